@@ -0,0 +1,79 @@
+"""
+Compare two benchmark result files (from benchmarks/run.py), matching runs by size and style:
+
+    python -m benchmarks.compare baseline.json results.json --threshold 10
+
+Exits with 1 when a time or memory metric regressed by more than the threshold (percent).
+"""
+import argparse
+import json
+import sys
+from typing import Dict, Iterator, Optional, Tuple
+
+# Below these, differences are noise rather than regressions
+MIN_SECONDS = 0.05
+MIN_MB = 5.0
+
+
+def load(path: str) -> Dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def metrics(run: Dict) -> Iterator[Tuple[str, Optional[float], bool]]:
+    """(name, value, gated) for every metric of a run; gated metrics can fail the comparison."""
+    yield "total_wall_seconds", run.get("total_wall_seconds"), True
+    yield "peak_rss_mb", run.get("peak_rss_mb"), True
+    yield "llm.requests", run.get("llm", {}).get("requests"), False
+    yield "llm.prompt_tokens", run.get("llm", {}).get("prompt_tokens"), False
+    yield "generated_files", run.get("generated_files"), False
+    for name, stage in run.get("stages", {}).items():
+        yield f"{name}.wall_seconds", stage.get("wall_seconds"), True
+        yield f"{name}.lag_p99_ms", stage.get("event_loop_lag_ms", {}).get("p99"), False
+
+
+def regressed(name: str, base: float, new: float, threshold: float) -> bool:
+    floor = MIN_MB if name.endswith("_mb") else MIN_SECONDS
+    return new - base > floor and new > base * (1 + threshold / 100)
+
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> int:
+    base_runs = {(run["files"], run["style"]): run for run in baseline.get("runs", [])}
+    print(f"baseline {baseline.get('git', {}).get('commit')} vs current {current.get('git', {}).get('commit')}")
+    regressions = 0
+    for run in current.get("runs", []):
+        key = (run["files"], run["style"])
+        base = base_runs.get(key)
+        print(f"\n{key[0]} files ({key[1]})")
+        if base is None:
+            print("  no baseline run")
+            continue
+        if "error" in run:
+            print(f"  current run failed: {run['error']}")
+            regressions += 1
+            continue
+        base_metrics = {name: value for name, value, _ in metrics(base)}
+        for name, value, gated in metrics(run):
+            base_value = base_metrics.get(name)
+            if value is None or base_value is None:
+                continue
+            if value == base_value:
+                change = "+0.0%"
+            else:
+                change = f"{(value - base_value) / base_value * 100:+.1f}%" if base_value else "n/a"
+            flag = ""
+            if gated and regressed(name, base_value, value, threshold):
+                flag = "  REGRESSION"
+                regressions += 1
+            print(f"  {name:<55} {base_value:>12.6g} {value:>12.6g} {change:>9}{flag}")
+    print(f"\n{regressions} regression(s) above {threshold}%")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed slowdown or memory growth in percent")
+    args = parser.parse_args()
+    sys.exit(compare(load(args.baseline), load(args.current), args.threshold))
@@ -0,0 +1,113 @@
+"""
+Measurements for benchmark runs: wall time per stage, event-loop lag, resident memory and the
+LLM calls and tokens a stage caused (from the fake backend's counters).
+"""
+import asyncio
+import os
+import resource
+import time
+from typing import Callable, Dict, List, Optional
+
+# How often the monitor wakes up; lag is how late it wakes
+SAMPLE_INTERVAL = 0.05
+# Fake backend counters reported per stage
+LLM_COUNTERS = ("requests", "attempts", "rate_limited", "server_errors", "failed", "prompt_tokens",
+                "completion_tokens", "embedding_requests", "embedding_tokens", "simulated_seconds")
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process (Linux /proc), else the peak as reported by getrusage."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if os.uname().sysname == "Darwin" else peak / 1024
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class StageRecorder:
+    """
+    Splits a run into named stages. A background task samples event-loop lag and RSS while the
+    run is in progress; each stage gets its wall time, lag percentiles, peak RSS and the
+    difference of the LLM counters between its start and end.
+    """
+
+    def __init__(self, llm_counters: Callable[[], Dict]):
+        self.llm_counters = llm_counters
+        self.stages: Dict[str, Dict] = {}
+        self._current: Optional[str] = None
+        self._started = 0.0
+        self._counters_at_start: Dict = {}
+        self._lags: List[float] = []
+        self._peak_rss = 0.0
+        self._monitor: Optional[asyncio.Task] = None
+
+    async def _sample(self) -> None:
+        while True:
+            expected = time.perf_counter() + SAMPLE_INTERVAL
+            await asyncio.sleep(SAMPLE_INTERVAL)
+            self._lags.append(max(0.0, time.perf_counter() - expected))
+            self._peak_rss = max(self._peak_rss, current_rss_mb())
+
+    def start_monitor(self) -> None:
+        self._monitor = asyncio.ensure_future(self._sample())
+
+    async def stop_monitor(self) -> None:
+        self.end_stage()
+        if self._monitor is not None:
+            self._monitor.cancel()
+            try:
+                await self._monitor
+            except asyncio.CancelledError:
+                pass
+
+    def stage(self, name: str) -> None:
+        """Start stage `name`, ending the current one; repeated names (e.g. progress updates) are ignored."""
+        if name == self._current:
+            return
+        self.end_stage()
+        self._current = name
+        self._started = time.perf_counter()
+        self._counters_at_start = self.llm_counters()
+        self._lags = []
+        self._peak_rss = current_rss_mb()
+
+    def end_stage(self) -> None:
+        if self._current is None:
+            return
+        counters = self.llm_counters()
+        lags_ms = [lag * 1000 for lag in self._lags]
+        stats = {
+            "wall_seconds": round(time.perf_counter() - self._started, 4),
+            "peak_rss_mb": round(max(self._peak_rss, current_rss_mb()), 1),
+            "event_loop_lag_ms": {
+                "p50": round(percentile(lags_ms, 50), 2),
+                "p99": round(percentile(lags_ms, 99), 2),
+                "max": round(max(lags_ms, default=0.0), 2),
+                "samples": len(lags_ms)
+            },
+            "llm": {
+                name: round(counters.get(name, 0) - self._counters_at_start.get(name, 0), 4)
+                for name in LLM_COUNTERS
+            }
+        }
+        # A stage entered again later gets a numbered key instead of overwriting the first
+        key = self._current
+        suffix = 2
+        while key in self.stages:
+            key = f"{self._current}#{suffix}"
+            suffix += 1
+        self.stages[key] = stats
+        self._current = None
@@ -0,0 +1,256 @@
+"""
+End-to-end benchmark: synthetic legacy solutions go through the /analyze and /migrate pipelines
+(ProjectAnalyzer, then the Migrator) with the fake LLM backend standing in for Azure OpenAI.
+
+Each size runs in its own process, so peak RSS and module state belong to that run alone. The
+results file is JSON and can be compared across commits with benchmarks/compare.py:
+
+    python -m benchmarks.run --files 100 1000 --output results.json
+    python -m benchmarks.compare baseline.json results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHEMA_VERSION = 1
+# The target structure prompts (REST and gRPC) both open with this
+TARGET_STRUCTURE_PROMPT = r"You are a seasoned \.NET Architect"
+
+
+def configure_environment(work_dir: str, args: argparse.Namespace) -> None:
+    """Point the app's settings at the work directory and the fake backend; must run before app imports."""
+    os.environ.update({
+        "LLM_BACKEND": "fake",
+        "FAKE_LLM_LATENCY_MS": str(args.latency_ms),
+        "FAKE_LLM_TOKENS_PER_SECOND": str(args.tokens_per_second),
+        "FAKE_LLM_RATE_LIMIT_RATE": str(args.rate_limit_rate),
+        "FAKE_LLM_ERROR_RATE": str(args.error_rate),
+        "FAKE_LLM_SEED": str(args.seed),
+        "FAKE_EMBED_LATENCY_MS": str(args.embed_latency_ms),
+        "FAKE_LLM_FIXTURES": os.path.join(work_dir, "fixtures.yaml"),
+        # The client-side limiter would otherwise dominate a run with zero model time
+        "AZURE_OPENAI_TPM": str(args.tpm),
+        "AZURE_OPENAI_RPM": str(args.rpm),
+        "DATABASE_URL": f"sqlite:///{os.path.join(work_dir, 'bench.sqlite3')}",
+        "JOB_QUEUE_PATH": os.path.join(work_dir, "jobs.sqlite3"),
+        "GENERATION_CACHE_ENABLED": "false",
+        "GENERATION_CACHE_PATH": os.path.join(work_dir, "generation_cache.sqlite3"),
+        "LANGCHAIN_TRACING_V2": "false",
+        "LANGSMITH_TRACING": "false"
+    })
+    # The LangSmith client refuses to start without a key, even with tracing off
+    os.environ.setdefault("LANGCHAIN_API_KEY", "benchmark")
+
+
+def write_fixtures(path: str, target: Dict) -> None:
+    import yaml
+
+    with open(path, "w", encoding="utf-8") as f:
+        yaml.safe_dump([{"match": TARGET_STRUCTURE_PROMPT, "response": json.dumps(target)}], f)
+
+
+def count_files(path: str) -> int:
+    return sum(len(files) for _, _, files in os.walk(path)) if os.path.isdir(path) else 0
+
+
+def numeric_usage(token_usage: Optional[Dict]) -> Dict:
+    """Scalar token usage figures; the per-file breakdowns are left out."""
+    return {key: value for key, value in (token_usage or {}).items() if isinstance(value, (int, float))}
+
+
+async def run_pipeline(solution, recorder, output_dir: str, target_version: str) -> Dict:
+    """Run /analyze and /migrate for `solution` the way the routes and worker do."""
+    from services.job_store import job_store
+    from services.pipelines import load_analysis, run_analysis, run_migration
+    from utils.file_utils import join_paths
+
+    def progress(prefix: str):
+        def report(update: Dict) -> None:
+            if "stage" in update:
+                recorder.stage(f"{prefix}.{update['stage']}")
+        return report
+
+    recorder.stage("analyze.upload")
+    data = await run_analysis(
+        repo_url=None,
+        target_version=target_version,
+        api_type="rest",
+        instruction="split into microservices",
+        zip_content_b64=solution.zip_base64(),
+        progress=progress("analyze")
+    )
+
+    recorder.stage("migrate.create_job")
+    analysis = await asyncio.to_thread(load_analysis, data["analysis_id"])
+    job = await asyncio.to_thread(
+        job_store.create_job,
+        analysis_id=analysis.id,
+        repo_name="migrated_project",
+        output_dir=output_dir,
+        api_type="rest",
+        target_version=target_version,
+        instruction=analysis.instruction,
+        target_structure=data["target_structure"]
+    )
+    job["output_dir"] = join_paths(output_dir, "jobs", job["id"])
+    await asyncio.to_thread(job_store.update_job, job["id"], output_dir=job["output_dir"])
+
+    migration_result = await run_migration(job, analysis, progress=progress("migrate"))
+    return {
+        "microservices": len(data["target_structure"].get("microservices", [])),
+        "generated_files": count_files(join_paths(job["output_dir"], "migrated_project")),
+        "token_usage": numeric_usage(migration_result.get("token_usage"))
+    }
+
+
+def run_single(args: argparse.Namespace) -> Dict:
+    """Benchmark one solution size in this process and return its result."""
+    work_dir = tempfile.mkdtemp(prefix="benchmark_")
+    configure_environment(work_dir, args)
+    # The app writes logs and scratch files relative to the working directory
+    os.chdir(work_dir)
+    sys.path.insert(0, REPO_DIR)
+
+    from benchmarks.metrics import StageRecorder, peak_rss_mb
+    from benchmarks.synthetic_repo import generate_solution, target_structure
+
+    started = time.perf_counter()
+    solution = generate_solution(args.files[0], style=args.style, seed=args.seed)
+    write_fixtures(os.environ["FAKE_LLM_FIXTURES"], target_structure(solution, args.entities_per_service))
+    result = {
+        "files": args.files[0],
+        "style": args.style,
+        "source_files": len(solution.files),
+        "entities": len(solution.entities),
+        "generate_seconds": round(time.perf_counter() - started, 4)
+    }
+
+    started = time.perf_counter()
+    from config.db_config import Base, engine
+    from config.llm_config import llm_config
+    import models.db  # noqa: F401 (registers the tables)
+    # The API server creates the tables on startup; the benchmark starts from an empty database
+    Base.metadata.create_all(bind=engine)
+    result["import_seconds"] = round(time.perf_counter() - started, 4)
+
+    recorder = StageRecorder(llm_config.fake_backend.snapshot)
+
+    async def main() -> Dict:
+        recorder.start_monitor()
+        try:
+            return await run_pipeline(solution, recorder, os.path.join(work_dir, "output"), args.target_version)
+        finally:
+            await recorder.stop_monitor()
+
+    started = time.perf_counter()
+    try:
+        result.update(asyncio.run(main()))
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["total_wall_seconds"] = round(time.perf_counter() - started, 4)
+    result["peak_rss_mb"] = round(peak_rss_mb(), 1)
+    result["llm"] = llm_config.fake_backend.snapshot()
+    result["stages"] = recorder.stages
+
+    os.chdir(REPO_DIR)
+    if args.keep:
+        result["work_dir"] = work_dir
+    else:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return result
+
+
+def git_revision() -> Dict:
+    def git(*command: str) -> str:
+        return subprocess.run(["git", *command], cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout.strip()
+
+    try:
+        return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--", "."))}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def child_arguments(args: argparse.Namespace, files: int, result_path: str) -> List[str]:
+    return [
+        sys.executable, "-m", "benchmarks.run", "--single", "--result", result_path,
+        "--files", str(files), "--style", args.style, "--seed", str(args.seed),
+        "--entities-per-service", str(args.entities_per_service), "--target-version", args.target_version,
+        "--latency-ms", str(args.latency_ms), "--tokens-per-second", str(args.tokens_per_second),
+        "--embed-latency-ms", str(args.embed_latency_ms), "--rate-limit-rate", str(args.rate_limit_rate),
+        "--error-rate", str(args.error_rate), "--tpm", str(args.tpm), "--rpm", str(args.rpm)
+    ] + (["--keep"] if args.keep else [])
+
+
+def run_all(args: argparse.Namespace) -> int:
+    runs = []
+    log_path = os.path.abspath(args.log)
+    with open(log_path, "w", encoding="utf-8") as log, tempfile.TemporaryDirectory(prefix="benchmark_results_") as results:
+        for files in args.files:
+            print(f"Benchmarking {files} files ({args.style})...", flush=True)
+            result_path = os.path.join(results, f"{files}.json")
+            process = subprocess.run(child_arguments(args, files, result_path), cwd=REPO_DIR,
+                                     stdout=log, stderr=subprocess.STDOUT)
+            if os.path.exists(result_path):
+                with open(result_path, "r", encoding="utf-8") as f:
+                    run = json.load(f)
+            else:
+                run = {"files": files, "style": args.style, "error": f"benchmark process exited with {process.returncode}"}
+            runs.append(run)
+            print(f"  {run.get('total_wall_seconds', '-')}s, peak RSS {run.get('peak_rss_mb', '-')} MB, "
+                  f"{run.get('llm', {}).get('requests', '-')} LLM requests"
+                  + (f", error: {run['error']}" if "error" in run else ""), flush=True)
+
+    report = {
+        "schema_version": SCHEMA_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {key: value for key, value in vars(args).items()
+                   if key not in ("files", "output", "log", "single", "result", "keep")},
+        "runs": runs
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output} (pipeline logs in {log_path})")
+    return 1 if any("error" in run for run in runs) else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark /analyze and /migrate on synthetic legacy .NET solutions")
+    parser.add_argument("--files", type=int, nargs="+", default=[100, 1000], help="source files per solution")
+    parser.add_argument("--style", choices=["webforms", "mvc", "mixed"], default="mixed")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--entities-per-service", type=int, default=4, help="entities grouped into each target microservice")
+    parser.add_argument("--target-version", default="net8.0")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="fake time to first token; 0 measures pipeline overhead only")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="fake output speed; 0 streams instantly")
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of fake requests answered with 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of fake requests answered with 500")
+    parser.add_argument("--tpm", type=int, default=1_000_000_000, help="AZURE_OPENAI_TPM for the client-side limiter")
+    parser.add_argument("--rpm", type=int, default=10_000_000, help="AZURE_OPENAI_RPM for the client-side limiter")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--log", default="benchmark.log", help="where the pipeline's own output goes")
+    parser.add_argument("--keep", action="store_true", help="keep each run's work directory")
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        result = run_single(args)
+        with open(args.result, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        sys.exit(1 if "error" in result else 0)
+    sys.exit(run_all(args))
@@ -0,0 +1,419 @@
+"""
+Synthetic legacy .NET solutions for benchmarks: ASP.NET WebForms pages with code-behind, MVC
+controllers with views, models, services, data access and Web.config, generated
+deterministically from a seed at any size.
+"""
+import base64
+import io
+import os
+import random
+import zipfile
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+ENTITY_NAMES = ("Customer", "Order", "Product", "Invoice", "Supplier", "Shipment", "Category", "Employee",
+                "Payment", "Review", "Warehouse", "Discount", "Cart", "Address", "Ticket", "Report")
+PROPERTY_TYPES = (("string", "Name"), ("string", "Description"), ("decimal", "Amount"), ("int", "Quantity"),
+                  ("DateTime", "CreatedAt"), ("bool", "IsActive"), ("string", "Email"), ("string", "Code"))
+SOLUTION_NAME = "LegacyShop"
+
+
+@dataclass
+class Entity:
+    """One business entity and the legacy files built around it."""
+    name: str
+    style: str
+    files: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def plural(self) -> str:
+        base = self.name.rstrip("0123456789")
+        suffix = self.name[len(base):]
+        if base.endswith("y"):
+            return base[:-1] + "ies" + suffix
+        return base + ("es" if base.endswith("s") else "s") + suffix
+
+
+@dataclass
+class SyntheticSolution:
+    name: str
+    style: str
+    entities: List[Entity]
+    files: Dict[str, str]
+
+    def write(self, root: str) -> str:
+        """Write the solution under `root`/<name>; returns that directory."""
+        base = os.path.join(root, self.name)
+        for path, content in self.files.items():
+            full_path = os.path.join(base, *path.split("/"))
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, "w", encoding="utf-8") as f:
+                f.write(content)
+        return base
+
+    def zip_base64(self) -> str:
+        """The solution as the base64 ZIP /analyze accepts, with a single root folder."""
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            for path, content in self.files.items():
+                archive.writestr(f"{self.name}/{path}", content)
+        return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def _properties(rng: random.Random) -> List[tuple]:
+    return [("int", "Id")] + rng.sample(PROPERTY_TYPES, rng.randint(3, 6))
+
+
+def _model(entity: Entity, properties: List[tuple]) -> str:
+    lines = ["using System;", "", f"namespace {SOLUTION_NAME}.Models", "{", f"    public class {entity.name}", "    {"]
+    lines += [f"        public {kind} {name} {{ get; set; }}" for kind, name in properties]
+    lines += ["    }", "}"]
+    return "\n".join(lines)
+
+
+def _repository(entity: Entity, properties: List[tuple]) -> str:
+    columns = ", ".join(name for _, name in properties)
+    table = entity.plural
+    return f"""using System.Collections.Generic;
+using System.Configuration;
+using System.Data.SqlClient;
+using {SOLUTION_NAME}.Models;
+
+namespace {SOLUTION_NAME}.DataAccess
+{{
+    public class {entity.name}Repository
+    {{
+        private readonly string _connectionString = ConfigurationManager.ConnectionStrings["ShopDb"].ConnectionString;
+
+        public List<{entity.name}> GetAll()
+        {{
+            var items = new List<{entity.name}>();
+            using (var connection = new SqlConnection(_connectionString))
+            using (var command = new SqlCommand("SELECT {columns} FROM {table}", connection))
+            {{
+                connection.Open();
+                using (var reader = command.ExecuteReader())
+                {{
+                    while (reader.Read())
+                    {{
+                        items.Add(new {entity.name} {{ Id = (int)reader["Id"] }});
+                    }}
+                }}
+            }}
+            return items;
+        }}
+
+        public {entity.name} GetById(int id)
+        {{
+            using (var connection = new SqlConnection(_connectionString))
+            using (var command = new SqlCommand("SELECT {columns} FROM {table} WHERE Id = @Id", connection))
+            {{
+                command.Parameters.AddWithValue("@Id", id);
+                connection.Open();
+                using (var reader = command.ExecuteReader())
+                {{
+                    return reader.Read() ? new {entity.name} {{ Id = (int)reader["Id"] }} : null;
+                }}
+            }}
+        }}
+
+        public void Delete(int id)
+        {{
+            using (var connection = new SqlConnection(_connectionString))
+            using (var command = new SqlCommand("DELETE FROM {table} WHERE Id = @Id", connection))
+            {{
+                command.Parameters.AddWithValue("@Id", id);
+                connection.Open();
+                command.ExecuteNonQuery();
+            }}
+        }}
+    }}
+}}"""
+
+
+def _service(entity: Entity) -> str:
+    return f"""using System.Collections.Generic;
+using {SOLUTION_NAME}.DataAccess;
+using {SOLUTION_NAME}.Models;
+
+namespace {SOLUTION_NAME}.Services
+{{
+    public class {entity.name}Service
+    {{
+        private readonly {entity.name}Repository _repository = new {entity.name}Repository();
+
+        public List<{entity.name}> List() => _repository.GetAll();
+
+        public {entity.name} Find(int id) => _repository.GetById(id);
+
+        public void Remove(int id) => _repository.Delete(id);
+    }}
+}}"""
+
+
+def _controller(entity: Entity) -> str:
+    return f"""using System.Web.Mvc;
+using {SOLUTION_NAME}.Services;
+
+namespace {SOLUTION_NAME}.Controllers
+{{
+    public class {entity.name}Controller : Controller
+    {{
+        private readonly {entity.name}Service _service = new {entity.name}Service();
+
+        // GET: /{entity.name}
+        public ActionResult Index()
+        {{
+            return View(_service.List());
+        }}
+
+        // GET: /{entity.name}/Details/5
+        public ActionResult Details(int id)
+        {{
+            var item = _service.Find(id);
+            if (item == null)
+            {{
+                return HttpNotFound();
+            }}
+            return View(item);
+        }}
+
+        [HttpPost]
+        [ValidateAntiForgeryToken]
+        public ActionResult Delete(int id)
+        {{
+            _service.Remove(id);
+            return RedirectToAction("Index");
+        }}
+    }}
+}}"""
+
+
+def _view(entity: Entity, action: str, properties: List[tuple]) -> str:
+    if action == "Index":
+        cells = "\n".join(f"            <td>@item.{name}</td>" for _, name in properties)
+        return f"""@model IEnumerable<{SOLUTION_NAME}.Models.{entity.name}>
+@{{ ViewBag.Title = "{entity.plural}"; }}
+<h2>{entity.plural}</h2>
+<table class="table">
+    @foreach (var item in Model)
+    {{
+        <tr>
+{cells}
+            <td>@Html.ActionLink("Details", "Details", new {{ id = item.Id }})</td>
+        </tr>
+    }}
+</table>"""
+    fields = "\n".join(f"    <dt>{name}</dt><dd>@Model.{name}</dd>" for _, name in properties)
+    return f"""@model {SOLUTION_NAME}.Models.{entity.name}
+@{{ ViewBag.Title = "{entity.name} {action}"; }}
+<h2>{entity.name}</h2>
+<dl>
+{fields}
+</dl>"""
+
+
+def _aspx(entity: Entity, page: str, properties: List[tuple]) -> str:
+    controls = "\n".join(
+        f'        <asp:Label ID="lbl{name}" runat="server" Text="{name}" /><asp:TextBox ID="txt{name}" runat="server" />'
+        for _, name in properties if name != "Id"
+    )
+    return f"""<%@ Page Title="{entity.plural}" Language="C#" MasterPageFile="~/Site.Master" AutoEventWireup="true" CodeBehind="{page}.aspx.cs" Inherits="{SOLUTION_NAME}.{entity.plural}.{page}" %>
+<asp:Content ID="MainContent" ContentPlaceHolderID="MainContent" runat="server">
+    <asp:GridView ID="gv{entity.plural}" runat="server" AutoGenerateColumns="true" OnRowCommand="gv{entity.plural}_RowCommand" />
+    <asp:Panel ID="pnlEdit" runat="server">
+{controls}
+        <asp:Button ID="btnSave" runat="server" Text="Save" OnClick="btnSave_Click" />
+    </asp:Panel>
+</asp:Content>"""
+
+
+def _code_behind(entity: Entity, page: str, properties: List[tuple]) -> str:
+    assignments = "\n".join(
+        f"            txt{name}.Text = string.Empty;" for _, name in properties if name != "Id"
+    )
+    return f"""using System;
+using System.Web.UI;
+using System.Web.UI.WebControls;
+using {SOLUTION_NAME}.Services;
+
+namespace {SOLUTION_NAME}.{entity.plural}
+{{
+    public partial class {page} : Page
+    {{
+        private readonly {entity.name}Service _service = new {entity.name}Service();
+
+        protected void Page_Load(object sender, EventArgs e)
+        {{
+            if (!IsPostBack)
+            {{
+                gv{entity.plural}.DataSource = _service.List();
+                gv{entity.plural}.DataBind();
+            }}
+        }}
+
+        protected void gv{entity.plural}_RowCommand(object sender, GridViewCommandEventArgs e)
+        {{
+            if (e.CommandName == "Delete")
+            {{
+                _service.Remove(Convert.ToInt32(e.CommandArgument));
+                Response.Redirect(Request.RawUrl);
+            }}
+        }}
+
+        protected void btnSave_Click(object sender, EventArgs e)
+        {{
+{assignments}
+        }}
+    }}
+}}"""
+
+
+def _entity_files(entity: Entity, rng: random.Random) -> Dict[str, str]:
+    properties = _properties(rng)
+    files = {
+        f"Models/{entity.name}.cs": _model(entity, properties),
+        f"DataAccess/{entity.name}Repository.cs": _repository(entity, properties),
+        f"Services/{entity.name}Service.cs": _service(entity),
+    }
+    if entity.style == "mvc":
+        files[f"Controllers/{entity.name}Controller.cs"] = _controller(entity)
+        for action in ("Index", "Details"):
+            files[f"Views/{entity.name}/{action}.cshtml"] = _view(entity, action, properties)
+    else:
+        for page in ("Default", "Edit"):
+            files[f"{entity.plural}/{page}.aspx"] = _aspx(entity, page, properties)
+            files[f"{entity.plural}/{page}.aspx.cs"] = _code_behind(entity, page, properties)
+    return files
+
+
+def _solution_files(style: str, entities: List[Entity]) -> Dict[str, str]:
+    connection = '<add name="ShopDb" connectionString="Server=.;Database=Shop;Trusted_Connection=True;" providerName="System.Data.SqlClient" />'
+    files = {
+        "Web.config": f"""<?xml version="1.0" encoding="utf-8"?>
+<configuration>
+  <connectionStrings>
+    {connection}
+  </connectionStrings>
+  <appSettings>
+    <add key="PageSize" value="25" />
+  </appSettings>
+  <system.web>
+    <compilation debug="true" targetFramework="4.7.2" />
+    <httpRuntime targetFramework="4.7.2" />
+  </system.web>
+</configuration>""",
+        "Global.asax": f'<%@ Application Codebehind="Global.asax.cs" Inherits="{SOLUTION_NAME}.Global" Language="C#" %>',
+        "Global.asax.cs": f"""using System;
+using System.Web;
+
+namespace {SOLUTION_NAME}
+{{
+    public class Global : HttpApplication
+    {{
+        protected void Application_Start(object sender, EventArgs e)
+        {{
+        }}
+    }}
+}}""",
+        f"{SOLUTION_NAME}.csproj": "\n".join(
+            ['<Project ToolsVersion="15.0" xmlns="http://schemas.microsoft.com/developer/msbuild/2003">', "  <ItemGroup>"]
+            + [f'    <Compile Include="Models\\{entity.name}.cs" />' for entity in entities]
+            + ["  </ItemGroup>", "</Project>"]
+        ),
+    }
+    if style != "mvc":
+        files["Site.Master"] = f'<%@ Master Language="C#" CodeBehind="Site.Master.cs" Inherits="{SOLUTION_NAME}.SiteMaster" %>\n<html><body><asp:ContentPlaceHolder ID="MainContent" runat="server" /></body></html>'
+        files["Site.Master.cs"] = f"using System.Web.UI;\n\nnamespace {SOLUTION_NAME}\n{{\n    public partial class SiteMaster : MasterPage\n    {{\n    }}\n}}"
+    if style != "webforms":
+        files["Views/Shared/_Layout.cshtml"] = "<!DOCTYPE html>\n<html>\n<body>\n    @RenderBody()\n</body>\n</html>"
+    return files
+
+
+def generate_solution(file_count: int, style: str = "mixed", seed: int = 0) -> SyntheticSolution:
+    """
+    A solution of about `file_count` files. `style` is "webforms", "mvc" or "mixed" (entities
+    alternate between the two); entities are added until the file count is reached.
+    """
+    rng = random.Random(seed)
+    entities: List[Entity] = []
+    files: Dict[str, str] = {}
+    common_count = len(_solution_files(style, []))
+    while len(files) + common_count < file_count or not entities:
+        index = len(entities)
+        name = ENTITY_NAMES[index % len(ENTITY_NAMES)] + (str(index // len(ENTITY_NAMES)) if index >= len(ENTITY_NAMES) else "")
+        entity_style = style if style != "mixed" else ("mvc" if index % 2 else "webforms")
+        entity = Entity(name, entity_style)
+        entity.files = _entity_files(entity, rng)
+        entities.append(entity)
+        files.update(entity.files)
+    files.update(_solution_files(style, entities))
+    return SyntheticSolution(SOLUTION_NAME, style, entities, files)
+
+
+def _target_file(file_type: str, description: str, namespace: str, source_files: List[str], **extra) -> Dict:
+    return {"source_files": source_files, "file_type": file_type, "description": description, "namespace": namespace, **extra}
+
+
+def _folder(files: Dict[str, Dict], subfolders: Dict[str, Dict] = None) -> Dict:
+    return {"target_files": files, "subfolders": subfolders or {}}
+
+
+def _service_projects(service: str, entities: List[Entity]) -> List[Dict]:
+    """Domain, Application, Infrastructure and Presentation projects of one microservice."""
+    entity_files, interfaces, services, repositories, controllers, views = {}, {}, {}, {}, {}, {}
+    for entity in entities:
+        model_source = [f"Models/{entity.name}.cs"]
+        service_source = [f"Services/{entity.name}Service.cs"]
+        entity_files[f"{entity.name}.cs"] = _target_file("model", f"{entity.name} entity", f"{service}.Domain.Entities", model_source)
+        interfaces[f"I{entity.name}Service.cs"] = _target_file("interface", f"{entity.name} use cases", f"{service}.Application.Interfaces", service_source)
+        services[f"{entity.name}Service.cs"] = _target_file("service", f"{entity.name} use cases", f"{service}.Application.Services", service_source)
+        repositories[f"{entity.name}Repository.cs"] = _target_file(
+            "repository", f"{entity.name} data access", f"{service}.Infrastructure.Repositories", [f"DataAccess/{entity.name}Repository.cs"]
+        )
+        if entity.style == "mvc":
+            controller_sources = [f"Controllers/{entity.name}Controller.cs"]
+            view_sources = {action: [f"Views/{entity.name}/{action}.cshtml"] for action in ("Index", "Details")}
+        else:
+            controller_sources = [f"{entity.plural}/Default.aspx.cs", f"{entity.plural}/Edit.aspx.cs"]
+            view_sources = {"Index": [f"{entity.plural}/Default.aspx"], "Details": [f"{entity.plural}/Edit.aspx"]}
+        controllers[f"{entity.name}Controller.cs"] = _target_file(
+            "controller", f"{entity.name} endpoints", f"{service}.Presentation.Controllers", controller_sources,
+            routes=[f"/api/{entity.plural.lower()}", f"/api/{entity.plural.lower()}/{{id}}"]
+        )
+        views[entity.name] = _folder({
+            f"{action}.cshtml": _target_file("view", f"{entity.name} {action} view", "", sources)
+            for action, sources in view_sources.items()
+        })
+    views["Shared"] = _folder({"_Layout.cshtml": _target_file("layout", "Shared layout", "", [])})
+
+    def project(layer: str, root: Dict[str, Dict], folders: Dict[str, Dict]) -> Dict:
+        name = f"{service}.{layer}"
+        root = {f"{name}.csproj": _target_file("csproj", f"{layer} project", "", []), **root}
+        return {"project_name": name, "target_structure": {"root": root, "folders": folders}}
+
+    return [
+        project("Domain", {}, {"Entities": _folder(entity_files)}),
+        project("Application", {}, {"Interfaces": _folder(interfaces), "Services": _folder(services)}),
+        project("Infrastructure", {}, {"Repositories": _folder(repositories)}),
+        project("Presentation", {
+            "Program.cs": _target_file("program", f"{service} entry point", f"{service}.Presentation", ["Global.asax.cs"]),
+            "appsettings.json": _target_file("config", f"{service} settings", "", ["Web.config"])
+        }, {"Controllers": _folder(controllers), "Views": _folder({}, views)})
+    ]
+
+
+def target_structure(solution: SyntheticSolution, entities_per_service: int = 4) -> Dict:
+    """
+    A valid REST target structure for the solution (what the target-structure LLM call would
+    return): one microservice per `entities_per_service` entities plus a routing-only Gateway.
+    """
+    # Imported here so generating a solution does not need the service settings
+    from utils.structure_validator import default_gateway_project
+
+    microservices = [{"name": "Gateway", "projects": [default_gateway_project()]}]
+    for start in range(0, len(solution.entities), entities_per_service):
+        entities = solution.entities[start:start + entities_per_service]
+        service = f"{entities[0].name}Service"
+        microservices.append({"name": service, "projects": _service_projects(service, entities)})
+    return {"microservices": microservices}
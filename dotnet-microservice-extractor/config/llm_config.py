@@ -81,37 +81,203 @@
 
 import os
 import certifi
+from utils import logger
 os.environ['REQUESTS_CA_BUNDLE'] = certifi.where()
 os.environ['SSL_CERT_FILE'] = certifi.where()
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from pydantic import Field, SecretStr, PrivateAttr
+from pydantic import BaseModel, Field, SecretStr, PrivateAttr, model_validator
 from functools import lru_cache
 from openai import AsyncAzureOpenAI
+from pydantic_ai.models import Model
 from pydantic_ai.models.openai import OpenAIModel
+from llama_index.core.llms import LLM
 from llama_index.llms.azure_openai import AzureOpenAI
 from llama_index.embeddings.azure_openai import AzureOpenAIEmbedding
+from llama_index.core.base.embeddings.base import BaseEmbedding
 # from llama_index.embeddings.huggingface import HuggingFaceEmbedding
 from llama_index.core import Settings
-from typing import Optional
+from llama_index.core.instrumentation import get_dispatcher
+from llama_index.core.instrumentation.event_handlers import BaseEventHandler
+from llama_index.core.instrumentation.events.llm import LLMChatStartEvent, LLMCompletionStartEvent
+from typing import Any, Awaitable, Callable, Dict, List, Literal, Optional
+from contextvars import ContextVar
+import asyncio
+import threading
+import time
+import weakref
+import httpx
+from utils.token_counter import token_counter
+from utils.request_hedger import RequestHedger
+from utils.fake_llm import FakeLLMBackend
+
+try:
+    import h2  # noqa: F401  (httpx needs it for HTTP/2)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Set while an async LlamaIndex call made through LLMConfig.acomplete runs; it already waited for capacity
+_rate_limit_acquired: ContextVar[bool] = ContextVar("rate_limit_acquired", default=False)
+
+
+class LLMRateLimiter:
+    """
+    Process-wide token and request budget for one deployment.
+
+    Two buckets (tokens per minute, requests per minute) refill continuously. A caller reserves
+    its estimated cost up front; if a bucket goes negative the caller waits until the deficit has
+    refilled, so concurrent callers queue in arrival order instead of all firing and collecting
+    429s. State is guarded by a thread lock, so the same limiter works from the event loop
+    (acquire) and from worker threads running sync LLM calls (acquire_sync).
+    """
+
+    def __init__(self, tokens_per_minute: int, requests_per_minute: int):
+        self.tokens_per_minute = max(1, tokens_per_minute)
+        self.requests_per_minute = max(1, requests_per_minute)
+        self._tokens = float(self.tokens_per_minute)
+        self._requests = float(self.requests_per_minute)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, estimated_tokens: int) -> float:
+        """Reserve capacity and return how long the caller must wait before sending."""
+        cost = min(max(estimated_tokens, 1), self.tokens_per_minute)
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._updated
+            self._updated = now
+            self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+            self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+            self._tokens -= cost
+            self._requests -= 1
+            token_wait = -self._tokens * 60 / self.tokens_per_minute if self._tokens < 0 else 0.0
+            request_wait = -self._requests * 60 / self.requests_per_minute if self._requests < 0 else 0.0
+            return max(token_wait, request_wait)
+
+    async def acquire(self, estimated_tokens: int) -> None:
+        wait = self._reserve(estimated_tokens)
+        if wait > 0:
+            logger.info(f"LLM rate limit: waiting {wait:.1f}s for {estimated_tokens} tokens")
+            await asyncio.sleep(wait)
+
+    def acquire_sync(self, estimated_tokens: int) -> None:
+        wait = self._reserve(estimated_tokens)
+        if wait > 0:
+            logger.info(f"LLM rate limit: waiting {wait:.1f}s for {estimated_tokens} tokens")
+            time.sleep(wait)
  
 
+class ModelRoute(BaseModel):
+    """
+    One row of the routing table: requests matching every given condition go to `deployment`.
+    Conditions left out match anything; the first matching row wins.
+    """
+    deployment: str
+    # LlamaIndex model name of the deployment (sets its context window and tokenizer)
+    model: str = "gpt-4o"
+    # "generation", "analysis", "target_structure", "recommendation"
+    tasks: Optional[List[str]] = None
+    # File types for generation; file extensions (".config", ".json", ...) for analysis
+    file_types: Optional[List[str]] = None
+    layers: Optional[List[str]] = None
+    min_input_tokens: int = 0
+    max_input_tokens: Optional[int] = None
+
+    def matches(self, task: str, file_type: Optional[str], layer: Optional[str], input_tokens: int) -> bool:
+        if self.tasks is not None and task not in self.tasks:
+            return False
+        if self.file_types is not None and file_type not in self.file_types:
+            return False
+        if self.layers is not None and (layer or "").lower() not in [name.lower() for name in self.layers]:
+            return False
+        if input_tokens < self.min_input_tokens:
+            return False
+        return self.max_input_tokens is None or input_tokens <= self.max_input_tokens
+
+
 class LLMConfig(BaseSettings):
-    # Azure OpenAI Configuration
-    azure_openai_api_key: SecretStr = Field(..., validation_alias="AZURE_OPENAI_API_KEY")
-    azure_openai_api_version: str = Field(..., validation_alias="AZURE_OPENAI_API_VERSION")
-    azure_openai_endpoint: str = Field(..., validation_alias="AZURE_OPENAI_ENDPOINT")
-    azure_openai_deployment_name: str = Field(..., validation_alias="AZURE_OPENAI_DEPLOYMENT_NAME")
+    # "azure" or "fake": deterministic offline responses with simulated latency and faults (FAKE_LLM_* below)
+    llm_backend: Literal["azure", "fake"] = Field("azure", validation_alias="LLM_BACKEND")
+
+    # Azure OpenAI Configuration (required by the azure backend)
+    azure_openai_api_key: SecretStr = Field(SecretStr(""), validation_alias="AZURE_OPENAI_API_KEY")
+    azure_openai_api_version: str = Field("", validation_alias="AZURE_OPENAI_API_VERSION")
+    azure_openai_endpoint: str = Field("", validation_alias="AZURE_OPENAI_ENDPOINT")
+    azure_openai_deployment_name: str = Field("", validation_alias="AZURE_OPENAI_DEPLOYMENT_NAME")
  
     # Azure OpenAI Embedding Configuration
-    azure_openai_embed_api_endpoint: str = Field(..., validation_alias="AZURE_OPENAI_EMBED_API_ENDPOINT")
-    azure_openai_embed_api_key: SecretStr = Field(..., validation_alias="AZURE_OPENAI_EMBED_API_KEY")
-    azure_openai_embed_model: str = Field(..., validation_alias="AZURE_OPENAI_EMBED_MODEL")
-    azure_openai_embed_version: str = Field(..., validation_alias="AZURE_OPENAI_EMBED_VERSION")
+    azure_openai_embed_api_endpoint: str = Field("", validation_alias="AZURE_OPENAI_EMBED_API_ENDPOINT")
+    azure_openai_embed_api_key: SecretStr = Field(SecretStr(""), validation_alias="AZURE_OPENAI_EMBED_API_KEY")
+    azure_openai_embed_model: str = Field("", validation_alias="AZURE_OPENAI_EMBED_MODEL")
+    azure_openai_embed_version: str = Field("", validation_alias="AZURE_OPENAI_EMBED_VERSION")
+ 
+    # Upper bound on files generated at the same time within one migration
+    max_concurrent_generations: int = Field(8, validation_alias="MAX_CONCURRENT_GENERATIONS")
  
+    # Azure quota per deployment; LLM_DEPLOYMENT_LIMITS is JSON like {"gpt-4o": {"tpm": 150000, "rpm": 900}}
+    azure_openai_tpm: int = Field(150000, validation_alias="AZURE_OPENAI_TPM")
+    azure_openai_rpm: int = Field(900, validation_alias="AZURE_OPENAI_RPM")
+    llm_deployment_limits: Dict[str, Dict[str, int]] = Field(default_factory=dict, validation_alias="LLM_DEPLOYMENT_LIMITS")
+    # Completion tokens reserved per request on top of the prompt, since Azure counts both against TPM
+    llm_expected_completion_tokens: int = Field(1500, validation_alias="LLM_EXPECTED_COMPLETION_TOKENS")
+
+    # "direct": one structured call per file with the context already in the prompt; "agent": ReAct tool loop.
+    # File types in AGENT_FILE_TYPES (JSON list) always use the agent, since they wire up code from other files.
+    generation_mode: Literal["direct", "agent"] = Field("direct", validation_alias="GENERATION_MODE")
+    agent_file_types: List[str] = Field(default_factory=lambda: ["program", "program_cs_grpc"], validation_alias="AGENT_FILE_TYPES")
+    # Direct generations stream the code into the target file as it arrives; a response cut off
+    # inside the code is continued up to STREAM_MAX_CONTINUATIONS times instead of regenerated
+    stream_generation: bool = Field(False, validation_alias="STREAM_GENERATION")
+    stream_max_continuations: int = Field(2, validation_alias="STREAM_MAX_CONTINUATIONS")
+
+    # Routing table (LLM_ROUTES, JSON list of ModelRoute rows) sending requests by task, file type, layer
+    # and input size to other deployments of the same endpoint; unmatched requests use AZURE_OPENAI_DEPLOYMENT_NAME
+    llm_routes: List[ModelRoute] = Field(default_factory=list, validation_alias="LLM_ROUTES")
+
+    # Hedged requests: a structured call slower than LLM_HEDGE_PERCENTILE of recent calls of its file
+    # type gets a duplicate, within LLM_HEDGE_BUDGET (share of first-attempt tokens spent on hedges)
+    hedge_requests: bool = Field(False, validation_alias="LLM_HEDGING")
+    hedge_percentile: float = Field(95.0, validation_alias="LLM_HEDGE_PERCENTILE")
+    hedge_budget: float = Field(0.05, validation_alias="LLM_HEDGE_BUDGET")
+    hedge_min_samples: int = Field(20, validation_alias="LLM_HEDGE_MIN_SAMPLES")
+
+    # Connection pool shared by every LLM and embedding client; 0 sizes it from MAX_CONCURRENT_GENERATIONS
+    llm_max_connections: int = Field(0, validation_alias="LLM_MAX_CONNECTIONS")
+    llm_keepalive_seconds: float = Field(90.0, validation_alias="LLM_KEEPALIVE_SECONDS")
+    llm_http2: bool = Field(True, validation_alias="LLM_HTTP2")
+    # Per-call timeouts and retries (exponential backoff on 429/5xx/connection errors, done by the openai client)
+    llm_request_timeout: float = Field(120.0, validation_alias="LLM_REQUEST_TIMEOUT")
+    llm_connect_timeout: float = Field(10.0, validation_alias="LLM_CONNECT_TIMEOUT")
+    llm_max_retries: int = Field(3, validation_alias="LLM_MAX_RETRIES")
+
+    # Fake backend: median time to first token, its distribution ("fixed", "uniform" within +-spread,
+    # "lognormal" with sigma spread), output speed (0 = instant), typical completion size, the share of
+    # attempts answered with a 429 or a 500 (retried like the openai client does), and an optional
+    # YAML file of canned responses ([{match: <prompt regex>, response: ...}]) for prompts that need real content
+    fake_llm_latency_ms: float = Field(500.0, validation_alias="FAKE_LLM_LATENCY_MS")
+    fake_llm_latency_distribution: Literal["fixed", "uniform", "lognormal"] = Field("lognormal", validation_alias="FAKE_LLM_LATENCY_DISTRIBUTION")
+    fake_llm_latency_spread: float = Field(0.5, validation_alias="FAKE_LLM_LATENCY_SPREAD")
+    fake_llm_tokens_per_second: float = Field(80.0, validation_alias="FAKE_LLM_TOKENS_PER_SECOND")
+    fake_llm_completion_tokens: int = Field(600, validation_alias="FAKE_LLM_COMPLETION_TOKENS")
+    fake_llm_rate_limit_rate: float = Field(0.0, validation_alias="FAKE_LLM_RATE_LIMIT_RATE")
+    fake_llm_error_rate: float = Field(0.0, validation_alias="FAKE_LLM_ERROR_RATE")
+    fake_llm_seed: int = Field(0, validation_alias="FAKE_LLM_SEED")
+    fake_llm_fixtures: Optional[str] = Field(None, validation_alias="FAKE_LLM_FIXTURES")
+    fake_embed_latency_ms: float = Field(30.0, validation_alias="FAKE_EMBED_LATENCY_MS")
+    fake_embed_dimensions: int = Field(3072, validation_alias="FAKE_EMBED_DIMENSIONS")
+
     # LlamaIndex components
-    _llm: Optional[AzureOpenAI] = PrivateAttr(default=None)
-    _embed_model: Optional[AzureOpenAIEmbedding] = PrivateAttr(default=None)
+    _llm: Optional[LLM] = PrivateAttr(default=None)
+    _embed_model: Optional[BaseEmbedding] = PrivateAttr(default=None)
+    _http_client: Optional[httpx.Client] = PrivateAttr(default=None)
+    _async_http_client: Optional[httpx.AsyncClient] = PrivateAttr(default=None)
+    _hedger: Optional[RequestHedger] = PrivateAttr(default=None)
+    _fake_backend: Optional[FakeLLMBackend] = PrivateAttr(default=None)
+    _routed_llms: Dict[str, LLM] = PrivateAttr(default_factory=dict)
+    _rate_limiters: Dict[str, LLMRateLimiter] = PrivateAttr(default_factory=dict)
+    _rate_limiters_lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _generation_semaphores: Any = PrivateAttr(default_factory=weakref.WeakKeyDictionary)
  
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -120,9 +286,30 @@ class LLMConfig(BaseSettings):
         extra="ignore"
     )
  
+    @model_validator(mode="after")
+    def check_backend_settings(self) -> "LLMConfig":
+        if self.llm_backend == "fake":
+            self.azure_openai_deployment_name = self.azure_openai_deployment_name or "fake"
+            return self
+        required = {
+            "AZURE_OPENAI_API_KEY": self.azure_openai_api_key.get_secret_value(),
+            "AZURE_OPENAI_API_VERSION": self.azure_openai_api_version,
+            "AZURE_OPENAI_ENDPOINT": self.azure_openai_endpoint,
+            "AZURE_OPENAI_DEPLOYMENT_NAME": self.azure_openai_deployment_name,
+            "AZURE_OPENAI_EMBED_API_ENDPOINT": self.azure_openai_embed_api_endpoint,
+            "AZURE_OPENAI_EMBED_API_KEY": self.azure_openai_embed_api_key.get_secret_value(),
+            "AZURE_OPENAI_EMBED_MODEL": self.azure_openai_embed_model,
+            "AZURE_OPENAI_EMBED_VERSION": self.azure_openai_embed_version
+        }
+        missing = [name for name, value in required.items() if not value]
+        if missing:
+            raise ValueError(f"Missing Azure OpenAI settings: {', '.join(missing)} (or set LLM_BACKEND=fake)")
+        return self
+
     @classmethod
-    @lru_cache(maxsize=1)
-    def get_pydantic_model(cls, api_key: str, api_version: str, endpoint: str, deployment_name: str) -> OpenAIModel:
+    @lru_cache(maxsize=None)
+    def get_pydantic_model(cls, api_key: str, api_version: str, endpoint: str, deployment_name: str,
+                           http_client: Optional[httpx.AsyncClient] = None, timeout: float = 120.0, max_retries: int = 3) -> OpenAIModel:
         return OpenAIModel(
             deployment_name,
             openai_client=AsyncAzureOpenAI(
@@ -130,22 +317,194 @@ class LLMConfig(BaseSettings):
                 api_version=api_version,
                 azure_endpoint=endpoint,
                 azure_deployment=deployment_name,
-                timeout=120.0, 
-                max_retries=3
+                timeout=timeout,
+                max_retries=max_retries,
+                http_client=http_client
             )
         )
+
+    @property
+    def max_connections(self) -> int:
+        # Headroom over the generation concurrency for agent tool calls, embeddings and analysis
+        return self.llm_max_connections or max(8, self.max_concurrent_generations * 2)
+
+    def http_timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(self.llm_request_timeout, connect=self.llm_connect_timeout)
+
+    def http_limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_connections,
+            keepalive_expiry=self.llm_keepalive_seconds
+        )
+
+    @property
+    def async_http_client(self) -> httpx.AsyncClient:
+        """
+        Pooled client of every async LLM call. Connections stay open between calls, so requests
+        after the first skip the TCP/TLS handshake; HTTP/2 (when h2 is installed) multiplexes
+        concurrent requests over few connections.
+        """
+        if self._async_http_client is None:
+            self._async_http_client = httpx.AsyncClient(
+                http2=self.llm_http2 and HTTP2_AVAILABLE, limits=self.http_limits(), timeout=self.http_timeout()
+            )
+        return self._async_http_client
+
+    @property
+    def http_client(self) -> httpx.Client:
+        """Pooled client of the sync calls left on worker threads (ReAct agent steps, RAG embeddings)."""
+        if self._http_client is None:
+            self._http_client = httpx.Client(
+                http2=self.llm_http2 and HTTP2_AVAILABLE, limits=self.http_limits(), timeout=self.http_timeout()
+            )
+        return self._http_client
  
+    def rate_limiter(self, deployment_name: Optional[str] = None) -> LLMRateLimiter:
+        """Shared limiter for a deployment (the chat deployment by default), created on first use."""
+        deployment_name = deployment_name or self.azure_openai_deployment_name
+        with self._rate_limiters_lock:
+            limiter = self._rate_limiters.get(deployment_name)
+            if limiter is None:
+                limits = self.llm_deployment_limits.get(deployment_name, {})
+                limiter = LLMRateLimiter(
+                    tokens_per_minute=limits.get("tpm", self.azure_openai_tpm),
+                    requests_per_minute=limits.get("rpm", self.azure_openai_rpm)
+                )
+                self._rate_limiters[deployment_name] = limiter
+            return limiter
+
+    def generation_semaphore(self) -> asyncio.Semaphore:
+        """
+        Process-wide cap of MAX_CONCURRENT_GENERATIONS file generations, shared by every
+        migration and worker job; one per event loop, since a semaphore binds to its loop.
+        """
+        loop = asyncio.get_running_loop()
+        with self._rate_limiters_lock:
+            semaphore = self._generation_semaphores.get(loop)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(max(1, self.max_concurrent_generations))
+                self._generation_semaphores[loop] = semaphore
+            return semaphore
+
+    @property
+    def fake_backend(self) -> Optional[FakeLLMBackend]:
+        """The offline backend when LLM_BACKEND=fake, else None; its stats() cover every fake call."""
+        if self.llm_backend != "fake":
+            return None
+        if self._fake_backend is None:
+            self._fake_backend = FakeLLMBackend(
+                latency_ms=self.fake_llm_latency_ms,
+                latency_distribution=self.fake_llm_latency_distribution,
+                latency_spread=self.fake_llm_latency_spread,
+                tokens_per_second=self.fake_llm_tokens_per_second,
+                completion_tokens=self.fake_llm_completion_tokens,
+                error_rate=self.fake_llm_error_rate,
+                rate_limit_rate=self.fake_llm_rate_limit_rate,
+                max_retries=self.llm_max_retries,
+                seed=self.fake_llm_seed,
+                embed_latency_ms=self.fake_embed_latency_ms,
+                embed_dimensions=self.fake_embed_dimensions,
+                fixtures_path=self.fake_llm_fixtures
+            )
+        return self._fake_backend
+
+    def route(self, task: str, file_type: Optional[str] = None, layer: Optional[str] = None, input_tokens: int = 0) -> str:
+        """Deployment for a request, from the first matching LLM_ROUTES row."""
+        for route in self.llm_routes:
+            if route.matches(task, file_type, layer, input_tokens):
+                return route.deployment
+        return self.azure_openai_deployment_name
+
+    def pydantic_model(self, deployment_name: Optional[str] = None) -> Model:
+        """pydantic-ai model of a deployment, sharing the pooled async client; pass as run(model=...)."""
+        if self.fake_backend is not None:
+            return self.fake_backend.pydantic_model(deployment_name or self.azure_openai_deployment_name)
+        return self.get_pydantic_model(
+            api_key=self.azure_openai_api_key.get_secret_value(),
+            api_version=self.azure_openai_api_version,
+            endpoint=self.azure_openai_endpoint,
+            deployment_name=deployment_name or self.azure_openai_deployment_name,
+            http_client=self.async_http_client,
+            timeout=self.llm_request_timeout,
+            max_retries=self.llm_max_retries
+        )
+
+    def llm(self, deployment_name: Optional[str] = None) -> LLM:
+        """LlamaIndex LLM of a deployment; the default one is the global Settings.llm."""
+        if not deployment_name or deployment_name == self.azure_openai_deployment_name:
+            return self._llm
+        if self.fake_backend is not None:
+            return self.fake_backend.llm(deployment_name)
+        with self._rate_limiters_lock:
+            llm = self._routed_llms.get(deployment_name)
+            if llm is None:
+                model = next((route.model for route in self.llm_routes if route.deployment == deployment_name), "gpt-4o")
+                llm = AzureOpenAI(
+                    model=model,
+                    deployment_name=deployment_name,
+                    api_key=self.azure_openai_api_key.get_secret_value(),
+                    azure_endpoint=self.azure_openai_endpoint,
+                    api_version=self.azure_openai_api_version,
+                    timeout=self.llm_request_timeout,
+                    max_retries=self.llm_max_retries,
+                    http_client=self.http_client,
+                    async_http_client=self.async_http_client
+                )
+                self._routed_llms[deployment_name] = llm
+            return llm
+
+    def estimate_request_tokens(self, prompt: str) -> int:
+        return token_counter.count(prompt) + self.llm_expected_completion_tokens
+
+    async def acquire(self, prompt: str, deployment_name: Optional[str] = None) -> None:
+        """Wait for rate limit capacity before sending `prompt`; used around pydantic-ai agent runs."""
+        estimated_tokens = await token_counter.count_async(prompt) + self.llm_expected_completion_tokens
+        await self.rate_limiter(deployment_name).acquire(estimated_tokens)
+
+    @property
+    def hedger(self) -> RequestHedger:
+        """Process-wide hedger, so latency percentiles are learned across migrations and analyses."""
+        if self._hedger is None:
+            self._hedger = RequestHedger(self.hedge_percentile, self.hedge_budget, self.hedge_min_samples)
+        return self._hedger
+
+    async def hedged(self, key: str, call: Callable[[], Awaitable[Any]], prompt: str, stats: Optional[Dict] = None,
+                     deployment_name: Optional[str] = None) -> Any:
+        """
+        Await call() (one LLM request for `prompt`, already rate limited); with LLM_HEDGING on, a
+        slow call of kind `key` is raced against a duplicate that waits for its own capacity.
+        """
+        if not self.hedge_requests:
+            return await call()
+        key = f"{deployment_name or self.azure_openai_deployment_name}:{key}"
+        return await self.hedger.run(key, call, self.estimate_request_tokens(prompt),
+                                     acquire_hedge=lambda: self.acquire(prompt, deployment_name), stats=stats)
+
+    async def acomplete(self, prompt: str, deployment_name: Optional[str] = None, **kwargs: Any):
+        """LlamaIndex completion on the event loop through the pooled async client, rate limited without blocking."""
+        await self.acquire(prompt, deployment_name)
+        token = _rate_limit_acquired.set(True)
+        try:
+            return await self.llm(deployment_name).acomplete(prompt, **kwargs)
+        finally:
+            _rate_limit_acquired.reset(token)
+
     def init_llamaindex(self) -> None:
         """Initialize LlamaIndex settings with Azure OpenAI components"""
+        if self.fake_backend is not None:
+            self.init_fake_backend()
+            return
         self._llm = AzureOpenAI(
             model="gpt-4o",
             deployment_name=self.azure_openai_deployment_name,
             api_key=self.azure_openai_api_key.get_secret_value(),
             azure_endpoint=self.azure_openai_endpoint,
             api_version=self.azure_openai_api_version,
-            timeout=120.0,  # Set timeout to 120 seconds
-            max_retries=3
-            
+            timeout=self.llm_request_timeout,
+            max_retries=self.llm_max_retries,
+            http_client=self.http_client,
+            async_http_client=self.async_http_client
         )
  
         # self._embed_model = AzureOpenAIEmbedding(
@@ -161,8 +520,10 @@ class LLMConfig(BaseSettings):
             api_key=self.azure_openai_embed_api_key.get_secret_value(),
             azure_endpoint=self.azure_openai_embed_api_endpoint,
             api_version=self.azure_openai_embed_version,
-            timeout=120.0,  # Set timeout to 120 seconds
-            max_retries=3
+            timeout=self.llm_request_timeout,
+            max_retries=self.llm_max_retries,
+            http_client=self.http_client,
+            async_http_client=self.async_http_client
         )
  
         # self._embed_model = HuggingFaceEmbedding(model_name="sentence-transformers/all-MiniLM-L6-v2")
@@ -170,15 +531,51 @@ class LLMConfig(BaseSettings):
         # Configure global LlamaIndex settings
         Settings.llm = self._llm
         Settings.embed_model = self._embed_model
+
+        # Every LlamaIndex LLM call (complete, chat, ReAct agent steps) goes through the limiter
+        get_dispatcher().add_event_handler(LLMRateLimitEventHandler())
+
+    def init_fake_backend(self) -> None:
+        """LlamaIndex settings with the fake LLM and embeddings; LangSmith tracing is turned off, as it needs the network."""
+        self._llm = self.fake_backend.llm(self.azure_openai_deployment_name)
+        self._embed_model = self.fake_backend.embed_model()
+        Settings.llm = self._llm
+        Settings.embed_model = self._embed_model
+        os.environ["LANGCHAIN_TRACING_V2"] = "false"
+        os.environ["LANGSMITH_TRACING"] = "false"
+        logger.info(f"Using the fake LLM backend (deployment {self.azure_openai_deployment_name}, "
+                    f"{self.fake_llm_latency_ms:.0f}ms {self.fake_llm_latency_distribution} latency)")
+        # Rate limits still apply, so offline runs queue the way they would against Azure
+        get_dispatcher().add_event_handler(LLMRateLimitEventHandler())
+
+
+class LLMRateLimitEventHandler(BaseEventHandler):
+    """
+    Blocks LlamaIndex LLM calls until the deployment's limiter has capacity. Start events are
+    dispatched synchronously in the calling thread; sync calls run via asyncio.to_thread, and
+    async calls go through LLMConfig.acomplete, which has waited already, so waiting here never
+    stalls the event loop.
+    """
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "LLMRateLimitEventHandler"
+
+    def handle(self, event: Any, **kwargs: Any) -> None:
+        if _rate_limit_acquired.get():
+            return
+        if isinstance(event, LLMCompletionStartEvent):
+            prompt = event.prompt
+        elif isinstance(event, LLMChatStartEvent):
+            prompt = "\n".join(str(message.content or "") for message in event.messages)
+        else:
+            return
+        deployment_name = event.model_dict.get("engine") or event.model_dict.get("deployment_name")
+        llm_config.rate_limiter(deployment_name).acquire_sync(llm_config.estimate_request_tokens(prompt))
  
 # Create singleton instances
 llm_config = LLMConfig()
 llm_config.init_llamaindex()
  
-pydantic_ai_model = llm_config.get_pydantic_model(
-    api_key=llm_config.azure_openai_api_key.get_secret_value(),
-    api_version=llm_config.azure_openai_api_version,
-    endpoint=llm_config.azure_openai_endpoint,
-    deployment_name=llm_config.azure_openai_deployment_name
-)
+pydantic_ai_model = llm_config.pydantic_model()
  
\ No newline at end of file
@@ -12,6 +12,22 @@ class Settings:
         self.is_production = self.env == "production"
 
         self.DATABASE_URL = os.getenv("DATABASE_URL")
+
+        # Background jobs: local SQLite queue shared by the API and the worker processes
+        self.JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "jobs.sqlite3")
+        self.JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+        self.JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+        # A running job whose worker has not checked in for this long is put back on the queue
+        self.JOB_STALE_AFTER = float(os.getenv("JOB_STALE_AFTER", "300"))
+
+        # Persistent cache of LLM-generated files, keyed by the rendered prompt and model
+        self.GENERATION_CACHE_ENABLED = os.getenv("GENERATION_CACHE_ENABLED", "true").lower() == "true"
+        self.GENERATION_CACHE_PATH = os.getenv("GENERATION_CACHE_PATH", "generation_cache.sqlite3")
+
+        # Token budget of the context (source analysis, referenced types, generated files) added to each generation prompt
+        self.CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+        # Token budget of the generated-file summaries the ReAct agent starts each file with
+        self.AGENT_MEMORY_TOKEN_LIMIT = int(os.getenv("AGENT_MEMORY_TOKEN_LIMIT", "1500"))
         
         # Logging settings
         self.logs_dir = Path("logs")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Text, JSON
+from sqlalchemy import Column, String, DateTime, Text, JSON, Integer, UniqueConstraint
 from datetime import datetime, timezone
 from config.db_config import Base
 import uuid
@@ -30,4 +30,48 @@ class User(Base):
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
  
     def __repr__(self):
-        return f"<User(username='{self.username}')>"
\ No newline at end of file
+        return f"<User(username='{self.username}')>"
+
+
+class MigrationJob(Base):
+    __tablename__ = "migration_jobs"
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()), unique=True, index=True)
+    analysis_id = Column(String(36), nullable=False, index=True)
+    status = Column(String(20), nullable=False, default="pending")
+    repo_name = Column(String(255), nullable=False)
+    api_type = Column(String(20), nullable=True)
+    target_version = Column(String(20), nullable=True)
+    instruction = Column(Text, nullable=True)
+    target_structure = Column(JSON, nullable=True)
+    output_dir = Column(String(1024), nullable=False)
+    # Username of the creator; None for jobs created before ownership was recorded
+    owner = Column(String(255), nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f"<MigrationJob(id='{self.id}', status='{self.status}')>"
+
+
+class FileCheckpoint(Base):
+    __tablename__ = "file_checkpoints"
+    __table_args__ = (UniqueConstraint("job_id", "path_hash", name="uq_checkpoint_job_path"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_id = Column(String(36), nullable=False, index=True)
+    path_hash = Column(String(64), nullable=False)  # sha256 of file_path, keeps the unique key short
+    file_path = Column(Text, nullable=False)  # relative to the migrated repository root
+    microservice = Column(String(255), nullable=True)
+    project_name = Column(String(255), nullable=True)
+    content_hash = Column(String(64), nullable=False)
+    dependencies = Column(JSON, nullable=True)
+    routes = Column(JSON, nullable=True)
+    prompt_tokens = Column(Integer, default=0)
+    response_tokens = Column(Integer, default=0)
+    completed_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f"<FileCheckpoint(job_id='{self.job_id}', file_path='{self.file_path}')>"
@@ -1,28 +1,31 @@
 import hashlib
-import aiofiles
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
+import asyncio
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Request
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import BaseModel
-from typing import Dict, Literal, Optional
+from typing import Dict, List, Literal, Optional, Tuple
 from models.response_models import ResponseModel
-from services.migration_service import Migrator
 from services.analysis_service import ProjectAnalyzer
-from utils.file_utils import ensure_directory_exists, join_paths, safe_remove_directory, clear_empty_folders
-from utils.git_helpers import clone_repository
+from utils.file_utils import ensure_directory_exists, join_paths
+from utils.structure_validator import TargetStructureValidator
+from utils.source_index import get_source_index
+from services.job_store import job_store
+from services.job_queue import QUEUED, RUNNING, job_queue
+from services.pipelines import run_analysis, run_migration, run_regeneration
 from utils import logger
 import os
-import zipfile
-import tempfile
 import base64
+from datetime import datetime, timezone
+from config.settings import settings
 from config.db_config import Base, SessionLocal, engine
 from sqlalchemy.orm import Session
 from models.db import Analysis
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from services.target_structure_rag_service import TargetStructureRagService
-from config.llm_config import pydantic_ai_model
+from config.llm_config import pydantic_ai_model, llm_config
 from pydantic_ai import Agent
 import json
-from sqlalchemy import inspect
+from sqlalchemy import inspect, text
 from auth import get_current_user, create_access_token, verify_password, oauth2_scheme
 from models.db import User
 
@@ -54,8 +57,22 @@ def ensure_zip_content_column_exists():
     except Exception as e:
         logger.error(f"Error checking/adding zip_content column: {str(e)}")
 
+# Check if the migration_jobs owner column exists, if not, add it
+def ensure_migration_job_owner_column_exists():
+    try:
+        inspector = inspect(engine)
+        columns = [col['name'] for col in inspector.get_columns('migration_jobs')]
+        if 'owner' not in columns:
+            with engine.connect() as connection:
+                connection.execute(text("ALTER TABLE migration_jobs ADD COLUMN owner VARCHAR(255)"))
+                connection.commit()
+                logger.info("Added missing owner column to migration_jobs table")
+    except Exception as e:
+        logger.error(f"Error checking/adding owner column: {str(e)}")
+
 ensure_api_type_column_exists()
 ensure_zip_content_column_exists()
+ensure_migration_job_owner_column_exists()
 
 def get_db():  
     db = SessionLocal()
@@ -80,6 +97,13 @@ class MigrationRequest(BaseModel):
     target_structure: Dict
     instruction: Optional[str] = None
 
+class FileRegenerationRequest(BaseModel):
+    paths: List[str] = []
+    microservices: List[str] = []
+    target_structure: Optional[Dict] = None
+    instruction: Optional[str] = None
+    delta: bool = True
+
 class RegenerationRequest(BaseModel):
     analysis_id: str
     target_structure: Dict
@@ -96,6 +120,15 @@ file_recommendation_agent = Agent(
 
 router = APIRouter()
 
+# Migration event stream (SSE)
+EVENT_POLL_INTERVAL = 0.5
+EVENT_KEEPALIVE_INTERVAL = 15
+TERMINAL_EVENTS = ("migration_completed", "migration_failed", "migration_cancelled")
+# Job statuses with no run in progress
+FINISHED_JOB_STATUSES = ("completed", "failed", "cancelled", "regeneration_failed")
+# Migration jobs whose files may be regenerated; a failed regeneration can be retried
+REGENERATABLE_STATUSES = ["completed", "regeneration_failed"]
+
 current_dir = os.getcwd()
 output_dir = os.path.join(current_dir, 'output')
 try:
@@ -116,66 +149,6 @@ async def store_zip_content(zip_file: UploadFile) -> str:
         logger.error(f"Failed to store ZIP content: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to store ZIP content: {str(e)}")
 
-async def restore_zip_content(zip_content_b64: str, temp_dir: str) -> str:
-    """Restore ZIP file from base64 content and extract it."""
-    try:
-        # Decode base64 content
-        zip_content = base64.b64decode(zip_content_b64)
-       
-        # Ensure the temporary directory exists
-        ensure_directory_exists(temp_dir)
-        zip_path = os.path.join(temp_dir, "restored.zip")
-       
-        # Write ZIP content to file
-        with open(zip_path, 'wb') as f:
-            f.write(zip_content)
-       
-        # Extract the ZIP file
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(temp_dir)
-       
-        # Remove the ZIP file after extraction
-        os.remove(zip_path)
-       
-        # Find the root directory of the extracted content
-        extracted_dirs = [os.path.join(temp_dir, d) for d in os.listdir(temp_dir) if os.path.isdir(os.path.join(temp_dir, d))]
-        if len(extracted_dirs) == 1:
-            return extracted_dirs[0]  # Use the single root directory if present
-        return temp_dir  # Otherwise, use the temp_dir directly
-    except Exception as e:
-        logger.error(f"Failed to restore ZIP content: {str(e)}")
-        await safe_remove_directory(temp_dir)
-        raise HTTPException(status_code=500, detail=f"Failed to restore ZIP content: {str(e)}")
-
-async def extract_zip_file(zip_file: UploadFile, temp_dir: str) -> str:
-    """Extract the uploaded ZIP file to a temporary directory and return the path."""
-    try:
-        # Ensure the temporary directory exists
-        ensure_directory_exists(temp_dir)
-        zip_path = os.path.join(temp_dir, "uploaded.zip")
-       
-        # Save the uploaded ZIP file
-        async with aiofiles.open(zip_path, 'wb') as f:
-            content = await zip_file.read()
-            await f.write(content)
-       
-        # Extract the ZIP file
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(temp_dir)
-       
-        # Remove the ZIP file after extraction
-        os.remove(zip_path)
-       
-        # Find the root directory of the extracted content
-        extracted_dirs = [os.path.join(temp_dir, d) for d in os.listdir(temp_dir) if os.path.isdir(os.path.join(temp_dir, d))]
-        if len(extracted_dirs) == 1:
-            return extracted_dirs[0]  # Use the single root directory if present
-        return temp_dir  # Otherwise, use the temp_dir directly
-    except Exception as e:
-        logger.error(f"Failed to extract ZIP file: {str(e)}")
-        await safe_remove_directory(temp_dir)
-        raise HTTPException(status_code=500, detail=f"Failed to extract ZIP file: {str(e)}")
-
 @router.post("/register")
 async def register_user(
     username: str = Form(...),
@@ -208,10 +181,33 @@ async def login_user(form_data: OAuth2PasswordRequestForm = Depends(), db: Sessi
     access_token = create_access_token(data={"sub": user.username})
     return {"access_token": access_token, "token_type": "bearer"}
 
+def resolve_source_type(repo_url: Optional[str], zip_file: Optional[UploadFile], source_type: Optional[str]) -> str:
+    """Auto-detect and validate the analysis source (git URL or uploaded ZIP)."""
+    # Add debug logging
+    logger.info(f"Received parameters: repo_url='{repo_url}', zip_file={zip_file.filename if zip_file else None}, source_type='{source_type}'")
+   
+    # Auto-detect source type if not provided
+    if source_type is None:
+        if repo_url and repo_url.strip():
+            source_type = "git"
+        elif zip_file:
+            source_type = "zip"
+        else:
+            logger.error(f"No valid input provided. repo_url='{repo_url}', zip_file={zip_file}")
+            raise HTTPException(status_code=400, detail="Either repository URL or ZIP file must be provided")
+   
+    # Validate input based on source_type
+    if source_type == "git" and (not repo_url or not repo_url.strip()):
+        raise HTTPException(status_code=400, detail="Repository URL is required for git source type")
+    if source_type == "zip" and not zip_file:
+        raise HTTPException(status_code=400, detail="ZIP file is required for zip source type")
+    if source_type == "zip" and zip_file and not zip_file.filename.endswith('.zip'):
+        raise HTTPException(status_code=400, detail="Uploaded file must be a ZIP file")
+    return source_type
+
 @router.post("/analyze", response_model=ResponseModel)
 async def analyze_repository(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
     repo_url: Optional[str] = Form(None),
     target_version: Literal["net6.0", "net7.0", "net8.0"] = Form("net8.0"),
     api_type: Literal["rest", "grpc"] = Form("rest"),
@@ -219,126 +215,88 @@ async def analyze_repository(
     source_type: Optional[Literal["git", "zip"]] = Form(None),
     zip_file: Optional[UploadFile] = File(None)
 ):
-    temp_dir = None
     try:
-        # Add debug logging
-        logger.info(f"Received parameters: repo_url='{repo_url}', zip_file={zip_file.filename if zip_file else None}, source_type='{source_type}'")
-       
-        # Auto-detect source type if not provided
-        if source_type is None:
-            if repo_url and repo_url.strip():
-                source_type = "git"
-            elif zip_file:
-                source_type = "zip"
-            else:
-                logger.error(f"No valid input provided. repo_url='{repo_url}', zip_file={zip_file}")
-                raise HTTPException(status_code=400, detail="Either repository URL or ZIP file must be provided")
-       
-        # Validate input based on source_type
-        if source_type == "git" and (not repo_url or not repo_url.strip()):
-            raise HTTPException(status_code=400, detail="Repository URL is required for git source type")
-        if source_type == "zip" and not zip_file:
-            raise HTTPException(status_code=400, detail="ZIP file is required for zip source type")
-        if source_type == "zip" and zip_file and not zip_file.filename.endswith('.zip'):
-            raise HTTPException(status_code=400, detail="Uploaded file must be a ZIP file")
-       
-        # Set up temporary directory
-        temp_dir = tempfile.mkdtemp(prefix="migration_")
+        source_type = resolve_source_type(repo_url, zip_file, source_type)
        
         # Store ZIP content if uploaded
         zip_content_b64 = None
-        if source_type == "zip" and zip_file:
+        if source_type == "zip":
             zip_content_b64 = await store_zip_content(zip_file)
-       
-        # Handle source based on source_type
-        if source_type == "git":
-            temp_dir = await clone_repository(repo_url)
-            logger.info(f"Repository cloned to: {temp_dir}")
-        else:  # source_type == "zip"
-            temp_dir = await extract_zip_file(zip_file, temp_dir)
-            logger.info(f"ZIP file extracted to: {temp_dir}")
- 
-        # Create analyzer with local path
-        analyzer = ProjectAnalyzer(temp_dir)
-        basic_tree = await analyzer.create_basic_tree()
-        analysis_tree = await analyzer.create_analyzed_tree()
- 
-        logger.info("Created analysis")
-       
-        default_instruction = f"Use the best of your knowledge to split into microservices considering the API type is {api_type}"
-        instruction = instruction or default_instruction
-               
-        logger.info("Generating target structure")
- 
-        # Select the appropriate method based on api_type
-        if api_type == "rest":
-            target_structure = await analyzer.create_target_structure(
-                analyzed_structure=analysis_tree,
-                target_version=target_version,
-                instruction=instruction
-            )
-        elif api_type == "grpc":
-            target_structure = await analyzer.create_grpc_target_structure(
-                analyzed_structure=analysis_tree,
-                target_version=target_version,
-                instruction=instruction
-            )
-        else:
-            raise ValueError("Invalid api_type specified")
  
-        target_structure = clear_empty_folders(target_structure)
-        logger.info("Target structure generated and cleaned")
-        with open('target.json', 'w') as f:
-            f.write(json.dumps(target_structure, indent=4))
-       
-        # Create DB record
-        analysis_data = {
-            "repo_url": repo_url or "Uploaded ZIP",
-            "target_version": target_version,
-            "api_type": api_type,
-            "basic_tree": basic_tree,
-            "analysis_tree": analysis_tree,
-            "zip_content": zip_content_b64
-        }
-       
-        new_analysis = Analysis(
-            repo_url=analysis_data["repo_url"],
-            target_version=analysis_data["target_version"],
-            api_type=analysis_data["api_type"],
-            structure=analysis_data["basic_tree"],
-            analysis=analysis_data["analysis_tree"],
+        data = await run_analysis(
+            repo_url=repo_url if source_type == "git" else None,
+            target_version=target_version,
+            api_type=api_type,
             instruction=instruction,
-            zip_content=analysis_data["zip_content"]
-        )
-       
-        db.add(new_analysis)
-        db.commit()
-        db.refresh(new_analysis)
-        logger.info("Analysis data saved to database")
-       
-        return ResponseModel(
-            status="success",
-            data={
-                "analysis_id": new_analysis.id,
-                "repo_url": repo_url or "Uploaded ZIP",
-                "target_version": target_version,
-                "api_type": api_type,
-                "structure": basic_tree,
-                "target_structure": target_structure
-            }
+            zip_content_b64=zip_content_b64
         )
+        return ResponseModel(status="success", data=data)
     except Exception as e:
-        if db:
-            db.rollback()
         logger.error(f"Analysis failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        if temp_dir and os.path.exists(temp_dir):
-            logger.info(f"Cleaning up temporary directory: {temp_dir}")
-            await safe_remove_directory(temp_dir)
-            logger.info("Cleanup completed")
-        if db:
-            db.close()
+
+def migration_response(job: Dict, migration_result: Dict, validation: Optional[Dict] = None) -> Dict:
+    # Read ZIP file and encode as base64
+    with open(migration_result["zip_file"], "rb") as f:
+        zip_data = base64.b64encode(f.read()).decode("utf-8")
+
+    # Return JSON with base64 ZIP and token_usage
+    response = {
+        "job_id": job["id"],
+        "zip_data": zip_data,
+        "filename": f"{job['repo_name']}.zip",
+        "token_usage": migration_result.get("token_usage")
+    }
+    if validation is not None:
+        response["validation"] = validation
+    return response
+
+
+async def create_migration_job(request: MigrationRequest, analysis: Analysis, owner: Optional[str] = None) -> Tuple[Dict, Dict]:
+    """Validate a migration request and record its job; returns (job, validation report)."""
+    if not isinstance(request.target_structure, dict) or 'microservices' not in request.target_structure:
+        raise HTTPException(status_code=400, detail="Invalid target structure format. Expected key 'microservices' not found.")
+ 
+    # Cheap structural check of the (possibly user-edited) structure before any LLM work
+    api_type = getattr(analysis, "api_type", "rest") or "rest"
+    validation = TargetStructureValidator(api_type=api_type, architecture_rules=False).validate(
+        request.target_structure, fix=False
+    )
+    if not validation.is_valid:
+        raise HTTPException(status_code=400, detail=f"Invalid target structure: {'; '.join(validation.errors)}")
+    if validation.violations:
+        logger.warning(f"Target structure violations: {validation.violations}")
+ 
+    # Get instruction: prefer request.instruction, fall back to analysis.instruction
+    instruction = request.instruction
+    if not instruction and hasattr(analysis, 'instruction'):
+        instruction = analysis.instruction
+    if not instruction:
+        logger.warning("No instruction provided; using default")
+        instruction = "split into microservices"
+ 
+    with open('request.json', 'w') as f:
+        f.write(json.dumps(request.target_structure, indent=4))
+ 
+    repo_url = analysis.repo_url
+    repo_name = repo_url.split('/')[-1].replace('.git', '') if repo_url != "Uploaded ZIP" else "migrated_project"
+ 
+    # Each job writes into its own directory so a resume finds its earlier output
+    job = await asyncio.to_thread(
+        job_store.create_job,
+        analysis_id=analysis.id,
+        repo_name=repo_name,
+        output_dir=output_dir,
+        api_type=api_type,
+        target_version=analysis.target_version,
+        instruction=instruction,
+        target_structure=request.target_structure,
+        owner=owner
+    )
+    job["output_dir"] = join_paths(output_dir, "jobs", job["id"])
+    await asyncio.to_thread(job_store.update_job, job["id"], output_dir=job["output_dir"])
+    return job, validation.model_dump()
+
 
 @router.post("/migrate", response_model=None)
 async def migrate_repository(
@@ -346,111 +304,270 @@ async def migrate_repository(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    temp_dir = None
+    job = None
     try:
         # Get analysis from DB
         analysis = db.query(Analysis).filter(Analysis.id == request.analysis_id).first()
         if not analysis:
             raise HTTPException(status_code=404, detail=f"Analysis with id {request.analysis_id} not found")
  
-        if not isinstance(request.target_structure, dict) or 'microservices' not in request.target_structure:
-            raise HTTPException(status_code=400, detail="Invalid target structure format. Expected key 'microservices' not found.")
- 
-        # Get instruction: prefer request.instruction, fall back to analysis.instruction
-        instruction = request.instruction
-        if not instruction and hasattr(analysis, 'instruction'):
-            instruction = analysis.instruction
-        if not instruction:
-            logger.warning("No instruction provided; using default")
-            instruction = "split into microservices"
- 
-        # Determine source type from analysis
-        repo_url = analysis.repo_url
-        is_zip = repo_url == "Uploaded ZIP"
-       
-        # Set up temporary directory
-        temp_dir = tempfile.mkdtemp(prefix="migration_")
-       
-        # Handle source based on whether it was originally a ZIP or git
-        if not is_zip:
-            temp_dir = await clone_repository(repo_url)
-            logger.info(f"Repository cloned to: {temp_dir}")
-        else:
-            # For ZIP-based projects, restore from stored content
-            if not hasattr(analysis, 'zip_content') or not analysis.zip_content:
-                raise HTTPException(status_code=400, detail="ZIP content not found in analysis. Please re-upload the ZIP file.")
-           
-            temp_dir = await restore_zip_content(analysis.zip_content, temp_dir)
-            logger.info(f"ZIP content restored to: {temp_dir}")
- 
-        # Instantiate Migrator and initialize output and source directories
-        migration_service = Migrator()
-        await migration_service.initialize(output_dir=output_dir, source_dir=temp_dir)
- 
-        with open('request.json', 'w') as f:
-            f.write(json.dumps(request.target_structure, indent=4))
+        job, validation = await create_migration_job(request, analysis, current_user.username)
+        migration_result = await run_migration(job, analysis)
+        return migration_response(job, migration_result, validation)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Migration failed: {str(e)}")
+        headers = {"X-Migration-Job-Id": job["id"]} if job else None
+        raise HTTPException(status_code=500, detail=str(e), headers=headers)
+
+
+@router.post("/migrate/{job_id}/resume", response_model=None)
+async def resume_migration(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Resume an interrupted or failed migration; files checkpointed by earlier runs are reused."""
+    try:
+        job = await asyncio.to_thread(get_owned_migration_job, job_id, current_user)
+        if await migration_is_active(job):
+            # A second run would write the same output directory and checkpoints
+            raise HTTPException(status_code=409, detail=f"Migration job {job_id} is {job['status']}")
  
-        # Initialize the shared RAG services using the provided JSON data
-        rag_initialized = migration_service.rag_service.initialize(
-            json_data=request.target_structure,
-            temp_dir=temp_dir,
-            force_rebuild=True
-        )
-        if not rag_initialized:
-            raise HTTPException(status_code=500, detail="Failed to initialize target structure RAG service")
-        logger.info("Target structure RAG service initialized successfully")
-       
-        analysis_initialized = migration_service.analysis_rag_service.initialize(
-            json_data=analysis.analysis,
-            temp_dir=temp_dir,
-            force_rebuild=True
-        )
-        if not analysis_initialized:
-            raise HTTPException(status_code=500, detail="Failed to initialize analysis RAG service")
-        logger.info("Analysis RAG service initialized successfully")
+        analysis = db.query(Analysis).filter(Analysis.id == job["analysis_id"]).first()
+        if not analysis:
+            raise HTTPException(status_code=404, detail=f"Analysis with id {job['analysis_id']} not found")
  
-        repo_name = repo_url.split('/')[-1].replace('.git', '') if not is_zip else "migrated_project"
-        api_type = getattr(analysis, "api_type", "rest") or "rest"
-       
-        # Select processing method based on api_type
-        if api_type == "rest":
-            migration_result = await migration_service.process_and_zip_projects(
-                target_structure=request.target_structure,
-                target_version=analysis.target_version,
-                repo_name=repo_name
-            )
-        elif api_type == "grpc":
-            migration_result = await migration_service.process_and_zip_projects_grpc(
-                target_structure=request.target_structure,
-                target_version=analysis.target_version,
-                repo_name=repo_name
+        logger.info(f"Resuming migration job {job_id} (previous status: {job['status']})")
+        migration_result = await run_migration(job, analysis)
+        return migration_response(job, migration_result)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Migration resume failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/migrate/{job_id}/files", response_model=None)
+async def regenerate_migration_files(
+    job_id: str,
+    request: FileRegenerationRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Regenerate only the given target files (paths relative to the migrated repository, e.g.
+    "OrderService/OrderService.Api/Controllers/OrderController.cs") and/or whole microservices of
+    a completed migration. Everything else is reused as is. Returns the changed files as a delta
+    zip, or the patched full archive with delta=false.
+    """
+    try:
+        if not request.paths and not request.microservices:
+            raise HTTPException(status_code=400, detail="Provide at least one path or microservice to regenerate")
+        job = await asyncio.to_thread(get_owned_migration_job, job_id, current_user)
+        if job["status"] not in REGENERATABLE_STATUSES:
+            raise HTTPException(status_code=409, detail=f"Migration job {job_id} is {job['status']}; only completed migrations can be patched")
+        if request.target_structure is not None:
+            validation = TargetStructureValidator(api_type=job["api_type"] or "rest", architecture_rules=False).validate(
+                request.target_structure, fix=False
             )
-        else:
-            raise HTTPException(status_code=400, detail="Invalid api_type specified")
+            if not validation.is_valid:
+                raise HTTPException(status_code=400, detail=f"Invalid target structure: {'; '.join(validation.errors)}")
  
-        zip_file_path = migration_result.get("zip_file")
-        if not os.path.exists(zip_file_path):
-            raise HTTPException(status_code=500, detail="Zip file not found")
- 
-        # Return the zip file as a download
-        # Read ZIP file and encode as base64
-        with open(zip_file_path, "rb") as f:
-            zip_data = base64.b64encode(f.read()).decode("utf-8")
+        analysis = db.query(Analysis).filter(Analysis.id == job["analysis_id"]).first()
+        if not analysis:
+            raise HTTPException(status_code=404, detail=f"Analysis with id {job['analysis_id']} not found")
 
-        # Return JSON with base64 ZIP and token_usage
+        # Claimed with one conditional update, so concurrent requests cannot both rewrite the files
+        if not await asyncio.to_thread(job_store.claim_job, job_id, REGENERATABLE_STATUSES, "regenerating"):
+            raise HTTPException(status_code=409, detail=f"Migration job {job_id} is already being changed")
+        result = await run_regeneration(
+            job, analysis, request.paths, request.microservices,
+            target_structure=request.target_structure, instruction=request.instruction
+        )
+        zip_path = result["delta_zip_file"] if request.delta else result["zip_file"]
+        with open(zip_path, "rb") as f:
+            zip_data = base64.b64encode(f.read()).decode("utf-8")
         return {
+            "job_id": job_id,
             "zip_data": zip_data,
-            "filename": f"{repo_name}.zip",
-            "token_usage": migration_result.get("token_usage")
+            "filename": os.path.basename(zip_path),
+            "delta": request.delta,
+            "regenerated_files": result["regenerated_files"],
+            "changed_files": result["changed_files"],
+            "not_found": result["not_found"],
+            "failed_files": [failure for ms_result in result["migration_results"] for failure in ms_result["failed_files"]],
+            "token_usage": result["token_usage"]
         }
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Migration failed: {str(e)}")
+        logger.error(f"File regeneration failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        if temp_dir and os.path.exists(temp_dir):
-            logger.info(f"Cleaning up temporary directory: {temp_dir}")
-            await safe_remove_directory(temp_dir)
-            logger.info("Cleanup completed")
+
+
+@router.get("/migrate/{job_id}/events")
+async def stream_migration_events(
+    job_id: str,
+    request: Request,
+    after: int = 0,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Server-sent events for a migration job: migration_started, file_started, file_finished and
+    file_failed (tokens, latency, retries), each finish with running totals per microservice, the
+    ETA and the longest-running files, then one migration_completed/failed/cancelled event.
+    Resumes and regenerations append their own run to the same log, each opening with
+    migration_started; the stream only ends at the terminal event of the latest run.
+    Reconnecting clients resume after their Last-Event-ID.
+    """
+    await asyncio.to_thread(get_owned_migration_job, job_id, current_user)
+    last_event_id = request.headers.get("last-event-id", "")
+    if last_event_id.isdigit():
+        after = int(last_event_id)
+
+    async def run_finished(cursor: int) -> bool:
+        """No later run follows the events up to `cursor`, and none is about to start."""
+        if await asyncio.to_thread(job_queue.events, job_id, cursor, 1):
+            return False
+        status = (await asyncio.to_thread(job_store.get_job, job_id) or {}).get("status")
+        return status is None or status in FINISHED_JOB_STATUSES
+
+    async def event_stream():
+        cursor = after
+        idle = 0.0
+        while not await request.is_disconnected():
+            events = await asyncio.to_thread(job_queue.events, job_id, cursor)
+            for event in events:
+                cursor = event["seq"]
+                yield f"id: {cursor}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+            if events and events[-1]["type"] in TERMINAL_EVENTS and await run_finished(cursor):
+                return
+            if events:
+                idle = 0.0
+                continue
+            await asyncio.sleep(EVENT_POLL_INTERVAL)
+            idle += EVENT_POLL_INTERVAL
+            if idle >= EVENT_KEEPALIVE_INTERVAL:
+                idle = 0.0
+                yield ": keep-alive\n\n"
+                # Jobs that finished without a terminal event (e.g. before events existed) end the stream
+                if await run_finished(cursor):
+                    return
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def get_owned_migration_job(job_id: str, current_user: User) -> Dict:
+    """Migration job record (from /migrate or /jobs/migrate) if it belongs to the user, else 404."""
+    job = job_store.get_job(job_id)
+    if not job or (job["owner"] and job["owner"] != current_user.username):
+        raise HTTPException(status_code=404, detail=f"Migration job {job_id} not found")
+    return job
+
+async def migration_is_active(job: Dict) -> bool:
+    """Whether a run of the migration job may still be writing its output."""
+    if job["status"] != "regenerating":
+        queued = await asyncio.to_thread(job_queue.get, job["id"])
+        if queued:
+            # Queued jobs have worker heartbeats; the queue requeues or fails them when those stop
+            return queued["status"] in (QUEUED, RUNNING)
+        if job["status"] not in (QUEUED, RUNNING):
+            return False
+    # A synchronous /migrate or regeneration has no heartbeat: one that stopped checkpointing files is presumed dead
+    last_activity = await asyncio.to_thread(job_store.last_activity, job["id"])
+    return last_activity is not None and \
+        (datetime.now(timezone.utc) - last_activity).total_seconds() < settings.JOB_STALE_AFTER
+
+def get_owned_job(job_id: str, current_user: User) -> Dict:
+    job = job_queue.get(job_id)
+    if not job or (job["owner"] and job["owner"] != current_user.username):
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+@router.post("/jobs/analyze", response_model=ResponseModel)
+async def submit_analysis_job(
+    current_user: User = Depends(get_current_user),
+    repo_url: Optional[str] = Form(None),
+    target_version: Literal["net6.0", "net7.0", "net8.0"] = Form("net8.0"),
+    api_type: Literal["rest", "grpc"] = Form("rest"),
+    instruction: Optional[str] = Form(None),
+    source_type: Optional[Literal["git", "zip"]] = Form(None),
+    zip_file: Optional[UploadFile] = File(None)
+):
+    """Queue an analysis for the background workers; poll /jobs/{job_id} for its progress."""
+    source_type = resolve_source_type(repo_url, zip_file, source_type)
+    payload = {
+        "repo_url": repo_url if source_type == "git" else None,
+        "target_version": target_version,
+        "api_type": api_type,
+        "instruction": instruction,
+        "zip_content": await store_zip_content(zip_file) if source_type == "zip" else None
+    }
+    job_id = await asyncio.to_thread(job_queue.submit, "analyze", payload, current_user.username)
+    return ResponseModel(status="success", data={"job_id": job_id, "status": "queued"})
+
+@router.post("/jobs/migrate", response_model=ResponseModel)
+async def submit_migration_job(
+    request: MigrationRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Queue a migration for the background workers; the job id is also the resumable migration job id."""
+    analysis = db.query(Analysis).filter(Analysis.id == request.analysis_id).first()
+    if not analysis:
+        raise HTTPException(status_code=404, detail=f"Analysis with id {request.analysis_id} not found")
+ 
+    job, validation = await create_migration_job(request, analysis, current_user.username)
+    await asyncio.to_thread(job_store.update_job, job["id"], status="queued")
+    await asyncio.to_thread(
+        job_queue.submit, "migrate", {"migration_job_id": job["id"]}, current_user.username, job["id"]
+    )
+    return ResponseModel(status="success", data={"job_id": job["id"], "status": "queued", "validation": validation})
+
+@router.get("/jobs", response_model=ResponseModel)
+async def list_jobs(limit: int = 50, current_user: User = Depends(get_current_user)):
+    jobs = await asyncio.to_thread(job_queue.list_jobs, current_user.username, min(max(limit, 1), 500))
+    return ResponseModel(status="success", data={"jobs": jobs})
+
+@router.get("/jobs/{job_id}", response_model=ResponseModel)
+async def get_job_status(job_id: str, current_user: User = Depends(get_current_user)):
+    job = await asyncio.to_thread(get_owned_job, job_id, current_user)
+    return ResponseModel(status="success", data=job)
+
+@router.get("/jobs/{job_id}/result", response_model=None)
+async def get_job_result(job_id: str, current_user: User = Depends(get_current_user)):
+    """Result of a completed job: the /analyze data, or the /migrate response with the zipped code."""
+    job = await asyncio.to_thread(get_owned_job, job_id, current_user)
+    if job["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is {job['status']}")
+    result = await asyncio.to_thread(job_queue.result, job_id)
+    if job["kind"] == "analyze":
+        return ResponseModel(status="success", data=result)
+    if not os.path.exists(result["zip_file"]):
+        raise HTTPException(status_code=410, detail="Migration output is no longer available")
+    return migration_response({"id": job_id, "repo_name": result["filename"][:-len(".zip")]}, result)
+
+@router.post("/jobs/{job_id}/cancel", response_model=ResponseModel)
+async def cancel_job(job_id: str, current_user: User = Depends(get_current_user)):
+    job = await asyncio.to_thread(get_owned_job, job_id, current_user)
+    status = await asyncio.to_thread(job_queue.cancel, job_id)
+    if status in ("completed", "failed"):
+        raise HTTPException(status_code=409, detail=f"Job {job_id} already {status}")
+    if status == "cancelled" and job["kind"] == "migrate":
+        await asyncio.to_thread(job_store.update_job, job_id, status="cancelled")
+    return ResponseModel(status="success", data={"job_id": job_id, "status": status, "cancel_requested": status == "running"})
+
+@router.post("/jobs/{job_id}/retry", response_model=ResponseModel)
+async def retry_job(job_id: str, current_user: User = Depends(get_current_user)):
+    """Requeue a failed or cancelled job; a migration picks up from its file checkpoints."""
+    await asyncio.to_thread(get_owned_job, job_id, current_user)
+    if not await asyncio.to_thread(job_queue.retry, job_id):
+        raise HTTPException(status_code=409, detail="Only failed or cancelled jobs can be retried")
+    return ResponseModel(status="success", data={"job_id": job_id, "status": "queued"})
 
 @router.post("/regenerate", response_model=ResponseModel)
 async def regenerate_structure(
@@ -493,6 +610,42 @@ async def regenerate_structure(
         logger.error(f"Regeneration failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/analysis/{analysis_id}/source-files", response_model=ResponseModel)
+async def search_source_files(
+    analysis_id: str,
+    q: Optional[str] = None,
+    under: Optional[str] = None,
+    extension: Optional[str] = None,
+    limit: int = 50,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    try:
+        analysis = db.query(Analysis).filter(Analysis.id == analysis_id).first()
+        if not analysis:
+            raise HTTPException(status_code=404, detail=f"Analysis with id {analysis_id} not found")
+
+        limit = min(max(limit, 1), 500)
+        source_index = get_source_index(analysis.id, analysis.analysis)
+        if under or extension:
+            files = source_index.find(
+                contains=(q or "").lower().split(),
+                extensions=[extension] if extension else [],
+                under=under
+            )[:limit]
+        else:
+            files = source_index.search(q or "", limit=limit)
+
+        return ResponseModel(
+            status="success",
+            data={"analysis_id": analysis_id, "total_files": len(source_index), "files": files}
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Source file search failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/recommend", response_model=ResponseModel)
 async def recommend_file(
     request: RecommendRequest,
@@ -500,8 +653,11 @@ async def recommend_file(
 ):
     try:
         prompt = f"Analyze this file and provide a brief description and file type recommendation:\n\nfile_name: {request.file_name}"
+        deployment = llm_config.route("recommendation")
+        await llm_config.acquire(prompt, deployment)
         analysis = await file_recommendation_agent.run(
             user_prompt=prompt,
+            model=llm_config.pydantic_model(deployment),
             model_settings={'temperature': 0.2}
         )
  
@@ -12,17 +12,20 @@ os.environ['SSL_CERT_FILE'] = certifi.where()  # For other SSL uses
 secure_session = requests.Session()
 secure_session.verify = False  # Temporary for debugging
 
+from dotenv import load_dotenv
+load_dotenv()
+
 # Debug SSL setup
 print("Certifi CA bundle path:", certifi.where())
 print("REQUESTS_CA_BUNDLE:", os.environ.get("REQUESTS_CA_BUNDLE"))
-try:
-    response = secure_session.get("https://api.smith.langchain.com/info", headers={"x-api-key": os.environ.get("LANGCHAIN_API_KEY")})
-    print("Manual test to LangSmith /info:", response.status_code, response.text)
-except Exception as e:
-    print("Manual test to LangSmith /info failed:", e)
+# The fake LLM backend runs offline; skip the LangSmith reachability check there
+if os.environ.get("LLM_BACKEND", "azure").lower() != "fake":
+    try:
+        response = secure_session.get("https://api.smith.langchain.com/info", headers={"x-api-key": os.environ.get("LANGCHAIN_API_KEY")})
+        print("Manual test to LangSmith /info:", response.status_code, response.text)
+    except Exception as e:
+        print("Manual test to LangSmith /info failed:", e)
 
-from dotenv import load_dotenv
-load_dotenv()
 from typing import Dict,List,Literal,Optional
 import os
 from config.llm_config import pydantic_ai_model
@@ -34,12 +37,13 @@ import json
 import asyncio
 from llama_index.core.agent import ReActAgent
 from utils import logger
-import tiktoken
 import re
 from tenacity import retry, stop_after_attempt, wait_fixed
 from utils.file_utils import sanitize_content
-
-encoder = tiktoken.encoding_for_model("gpt-4o")
+from utils.structure_validator import TargetStructureValidator
+from utils.source_index import SourcePathIndex
+from utils.tree_utils import iter_leaves
+from utils.token_counter import token_counter
 
 
 class AnalyzeOutputStructure(BaseModel):
@@ -124,19 +128,6 @@ target_structure_creator_agent = Agent(
 )
 
 
-async def flatten_dict(d, parent_key='', sep='/'):
-        items = []
-        for key, value in d.items():
-            new_key = f"{parent_key}{sep}{key}" if parent_key else key
-            if isinstance(value, dict):
-                # Recursively await the nested call
-                nested_items = await flatten_dict(value, new_key, sep) 
-                items.extend(nested_items.items())
-            else:
-                items.append((new_key, value))
-        return dict(items)
-
-
 class ProjectAnalyzer:          
     def __init__(self, project_path: str):
         self.start_path = project_path
@@ -146,6 +137,9 @@ class ProjectAnalyzer:
         ]
     
         self.agent = ReActAgent.from_tools(tools=[], llm=llm_config._llm, verbose=True)
+        # Hedged analysis requests of this project (see LLMConfig.hedged)
+        self.hedging = {"hedged": 0, "hedge_wins": 0, "hedge_tokens": 0}
+        self.deployment_requests = {}
     async def create_basic_tree(self) -> Dict:
       tree = {}
       
@@ -222,9 +216,17 @@ class ProjectAnalyzer:
   
   """
         
-        result = await project_structure_analyzer_agent.run(
-          user_prompt=prompt,
-          model_settings={'temperature': 0.2}
+        extension = os.path.splitext(file_path)[1]
+        deployment = llm_config.route("analysis", extension, None, await token_counter.count_async(code_content))
+        self.deployment_requests[deployment] = self.deployment_requests.get(deployment, 0) + 1
+        model = llm_config.pydantic_model(deployment)
+        await llm_config.acquire(prompt, deployment)
+        result = await llm_config.hedged(
+          f"analysis{extension}",
+          lambda: project_structure_analyzer_agent.run(user_prompt=prompt, model=model, model_settings={'temperature': 0.2}),
+          prompt,
+          stats=self.hedging,
+          deployment_name=deployment
         )
 
         # tokens = encoder.encode(result)
@@ -240,7 +242,7 @@ class ProjectAnalyzer:
         tree = {}
         
         analysis_tasks = []
-        semaphore = asyncio.Semaphore(10)  
+        semaphore = asyncio.Semaphore(llm_config.max_concurrent_generations)
         
         for root, _, files in os.walk(self.start_path):
             if any(pattern in root for pattern in self.ignore_patterns):
@@ -261,6 +263,10 @@ class ProjectAnalyzer:
         
         # Run all analysis tasks concurrently
         results = await asyncio.gather(*analysis_tasks)
+        if self.hedging["hedged"]:
+            logger.info(f"Hedged {self.hedging['hedged']} analysis requests ({self.hedging['hedge_wins']} won by the hedge, "
+                        f"{self.hedging['hedge_tokens']:,} estimated extra tokens)")
+        logger.info(f"Analysis requests per deployment: {self.deployment_requests}")
         
         # Build the tree from results
         for rel_path, analysis in results:
@@ -281,12 +287,9 @@ class ProjectAnalyzer:
           "Use the best of your knowledge to split into microservices following the onion ring architecture. "
             "Each microservice should be composed of multiple projects/layers such as Domain, Application, Infrastructure, and Presentation."
         )
-      flattened_structure = await flatten_dict(analyzed_structure)
+      source_index = SourcePathIndex.from_tree(analyzed_structure)
 
-      has_auth = any(
-          "auth" in file.lower() or "identity" in file.lower() or "login" in file.lower()
-          for file in flattened_structure.keys()
-      )
+      has_auth = bool(source_index.contains("auth", "identity", "login"))
       logger.info(f"Authentication detected: {has_auth}")
        # Dynamic Instruction-Based Parsing
       instruction_lower = instruction_text.lower()
@@ -302,8 +305,9 @@ class ProjectAnalyzer:
       # Fallback: Derive from repo if instruction is vague
       if not microservices:
           logger.warning(f"No microservices parsed from instruction: '{instruction_text}', analyzing repo")
-          possible_ms = {k.split('.')[0].lower().rstrip("s") for k in flattened_structure.keys()
-                        if k.lower().endswith((".cs", ".csproj")) and "gateway" not in k.lower()}
+          gateway_files = set(source_index.contains("gateway"))
+          possible_ms = {k.split('/')[-1].split('.')[0].lower().rstrip("s") for k in source_index.with_extension(".cs", ".csproj")
+                        if k not in gateway_files}
           microservices = sorted(list(possible_ms))[:2]
           if not microservices:
               microservices = ["default1", "default2"]
@@ -497,11 +501,10 @@ Every microservice should have a .csproj and a Program.cs file, and follow the o
 
 """
     
-      llm = llm_config._llm
       with open('prompt.txt', 'w', encoding="utf-8") as f:
           f.write(prompt)
 
-      response_new = llm.complete(prompt)
+      response_new = await llm_config.acomplete(prompt, deployment_name=llm_config.route("target_structure"))
       sanitized_response = sanitize_content(str(response_new))
 
       with open("response_new.json", "w", encoding="utf-8") as f:
@@ -516,174 +519,21 @@ Every microservice should have a .csproj and a Program.cs file, and follow the o
             
       target_structure = json.loads(sanitized_response)
       
-      # Sanitize LLM response to enforce Case 2 Gateway structure
-      for ms in target_structure.get('microservices', []):
-          ms_name = ms.get('name', '').lower()
-          if ms_name == 'gateway' and (
-              "auth" in instruction_lower or "auth service" in instruction_lower or 
-              "auth microservice" in instruction_lower or "authentication microservice" in instruction_lower
-          ):
-              # Case 2: Ensure Gateway is routing-only
-              logger.info("Sanitizing Gateway for Case 2: Removing authentication-related folders")
-              if 'projects' not in ms or not isinstance(ms.get('projects'), list) or not ms.get('projects'):
-                  logger.warning("Gateway microservice has invalid or missing projects. Adding default structure.")
-                  ms['projects'] = [{
-                      'project_name': 'Gateway',
-                      'target_structure': {
-                          'root': {
-                              'appsettings.json': {
-                                  'file_type': 'config',
-                                  'description': 'Gateway configuration',
-                                  'namespace': '',
-                                  'source_files': []
-                              },
-                              'Gateway.csproj': {
-                                  'file_type': 'csproj',
-                                  'description': 'API Gateway project with Ocelot dependencies',
-                                  'namespace': '',
-                                  'source_files': []
-                              },
-                              'ocelot.json': {
-                                  'file_type': 'ocelot',
-                                  'description': 'Ocelot routing configuration',
-                                  'namespace': '',
-                                  'source_files': []
-                              },
-                              'Program.cs': {
-                                  'file_type': 'program',
-                                  'description': 'Gateway entry point with Ocelot middleware',
-                                  'namespace': 'Gateway',
-                                  'source_files': []
-                              }
-                          },
-                          'folders': {}
-                      }
-                  }]
-              else:
-                  # Remove authentication-related folders
-                  for project in ms.get('projects', []):
-                      if 'target_structure' in project:
-                          folders = project['target_structure'].get('folders', {})
-                          for folder in ['Controllers', 'Data', 'Entities', 'Models', 'Views']:
-                              if folder in folders:
-                                  logger.info(f"Removing {folder} folder from Gateway in Case 2")
-                                  del folders[folder]
-                          project['target_structure']['folders'] = {}  # Ensure no other folders remain
-  
-      # Validate Gateway structure
-      if auth_enabled:
-          gateway = next(
-              (ms for ms in target_structure.get('microservices', []) if ms.get('name', '').lower() == 'gateway'),
-              None
-          )
-      
-          if not gateway:
-              logger.error("Gateway microservice is missing from the microservices list.")
-              raise KeyError("Gateway microservice not found in the microservices list.")
-      
-          projects = gateway.get('projects')
-          if not projects or not isinstance(projects, list) or not projects:
-              logger.warning(f"Gateway microservice has invalid or missing 'projects' key: {projects}. Adding default structure.")
-              gateway['projects'] = [{
-                  'project_name': 'Gateway',
-                  'target_structure': {
-                      'root': {
-                          'appsettings.json': {
-                              'file_type': 'config',
-                              'description': 'Gateway configuration',
-                              'namespace': '',
-                              'source_files': []
-                          },
-                          'Gateway.csproj': {
-                              'file_type': 'csproj',
-                              'description': 'API Gateway project with Ocelot dependencies',
-                              'namespace': '',
-                              'source_files': []
-                          },
-                          'ocelot.json': {
-                              'file_type': 'ocelot',
-                              'description': 'Ocelot routing configuration',
-                              'namespace': '',
-                              'source_files': []
-                          },
-                          'Program.cs': {
-                              'file_type': 'program',
-                              'description': 'Gateway entry point with Ocelot middleware',
-                              'namespace': 'Gateway',
-                              'source_files': []
-                          }
-                      },
-                      'folders': {}
-                  }
-              }]
-              projects = gateway['projects']             
-      
-          gateway_project = projects[0].get('target_structure')
-          if not gateway_project:
-              logger.error("First project in Gateway microservice has no 'target_structure'")
-              raise KeyError("Gateway microservice project missing 'target_structure'")
-      
-          # Only validate authentication files for Case 3
-          if not (
-              "auth" in instruction_lower or "auth service" in instruction_lower or 
-              "auth microservice" in instruction_lower or "authentication microservice" in instruction_lower
-          ):
-              # Case 3: Validate authentication files in Gateway
-              required_auth_files = ['Controllers/AuthController.cs', 'Data/AuthDbContext.cs', 'Entities/User.cs']
-              missing_files = [
-                  f for f in required_auth_files
-                  if not any(
-                      f.lower() in (
-                          f'{folder}/{file}' if folder else file
-                      ).lower()
-                      for folder, files in gateway_project.get('folders', {}).items()
-                      for file in files.get('target_files', {})
-                  ) and f not in gateway_project.get('root', {})
-              ]
-          
-              if missing_files:
-                  logger.warning(f"Gateway missing required authentication files: {missing_files}")
-              
-                  # Ensure the top-level folders exist
-                  gateway_project.setdefault('folders', {})
-                  folders = gateway_project['folders']
-                  folders.setdefault('Controllers', {'target_files': {}})
-                  folders.setdefault('Data', {'target_files': {}})
-                  folders.setdefault('Entities', {'target_files': {}})
-              
-                  # Populate missing files
-                  for f in missing_files:
-                      if f == 'Controllers/AuthController.cs':
-                          folders['Controllers']['target_files']['AuthController.cs'] = {
-                              'file_type': 'controller',
-                              'description': 'Authentication endpoints (e.g., /login, /token)',
-                              'namespace': 'Gateway.Controllers',
-                              'routes': ['/api/auth/login', '/api/auth/token'],
-                              'source_files': ['WebApi/Controllers/AuthenticationController.cs']
-                          }
-                      elif f == 'Data/AuthDbContext.cs':
-                          folders['Data']['target_files']['AuthDbContext.cs'] = {
-                              'file_type': 'dbcontext',
-                              'description': 'EF Core context for auth data',
-                              'namespace': 'Gateway.Data',
-                              'source_files': ['Infrastructure/Persistence/ApplicationDbContext.cs']
-                          }
-                      elif f == 'Entities/User.cs':
-                          folders['Entities']['target_files']['User.cs'] = {
-                              'file_type': 'entity',
-                              'description': 'User entity for authentication',
-                              'namespace': 'Gateway.Entities',
-                              'source_files': ['Infrastructure/Identity/ApplicationUser.cs']
-                          }
-          else:
-              # Case 2: Ensure no authentication-related folders
-              logger.info("Case 2: Skipping Gateway authentication validation")
-              folders = gateway_project.get('folders', {})
-              for folder in ['Controllers', 'Data', 'Entities', 'Models', 'Views']:
-                  if folder in folders:
-                      logger.info(f"Removing {folder} folder from Gateway in Case 2 validation")
-                      del folders[folder]
-              gateway_project['folders'] = {}  # Ensure no folders remain
+      # Enforce Gateway/authentication invariants in a single indexed pass
+      auth_requested = "auth" in instruction_lower
+      auth_case = "none" if not has_auth else ("separate" if auth_requested else "gateway")
+      validator = TargetStructureValidator(
+          api_type="rest",
+          auth_case=auth_case,
+          gateway_routing_only=auth_requested,
+          source_index=source_index
+      )
+      report = validator.validate(target_structure)
+      if report.fixes:
+          logger.info(f"Applied target structure fixes: {report.fixes}")
+      if not report.is_valid:
+          logger.error(f"Invalid target structure: {report.errors}")
+          raise KeyError("; ".join(report.errors))
       
       with open("response_new.json", "w", encoding="utf-8") as f:
           f.write(json.dumps(target_structure, indent=2))
@@ -699,21 +549,21 @@ Every microservice should have a .csproj and a Program.cs file, and follow the o
           "Use ADO.NET with manual MySQL queries (MySqlConnection, MySqlCommand, MySqlDataReader) for data access instead of Entity Framework."
       )
       
-      flattened_structure = await flatten_dict(analyzed_structure)
+      source_index = SourcePathIndex.from_tree(analyzed_structure)
       
       # Detect authentication
-      has_auth = any(
-          "auth" in file.lower() or "identity" in file.lower() or "login" in file.lower()
-          for file in flattened_structure.keys()
-      )
+      has_auth = bool(source_index.contains("auth", "identity", "login"))
       # Filter unsupported file types for gRPC mappings
       unsupported_types = ['.asmx', '.ascx', '.aspx']
+      valid_paths = source_index.find(exclude_extensions=unsupported_types)
+      unsupported_prefixes = tuple(f"{path}/" for path in source_index.with_extension(*unsupported_types))
       
+      # Flattened keys are "<file>/<field>", so drop every field of an unsupported file
       valid_files = {
-          k: v for k, v in flattened_structure.items()
-          if not any(k.lower().endswith(ext) for ext in unsupported_types)
+          k: v for k, v in iter_leaves(analyzed_structure)
+          if not (unsupported_prefixes and k.startswith(unsupported_prefixes))
       }
-      logger.debug(f"Valid source files: {list(valid_files.keys())}")
+      logger.debug(f"Valid source files: {valid_paths}")
       filtered_structure = valid_files
       # Dynamic Instruction-Based Parsing
       instruction_lower = instruction_text.lower()
@@ -731,19 +581,19 @@ Every microservice should have a .csproj and a Program.cs file, and follow the o
       if not microservices:
           logger.warning(f"No microservices parsed from instruction: '{instruction_text}', analyzing repo")
           possible_ms = set()
-          for file in filtered_structure.keys():
-              if file.lower().endswith((".cs", ".csproj")) and "gateway" not in file.lower():
-                  if "entity" in file.lower() or "repository" in file.lower():
-                      name = file.split('/')[-1].split('.')[0].lower().rstrip("s")
-                      possible_ms.add(name + "Grpc")
+          gateway_files = set(source_index.contains("gateway"))
+          for file in source_index.find(any_of=("entity", "repository"), extensions=(".cs", ".csproj")):
+              if file not in gateway_files:
+                  name = file.split('/')[-1].split('.')[0].lower().rstrip("s")
+                  possible_ms.add(name + "Grpc")
           # Infer customer from Customers/Default.aspx.cs
-          if any("customers/default.aspx.cs" in file.lower() for file in flattened_structure.keys()):
+          if source_index.contains("customers/default.aspx.cs"):
               possible_ms.add("customerGrpc")
           microservices = sorted(list(possible_ms))
           # Ensure product and customer are included if relevant
-          if any("product" in file.lower() for file in filtered_structure.keys()):
+          if source_index.find(contains=("product",), exclude_extensions=unsupported_types):
               microservices.append("productGrpc")
-          if any("customer" in file.lower() for file in flattened_structure.keys()):
+          if source_index.contains("customer"):
               microservices.append("customerGrpc")
           microservices = sorted(list(set(microservices)))
           if not microservices:
@@ -1576,11 +1426,10 @@ Every microservice should have a .csproj and a Program.cs file, and follow the o
   """
       
       # Process LLM response
-      llm = llm_config._llm
       with open('prompt_grpc.txt', 'w', encoding="utf-8") as f:
           f.write(prompt)
       
-      response_new = llm.complete(prompt)
+      response_new = await llm_config.acomplete(prompt, deployment_name=llm_config.route("target_structure"))
       sanitized_response = sanitize_content(str(response_new))
       
       with open("response_raw.json", "w", encoding="utf-8") as f:
@@ -1596,199 +1445,24 @@ Every microservice should have a .csproj and a Program.cs file, and follow the o
               logger.error("Failed to parse JSON from LLM response")
               raise ValueError("JSON response not found in agent output.")
       
-      # Locate Gateway microservice
-      gateway = next((ms for ms in json_result['microservices'] if ms['name'].lower() == 'gateway'), None)
-      if not gateway:
-          logger.error("Gateway microservice not found in target structure")
-          raise ValueError("Gateway microservice is required for gRPC architecture")
-      
-      gateway_project = gateway['projects'][0]['target_structure']
-      
-      # Remove authentication-related files if auth_enabled = False
+      # Enforce Gateway, proto and controller invariants in a single indexed pass
       if not auth_enabled:
-          if 'folders' in gateway_project:
-              if 'Data' in gateway_project['folders']:
-                  del gateway_project['folders']['Data']
-              if 'Entities' in gateway_project['folders']:
-                  del gateway_project['folders']['Entities']
-              if 'Controllers' in gateway_project['folders']:
-                  gateway_project['folders']['Controllers']['target_files'] = {
-                      k: v for k, v in gateway_project['folders']['Controllers']['target_files'].items()
-                      if 'auth' not in k.lower()
-                  }
-      
-      # Core files required for gRPC Gateway
-      base_gateway_files = [
-          'appsettings.json',
-          'Gateway.csproj',
-          'gateway.sln',
-          'Program.cs',
-          'Properties/launchSettings.json',
-      ]
-      
-      # Dynamically build expected controller and proto file paths with consistent naming
-      grpc_services = [ms['name'] for ms in json_result['microservices'] if ms['name'].lower() not in ['gateway', 'webui']]
-      dynamic_grpc_files = []
-      for service in grpc_services:
-          service_base = service.lower().replace('grpc', '')
-          controller_file = f'Controllers/{service}Controller.cs'
-          proto_file = f'Protos/{service_base}grpc.proto'
-          dynamic_grpc_files.extend([controller_file, proto_file])
-      
-      # Final list of required files
-      required_files = base_gateway_files + dynamic_grpc_files
-      
-      # Check for missing files and remove redundant .proto/controller files
-      if 'folders' in gateway_project and 'Protos' in gateway_project['folders']:
-          existing_protos = list(gateway_project['folders']['Protos']['target_files'].keys())
-          for proto in existing_protos:
-              proto_service = proto.replace('.proto', '').lower()
-              if proto_service in [s.lower().replace('grpc', '') for s in grpc_services]:
-                  del gateway_project['folders']['Protos']['target_files'][proto]
-      
-      if 'folders' in gateway_project and 'Controllers' in gateway_project['folders']:
-          existing_controllers = list(gateway_project['folders']['Controllers']['target_files'].keys())
-          for controller in existing_controllers:
-              controller_service = controller.replace('Controller.cs', '').lower()
-              if controller_service in [s.lower().replace('grpc', '') for s in grpc_services]:
-                  del gateway_project['folders']['Controllers']['target_files'][controller]
-      
-      # Check for missing files
-      missing_files = [
-          f for f in required_files
-          if not any(
-              f.lower() in (
-                  f'{folder}/{file}' if folder else file
-              ).lower()
-              for folder, files in gateway_project.get('folders', {}).items()
-              for file in files.get('target_files', {})
-          ) and f not in gateway_project.get('root', {})
-      ]
-      
-      if missing_files:
-          logger.warning(f"Gateway missing required gRPC files: {missing_files}")
-          
-          # Ensure folder structure exists
-          if 'folders' not in gateway_project:
-              gateway_project['folders'] = {}
-          if 'Controllers' not in gateway_project['folders']:
-              gateway_project['folders']['Controllers'] = {'target_files': {}, 'subfolders': {}}
-          if 'Protos' not in gateway_project['folders']:
-              gateway_project['folders']['Protos'] = {'target_files': {}, 'subfolders': {}}
-          if 'Properties' not in gateway_project['folders']:
-              gateway_project['folders']['Properties'] = {'target_files': {}, 'subfolders': {}}
-          
-          # Add missing files dynamically
-          for f in missing_files:
-              if f == 'appsettings.json':
-                  gateway_project['root']['appsettings.json'] = {
-                      'source_files': [sf for sf in flattened_structure.keys() if 'web.config' in sf.lower() or 'appsettings' in sf.lower()],
-                      'file_type': 'config',
-                      'description': 'Configuration settings for Gateway with gRPC client endpoints and MySQL connection string if auth_enabled',
-                      'instructions': 'Include logging (Information level), gRPC service endpoints for productGrpc (port 5001), cartGrpc (port 5002), orderGrpc (port 5003), webappGrpc (port 5004), and MySQL connection string if auth_enabled',
-                      'namespace': ''
-                  }
-              elif f == 'Gateway.csproj':
-                  gateway_project['root']['Gateway.csproj'] = {
-                      'source_files': [sf for sf in flattened_structure.keys() if sf.lower().endswith('.csproj')],
-                      'file_type': 'csproj_grpc',
-                      'description': 'Gateway project file with gRPC client dependencies and MySQLConnector if auth_enabled',
-                      'instructions': 'Target net8.0; include Grpc.Net.Client, Grpc.Net.ClientFactory, Microsoft.AspNetCore.Mvc, Microsoft.Extensions.Logging, and MySQLConnector if auth_enabled; reference .proto files in Protos folder',
-                      'namespace': ''
-                  }
-              elif f == 'gateway.sln':
-                  gateway_project['root']['gateway.sln'] = {
-                      'source_files': [sf for sf in flattened_structure.keys() if sf.lower().endswith('.sln')],
-                      'file_type': 'sln',
-                      'description': 'Solution file for Gateway microservice',
-                      'instructions': 'Include Gateway project and ensure compatibility with .NET 8.0',
-                      'namespace': ''
-                  }
-              elif f == 'Program.cs':
-                  gateway_project['root']['Program.cs'] = {
-                      'source_files': [sf for sf in flattened_structure.keys() if 'startup.cs' in sf.lower() or 'program.cs' in sf.lower()],
-                      'file_type': 'program_cs_grpc',
-                      'description': 'Entry point for Gateway with gRPC client setup, no EF middleware',
-                      'instructions': 'Configure ASP.NET Core with gRPC clients for productGrpc, cartGrpc, orderGrpc, and webappGrpc; set up MVC for HTTP-to-gRPC routing; use minimal API or controllers; configure logging; no EF middleware',
-                      'namespace': 'Gateway'
-                  }
-              elif f == 'Properties/launchSettings.json':
-                  gateway_project['folders']['Properties']['target_files']['launchSettings.json'] = {
-                      'source_files': [sf for sf in flattened_structure.keys() if 'launchsettings' in sf.lower()],
-                      'file_type': 'config',
-                      'description': 'Launch settings for Gateway development',
-                      'instructions': 'Include HTTP profile with port 5000, HTTPS profile with port 5005, and Development environment settings',
-                      'namespace': ''
-                  }
-              elif f.startswith('Controllers/') and f.endswith('Controller.cs'):
-                  service_name = f.replace('Controllers/', '').replace('Controller.cs', '')
-                  service_base = service_name.lower().replace('grpc', '')
-                  gateway_project['folders']['Controllers']['target_files'][f'{service_name}Controller.cs'] = {
-                      'source_files': [
-                          sf for sf in flattened_structure.keys()
-                          if service_base in sf.lower() and sf.lower().endswith('.cs') and
-                          ('entity' in sf.lower() or 'model' in sf.lower() or 'repository' in sf.lower() or 'aspx.cs' in sf.lower())
-                      ],
-                      'file_type': 'controller',
-                      'description': f'Controller for routing HTTP requests to {service_name} gRPC service',
-                      'instructions': f'Create an ASP.NET Core controller with async actions (Get{service_base.capitalize()}, List{service_base.capitalize()}s) to call {service_name} gRPC service using Grpc.Net.Client; inject gRPC client via constructor; use routes /api/{service_base}/get and /api/{service_base}/list',
-                      'namespace': 'Gateway.Controllers',
-                      'routes': [f'/api/{service_base}/get', f'/api/{service_base}/list']
-                  }
-              elif f.startswith('Protos/') and f.endswith('.proto'):
-                  service_name = f.replace('Protos/', '').replace('.proto', '')
-                  service_base = service_name.lower().replace('grpc', '')
-                  gateway_project['folders']['Protos']['target_files'][f'{service_name}.proto'] = {
-                      'source_files': [
-                          sf for sf in flattened_structure.keys()
-                          if service_base in sf.lower() and sf.lower().endswith('.cs') and
-                          ('entity' in sf.lower() or 'model' in sf.lower() or 'repository' in sf.lower() or 'aspx.cs' in sf.lower())
-                      ],
-                      'file_type': 'proto',
-                      'description': f'gRPC service definition for {service_name} microservice client',
-                      'instructions': f'Define {service_base.capitalize()}Service with Get{service_base.capitalize()} (takes {service_base.capitalize()}Request with id, returns {service_base.capitalize()}Response) and List{service_base.capitalize()}s (returns {service_base.capitalize()}ListResponse); derive messages from entity/model classes',
-                      'namespace': service_base
-                  }
-      
-      # Ensure downstream microservices have .proto files with consistent naming
-      for ms in json_result['microservices']:
-          if ms['name'].lower() not in ['gateway', 'webui']:
-              for project in ms['projects']:
-                  if 'Presentation' in project['project_name']:
-                      if 'folders' not in project['target_structure']:
-                          project['target_structure']['folders'] = {}
-                      if 'Protos' not in project['target_structure']['folders']:
-                          project['target_structure']['folders']['Protos'] = {'target_files': {}, 'subfolders': {}}
-                      service_base = ms['name'].lower().replace('grpc', '')
-                      proto_file = f"{service_base}grpc.proto"
-                      # Remove redundant .proto files
-                      existing_protos = list(project['target_structure']['folders']['Protos']['target_files'].keys())
-                      for proto in existing_protos:
-                          if proto != proto_file and proto.replace('.proto', '').lower() == service_base:
-                              del project['target_structure']['folders']['Protos']['target_files'][proto]
-                      relevant_files = [
-                          f for f in flattened_structure.keys()
-                          if service_base in f.lower() and
-                          f.lower().endswith('.cs') and
-                          ('entity' in f.lower() or 'model' in f.lower() or 'repository' in f.lower()) and
-                          '/' not in f.split('/')[-1]
-                      ]
-                      if not relevant_files:
-                          relevant_files = [
-                              f for f in flattened_structure.keys()
-                              if service_base in f.lower() and
-                              f.lower().endswith('.cs') and
-                              'aspx.cs' in f.lower() and
-                              '/' not in f.split('/')[-1]
-                          ]
-                      project['target_structure']['folders']['Protos']['target_files'][proto_file] = {
-                          'source_files': relevant_files,
-                          'file_type': 'proto',
-                          'description': f"gRPC service definition for {ms['name']} microservice",
-                          'instructions': f"Define {service_base.capitalize()}Service with Get{service_base.capitalize()} (takes {service_base.capitalize()}Request with id, returns {service_base.capitalize()}Response) and List{service_base.capitalize()}s (returns {service_base.capitalize()}ListResponse)",
-                          'namespace': service_base
-                      }
-                      logger.debug(f"Source files for {proto_file}: {relevant_files}")
+          auth_case = "none"
+      elif "auth service" in instruction_lower or "authentication service" in instruction_lower or "authentication" in instruction_lower:
+          auth_case = "separate"
+      else:
+          auth_case = "gateway"
+      validator = TargetStructureValidator(
+          api_type="grpc",
+          auth_case=auth_case,
+          source_index=source_index
+      )
+      report = validator.validate(json_result)
+      if report.fixes:
+          logger.info(f"Applied target structure fixes: {report.fixes}")
+      if not report.is_valid:
+          logger.error(f"Invalid gRPC target structure: {report.errors}")
+          raise ValueError("; ".join(report.errors))
       
       # Save the updated target structure
       with open("response_grpc.json", "w", encoding="utf-8") as f:
@@ -1822,18 +1496,22 @@ Requirements:
 Return modified structure following exact same schema as current target.
 """
             
-            input_tokens = encoder.encode(prompt)
+            input_tokens = await token_counter.count_async(prompt)
 
+            deployment = llm_config.route("target_structure", input_tokens=input_tokens)
+            await llm_config.acquire(prompt, deployment)
             response = await target_structure_creator_agent.run(
                 user_prompt=prompt,
+                model=llm_config.pydantic_model(deployment),
                 model_settings={'temperature': 0.3}
             )
 
-            output_tokens = encoder.encode(response)
-            logger.info(f"Completed regeneration of target structure. Input tokens: {len(input_tokens)}, Output tokens: {len(output_tokens)}")
+            response_json = response.data.model_dump_json()
+            output_tokens = await token_counter.count_async(response_json)
+            logger.info(f"Completed regeneration of target structure. Input tokens: {input_tokens}, Output tokens: {output_tokens}")
 
 
-            return json.loads(response.data.model_dump_json())
+            return json.loads(response_json)
         except Exception as e:
             print(f"Error regenerating target structure: {str(e)}")
             return {"projects": []}
\ No newline at end of file
@@ -0,0 +1,271 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+from config.settings import settings
+from utils import logger
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATUSES = (COMPLETED, FAILED, CANCELLED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    owner TEXT,
+    progress TEXT,
+    result TEXT,
+    error TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker_id TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS job_events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    data TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_job_events_job_seq ON job_events (job_id, seq);
+"""
+
+
+class JobQueue:
+    """
+    Durable job queue in a local SQLite file, shared by the API process (submit, status, cancel)
+    and the worker processes (claim, progress, finish). No broker is needed: SQLite's write lock
+    makes claiming atomic across processes, and WAL mode lets readers poll status while a worker
+    writes. Connections are per thread, as sqlite3 requires.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.JOB_QUEUE_PATH
+        self._local = threading.local()
+        with self._connect() as connection:
+            connection.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        return self._connect().execute(sql, params)
+
+    @staticmethod
+    def _job_dict(row: Optional[sqlite3.Row], include_payload: bool = False) -> Optional[Dict]:
+        if row is None:
+            return None
+        job = {
+            "id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "owner": row["owner"],
+            "progress": json.loads(row["progress"]) if row["progress"] else {},
+            "error": row["error"],
+            "cancel_requested": bool(row["cancel_requested"]),
+            "attempts": row["attempts"],
+            "worker_id": row["worker_id"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+            "has_result": row["result"] is not None
+        }
+        if include_payload:
+            job["payload"] = json.loads(row["payload"])
+        return job
+
+    def submit(self, kind: str, payload: Dict[str, Any], owner: Optional[str] = None, job_id: Optional[str] = None) -> str:
+        job_id = job_id or str(uuid.uuid4())
+        self._execute(
+            "INSERT INTO jobs (id, kind, status, payload, owner, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, kind, QUEUED, json.dumps(payload), owner, time.time())
+        )
+        logger.info(f"Queued {kind} job {job_id}")
+        return job_id
+
+    def get(self, job_id: str, include_payload: bool = False) -> Optional[Dict]:
+        row = self._execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job_dict(row, include_payload)
+
+    def list_jobs(self, owner: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        if owner:
+            rows = self._execute("SELECT * FROM jobs WHERE owner = ? ORDER BY created_at DESC LIMIT ?", (owner, limit))
+        else:
+            rows = self._execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,))
+        return [self._job_dict(row) for row in rows.fetchall()]
+
+    def result(self, job_id: str) -> Optional[Dict]:
+        row = self._execute("SELECT result FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row["result"]) if row and row["result"] else None
+
+    def claim(self, worker_id: str) -> Optional[Dict]:
+        """Atomically take the oldest queued job for this worker; None when the queue is empty."""
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                connection.execute("COMMIT")
+                return None
+            now = time.time()
+            connection.execute(
+                "UPDATE jobs SET status = ?, worker_id = ?, started_at = ?, heartbeat_at = ?, attempts = attempts + 1 "
+                "WHERE id = ?",
+                (RUNNING, worker_id, now, now, row["id"])
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return self.get(row["id"], include_payload=True)
+
+    def heartbeat(self, job_id: str, worker_id: str, progress: Optional[Dict] = None) -> Optional[bool]:
+        """
+        Record that the worker's job is alive (optionally with new progress); returns whether
+        cancel was requested, or None when the worker no longer owns the running job (it was
+        requeued as stale and possibly claimed by another worker).
+        """
+        if progress is None:
+            cursor = self._execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND worker_id = ? AND status = ?",
+                (time.time(), job_id, worker_id, RUNNING)
+            )
+        else:
+            cursor = self._execute(
+                "UPDATE jobs SET heartbeat_at = ?, progress = ? WHERE id = ? AND worker_id = ? AND status = ?",
+                (time.time(), json.dumps(progress), job_id, worker_id, RUNNING)
+            )
+        if cursor.rowcount == 0:
+            return None
+        row = self._execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def _finish(self, job_id: str, worker_id: str, status: str, result: Optional[Dict] = None,
+                error: Optional[str] = None) -> bool:
+        """Finish the worker's running job; False (nothing written) if the worker no longer owns it."""
+        cursor = self._execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ? AND worker_id = ? AND status = ?",
+            (status, json.dumps(result) if result is not None else None, error, time.time(), job_id, worker_id, RUNNING)
+        )
+        if cursor.rowcount == 0:
+            logger.warning(f"Worker {worker_id} no longer owns job {job_id}; not marking it {status}")
+            return False
+        logger.info(f"Job {job_id} {status}")
+        return True
+
+    def complete(self, job_id: str, worker_id: str, result: Dict) -> bool:
+        return self._finish(job_id, worker_id, COMPLETED, result=result)
+
+    def fail(self, job_id: str, worker_id: str, error: str) -> bool:
+        return self._finish(job_id, worker_id, FAILED, error=error)
+
+    def mark_cancelled(self, job_id: str, worker_id: str) -> bool:
+        return self._finish(job_id, worker_id, CANCELLED, error="Cancelled by user")
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """
+        Cancel a job: a queued job is cancelled at once, a running one is flagged and stopped by
+        its worker at the next heartbeat. Returns the resulting status, or None if unknown.
+        """
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                connection.execute("COMMIT")
+                return None
+            status = row["status"]
+            if status == QUEUED:
+                connection.execute(
+                    "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                    (CANCELLED, "Cancelled by user", time.time(), job_id)
+                )
+                status = CANCELLED
+            elif status == RUNNING:
+                connection.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+            connection.execute("COMMIT")
+            return status
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def retry(self, job_id: str) -> bool:
+        """Put a failed or cancelled job back on the queue with its original payload."""
+        cursor = self._execute(
+            "UPDATE jobs SET status = ?, cancel_requested = 0, error = NULL, result = NULL, progress = NULL, "
+            "worker_id = NULL, started_at = NULL, finished_at = NULL, created_at = ? WHERE id = ? AND status IN (?, ?)",
+            (QUEUED, time.time(), job_id, FAILED, CANCELLED)
+        )
+        return cursor.rowcount > 0
+
+    def append_event(self, job_id: str, event: Dict[str, Any]) -> int:
+        """Append a progress event ({"type": ..., ...}) to the job's event log; returns its sequence number."""
+        cursor = self._execute(
+            "INSERT INTO job_events (job_id, type, data, created_at) VALUES (?, ?, ?, ?)",
+            (job_id, event["type"], json.dumps(event), time.time())
+        )
+        return cursor.lastrowid
+
+    def append_events(self, job_id: str, events: List[Dict[str, Any]]) -> None:
+        """Append several events in one transaction, in order."""
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            connection.executemany(
+                "INSERT INTO job_events (job_id, type, data, created_at) VALUES (?, ?, ?, ?)",
+                [(job_id, event["type"], json.dumps(event), now) for event in events]
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def events(self, job_id: str, after: int = 0, limit: int = 500) -> List[Dict]:
+        """Events of a job with a sequence number greater than `after`, oldest first."""
+        rows = self._execute(
+            "SELECT seq, data FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+            (job_id, after, limit)
+        ).fetchall()
+        return [{"seq": row["seq"], **json.loads(row["data"])} for row in rows]
+
+    def requeue_stale(self, stale_after: Optional[float] = None) -> int:
+        """Put running jobs whose worker stopped sending heartbeats (crash, restart) back on the queue."""
+        cutoff = time.time() - (stale_after if stale_after is not None else settings.JOB_STALE_AFTER)
+        self._execute(
+            "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE status = ? AND heartbeat_at < ? AND cancel_requested = 1",
+            (CANCELLED, "Cancelled by user", time.time(), RUNNING, cutoff)
+        )
+        cursor = self._execute(
+            "UPDATE jobs SET status = ?, worker_id = NULL WHERE status = ? AND heartbeat_at < ?",
+            (QUEUED, RUNNING, cutoff)
+        )
+        if cursor.rowcount:
+            logger.warning(f"Requeued {cursor.rowcount} stale job(s)")
+        return cursor.rowcount
+
+
+# Create singleton instance
+job_queue = JobQueue()
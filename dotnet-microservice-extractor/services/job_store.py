@@ -0,0 +1,174 @@
+import hashlib
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from config.db_config import SessionLocal
+from models.db import MigrationJob, FileCheckpoint
+from utils import logger
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class JobStore:
+    """
+    Persists migration jobs and a checkpoint per completed target file, so an interrupted
+    migration can be resumed without regenerating (and paying for) finished files.
+    Each call uses its own short-lived session; callers on the event loop should run
+    these methods with asyncio.to_thread.
+    """
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+
+    def create_job(self, analysis_id: str, repo_name: str, output_dir: str, api_type: Optional[str] = None,
+                   target_version: Optional[str] = None, instruction: Optional[str] = None,
+                   target_structure: Optional[Dict] = None, status: str = "pending", owner: Optional[str] = None) -> Dict:
+        db = self.session_factory()
+        try:
+            job = MigrationJob(
+                analysis_id=analysis_id,
+                repo_name=repo_name,
+                output_dir=output_dir,
+                api_type=api_type,
+                target_version=target_version,
+                instruction=instruction,
+                target_structure=target_structure,
+                status=status,
+                owner=owner
+            )
+            db.add(job)
+            db.commit()
+            db.refresh(job)
+            logger.info(f"Created migration job {job.id} for analysis {analysis_id}")
+            return self._job_dict(job)
+        finally:
+            db.close()
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        db = self.session_factory()
+        try:
+            job = db.query(MigrationJob).filter(MigrationJob.id == job_id).first()
+            return self._job_dict(job) if job else None
+        finally:
+            db.close()
+
+    def update_job(self, job_id: str, **fields) -> None:
+        db = self.session_factory()
+        try:
+            job = db.query(MigrationJob).filter(MigrationJob.id == job_id).first()
+            if not job:
+                raise KeyError(f"Migration job {job_id} not found")
+            for name, value in fields.items():
+                setattr(job, name, value)
+            db.commit()
+        finally:
+            db.close()
+
+    def claim_job(self, job_id: str, from_statuses: List[str], status: str) -> bool:
+        """
+        Move the job to `status` if it is in one of `from_statuses`, in a single conditional
+        UPDATE; False if it is missing or another caller changed its status first.
+        """
+        db = self.session_factory()
+        try:
+            claimed = db.query(MigrationJob).filter(
+                MigrationJob.id == job_id, MigrationJob.status.in_(from_statuses)
+            ).update({"status": status, "error": None}, synchronize_session=False)
+            db.commit()
+            return claimed == 1
+        finally:
+            db.close()
+
+    def last_activity(self, job_id: str) -> Optional[datetime]:
+        """When the job last changed or checkpointed a file (UTC), or None if it does not exist."""
+        db = self.session_factory()
+        try:
+            job = db.query(MigrationJob).filter(MigrationJob.id == job_id).first()
+            if not job:
+                return None
+            latest_checkpoint = db.query(func.max(FileCheckpoint.completed_at)).filter(FileCheckpoint.job_id == job_id).scalar()
+            times = [t if t.tzinfo else t.replace(tzinfo=timezone.utc) for t in (job.updated_at, latest_checkpoint) if t]
+            return max(times) if times else None
+        finally:
+            db.close()
+
+    def load_checkpoints(self, job_id: str) -> Dict[str, Dict]:
+        """Return {file_path: checkpoint} for every file the job already completed."""
+        db = self.session_factory()
+        try:
+            rows = db.query(FileCheckpoint).filter(FileCheckpoint.job_id == job_id).all()
+            return {row.file_path: self._checkpoint_dict(row) for row in rows}
+        finally:
+            db.close()
+
+    def save_checkpoint(self, job_id: str, file_path: str, content_hash: str, microservice: Optional[str] = None,
+                        project_name: Optional[str] = None, dependencies: Optional[List[str]] = None,
+                        routes: Optional[List[str]] = None, prompt_tokens: int = 0, response_tokens: int = 0) -> None:
+        """Insert or replace the checkpoint for one completed file."""
+        path_hash = hashlib.sha256(file_path.encode("utf-8")).hexdigest()
+        values = {
+            "file_path": file_path,
+            "microservice": microservice,
+            "project_name": project_name,
+            "content_hash": content_hash,
+            "dependencies": list(dependencies or []),
+            "routes": list(routes or []),
+            "prompt_tokens": prompt_tokens,
+            "response_tokens": response_tokens,
+            "completed_at": datetime.now(timezone.utc)
+        }
+        db = self.session_factory()
+        try:
+            row = db.query(FileCheckpoint).filter(
+                FileCheckpoint.job_id == job_id, FileCheckpoint.path_hash == path_hash
+            ).first()
+            if row is None:
+                db.add(FileCheckpoint(job_id=job_id, path_hash=path_hash, **values))
+            else:
+                for name, value in values.items():
+                    setattr(row, name, value)
+            db.commit()
+        except IntegrityError:
+            # A concurrent save for the same file won; its content is just as current
+            db.rollback()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _job_dict(job: MigrationJob) -> Dict:
+        return {
+            "id": job.id,
+            "analysis_id": job.analysis_id,
+            "status": job.status,
+            "repo_name": job.repo_name,
+            "api_type": job.api_type,
+            "target_version": job.target_version,
+            "instruction": job.instruction,
+            "target_structure": job.target_structure,
+            "output_dir": job.output_dir,
+            "owner": job.owner,
+            "result": job.result,
+            "error": job.error,
+            "created_at": job.created_at.isoformat() if job.created_at else None,
+            "updated_at": job.updated_at.isoformat() if job.updated_at else None
+        }
+
+    @staticmethod
+    def _checkpoint_dict(row: FileCheckpoint) -> Dict:
+        return {
+            "file_path": row.file_path,
+            "microservice": row.microservice,
+            "project_name": row.project_name,
+            "content_hash": row.content_hash,
+            "dependencies": row.dependencies or [],
+            "routes": row.routes or [],
+            "prompt_tokens": row.prompt_tokens or 0,
+            "response_tokens": row.response_tokens or 0
+        }
+
+
+# Create singleton instance
+job_store = JobStore()
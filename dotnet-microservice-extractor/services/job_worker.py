@@ -0,0 +1,127 @@
+import asyncio
+import os
+import socket
+import time
+from typing import Dict, Optional
+from config.settings import settings
+from services.job_queue import JobQueue, job_queue
+from services.job_store import job_store
+from services.pipelines import load_analysis, run_analysis, run_migration
+from utils import logger
+
+
+class JobProgress:
+    """Latest progress snapshot of a running job; pipeline callbacks update it, heartbeats persist it."""
+
+    def __init__(self):
+        self.state: Dict = {"stage": "starting", "files_done": 0, "files_failed": 0, "files_resumed": 0}
+
+    def update(self, fields: Dict) -> None:
+        if "type" not in fields:
+            # Pipeline stage change, e.g. {"stage": "analyzing"}
+            self.state.update(fields)
+            return
+        # Migration event: keep the latest running totals (per microservice, ETA, files in flight)
+        totals = fields.get("totals")
+        if totals:
+            self.state.update(totals)
+        if fields["type"] in ("file_finished", "file_failed"):
+            self.state["last_file"] = fields.get("file")
+
+    def snapshot(self) -> Dict:
+        return dict(self.state)
+
+
+class JobWorker:
+    """
+    Pulls jobs from the queue and runs the matching pipeline, one job at a time. While a job
+    runs the worker sends a heartbeat (with progress) every poll interval and cancels the
+    pipeline as soon as a cancel request shows up, or when the heartbeat finds the job was
+    requeued as stale and no longer belongs to this worker. Between jobs it periodically puts
+    jobs of crashed workers back on the queue.
+    """
+
+    def __init__(self, worker_id: Optional[str] = None, queue: JobQueue = job_queue,
+                 poll_interval: float = settings.JOB_POLL_INTERVAL,
+                 stale_sweep_interval: float = settings.JOB_STALE_AFTER / 2):
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.queue = queue
+        self.poll_interval = poll_interval
+        self.stale_sweep_interval = stale_sweep_interval
+
+    async def run_forever(self) -> None:
+        logger.info(f"Job worker {self.worker_id} started")
+        last_sweep = None
+        while True:
+            if last_sweep is None or time.monotonic() - last_sweep >= self.stale_sweep_interval:
+                await asyncio.to_thread(self.queue.requeue_stale)
+                last_sweep = time.monotonic()
+            job = await asyncio.to_thread(self.queue.claim, self.worker_id)
+            if job is None:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            await self.run_job(job)
+
+    async def run_job(self, job: Dict) -> None:
+        logger.info(f"Worker {self.worker_id} running {job['kind']} job {job['id']} (attempt {job['attempts']})")
+        progress = JobProgress()
+        task = asyncio.ensure_future(self.execute(job, progress))
+        cancel_requested = False
+        try:
+            while not task.done():
+                await asyncio.wait({task}, timeout=self.poll_interval)
+                if task.done():
+                    break
+                # Heartbeats continue while a cancelled pipeline unwinds so the job is not seen as stale
+                cancel = await asyncio.to_thread(self.queue.heartbeat, job["id"], self.worker_id, progress.snapshot())
+                if cancel is None:
+                    # Requeued as stale, maybe running elsewhere already: stop without touching the job
+                    logger.warning(f"Worker {self.worker_id} lost job {job['id']}; stopping its pipeline")
+                    task.cancel()
+                    await asyncio.gather(task, return_exceptions=True)
+                    return
+                if cancel and not cancel_requested:
+                    logger.info(f"Cancelling job {job['id']}")
+                    cancel_requested = True
+                    task.cancel()
+            result = await task
+            await asyncio.to_thread(self.queue.heartbeat, job["id"], self.worker_id, progress.snapshot())
+            await asyncio.to_thread(self.queue.complete, job["id"], self.worker_id, result)
+        except asyncio.CancelledError:
+            if not cancel_requested:
+                # The worker itself is shutting down: stop the pipeline before letting go of it
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                raise
+            # Only reached once the pipeline has unwound, so nothing writes for the job after this
+            await asyncio.to_thread(self.queue.mark_cancelled, job["id"], self.worker_id)
+        except Exception as e:
+            logger.error(f"Job {job['id']} failed: {str(e)}")
+            await asyncio.to_thread(self.queue.fail, job["id"], self.worker_id, str(e))
+
+    async def execute(self, job: Dict, progress: JobProgress) -> Dict:
+        payload = job["payload"]
+        if job["kind"] == "analyze":
+            return await run_analysis(
+                repo_url=payload.get("repo_url"),
+                target_version=payload["target_version"],
+                api_type=payload["api_type"],
+                instruction=payload.get("instruction"),
+                zip_content_b64=payload.get("zip_content"),
+                progress=progress.update
+            )
+        if job["kind"] == "migrate":
+            migration_job = await asyncio.to_thread(job_store.get_job, payload["migration_job_id"])
+            if not migration_job:
+                raise ValueError(f"Migration job {payload['migration_job_id']} not found")
+            analysis = await asyncio.to_thread(load_analysis, migration_job["analysis_id"])
+            if not analysis:
+                raise ValueError(f"Analysis with id {migration_job['analysis_id']} not found")
+            migration_result = await run_migration(migration_job, analysis, progress=progress.update)
+            return {
+                "migration_job_id": migration_job["id"],
+                "zip_file": migration_result.get("zip_file"),
+                "filename": f"{migration_job['repo_name']}.zip",
+                "token_usage": migration_result.get("token_usage")
+            }
+        raise ValueError(f"Unknown job kind: {job['kind']}")
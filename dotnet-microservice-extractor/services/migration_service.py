@@ -7,6 +7,9 @@ from urllib3 import disable_warnings # Suppress SSL warnings (temporary for debu
 os.environ['REQUESTS_CA_BUNDLE'] = certifi.where()  # Set globally for requests
 os.environ['SSL_CERT_FILE'] = certifi.where()  # For other SSL uses
 
+from dotenv import load_dotenv
+load_dotenv()
+
 # Create session (insecure for debugging, to confirm bypass)
 secure_session = requests.Session()
 secure_session.verify = False  # Temporary for debugging
@@ -14,24 +17,22 @@ secure_session.verify = False  # Temporary for debugging
 # Debug SSL setup
 print("Certifi CA bundle path:", certifi.where())
 print("REQUESTS_CA_BUNDLE:", os.environ.get("REQUESTS_CA_BUNDLE"))
-try:
-    response = secure_session.get("https://api.smith.langchain.com/info", headers={"x-api-key": os.environ.get("LANGCHAIN_API_KEY")})
-    print("Manual test to LangSmith /info:", response.status_code, response.text)
-except Exception as e:
-    print("Manual test to LangSmith /info failed:", e)
-
-from dotenv import load_dotenv
-load_dotenv()
+# The fake LLM backend runs offline; skip the LangSmith reachability check there
+if os.environ.get("LLM_BACKEND", "azure").lower() != "fake":
+    try:
+        response = secure_session.get("https://api.smith.langchain.com/info", headers={"x-api-key": os.environ.get("LANGCHAIN_API_KEY")})
+        print("Manual test to LangSmith /info:", response.status_code, response.text)
+    except Exception as e:
+        print("Manual test to LangSmith /info failed:", e)
 
 # Critical imports that might trigger HTTPS calls
 from config.llm_config import pydantic_ai_model, llm_config
 from llama_index.core.agent import ReActAgent
 from llama_index.core import Settings
-from llama_index.core.memory import ChatMemoryBuffer, SimpleComposableMemory
 
 # Other imports
 from pydantic import BaseModel
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Tuple
 from pydantic_ai import Agent
 import json
 import asyncio
@@ -41,16 +42,43 @@ import subprocess
 from utils.logger import logger, llm_logger
 from utils.file_utils import (
     read_file,
-    load_yaml_file,
     ensure_directory_exists,
     join_paths,
     sanitize_content,
     copy_static_files_to_wwwroot
 )
 import zipfile
-import tiktoken
 from utils.file_cache import FileCache
-from utils.tools import create_query_target_structure_tool, create_get_file_content_tool, create_query_analysis_tool
+from utils.tools import create_query_target_structure_tool, create_get_file_content_tool, create_query_analysis_tool, create_find_source_files_tool
+from utils.ocelot_builder import (
+    gateway_microservice_names,
+    detect_auth_case,
+    assign_service_ports,
+    collect_controller_routes,
+    build_ocelot_config,
+    validate_ocelot_config,
+    needs_llm_gateway,
+    GATEWAY_PORT,
+    FIRST_SERVICE_PORT
+)
+from utils.template_engine import (
+    template_library,
+    resolve_template_kind,
+    resolve_packages,
+    template_dependencies,
+    solution_project_guid,
+    LAYER_PROFILES
+)
+from utils.generation_scheduler import GenerationScheduler, GenerationTask
+from utils.migration_progress import MigrationProgress
+from utils.generation_cache import generation_cache, generation_key
+from utils.context_builder import GenerationContextBuilder
+from utils.csharp_chunker import chunk_source
+from utils.token_counter import token_counter
+from utils.prompt_registry import PromptSet, prompt_registry
+from utils.agent_memory import MicroserviceAgent
+from utils.code_stream import GeneratedCodeDecoder, StreamingSanitizer, final_result_args
+from services.job_store import job_store, content_hash
 from services.target_structure_rag_service import TargetStructureRagService
 from services.analysis_rag_service import AnalysisRagService
 from tenacity import retry, stop_after_attempt, wait_fixed, retry_if_exception_type
@@ -58,13 +86,15 @@ import logging
 from langsmith import Client, traceable
 from langsmith.run_helpers import trace
 import time
+from contextvars import ContextVar
 from datetime import datetime
 
 # Initialize LangSmith client
 langsmith_client = Client(api_key=os.environ.get("LANGCHAIN_API_KEY"), session=secure_session)
 print("LangSmith client initialized:", langsmith_client)
 
-encoder = tiktoken.encoding_for_model("gpt-4o")
+# Attempt counter of the file being generated in the current task (tenacity retries re-enter generate_code)
+generation_attempts: ContextVar[Optional[List[int]]] = ContextVar("generation_attempts", default=None)
 
 
 
@@ -82,6 +112,8 @@ class TokenTracker:
     """Tracks token usage across the entire migration process."""
     
     def __init__(self):
+        # Version of prompts.yml the migration runs with; kept across resets
+        self.prompts_version = None
         self.reset()
     
     def reset(self):
@@ -90,6 +122,17 @@ class TokenTracker:
         self.total_requests = 0
         self.file_stats = {}
         self.microservice_stats = {}
+        self.templated_files = {}
+        self.resumed_files = {}
+        self.cache_hit_files = {}
+        self.cache_misses = 0
+        self.cache_tokens_saved = 0
+        self.generation_paths = {"direct": 0, "agent": 0, "agent_fallback": 0}
+        self.provider_prompt_tokens = 0
+        self.cached_prompt_tokens = 0
+        self.hedging = {"hedged": 0, "hedge_wins": 0, "hedge_tokens": 0}
+        self.deployment_requests = {}
+        self.file_deployments = {}
         
     def add_file_tokens(self, file_name: str, prompt_tokens: int, response_tokens: int, microservice: str = "Miscellaneous"):
         """Add token usage for a specific file."""
@@ -121,6 +164,36 @@ class TokenTracker:
         if file_name not in [f for f, stats in self.file_stats.items() if stats.get("microservice") == microservice]:
             self.microservice_stats[microservice]["files_processed"] += 1
     
+    def add_templated_file(self, file_name: str, microservice: str = "Miscellaneous"):
+        """Record a file rendered from a template instead of an LLM call."""
+        self.templated_files.setdefault(microservice, []).append(file_name)
+
+    def add_resumed_file(self, file_name: str, microservice: str = "Miscellaneous"):
+        """Record a file restored from a checkpoint of an earlier, interrupted run."""
+        self.resumed_files.setdefault(microservice, []).append(file_name)
+
+    def add_cache_hit(self, file_name: str, tokens_saved: int, microservice: str = "Miscellaneous"):
+        """Record a file served from the generation cache instead of an LLM call."""
+        self.cache_hit_files.setdefault(microservice, []).append(file_name)
+        self.cache_tokens_saved += tokens_saved
+
+    def add_cache_miss(self):
+        self.cache_misses += 1
+
+    def add_generation(self, path: str):
+        """Record how one LLM generation ran: direct, agent, or agent_fallback after a failed direct call."""
+        self.generation_paths[path] = self.generation_paths.get(path, 0) + 1
+
+    def add_route(self, file_name: str, deployment: str):
+        """Record the deployment an LLM generation was sent to."""
+        self.deployment_requests[deployment] = self.deployment_requests.get(deployment, 0) + 1
+        self.file_deployments[file_name] = deployment
+
+    def add_provider_usage(self, prompt_tokens: int, cached_tokens: int):
+        """Record the prompt tokens the provider reported for one call and how many it served from its prompt cache."""
+        self.provider_prompt_tokens += prompt_tokens
+        self.cached_prompt_tokens += cached_tokens
+
     def get_summary(self) -> Dict:
         """Get comprehensive token usage summary."""
         return {
@@ -130,6 +203,23 @@ class TokenTracker:
             "total_requests": self.total_requests,
             "average_prompt_tokens_per_request": self.total_prompt_tokens / max(1, self.total_requests),
             "average_response_tokens_per_request": self.total_response_tokens / max(1, self.total_requests),
+            "templated_files_count": sum(len(files) for files in self.templated_files.values()),
+            "templated_files": self.templated_files,
+            "resumed_files_count": sum(len(files) for files in self.resumed_files.values()),
+            "resumed_files": self.resumed_files,
+            "cache_hits_count": sum(len(files) for files in self.cache_hit_files.values()),
+            "cache_misses_count": self.cache_misses,
+            "cache_hit_rate": sum(len(files) for files in self.cache_hit_files.values()) / max(1, sum(len(files) for files in self.cache_hit_files.values()) + self.cache_misses),
+            "cache_tokens_saved": self.cache_tokens_saved,
+            "cache_hit_files": self.cache_hit_files,
+            "generation_paths": dict(self.generation_paths),
+            "prompts_version": self.prompts_version,
+            "provider_prompt_tokens": self.provider_prompt_tokens,
+            "cached_prompt_tokens": self.cached_prompt_tokens,
+            "prompt_cache_rate": self.cached_prompt_tokens / max(1, self.provider_prompt_tokens),
+            "hedging": dict(self.hedging),
+            "deployment_requests": dict(self.deployment_requests),
+            "file_deployments": self.file_deployments,
             "file_stats": self.file_stats,
             "microservice_stats": self.microservice_stats,
             "top_consuming_files": sorted(
@@ -147,7 +237,16 @@ class TokenTracker:
         logger.info(f"Total Prompt Tokens: {summary['total_prompt_tokens']:,}")
         logger.info(f"Total Response Tokens: {summary['total_response_tokens']:,}")
         logger.info(f"Total Requests: {summary['total_requests']}")
+        logger.info(f"Files Rendered From Templates: {summary['templated_files_count']}")
+        logger.info(f"Files Restored From Checkpoints: {summary['resumed_files_count']}")
+        logger.info(f"Generation Cache: {summary['cache_hits_count']} hits, {summary['cache_misses_count']} misses ({summary['cache_hit_rate']:.0%}), {summary['cache_tokens_saved']:,} tokens saved")
+        logger.info(f"Generation Paths: {summary['generation_paths']['direct']} direct, {summary['generation_paths']['agent']} agent, {summary['generation_paths']['agent_fallback']} agent fallback")
+        logger.info(f"Provider Prompt Cache: {summary['cached_prompt_tokens']:,} of {summary['provider_prompt_tokens']:,} reported prompt tokens cached ({summary['prompt_cache_rate']:.0%})")
+        logger.info(f"Deployments: {', '.join(f'{name}: {count} requests' for name, count in summary['deployment_requests'].items()) or 'none'}")
+        logger.info(f"Hedged Requests: {summary['hedging']['hedged']} hedged, {summary['hedging']['hedge_wins']} won by the hedge, {summary['hedging']['hedge_tokens']:,} estimated extra tokens")
         logger.info(f"Average Tokens per Request: {summary['average_prompt_tokens_per_request'] + summary['average_response_tokens_per_request']:.2f}")
+        if llm_config.fake_backend is not None:
+            llm_config.fake_backend.log_summary()
         
         logger.info(f"=== MICROSERVICE BREAKDOWN ===")
         for ms_name, stats in summary['microservice_stats'].items():
@@ -160,13 +259,29 @@ class TokenTracker:
 
 class Migrator:
     def __init__(self):
-        self.prompts = None
+        # Snapshot of prompts.yml taken at initialize(), so one migration uses one prompt version
+        self.prompts: Optional[PromptSet] = None
         self.output_dir = None
         self.source_dir = None
         self.repo_name = None
         self.target_version = None
         self.target_structure = None  
         self.instruction = None  
+        self.api_type = None
+        self.templates = template_library
+        self.generation_cache = generation_cache
+        # Off when the user explicitly asks for a file to be regenerated
+        self.use_generation_cache = True
+        self.source_index = None
+        # Pre-fetches each file's related context into its prompt; set when the analysis is known
+        self.context_builder: Optional[GenerationContextBuilder] = None
+        # The concurrency limit is process-wide, shared with every other migration and worker job
+        self.scheduler = GenerationScheduler(llm_config.max_concurrent_generations, llm_config.generation_semaphore)
+        # Set when the migration runs as a resumable job
+        self.job_id = None
+        self.checkpoints: Dict[str, Dict] = {}
+        # Live per-file events; the caller sets progress.sink (or replaces progress) to receive them
+        self.progress = MigrationProgress()
         self.llm = Settings.llm
         
         # Token tracking
@@ -201,7 +316,9 @@ class Migrator:
        self.output_dir = output_dir
        self.source_dir = source_dir
        ensure_directory_exists(self.output_dir)
-       self.prompts = await load_yaml_file()
+       self.prompts = prompt_registry.current()
+       self.token_tracker.prompts_version = self.prompts.version
+       logger.info(f"Using prompts version {self.prompts.version}")
 
         # Set up prompt logger after output_dir is defined
        self.prompt_log_dir = join_paths(self.output_dir, "prompt_logs")
@@ -216,11 +333,6 @@ class Migrator:
             )
             self.prompt_logger.addHandler(prompt_handler)
 
-       if not self.prompts:
-           raise ValueError("prompts.yml failed to load. Is it missing, empty, or malformed?")
-       if "file_type_prompts" not in self.prompts or "ocelot" not in self.prompts["file_type_prompts"]:
-           raise ValueError("Missing 'file_type_prompts.ocelot.prompt' in prompts.yml")
-
     @traceable(name="zip_repository")
     def zip_repo(self) -> str:
         """
@@ -236,6 +348,17 @@ class Migrator:
                     zipf.write(full_file_path, arcname)
         return zip_path
 
+    def zip_files(self, relative_paths: List[str], suffix: str) -> str:
+        """Zip just the given repository-relative files (a delta of the full archive) and return its path."""
+        repo_dir = join_paths(self.output_dir, self.repo_name)
+        zip_path = join_paths(self.output_dir, f"{self.repo_name}_{suffix}.zip")
+        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+            for relative_path in relative_paths:
+                full_file_path = os.path.join(repo_dir, *relative_path.split("/"))
+                if os.path.exists(full_file_path):
+                    zipf.write(full_file_path, os.path.relpath(full_file_path, os.path.dirname(repo_dir)))
+        return zip_path
+
     @traceable(name="extract_routes")
     def extract_routes(self, code: str) -> List[str]:
         """
@@ -299,308 +422,297 @@ class Migrator:
 
     # chunking
     def estimate_tokens(self, text: str) -> int:
-        return len(encoder.encode(text))
+        return token_counter.count(text)
 
     @traceable(name="chunk_large_file")
     def chunk_large_file(self, content: str, max_chunk_size: int = 10000, file_type: str = "cs") -> List[str]:
-        logger.debug(f"Checking chunking for {file_type} file with size {len(content)} characters, {self.estimate_tokens(content)} tokens")
-        if self.estimate_tokens(content) <= max_chunk_size:
-            logger.debug(f"No chunking needed for {file_type} file; size below threshold of {max_chunk_size} tokens")
+        """
+        Split source content into chunks of at most `max_chunk_size` tokens at type and member
+        boundaries (see utils/csharp_chunker). Each chunk repeats the usings, namespace and
+        enclosing type declarations, so it can be generated on its own.
+        """
+        if not token_counter.exceeds(content, max_chunk_size):
+            logger.debug(f"No chunking needed for {file_type} file; below {max_chunk_size} tokens")
             return [content]
 
-        logger.debug(f"Chunking {file_type} file with size {len(content)} characters, {self.estimate_tokens(content)} tokens")
-        lines = content.splitlines()
-        chunks = []
-        current_chunk = []
-        current_size = 0
-
-        in_method = False
-        in_struct = False
-        method_start_keywords = ['public class', 'private class', 'public interface', 'private interface',
-                                'public void', 'private void', 'public async', 'private async',
-                                'public string', 'private string', 'public int', 'private int']
-        method_end_keywords = ['}']
-        struct_start_keywords = ['public struct', 'private struct', 'public record', 'private record']
-        struct_end_keywords = ['}']
-
-        for line in lines:
-            line_stripped = line.strip()
-
-            if any(keyword in line_stripped for keyword in struct_start_keywords):
-                if current_size + len(line) > max_chunk_size and current_chunk and not in_method:
-                    chunks.append("\n".join(current_chunk))
-                    current_chunk = [line]
-                    current_size = len(line)
-                    in_struct = True
-                    logger.debug(f"Starting struct in chunk, line: {line_stripped[:50]}")
-                else:
-                    current_chunk.append(line)
-                    current_size += len(line)
-                    in_struct = True
-
-            elif any(keyword in line_stripped for keyword in struct_end_keywords) and in_struct:
-                current_chunk.append(line)
-                current_size += len(line)
-                in_struct = False
-                if current_size > max_chunk_size * 0.8:
-                    chunks.append("\n".join(current_chunk))
-                    current_chunk = []
-                    current_size = 0
-                    logger.debug(f"Completed struct, created chunk with {len(current_chunk)} lines")
-                else:
-                    logger.debug(f"Completed struct, continuing chunk")
-
-            elif any(keyword in line_stripped for keyword in method_start_keywords):
-                if current_size + len(line) > max_chunk_size and current_chunk and not in_struct:
-                    chunks.append("\n".join(current_chunk))
-                    current_chunk = [line]
-                    current_size = len(line)
-                    in_method = True
-                    logger.debug(f"Starting method in chunk, line: {line_stripped[:50]}")
-                else:
-                    current_chunk.append(line)
-                    current_size += len(line)
-                    in_method = True
-
-            elif any(keyword in line_stripped for keyword in method_end_keywords) and in_method:
-                current_chunk.append(line)
-                current_size += len(line)
-                in_method = False
-                if current_size > max_chunk_size * 0.8:
-                    chunks.append("\n".join(current_chunk))
-                    current_chunk = []
-                    current_size = 0
-                    logger.debug(f"Completed method, created chunk with {len(current_chunk)} lines")
-                else:
-                    logger.debug(f"Completed method, continuing chunk")
-
-            else:
-                if current_size + len(line) > max_chunk_size and current_chunk and not in_method and not in_struct:
-                    chunks.append("\n".join(current_chunk))
-                    current_chunk = [line]
-                    current_size = len(line)
-                    logger.debug(f"Reached size limit, created chunk with {len(current_chunk)} lines")
-                else:
-                    current_chunk.append(line)
-                    current_size += len(line)
-
-        if current_chunk:
-            chunks.append("\n".join(current_chunk))
-            logger.debug(f"Added final chunk with {len(current_chunk)} lines")
-
-        logger.info(f"Created {len(chunks)} chunks for {file_type} file")
+        chunks = chunk_source(content, max_chunk_size, self.estimate_tokens)
+        logger.info(f"Created {len(chunks)} chunks for {file_type} file (max {max_chunk_size} tokens per chunk)")
         return chunks
     
     @traceable(name="generate_gateway")
     async def generate_gateway(self, migration_results: List[Dict]) -> None:
-        """Generate Ocelot configuration for the Gateway project using prompts.yml."""
+        """
+        Generate Ocelot configuration for the Gateway project.
+
+        The configuration is built locally from the target structure and the routes extracted
+        from the generated controllers. The LLM is only asked to refine it when the migration
+        instruction requests gateway features the builder cannot express.
+        """
         if self.prompts is None:
             logger.error("Prompts not initialized. Ensure initialize() is called before generate_gateway.")
             raise ValueError("Prompts are not initialized")
-
         repo_dir = join_paths(self.output_dir, self.repo_name)
         gateway_dir = join_paths(repo_dir, "Gateway")
         ensure_directory_exists(gateway_dir)
     
-        microservices = [
-            ms["name"].replace("Api", "").lower()
-            for ms in self.target_structure.get("microservices", [])
-            if ms["name"].lower() != "gateway"
-        ]
-        microservices_list = ", ".join([ms for ms in microservices if ms != "auth"])
-    
-        has_auth = any("auth" in ms.lower() for ms in microservices)
-        if not has_auth:
-            auth_instruction = "No authentication detected; exclude AuthenticationOptions."
-            auth_case = "none"
-        elif "auth" in microservices:
-            auth_instruction = "Authentication in separate AuthService; include /auth/{everything} route and AuthenticationOptions for other routes."
-            auth_case = "separate"
-        else:
-            auth_instruction = "Authentication in Gateway; include AuthenticationOptions for all routes."
-            auth_case = "gateway"
+        microservices = gateway_microservice_names(self.target_structure)
+        auth_case = detect_auth_case(microservices)
+        controller_routes = collect_controller_routes(migration_results)
     
         try:
-            ocelot_prompt = self.prompts['file_type_prompts']['ocelot']['prompt']
-        except KeyError as e:
-            logger.error(f"Missing ocelot prompt in prompts.yml: {str(e)}")
-            raise ValueError("Ocelot prompt not found in prompts.yml")
+            gateway_config = validate_ocelot_config(
+                build_ocelot_config(microservices, auth_case, controller_routes)
+            )
+            logger.info(f"Built ocelot configuration locally: {len(gateway_config['Routes'])} routes, auth case '{auth_case}'")
     
-        routes_input = []
-        for i, ms_name in enumerate(microservices):
-            port = 5000 if ms_name == "auth" else 5001 + i
-            routes_input.append({
-                "microservice": ms_name,
-                "port": port,
-                "routes": [f"/api/{ms_name}/{{everything}}"]
-            })
+            if needs_llm_gateway(self.instruction):
+                try:
+                    gateway_config = await self.customize_gateway_config(gateway_config, microservices, auth_case)
+                except Exception as e:
+                    logger.warning(f"LLM customization of ocelot.json failed, keeping generated configuration: {str(e)}")
+    
+            ocelot_path = join_paths(gateway_dir, "ocelot.json")
+            async with aiofiles.open(ocelot_path, "w", encoding="utf-8") as f:
+                await f.write(json.dumps(gateway_config, indent=4))
+            logger.info(f"Wrote ocelot.json to {ocelot_path}")
+        except Exception as e:
+            logger.error(f"Error generating ocelot.json: {str(e)}")
+            raise
+
+    @traceable(name="customize_gateway_config")
+    async def customize_gateway_config(self, gateway_config: Dict, microservices: List[str], auth_case: str) -> Dict:
+        """Ask the LLM to apply the custom gateway instruction on top of the generated configuration."""
+        ocelot_prompt = self.prompts.file_type_prompt("ocelot")
     
         prompt = f"""
     ### Ocelot Configuration
     {ocelot_prompt}
     
     ### Instruction
-    {self.instruction or "split into microservices"}
+    {self.instruction}
     
     ### Microservices
-    {microservices_list}
+    {", ".join(ms for ms in microservices if ms != "auth")}
     
-    ### Authentication Handling
-    {auth_instruction}
+    ### Authentication Case
+    {auth_case}
     
-    ### Routes
-    {json.dumps(routes_input, indent=2)}
+    ### Current Configuration
+    {json.dumps(gateway_config, indent=2)}
     
-    Generate a valid JSON configuration for ocelot.json with Routes and GlobalConfiguration.
-    For each microservice, create a route with:
-    - DownstreamPathTemplate: /api/<microservice_name>/{{everything}}
-    - DownstreamScheme: http
-    - DownstreamHostAndPorts: localhost, port as specified
-    - UpstreamPathTemplate: /api/<microservice_name>/{{everything}}
-    - UpstreamHttpMethod: ["GET", "POST", "PUT", "DELETE"]
-    If authentication case is 'separate', add /auth/{{everything}} route on port 5000 without AuthenticationOptions.
-    If authentication case is 'gateway' or 'separate', add AuthenticationOptions with "AuthenticationProviderKey": "Bearer" and empty "AllowedScopes" for non-auth routes.
-    Set GlobalConfiguration BaseUrl to "http://localhost:5004".
+    Apply the instruction to the current configuration. Keep every existing route, port and
+    authentication setting unless the instruction explicitly changes it.
     Your entire response must be ONLY the valid JSON object. No explanations, no extra text, no markdown. Start with '{{' and end with '}}'. Do not include any other characters.
     """
-        
-        # Track tokens for gateway generation
-        prompt_tokens = self.estimate_tokens(prompt)
-        
+        prompt_tokens = await token_counter.count_async(prompt)
+    
+        with trace(name="generate_ocelot_config", 
+                  inputs={"prompt_tokens": prompt_tokens, "microservices": len(microservices)}) as run_context:
+            response = await llm_config.acomplete(prompt)
+            response_str = str(response)
+            response_tokens = await token_counter.count_async(response_str)
+    
+            self.token_tracker.add_file_tokens("ocelot.json", prompt_tokens, response_tokens, "Gateway")
+    
+            if run_context:
+                run_context.end(outputs={
+                    "response_tokens": response_tokens,
+                    "total_tokens": prompt_tokens + response_tokens
+                })
+    
+        sanitized_response = sanitize_content(response_str)
+        match = re.search(r"(\{.*\})", sanitized_response, re.DOTALL)
+        if not match:
+            raise ValueError("No JSON object found in ocelot config response")
+        return validate_ocelot_config(json.loads(match.group(1)))
+
+    @staticmethod
+    def infer_layer(project_name: Optional[str]) -> Optional[str]:
+        """Infer the onion layer (Domain, Application, Infrastructure, Presentation) from a project name."""
+        if not project_name:
+            return None
+        project_name_lower = project_name.lower()
+        for layer in ('Domain', 'Application', 'Infrastructure', 'Presentation'):
+            if layer.lower() in project_name_lower:
+                return layer
+        return None
+
+    def find_microservice(self, ms_name: str) -> Dict:
+        return next(
+            (ms for ms in (self.target_structure or {}).get("microservices", []) if ms.get("name") == ms_name),
+            {}
+        )
+
+    @staticmethod
+    def project_file_name(project: Dict) -> str:
+        """Name of the project's .csproj as declared in its target structure root."""
+        project_name = project.get("project_name", "unknown")
+        root = project.get("target_structure", {}).get("root", {})
+        csproj = next((os.path.basename(f) for f in root if f.endswith(".csproj")), None)
+        return csproj or f"{project_name}.csproj"
+
+    def build_template_context(self, file_path: str, file_info: Dict, project_name: str, layer: Optional[str]) -> Dict:
+        """Collect the values boilerplate templates need: ports, packages, references and solution entries."""
+        ms_name = file_info.get('microservice_name', 'Miscellaneous')
+        kind = resolve_template_kind(os.path.basename(file_path), file_info.get('file_type', ''))
+        is_gateway = layer == "Gateway"
+        microservices = gateway_microservice_names(self.target_structure or {})
+        auth_case = detect_auth_case(microservices)
+        route_name = ms_name.replace("Api", "").lower()
+        port = GATEWAY_PORT if is_gateway else assign_service_ports(microservices).get(route_name, FIRST_SERVICE_PORT)
+        microservice = self.find_microservice(ms_name)
+        projects = microservice.get("projects", [])
+
+        context = {
+            "project_name": project_name,
+            "target_framework": self.target_version,
+            "port": port,
+            "launch_browser": self.api_type != "grpc" and layer in ("Presentation", "Gateway"),
+            "authenticated": is_gateway and auth_case == "separate",
+        }
+
+        if kind == "appsettings":
+            database_name = re.sub(r"\W", "", ms_name) + "Db"
+            context["connection_string"] = None if is_gateway else f"Server=localhost;Port=3306;Database={database_name};User=root;Password=;"
+            uses_jwt = (is_gateway and auth_case == "separate") or (not is_gateway and "auth" in route_name)
+            context["jwt_issuer"] = "AuthService" if uses_jwt else None
+            context["grpc_http2"] = self.api_type == "grpc" and layer == "Presentation"
+
+        elif kind in ("csproj", "csproj_grpc"):
+            profile = LAYER_PROFILES[kind][layer]
+            project_references = []
+            for reference_layer in profile["references"]:
+                referenced = next((p for p in projects if self.infer_layer(p.get("project_name")) == reference_layer), None)
+                if referenced:
+                    project_references.append(f"..\\{referenced['project_name']}\\{self.project_file_name(referenced)}")
+            protos = []
+            if kind == "csproj_grpc" and layer == "Presentation":
+                project = next((p for p in projects if p.get("project_name") == project_name), {})
+                proto_folder = project.get("target_structure", {}).get("folders", {}).get("Protos", {})
+                protos = [f"Protos\\{proto}" for proto in (proto_folder.get("target_files") or {}) if proto.endswith(".proto")]
+            context.update({
+                "sdk": profile["sdk"],
+                "output_type": profile["output_type"],
+                "packages": resolve_packages(kind, layer, template_dependencies(file_info) or [], self.target_version,
+                                             context["authenticated"], (ms_name,)),
+                "project_references": project_references,
+                "protos": protos,
+            })
+
+        elif kind == "sln":
+            ms_dir = join_paths(self.output_dir, self.repo_name, ms_name)
+            solution_dir = os.path.dirname(file_path)
+            solution_projects = []
+            for project in projects:
+                name = project.get("project_name", "unknown")
+                project_path = join_paths(ms_dir, self.project_file_name(project)) if ms_name.lower() == 'gateway' \
+                    else join_paths(ms_dir, name, self.project_file_name(project))
+                solution_projects.append({
+                    "name": os.path.splitext(self.project_file_name(project))[0],
+                    "path": os.path.relpath(project_path, solution_dir).replace(os.sep, "\\"),
+                    "guid": solution_project_guid(name)
+                })
+            context["projects"] = solution_projects
+
+        return context
+
+    def render_boilerplate(self, file_path: str, file_info: Dict, project_name: str) -> Optional[Dict]:
+        """Render the file from the template library if it is pure boilerplate; None means use the LLM."""
+        ms_name = file_info.get('microservice_name', 'Miscellaneous')
+        layer = "Gateway" if ms_name.lower() == 'gateway' else self.infer_layer(project_name)
+        file_name = os.path.basename(file_path)
+        if not self.templates.can_render(file_name, file_info, layer):
+            return None
+        kind = resolve_template_kind(file_name, file_info.get('file_type', ''))
+        if kind == "program" and detect_auth_case(gateway_microservice_names(self.target_structure or {})) == "gateway":
+            # Gateway also hosts the auth controllers and DbContext, which needs real generation
+            return None
         try:
-            with trace(name="generate_ocelot_config", 
-                      inputs={"prompt_tokens": prompt_tokens, "microservices": len(microservices)}) as run_context:
-                response = llm_config._llm.complete(prompt)
-                response_str = str(response)
-                response_tokens = self.estimate_tokens(response_str)
-                
-                # Add to token tracker
-                self.token_tracker.add_file_tokens("ocelot.json", prompt_tokens, response_tokens, "Gateway")
-                
-                # Add to LangSmith context
-                if run_context:
-                    run_context.end(outputs={
-                        "response_tokens": response_tokens,
-                        "total_tokens": prompt_tokens + response_tokens
-                    })
-                
-                sanitized_response = sanitize_content(response_str)
-                match = re.search(r"(\{.*\})", sanitized_response, re.DOTALL)
-                if not match:
-                    raise ValueError("No JSON object found in ocelot config response")
-                gateway_config = json.loads(match.group(1))
-        
-                ocelot_path = join_paths(gateway_dir, "ocelot.json")
-                async with aiofiles.open(ocelot_path, "w", encoding="utf-8") as f:
-                    await f.write(json.dumps(gateway_config, indent=4))
-                logger.info(f"Wrote ocelot.json to {ocelot_path}")
-                
+            context = self.build_template_context(file_path, file_info, project_name, layer)
+            rendered = self.templates.render(file_name, file_info.get('file_type', ''), layer, context)
+            self.token_tracker.add_templated_file(file_name, ms_name)
+            logger.info(f"Rendered {file_name} from template (layer: {layer}); skipping LLM")
+            return rendered
         except Exception as e:
-            logger.error(f"Error generating ocelot.json: {str(e)}")
-            raise
+            logger.warning(f"Template rendering failed for {file_name}, falling back to LLM: {str(e)}")
+            return None
 
     @retry(stop=stop_after_attempt(3), wait=wait_fixed(2), retry=retry_if_exception_type((ValueError)))
     @traceable(name="generate_code")
-    async def generate_code(self, content: str, file_type: str, description: str, instructions: str, file_name: str, agent: ReActAgent, namespace: Optional[str] = None, microservice_name: Optional[str] = None, project_name: Optional[str] = None) -> Optional[Dict]:
-        """Generate code for a specific file with dynamic prompt selection from prompts.yml."""
+    async def generate_code(self, content: str, file_type: str, description: str, instructions: str, file_name: str, agent: MicroserviceAgent, namespace: Optional[str] = None, microservice_name: Optional[str] = None, project_name: Optional[str] = None, context: Optional[str] = None,
+                            stream_to: Optional[str] = None) -> Optional[Dict]:
+        """
+        Generate code for a specific file with dynamic prompt selection from prompts.yml. With
+        `stream_to`, an unchunked direct generation may write the code to that path as it streams
+        (the result then has "streamed": True).
+        """
         logger.info(f"Generating code for file: {file_name}, type: {file_type}, microservice: {microservice_name}, project: {project_name}")
+        attempts = generation_attempts.get()
+        if attempts is not None:
+            attempts[0] += 1
     
         # Infer project layer based on project_name
-        layer = None
+        layer = self.infer_layer(project_name)
         if project_name:
-            project_name_lower = project_name.lower()
-            if 'domain' in project_name_lower:
-                layer = 'Domain'
-            elif 'application' in project_name_lower:
-                layer = 'Application'
-            elif 'infrastructure' in project_name_lower:
-                layer = 'Infrastructure'
-            elif 'presentation' in project_name_lower:
-                layer = 'Presentation'
             logger.info(f"Inferred project layer: {layer}")
     
-        # Select the prompt from prompts.yml
-        file_type_prompt = ''
-        if self.prompts and 'file_type_prompts' in self.prompts and file_type in self.prompts['file_type_prompts']:
-            file_type_prompt = self.prompts['file_type_prompts'][file_type].get('prompt', '')
-            logger.info(f"Using prompt from prompts.yml for {file_type}: {file_type_prompt[:100]}...")  # Truncate for readability
+        # Select the prompt from prompts.yml, customized with the microservice name (cached per PromptSet)
+        prompts = self.prompts or prompt_registry.current()
+        if prompts.has_prompt(file_type):
+            logger.info(f"Using prompt from prompts.yml (version {prompts.version}) for {file_type}")
         else:
             logger.warning(f"No prompt found in prompts.yml for file_type: {file_type}. Using default prompt construction.")
-            file_type_prompt = f"Generate a {file_type} file for a .NET project targeting {self.target_version} with appropriate SDK and build properties."
-    
-        # Customize prompt with microservice-specific details
-        if microservice_name and microservice_name != 'Unknown':
-            ms_name = microservice_name.replace("Grpc", "").lower()
-            ms_name_capitalized = ms_name.capitalize()
-            file_type_prompt = file_type_prompt.replace("customerGrpc", f"{ms_name}Grpc")
-            file_type_prompt = file_type_prompt.replace("CustomerGrpc", f"{ms_name_capitalized}Grpc")
-            logger.info(f"Customized prompt with microservice name: {ms_name}")
-    
-        # Construct the prompt directly without format_args
-        prompt = f"""Generate code for a file named {file_name} of type {file_type}, following these strict guidelines:
-    
-        VALIDATION RULES:
-        1. The file must contain exactly one primary type (class, interface, or record) for C# files.
-        2. The namespace must reflect the project and folder structure.
-        3. No regions or commented-out code are allowed.
-        4. Follow standard .NET naming conventions.
-        5. Include all necessary using directives at the top.
-    
-        Description: {description}
-        Instructions: {instructions}
-        Target Framework: {self.target_version}
-        Microservice Name: {microservice_name or 'Unknown'}
-        Project Name: {project_name or 'Unknown'}
-        Project Layer: {layer or 'Unknown'}
-    
-        For csproj files: Use the computed list of dependencies to create corresponding PackageReference entries, including only packages that are not part of the default set for {self.target_version} (exclude system and default packages).
-    
-        Generate clean, modern .NET code using the following principles:
-        - Leverage the latest C# features appropriate for the target framework.
-        - Follow SOLID principles and adopt clean architecture.
-        - Implement proper dependency injection.
-        - Use async/await where applicable.
-        - Handle errors appropriately.
-        - Include XML documentation for public APIs.
-    
-        Output Requirements:
-        The response MUST be a valid JSON object with exactly two keys:
-        1. "generated_code": containing the generated code as a string.
-        2. "dependencies": an array of dependency names.
-        Do not include any extra text or commentary in the response.
-    
-        Source content (if applicable):
-        {content}"""
-    
+
+        # Layout for provider-side prompt caching: the shared guidelines, the migration instruction
+        # and the file type/service block form a byte-identical prefix across files, and everything
+        # specific to this file comes last, with the source at the very end so chunks share the rest
+        prompt_prefix = prompts.shared_prefix(file_type, microservice_name, project_name, layer,
+                                              self.target_version, self.instruction)
+        prompt_body = f"File to generate: {file_name} (type: {file_type})\nDescription: {description}\n"
+        if instructions:
+            prompt_body += f"Instructions for this file: {instructions}\n"
         if namespace:
-            prompt += f"\nThe namespace for this file should be: {namespace}"
-    
-        # Prepend the specific prompt from prompts.yml
-        if file_type_prompt:
-            prompt = f"{file_type_prompt}\n\nAdditional Context:\n- Microservice Name: {microservice_name or 'Unknown'}\n- Project Name: {project_name or 'Unknown'}\n- Project Layer: {layer or 'Unknown'}\n\n{prompt}"
-            logger.info(f"Prepended prompt for {file_type}: {file_type_prompt[:100]}...")  # Truncate for readability
+            prompt_body += f"The namespace for this file should be: {namespace}\n"
+        if context:
+            prompt_body += f"\nRelated context (source analysis, referenced types and already generated files):\n{context}\n"
+        prompt_body += "\nSource content (if applicable):\n"
+
+        def compose(source: str) -> str:
+            return f"{prompt_prefix}{prompt_body}{source}"
+
+        prompt = compose(content)
     
         # Log the final prompt being sent to the LLM
-        logger.info(f"Final prompt for {file_name}: {prompt[:500]}...")  # Truncate for readability
+        logger.info(f"Final prompt for {file_name} (after {len(prompt_prefix)} chars of shared prefix): {prompt_body[:500]}...")  # Truncate for readability
         
         # Log full prompt to LangSmith
         self.prompt_logger.info(f"=== FULL PROMPT FOR {file_name} ===\n{prompt}\n=== END PROMPT ===")
-    
-        prompt_token_count = self.estimate_tokens(prompt)
-        logger.debug(f"Prompt token count for generate_code ({file_name}): {prompt_token_count}")
 
-        max_input_tokens = 100000
-        if prompt_token_count > max_input_tokens:
-            logger.error(f"Prompt for {file_name} exceeds token limit: {prompt_token_count} tokens")
-            raise ValueError(f"Prompt size ({prompt_token_count} tokens) exceeds maximum allowed ({max_input_tokens} tokens)")
-
-        total_prompt_tokens_file = prompt_token_count
+        # Same prompt and model as an earlier run: reuse that result instead of calling the LLM
+        # Route by file type, layer and source size; the cache key includes the deployment
+        model = llm_config.route("generation", file_type, layer, await token_counter.count_async(content))
+        cache_key = generation_key(prompt, file_type, model)
+        cached = await self.cached_generation(cache_key) if self.use_generation_cache else None
+        if cached:
+            self.token_tracker.add_cache_hit(file_name, cached["prompt_tokens"] + cached["response_tokens"], microservice_name or "Miscellaneous")
+            logger.info(f"Serving {file_name} from the generation cache; skipping LLM")
+            return {
+                "generated_code": cached["generated_code"],
+                "dependencies": cached["dependencies"],
+                "token_usage": {"prompt_tokens": 0, "response_tokens": 0},
+                "cached": True
+            }
+        self.token_tracker.add_cache_miss()
+    
+        total_prompt_tokens_file = 0
         total_response_tokens_file = 0
 
         chunkable_file_types = ["model", "proto", "grpc_service_cs", "service", "interface"]
-        if file_type in chunkable_file_types and self.estimate_tokens(content) > 10000:
-            logger.info(f"Chunking source content for {file_name}: {self.estimate_tokens(content)} tokens")
-            chunks = self.chunk_large_file(content, max_chunk_size=10000, file_type=file_type)
+        chunks = [content]
+        if file_type in chunkable_file_types and token_counter.exceeds(content, 10000):
+            # Splitting measures every member of a large file; keep that off the event loop
+            chunks = await asyncio.to_thread(self.chunk_large_file, content, 10000, file_type)
+        if len(chunks) > 1:
             logger.info(f"Split content into {len(chunks)} chunks for {file_name}")
 
             results = []
@@ -611,11 +723,13 @@ class Migrator:
                       inputs={"file_name": file_name, "chunks": len(chunks), "file_type": file_type, "microservice": microservice_name}) as run_context:
                 
                 for i, chunk in enumerate(chunks):
-                    chunk_prompt = prompt + f"\n\n[CHUNK CONTEXT: This is part {i+1} of {len(chunks)} of a larger file. Please generate only the code for this specific chunk. For the first chunk only, include all necessary using statements and namespace declarations at the top. For subsequent chunks, generate only the class/method content without any using statements or namespace wrappers.]"
-                    chunk_prompt_token_count = self.estimate_tokens(chunk_prompt)
+                    chunk_marker = f"\n\n[CHUNK CONTEXT: This is part {i+1} of {len(chunks)} of a larger file. The source chunk repeats the file's using directives and enclosing namespace/type declarations for reference only. Please generate only the code for this specific chunk. For the first chunk only, include all necessary using statements and namespace declarations at the top. For subsequent chunks, generate only the class/method content without any using statements or namespace wrappers. A member too large for one part is split across parts marked with '// [split member: ...]' comments: for such a part, translate exactly the lines given, leave a member the part does not finish unclosed, and continue a member the part starts in the middle of without reopening it.]"
+                    chunk_prompt = compose(chunk) + chunk_marker
+                    # The instructions are shared by every chunk, so only the chunk itself is encoded anew
+                    chunk_prompt_token_count = await token_counter.count_parts_async([prompt_prefix, prompt_body, chunk, chunk_marker])
                     total_prompt_tokens_file += chunk_prompt_token_count
                     logger.debug(f"Prompt token count for generate_code chunk {i+1}/{len(chunks)} ({file_name}): {chunk_prompt_token_count}")
-                    tasks.append(asyncio.to_thread(agent.chat, chunk_prompt))
+                    tasks.append(self.run_generation(chunk_prompt, file_type, f"{file_name} (chunk {i+1}/{len(chunks)})", agent, deployment=model))
                 
                 chunk_results = await asyncio.gather(*tasks, return_exceptions=True)
                 for i, result in enumerate(chunk_results):
@@ -623,17 +737,9 @@ class Migrator:
                         logger.error(f"Error processing chunk {i+1} for {file_name}: {str(result)}")
                         raise ValueError(f"Failed to process chunk {i+1} for {file_name}: {str(result)}")
                     
-                    sanitized_response = sanitize_content(str(result))
-                    response_token_count = self.estimate_tokens(sanitized_response)
+                    json_result, response_token_count = result
                     total_response_tokens_file += response_token_count
                     logger.debug(f"LLM response token count for generate_code chunk {i+1}/{len(chunks)} ({file_name}): {response_token_count}")
-                    logger.debug(f"Raw LLM response for chunk {i+1} of {file_name}: {sanitized_response[:500]}...")
-                    match = re.search(r"(\{.*\})", sanitized_response, re.DOTALL)
-                    if not match:
-                        logger.error(f"No JSON object found in LLM response for chunk {i+1} of {file_name}")
-                        raise ValueError(f"No JSON object found in the response for chunk {i+1}")
-                    
-                    json_result = json.loads(match.group(1))
                     results.append(json_result["generated_code"])
                     combined_dependencies.update(json_result["dependencies"])
                     logger.info(f"Generated chunk {i+1}/{len(chunks)} for {file_name}: {len(json_result['generated_code'].splitlines())} lines")
@@ -655,16 +761,28 @@ class Migrator:
                 
                 logger.debug(f"Total token count for generate_code ({file_name}): {total_prompt_tokens_file + total_response_tokens_file} (Prompt: {total_prompt_tokens_file}, Response: {total_response_tokens_file})")
                 
-                return {"generated_code": combined_code, "dependencies": list(combined_dependencies)}
+                generated = {
+                    "generated_code": combined_code,
+                    "dependencies": list(combined_dependencies),
+                    "token_usage": {"prompt_tokens": total_prompt_tokens_file, "response_tokens": total_response_tokens_file}
+                }
+                await self.cache_generation(cache_key, file_name, file_type, model, generated)
+                return generated
 
-        logger.info(f"No chunking needed for {file_name}; content size: {self.estimate_tokens(content)} tokens")
+        # The source content was already counted when it was read, so this mostly hits the memo
+        prompt_token_count = await token_counter.count_parts_async([prompt_prefix, prompt_body, content])
+        logger.debug(f"Prompt token count for generate_code ({file_name}): {prompt_token_count}")
+
+        max_input_tokens = 100000
+        if prompt_token_count > max_input_tokens:
+            logger.error(f"Prompt for {file_name} exceeds token limit: {prompt_token_count} tokens")
+            raise ValueError(f"Prompt size ({prompt_token_count} tokens) exceeds maximum allowed ({max_input_tokens} tokens)")
+        total_prompt_tokens_file = prompt_token_count
 
         with trace(name=f"generate_code_single_{file_name}", 
                   inputs={"file_name": file_name, "file_type": file_type, "microservice": microservice_name, "prompt_tokens": prompt_token_count}) as run_context:
             
-            response = await asyncio.to_thread(agent.chat, prompt)
-            sanitized_response = sanitize_content(str(response))
-            response_token_count = self.estimate_tokens(sanitized_response)
+            json_result, response_token_count = await self.run_generation(prompt, file_type, file_name, agent, stream_to=stream_to, deployment=model)
             total_response_tokens_file = response_token_count
             
             # Track tokens for single file
@@ -675,26 +793,186 @@ class Migrator:
                 run_context.end(outputs={
                     "response_tokens": response_token_count,
                     "total_tokens": total_prompt_tokens_file + total_response_tokens_file,
-                    "response_preview": sanitized_response[:200]
+                    "response_preview": json_result["generated_code"][:200]
                 })
             
             logger.debug(f"LLM response token count for generate_code ({file_name}): {response_token_count}")
-            logger.info(f"Raw LLM response for {file_name}: {sanitized_response[:500]}...")
-
-            match = re.search(r"(\{.*\})", sanitized_response, re.DOTALL)
-            if not match:
-                logger.error(f"No JSON object found in LLM response for {file_name}")
-                raise ValueError("No JSON object found in the response")
-            json_str = match.group(1)
-            json_result = json.loads(json_str)
             logger.info(f"Generated code for {file_name}: {json_result['generated_code'][:500]}...")  # Truncate for readability
             logger.info(f"Dependencies for {file_name}: {json_result['dependencies']}")
             logger.debug(f"Total token count for generate_code ({file_name}): {total_prompt_tokens_file + total_response_tokens_file} (Prompt: {total_prompt_tokens_file}, Response: {total_response_tokens_file})")
             
+            json_result["token_usage"] = {"prompt_tokens": total_prompt_tokens_file, "response_tokens": total_response_tokens_file}
+            await self.cache_generation(cache_key, file_name, file_type, model, json_result)
             return json_result
 
+    def generation_path(self, file_type: str) -> str:
+        """"direct" for one structured LLM call per file, "agent" for the ReAct tool loop."""
+        if llm_config.generation_mode == "agent" or file_type in llm_config.agent_file_types:
+            return "agent"
+        return "direct"
+
+    async def run_generation(self, prompt: str, file_type: str, file_name: str, agent: MicroserviceAgent,
+                             stream_to: Optional[str] = None, deployment: Optional[str] = None) -> Tuple[Dict, int]:
+        """
+        Send one generation prompt and return the parsed {"generated_code", "dependencies"} result
+        with its response token count. The prompt already carries the source content, namespace and
+        description, so most files need a single structured call; the ReAct agent (several round
+        trips plus RAG queries per tool call) is kept for file types that need open-ended lookup
+        and as a fallback when the direct call fails. Direct calls go to `deployment` (see
+        LLMConfig.route); the agent always uses the default deployment.
+        """
+        deployment = deployment or llm_config.azure_openai_deployment_name
+        path = self.generation_path(file_type)
+        if path == "direct":
+            try:
+                if stream_to and llm_config.stream_generation:
+                    json_result, response_tokens = await self.generate_streaming(prompt, file_name, stream_to, deployment)
+                else:
+                    json_result, response_tokens = await self.generate_direct(prompt, file_type, deployment)
+                self.token_tracker.add_generation("direct")
+                self.token_tracker.add_route(file_name, deployment)
+                return json_result, response_tokens
+            except Exception as e:
+                logger.warning(f"Direct generation failed for {file_name}, falling back to the agent: {str(e)}")
+                path = "agent_fallback"
+        json_result, response_tokens = await self.generate_with_agent(prompt, file_name, agent)
+        self.token_tracker.add_generation(path)
+        self.token_tracker.add_route(file_name, llm_config.azure_openai_deployment_name)
+        return json_result, response_tokens
+
+    async def generate_direct(self, prompt: str, file_type: str, deployment: str) -> Tuple[Dict, int]:
+        await llm_config.acquire(prompt, deployment)
+        model = llm_config.pydantic_model(deployment)
+        result = await llm_config.hedged(file_type, lambda: code_generation_agent.run(user_prompt=prompt, model=model), prompt,
+                                         stats=self.token_tracker.hedging, deployment_name=deployment)
+        output = result.data
+        json_result = {"generated_code": output.generated_code, "dependencies": list(output.dependencies)}
+        usage = result.usage()
+        self.record_provider_usage(usage)
+        response_tokens = getattr(usage, "response_tokens", None) or await token_counter.count_async(output.generated_code)
+        return json_result, response_tokens
+
+    def record_provider_usage(self, usage) -> None:
+        # Azure OpenAI reports the part of the prompt served from its prefix cache in the usage details
+        self.token_tracker.add_provider_usage(getattr(usage, "request_tokens", None) or 0, (getattr(usage, "details", None) or {}).get("cached_tokens", 0))
+
+    async def generate_streaming(self, prompt: str, file_name: str, output_path: str, deployment: str) -> Tuple[Dict, int]:
+        """
+        Direct generation that decodes the structured output as it streams and appends the
+        sanitized code to `output_path` (through a .partial file renamed at the end), so the first
+        bytes land on disk after the first tokens instead of after the whole response. A response
+        cut off inside the code is detected when its stream ends and is continued from where it
+        stopped rather than regenerated from scratch.
+        """
+        ensure_directory_exists(os.path.dirname(output_path))
+        partial_path = f"{output_path}.partial"
+        sanitizer = StreamingSanitizer()
+        pieces: List[str] = []
+        dependencies: List[str] = []
+        response_tokens = 0
+        request_prompt = prompt
+        try:
+            async with aiofiles.open(partial_path, "w", encoding="utf-8") as f:
+                for attempt in range(llm_config.stream_max_continuations + 1):
+                    decoder = GeneratedCodeDecoder()
+                    await llm_config.acquire(request_prompt, deployment)
+                    async with code_generation_agent.run_stream(user_prompt=request_prompt, model=llm_config.pydantic_model(deployment)) as result:
+                        async for message, _ in result.stream_structured(debounce_by=None):
+                            args = final_result_args(message)
+                            if args is None:
+                                continue
+                            text = sanitizer.feed(decoder.feed(args))
+                            if text:
+                                pieces.append(text)
+                                await f.write(text)
+                        usage = result.usage()
+                    self.record_provider_usage(usage)
+                    response_tokens += getattr(usage, "response_tokens", None) or 0
+                    for dependency in decoder.dependencies():
+                        if dependency not in dependencies:
+                            dependencies.append(dependency)
+                    if not decoder.started:
+                        raise ValueError(f"Streamed response for {file_name} has no generated_code")
+                    if decoder.complete:
+                        break
+                    tail = "".join(pieces[-64:])[-1500:]
+                    logger.warning(f"Streamed output for {file_name} was cut off after {sum(map(len, pieces))} characters; requesting continuation {attempt + 1}")
+                    request_prompt = (
+                        f"{prompt}\n\n[CONTINUATION: Your previous response was cut off. The generated_code written so far ends with:\n"
+                        f"{tail}\n"
+                        "Respond in the same JSON format. generated_code must contain ONLY the code that follows, starting exactly where "
+                        "the text above ends, without repeating any of it; dependencies lists the file's dependencies.]"
+                    )
+                else:
+                    raise ValueError(f"Streamed output for {file_name} is still incomplete after {llm_config.stream_max_continuations} continuations")
+                text = sanitizer.finish()
+                if text:
+                    pieces.append(text)
+                    await f.write(text)
+            os.replace(partial_path, output_path)
+        except BaseException:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+
+        generated_code = "".join(pieces)
+        if not response_tokens:
+            response_tokens = await token_counter.count_async(generated_code)
+        logger.info(f"Streamed {len(generated_code)} characters of {file_name} to {output_path}")
+        return {"generated_code": generated_code, "dependencies": dependencies, "streamed": True}, response_tokens
+
+    async def generate_with_agent(self, prompt: str, file_name: str, agent: MicroserviceAgent) -> Tuple[Dict, int]:
+        response = await asyncio.to_thread(agent.chat, prompt)
+        sanitized_response = sanitize_content(str(response))
+        logger.info(f"Raw LLM response for {file_name}: {sanitized_response[:500]}...")
+        match = re.search(r"(\{.*\})", sanitized_response, re.DOTALL)
+        if not match:
+            logger.error(f"No JSON object found in LLM response for {file_name}")
+            raise ValueError(f"No JSON object found in the response for {file_name}")
+        return json.loads(match.group(1)), await token_counter.count_async(sanitized_response)
+
+    async def cached_generation(self, cache_key: str) -> Optional[Dict]:
+        try:
+            return await asyncio.to_thread(self.generation_cache.get, cache_key)
+        except Exception as e:
+            logger.warning(f"Generation cache lookup failed: {str(e)}")
+            return None
+
+    async def cache_generation(self, cache_key: str, file_name: str, file_type: str, model: str, generated: Dict) -> None:
+        token_usage = generated.get("token_usage") or {}
+        try:
+            await asyncio.to_thread(
+                self.generation_cache.put,
+                cache_key,
+                generated["generated_code"],
+                generated.get("dependencies") or [],
+                file_name=file_name,
+                file_type=file_type,
+                model=model,
+                prompt_tokens=token_usage.get("prompt_tokens", 0),
+                response_tokens=token_usage.get("response_tokens", 0)
+            )
+        except Exception as e:
+            # A missed cache write only costs a regeneration next time
+            logger.warning(f"Failed to cache generation for {file_name}: {str(e)}")
+
+    async def build_context(self, task: GenerationTask, types: Dict[str, List[GenerationTask]], order: Dict[str, int],
+                            scheduled: set, file_cache: FileCache) -> Optional[str]:
+        """Related-context bundle for an LLM-generated file; None for project and boilerplate files."""
+        if self.context_builder is None or task.is_csproj or self.templates.can_render(task.file_name, task.file_info, task.layer):
+            return None
+        try:
+            context = await self.context_builder.build(task, types, order, scheduled, file_cache)
+        except Exception as e:
+            # Generation still works without it; the agent can look things up itself
+            logger.warning(f"Failed to build context for {task.label}: {str(e)}")
+            return None
+        logger.debug(f"Context for {task.label}: {await token_counter.count_async(context)} tokens")
+        return context or None
+
     @traceable(name="process_file")
-    async def process_file(self, file_path: str, file_info: Dict, agent: ReActAgent, file_cache: FileCache, project_dir: str, project_name: str) -> Dict:
+    async def process_file(self, file_path: str, file_info: Dict, agent: MicroserviceAgent, file_cache: FileCache, project_dir: str, project_name: str,
+                           context: Optional[str] = None) -> Dict:
         file_name = os.path.basename(file_path)
         file_ext = os.path.splitext(file_name)[1].lower()
         file_type = file_info.get('file_type', 'unknown')
@@ -713,15 +991,20 @@ class Migrator:
         else:
             namespace = project_name  # File is in project root
     
+        # Boilerplate files are rendered locally; only files with real source logic go to the LLM
+        rendered = self.render_boilerplate(file_path, file_info, project_name)
+        if rendered is None and file_ext == ".csproj" and file_info.get('dependencies'):
+            instructions = f"{instructions}\nDependencies reported by the project's files: {', '.join(file_info['dependencies'])}".strip()
+    
         # Read source content if applicable
         source_files = file_info.get('source_files', [])
         source_content = ""
         source_tokens=0
-        if source_files:
+        if source_files and rendered is None:
             source_paths = [join_paths(self.source_dir, f) for f in source_files]
             contents = await asyncio.gather(*[read_file(path) for path in source_paths])
             source_content = "\n".join([c for c in contents if c])
-            source_tokens = self.estimate_tokens(source_content)
+            source_tokens = await token_counter.count_async(source_content)
             logger.info(f"Read {len(source_files)} source files for {file_name}, total content size: {len(source_content)} characters, {source_tokens} tokens")
     
         try:
@@ -730,11 +1013,13 @@ class Migrator:
             logger.info(f"Resolved file path for writing: {file_path}")
     
             # Generate code with the computed namespace
-            generated = await self.generate_code(source_content, file_type, description, 
-                                                 instructions, file_name, agent, 
-                                                 namespace=namespace,
-                                                 microservice_name=microservice_name,
-                                                 project_name=project_name)
+            generated = rendered or await self.generate_code(source_content, file_type, description, 
+                                                             instructions, file_name, agent, 
+                                                             namespace=namespace,
+                                                             microservice_name=microservice_name,
+                                                             project_name=project_name,
+                                                             context=context,
+                                                             stream_to=file_path)
             
             if not generated or "generated_code" not in generated:
                 raise ValueError(f"Code generation failed for {file_name}")
@@ -744,20 +1029,26 @@ class Migrator:
             ensure_directory_exists(directory)
             logger.info(f"Ensured directory exists: {directory}")
     
-            # Write the generated code
-            sanitized_code = sanitize_content(generated["generated_code"])
-            generated_tokens = self.estimate_tokens(sanitized_code)
+            # Write the generated code (streamed generations are on disk already, sanitized)
+            sanitized_code = generated["generated_code"] if generated.get("streamed") else sanitize_content(generated["generated_code"])
+            generated_tokens = await token_counter.count_async(sanitized_code)
             logger.info(f"Generated file {file_name}: {len(sanitized_code.splitlines())} lines, {generated_tokens} tokens")
-            async with aiofiles.open(file_path, "w", encoding="utf-8") as f:
-                await f.write(sanitized_code)
-            await file_cache.update_file(file_path, sanitized_code)
+            if generated.get("streamed"):
+                file_cache.remember(file_path, sanitized_code)
+            else:
+                async with aiofiles.open(file_path, "w", encoding="utf-8") as f:
+                    await f.write(sanitized_code)
+                await file_cache.update_file(file_path, sanitized_code)
             logger.info(f"Successfully wrote file to: {file_path}")
     
             # Return result (routes only for REST controllers)
             result = {
                 "file": file_name,
                 "dependencies": generated.get("dependencies", []),
-                "routes": []
+                "routes": [],
+                "content_hash": content_hash(sanitized_code),
+                "token_usage": generated.get("token_usage") or {"prompt_tokens": 0, "response_tokens": 0},
+                "generated_by": "template" if rendered else ("cache" if generated.get("cached") else "llm")
             }
             if file_type == "controller_cs":
                 result["routes"] = self.extract_routes(sanitized_code)
@@ -773,34 +1064,206 @@ class Migrator:
                 "error": str(e)
             }    
           
-    @traceable(name="process_folder_with_routes")
-    async def process_folder_with_routes(self, base_path: str, folder_data: dict, migration_results: dict, project_dependencies: set, agent: ReActAgent, file_cache: FileCache, microservice_name: str, project_dir: str, project_name: str) -> None:
-        logger.info(f"Processing folder: {base_path}")
-    
-        if folder_data.get("target_files"):
-            for file_name, file_info in folder_data["target_files"].items():
-                try:
-                    full_path = os.path.normpath(join_paths(base_path, file_name))
-                    logger.info(f"Processing file at: {full_path}")
-                    file_info['microservice_name'] = microservice_name
-                    result = await self.process_file(full_path, file_info, agent, file_cache, project_dir, project_name)
-                    migration_results["successful_files"].append(full_path)
-                    if result.get("dependencies"):
-                        project_dependencies.update(result.get("dependencies", []))
-                    if result.get("routes"):
-                        migration_results["file_routes"][full_path] = result["routes"]
-                except Exception as e:
-                    logger.error(f"Error processing file {full_path}: {e}")
-                    migration_results["failed_files"].append(
-                        {"file": full_path, "error": str(e)}
-                    )
-    
-        if folder_data.get("subfolders"):
-            for subfolder_name, subfolder_data in folder_data["subfolders"].items():
-                subfolder_path = os.path.normpath(join_paths(base_path, subfolder_name))
-                ensure_directory_exists(subfolder_path)
-                logger.info(f"Processing subfolder: {subfolder_path}")
-                await self.process_folder_with_routes(subfolder_path, subfolder_data, migration_results, project_dependencies, agent, file_cache, microservice_name, project_dir, project_name)
+    def checkpoint_path(self, output_path: str) -> str:
+        """Checkpoint key: the file's path relative to the migrated repository root."""
+        repo_dir = join_paths(self.output_dir, self.repo_name)
+        return os.path.relpath(output_path, repo_dir).replace(os.sep, "/")
+
+    async def restore_checkpoint(self, task: GenerationTask, file_cache: FileCache) -> Optional[Dict]:
+        """Reuse a file finished by an earlier run of this job if it is still on disk unchanged."""
+        checkpoint = self.checkpoints.get(self.checkpoint_path(task.output_path))
+        if not checkpoint or not os.path.exists(task.output_path):
+            return None
+        async with aiofiles.open(task.output_path, "r", encoding="utf-8") as f:
+            code = await f.read()
+        if content_hash(code) != checkpoint["content_hash"]:
+            logger.info(f"Checkpoint for {task.label} is stale; regenerating")
+            return None
+        await file_cache.update_file(task.output_path, code)
+        self.token_tracker.add_resumed_file(task.file_name, task.file_info.get('microservice_name', 'Miscellaneous'))
+        logger.info(f"Restored {task.label} from checkpoint; skipping generation")
+        return {
+            "file": task.file_name,
+            "dependencies": checkpoint["dependencies"],
+            "routes": checkpoint["routes"],
+            "content_hash": checkpoint["content_hash"],
+            "token_usage": {"prompt_tokens": 0, "response_tokens": 0},
+            "status": "success",
+            "resumed": True
+        }
+
+    async def save_checkpoint(self, task: GenerationTask, result: Dict) -> None:
+        if not self.job_id or result.get("status") != "success":
+            return
+        token_usage = result.get("token_usage") or {}
+        try:
+            await asyncio.to_thread(
+                job_store.save_checkpoint,
+                self.job_id,
+                self.checkpoint_path(task.output_path),
+                result["content_hash"],
+                microservice=task.file_info.get('microservice_name'),
+                project_name=task.project_name,
+                dependencies=result.get("dependencies"),
+                routes=result.get("routes"),
+                prompt_tokens=token_usage.get("prompt_tokens", 0),
+                response_tokens=token_usage.get("response_tokens", 0)
+            )
+        except Exception as e:
+            # A lost checkpoint only costs a regeneration on resume; never fail the file for it
+            logger.warning(f"Failed to checkpoint {task.label}: {str(e)}")
+
+    def collect_project_tasks(self, ms_name: str, ms_dir: str, project: Dict) -> Tuple[str, str, List[GenerationTask]]:
+        """Turn a project's target structure (root files and every folder) into generation tasks."""
+        is_gateway = ms_name.lower() == 'gateway'
+        project_name = project.get("project_name", "unknown")
+        if is_gateway and self.api_type == "rest":
+            project_name = "Gateway"  # Consistent namespace base for Gateway
+        project_dir = ms_dir if is_gateway else join_paths(ms_dir, project_name)
+        ensure_directory_exists(project_dir)
+        layer = self.infer_layer(project_name)
+        skip_wwwroot = self.api_type == "grpc"  # static files are copied, not generated
+        tasks = []
+
+        def add_task(output_path: str, file_info: Dict, label: str) -> None:
+            file_info['microservice_name'] = ms_name
+            output_path = os.path.normpath(output_path)
+            tasks.append(GenerationTask(output_path, project_name, project_dir, output_path, file_info, layer, label))
+
+        for file_name, file_info in project["target_structure"].get("root", {}).items():
+            if file_name.endswith('ocelot.json'):
+                logger.info(f"Skipping ocelot.json: {file_name}")
+                continue
+            if skip_wwwroot and "wwwroot" in file_name.lower():
+                logger.info(f"Skipping wwwroot file in root for LLM processing: {file_name}")
+                continue
+            clean_file_name = file_name
+            if is_gateway and file_name.startswith('Gateway/'):
+                clean_file_name = file_name[len('Gateway/'):]
+                logger.info(f"Stripped Gateway/ prefix: {file_name} -> {clean_file_name}")
+            add_task(join_paths(project_dir, clean_file_name), file_info, clean_file_name)
+
+        folders = project["target_structure"].get("folders", {})
+        logger.info(f"Folders to process: {list(folders.keys())}")
+        stack = [
+            (join_paths(project_dir, folder_name), folder_info)
+            for folder_name, folder_info in reversed(list(folders.items()))
+            if not (skip_wwwroot and folder_name.lower() == "wwwroot")
+        ]
+        while stack:
+            folder_path, folder_info = stack.pop()
+            ensure_directory_exists(folder_path)
+            for file_name, file_info in (folder_info.get("target_files") or {}).items():
+                full_path = os.path.normpath(join_paths(folder_path, file_name))
+                add_task(full_path, file_info, full_path)
+            subfolders = folder_info.get("subfolders") or {}
+            stack.extend(
+                (join_paths(folder_path, subfolder_name), subfolder_info)
+                for subfolder_name, subfolder_info in reversed(list(subfolders.items()))
+            )
+        return project_name, project_dir, tasks
+
+    @traceable(name="generate_microservice_files")
+    async def generate_microservice_files(self, ms_name: str, ms_dir: str, projects: List[Dict], agent: MicroserviceAgent, file_cache: FileCache,
+                                          select: Optional[Callable[[str], bool]] = None) -> List[Tuple[Dict, str, Dict]]:
+        """
+        Generate every file of a microservice through the DAG scheduler: independent files run
+        concurrently, a .csproj runs after the files whose dependencies it aggregates, and files
+        wait for the referenced-layer types they use. Returns (project, project_dir, migration_results)
+        per project, in the given order.
+
+        With `select` (called with each file's repository-relative path) only the selected files
+        are regenerated, ignoring checkpoints; the others stay as they are on disk and contribute
+        their checkpointed dependencies to the project file.
+        """
+        collected = [(project, *self.collect_project_tasks(ms_name, ms_dir, project)) for project in projects]
+        # Context lookups see every file of the microservice, including ones not selected for this run
+        every_task = [task for _, _, _, tasks in collected for task in tasks]
+        types = GenerationContextBuilder.index_types(every_task)
+        order = {task.key: position for position, task in enumerate(every_task)}
+        project_dependencies: Dict[str, set] = {}
+        if select is not None:
+            selected_collection = []
+            for project, project_name, project_dir, tasks in collected:
+                selected = []
+                for task in tasks:
+                    if select(self.checkpoint_path(task.output_path)):
+                        selected.append(task)
+                        continue
+                    checkpoint = self.checkpoints.get(self.checkpoint_path(task.output_path))
+                    if checkpoint:
+                        project_dependencies.setdefault(project_name, set()).update(checkpoint["dependencies"])
+                selected_collection.append((project, project_name, project_dir, selected))
+            collected = selected_collection
+
+        async def generate(task: GenerationTask) -> Dict:
+            file_info = task.file_info
+            file_path = self.checkpoint_path(task.output_path)
+            self.progress.file_started(ms_name, file_path, task.project_name)
+            started = time.monotonic()
+            # Each scheduled task runs in its own context, so generate_code counts this file's attempts only
+            attempts = [0]
+            generation_attempts.set(attempts)
+            result = None
+            try:
+                result = await self.restore_checkpoint(task, file_cache) if select is None else None
+                if result is None:
+                    if task.is_csproj:
+                        reported = project_dependencies.get(task.project_name, set()) | set(file_info.get("dependencies") or [])
+                        file_info = {**file_info, "dependencies": sorted(reported)}
+                    context = await self.build_context(task, types, order, scheduled, file_cache)
+                    result = await self.process_file(task.output_path, file_info, agent, file_cache, task.project_dir, task.project_name,
+                                                     context=context)
+                    await self.save_checkpoint(task, result)
+                if result.get("status") == "success":
+                    # Later agent generations in this microservice start from a summary of this file
+                    agent.record(file_path, await file_cache.get_file_content(task.output_path))
+            except Exception as e:
+                result = {"file": task.file_name, "status": "failed", "error": str(e)}
+                raise
+            finally:
+                self.progress.file_finished(
+                    ms_name, file_path, result or {"status": "failed", "error": "cancelled"},
+                    time.monotonic() - started, max(attempts[0] - 1, 0)
+                )
+            project_dependencies.setdefault(task.project_name, set()).update(result.get("dependencies") or [])
+            return result
+
+        all_tasks = [task for _, _, _, tasks in collected for task in tasks]
+        scheduled = {task.key for task in all_tasks}
+        self.progress.set_total(ms_name, len(all_tasks))
+        logger.info(f"Scheduling {len(all_tasks)} files for {ms_name} (max {self.scheduler.max_concurrency} concurrent)")
+        results = await self.scheduler.run(all_tasks, generate)
+
+        project_results = []
+        for project, project_name, project_dir, tasks in collected:
+            migration_results = {
+                "successful_files": [],
+                "failed_files": [],
+                "total_files": 0,
+                "success_rate": 0,
+                "target_version": self.target_version,
+                "project_name": project_name,
+                "microservice": ms_name,
+                "file_routes": {},
+                "successful_paths": []
+            }
+            for task in tasks:
+                result = results.get(task.key)
+                migration_results["total_files"] += 1
+                if isinstance(result, Exception) or result is None:
+                    logger.error(f"Error processing file {task.label}: {result}")
+                    migration_results["failed_files"].append({"file": task.label, "error": str(result)})
+                    continue
+                if result.get("status") == "success":
+                    migration_results["successful_files"].append(task.label)
+                    migration_results["successful_paths"].append(self.checkpoint_path(task.output_path))
+                else:
+                    migration_results["failed_files"].append({"file": task.label, "error": result.get("error")})
+                if result.get("routes"):
+                    migration_results["file_routes"][task.label] = result["routes"]
+            project_results.append((project, project_dir, migration_results))
+        return project_results
 
     @traceable(name="process_and_zip_projects")
     async def process_and_zip_projects(self, target_structure: Dict, target_version: str, repo_name: str) -> Dict:
@@ -810,11 +1273,13 @@ class Migrator:
         try:
             # Reset token tracker for new migration
             self.token_tracker.reset()
+            self.api_type = "rest"
             
             # Validate target_structure
             if not target_structure or not isinstance(target_structure, dict):
                 logger.error("Invalid or empty target_structure provided")
                 raise ValueError("Target structure is None or invalid")
+            self.progress.start(target_structure.get("microservices", []), self.api_type)
     
             # Set self.target_structure for use in generate_gateway
             self.target_structure = target_structure
@@ -851,6 +1316,91 @@ class Migrator:
             self.token_tracker.log_summary()
             raise
 
+    @traceable(name="regenerate_files")
+    async def regenerate_files(self, target_structure: Dict, target_version: str, repo_name: str, api_type: str,
+                               paths: List[str], microservices: List[str]) -> Dict:
+        """
+        Regenerate only the given target files (repository-relative paths) and every file of the
+        given microservices in an existing migration output, leaving everything else untouched.
+        Requires the job's checkpoints (self.job_id/self.checkpoints) for the files that are kept.
+        For REST, ocelot.json is rebuilt from the checkpointed routes whenever anything was
+        regenerated, so routes a regenerated controller no longer has are dropped too. Then the
+        repository is re-zipped and a zip of just the changed files is written.
+        """
+        self.token_tracker.reset()
+        self.api_type = api_type
+        self.target_structure = target_structure
+        self.target_version = target_version
+        self.repo_name = repo_name
+        self.use_generation_cache = False
+        self.progress.start([], api_type)
+        repo_dir = join_paths(self.output_dir, repo_name)
+
+        wanted_paths = {path.replace("\\", "/").strip("/") for path in paths}
+        wanted_microservices = {name.lower() for name in microservices}
+        project_results = []
+        selected_paths = set()
+        changed_paths: List[str] = []
+        for microservice in target_structure.get("microservices", []):
+            ms_name = microservice.get("name", "Miscellaneous")
+            whole = ms_name.lower() in wanted_microservices
+            if not whole and not any(path.split("/", 1)[0] == ms_name for path in wanted_paths):
+                continue
+
+            def select(path: str, whole: bool = whole) -> bool:
+                if whole or path in wanted_paths:
+                    selected_paths.add(path)
+                    return True
+                return False
+
+            file_cache = FileCache()
+            agent = MicroserviceAgent(self.microservice_tools(file_cache), llm_config._llm)
+            ms_dir = join_paths(repo_dir, ms_name)
+            for _, _, migration_results in await self.generate_microservice_files(
+                    ms_name, ms_dir, microservice.get("projects", []), agent, file_cache, select=select):
+                project_results.append(migration_results)
+                changed_paths.extend(migration_results["successful_paths"])
+
+        regenerated = sorted(changed_paths)
+        not_found = sorted(wanted_paths - selected_paths)
+
+        if api_type == "rest" and selected_paths:
+            # Routes of regenerated controllers are checkpointed (empty when a controller lost them);
+            # rebuild the gateway from all of them
+            checkpoints = await asyncio.to_thread(job_store.load_checkpoints, self.job_id) if self.job_id else {}
+            ms_names = {microservice.get("name") for microservice in target_structure.get("microservices", [])}
+            routes_by_ms: Dict[str, Dict] = {}
+            for checkpoint in checkpoints.values():
+                if checkpoint["routes"] and checkpoint["microservice"] in ms_names:
+                    routes_by_ms.setdefault(checkpoint["microservice"], {})[checkpoint["file_path"]] = checkpoint["routes"]
+            await self.generate_gateway([
+                {"microservice": ms_name, "file_routes": file_routes} for ms_name, file_routes in routes_by_ms.items()
+            ])
+            changed_paths.append("Gateway/ocelot.json")
+
+        zip_path = self.zip_repo()
+        delta_zip_path = self.zip_files(changed_paths, "delta")
+        self.token_tracker.log_summary()
+        return {
+            "migration_results": project_results,
+            "regenerated_files": regenerated,
+            "changed_files": sorted(set(changed_paths)),
+            "not_found": not_found,
+            "zip_file": zip_path,
+            "delta_zip_file": delta_zip_path,
+            "token_usage": self.token_tracker.get_summary()
+        }
+
+    def microservice_tools(self, file_cache: FileCache) -> List:
+        tools = [
+            create_query_target_structure_tool(self.rag_service),
+            create_get_file_content_tool(file_cache),
+            create_query_analysis_tool(self.analysis_rag_service)
+        ]
+        if self.source_index is not None:
+            tools.append(create_find_source_files_tool(self.source_index))
+        return tools
+
     @traceable(name="process_microservices")
     async def process_microservices(self, target_structure: Dict, target_version: str, repo_name: str) -> List[Dict]:
         """Process all microservices in parallel."""
@@ -885,21 +1435,7 @@ class Migrator:
         ms_results = []
     
         file_cache = FileCache()
-        tools = [
-            create_query_target_structure_tool(self.rag_service),
-            create_get_file_content_tool(file_cache),
-            create_query_analysis_tool(self.analysis_rag_service)
-        ]
-        chat_memory_buffer = ChatMemoryBuffer.from_defaults()
-        composable_memory = SimpleComposableMemory.from_defaults(
-            primary_memory=chat_memory_buffer,
-        )
-        agent = ReActAgent(
-            tools=tools,
-            llm=llm_config._llm,
-            verbose=True,
-            memory=composable_memory
-        )
+        agent = MicroserviceAgent(self.microservice_tools(file_cache), llm_config._llm)
     
         try:
             projects = microservice.get("projects", [])
@@ -912,88 +1448,8 @@ class Migrator:
                 return len(desired_order)
             sorted_projects = sorted(projects, key=order_key)
     
-            for project in sorted_projects:
-                project_name = project.get("project_name", "unknown")
-                if ms_name.lower() == 'gateway':
-                    project_dir = ms_dir
-                    project_name = "Gateway"  # Consistent namespace base for Gateway
-                else:
-                    project_dir = join_paths(ms_dir, project_name)
-                ensure_directory_exists(project_dir)
-    
-                migration_results = {
-                    "successful_files": [],
-                    "failed_files": [],
-                    "total_files": 0,
-                    "success_rate": 0,
-                    "target_version": self.target_version,
-                    "project_name": project_name,
-                    "microservice": ms_name,
-                    "file_routes": {}
-                }
-                project_dependencies = set()
-    
-                root_files = project["target_structure"].get("root", {})
-                normal_files, special_files = {}, {}
-                for file_name, file_info in root_files.items():
-                    if file_name.endswith(".csproj") or file_name.lower() == "program.cs":
-                        special_files[file_name] = file_info
-                    else:
-                        normal_files[file_name] = file_info
-    
-                for file_name, file_info in normal_files.items():
-                    if file_name.endswith('ocelot.json'):
-                        logger.info(f"Skipping ocelot.json: {file_name}")
-                        continue
-                    try:
-                        clean_file_name = file_name
-                        if ms_name.lower() == 'gateway' and file_name.startswith('Gateway/'):
-                            clean_file_name = file_name[len('Gateway/'):]
-                            logger.info(f"Stripped Gateway/ prefix: {file_name} -> {clean_file_name}")
-                        file_info['microservice_name'] = ms_name
-                        output_path = join_paths(ms_dir if ms_name.lower() == 'gateway' else project_dir, clean_file_name)
-                        result = await self.process_file(output_path, file_info, agent, file_cache, project_dir, project_name)
-                        migration_results["successful_files"].append(clean_file_name)
-                        migration_results["total_files"] += 1
-                        project_dependencies.update(result.get("dependencies", []))
-                        if result.get("routes"):
-                            migration_results["file_routes"][clean_file_name] = result["routes"]
-                    except Exception as e:
-                        migration_results["failed_files"].append({"file": file_name, "error": str(e)})
-                        migration_results["total_files"] += 1
-    
-                for file_name, file_info in special_files.items():
-                    if file_name.endswith('ocelot.json'):
-                        logger.info(f"Skipping ocelot.json: {file_name}")
-                        continue
-                    try:
-                        clean_file_name = file_name
-                        if ms_name.lower() == 'gateway' and file_name.startswith('Gateway/'):
-                            clean_file_name = file_name[len('Gateway/'):]
-                            logger.info(f"Stripped Gateway/ prefix: {file_name} -> {clean_file_name}")
-                        file_info['microservice_name'] = ms_name
-                        output_path = join_paths(ms_dir if ms_name.lower() == 'gateway' else project_dir, clean_file_name)
-                        result = await self.process_file(output_path, file_info, agent, file_cache, project_dir, project_name)
-                        migration_results["successful_files"].append(clean_file_name)
-                        migration_results["total_files"] += 1
-                        project_dependencies.update(result.get("dependencies", []))
-                        if result.get("routes"):
-                            migration_results["file_routes"][clean_file_name] = result["routes"]
-                    except Exception as e:
-                        migration_results["failed_files"].append({"file": file_name, "error": str(e)})
-                        migration_results["total_files"] += 1
-    
-                folders = project["target_structure"].get("folders", {})
-                logger.info(f"Folders to process: {list(folders.keys())}")
-                for folder_name, folder_info in folders.items():
-                    logger.info(f"Processing folder: {folder_name}")
-                    folder_path = join_paths(ms_dir if ms_name.lower() == 'gateway' else project_dir, folder_name)
-                    ensure_directory_exists(folder_path)
-                    await self.process_folder_with_routes(
-                        folder_path, folder_info, migration_results,
-                        project_dependencies, agent, file_cache, ms_name, project_dir, project_name
-                    )
-    
+            project_results = await self.generate_microservice_files(ms_name, ms_dir, sorted_projects, agent, file_cache)
+            for project, project_dir, migration_results in project_results:
                 if migration_results["total_files"] > 0:
                     migration_results["success_rate"] = (
                         len(migration_results["successful_files"]) / migration_results["total_files"]
@@ -1006,7 +1462,7 @@ class Migrator:
     
             self.create_solution(ms_dir, ms_name)
         finally:
-            composable_memory.reset()
+            agent.reset()
     
         return ms_results
     
@@ -1015,6 +1471,7 @@ class Migrator:
     async def process_and_zip_projects_grpc(self, target_structure: Dict, target_version: str, repo_name: str) -> Dict:
         # Reset token tracker for new migration
         self.token_tracker.reset()
+        self.api_type = "grpc"
         
         self.target_structure = target_structure
         self.target_version = target_version
@@ -1022,6 +1479,7 @@ class Migrator:
         if self.target_structure is None:
             logger.error("Target structure is None in process_and_zip_projects_grpc")
             raise ValueError("Target structure is not provided")
+        self.progress.start(target_structure.get("microservices", []), self.api_type)
         migration_results = await self.process_microservices_grpc(target_structure, target_version, repo_name)
         zip_path = self.zip_repo()
         
@@ -1073,14 +1531,7 @@ class Migrator:
         ms_results = []
 
         file_cache = FileCache()
-        tools = [
-            create_query_target_structure_tool(self.rag_service),
-            create_get_file_content_tool(file_cache),
-            create_query_analysis_tool(self.analysis_rag_service)
-        ]
-        chat_memory_buffer = ChatMemoryBuffer.from_defaults()
-        composable_memory = SimpleComposableMemory.from_defaults(primary_memory=chat_memory_buffer)
-        agent = ReActAgent.from_tools(tools=tools, llm=llm_config._llm, verbose=True, memory=composable_memory)
+        agent = MicroserviceAgent(self.microservice_tools(file_cache), llm_config._llm)
 
 
         try:
@@ -1094,73 +1545,12 @@ class Migrator:
                 return len(desired_order)
             sorted_projects = sorted(projects, key=order_key)
 
-            for project in sorted_projects:
-                project_name = project.get("project_name", "unknown")
-                project_dir = ms_dir if ms_name.lower() == 'gateway' else join_paths(ms_dir, project_name)
-                ensure_directory_exists(project_dir)
-
-                migration_results = {
-                    "successful_files": [],
-                    "failed_files": [],
-                    "total_files": 0,
-                    "success_rate": 0,
-                    "target_version": self.target_version,
-                    "project_name": project_name,
-                    "microservice": ms_name,
-                    "file_routes": {}
-                }
-                project_dependencies = set()
-
-                root_files = project["target_structure"].get("root", {})
-                normal_files, special_files = {}, {}
-                for file_name, file_info in root_files.items():
-                    if file_name.endswith(".csproj") or file_name.lower() == "program.cs":
-                        special_files[file_name] = file_info
-                    elif "wwwroot" not in file_name.lower():
-                        normal_files[file_name] = file_info
-                    else:
-                        logger.info(f"Skipping wwwroot file in root for LLM processing: {file_name}")
-
-                tasks = []
-                for file_name, file_info in normal_files.items():
-                 output_path = join_paths(project_dir, file_name)
-                 tasks.append(self.process_file(output_path, file_info, agent, file_cache, project_dir, project_name))
-
-              
-                for file_name, file_info in special_files.items():
-                    output_path = join_paths(project_dir, file_name)
-                    tasks.append(self.process_file(output_path, file_info, agent, file_cache, project_dir, project_name))
-
-                results = await asyncio.gather(*tasks, return_exceptions=True)
-                for result in results:
-                    if isinstance(result, Exception):
-                        migration_results["failed_files"].append({"file": "unknown", "error": str(result)})
-                        migration_results["total_files"] += 1
-                    else:
-                        if result["status"] == "success":
-                            migration_results["successful_files"].append(result["file"])
-                        else:
-                            migration_results["failed_files"].append({"file": result["file"], "error": result["error"]})
-                        migration_results["total_files"] += 1
-                        project_dependencies.update(result.get("dependencies", []))
-                        if result.get("routes"):
-                            migration_results["file_routes"][result["file"]] = result["routes"]
-
+            project_results = await self.generate_microservice_files(ms_name, ms_dir, sorted_projects, agent, file_cache)
+            for project, project_dir, migration_results in project_results:
                 folders = project["target_structure"].get("folders", {})
-                logger.info(f"Folders to process: {list(folders.keys())}")
-                for folder_name, folder_info in folders.items():
-                    if folder_name.lower() == "wwwroot":
-                        logger.info(f"Skipping wwwroot folder for LLM processing: {folder_name}")
-                        continue
-                    folder_path = join_paths(project_dir, folder_name)
-                    ensure_directory_exists(folder_path)
-                    await self.process_folder_with_routes(
-                        folder_path, folder_info, migration_results, project_dependencies, agent, file_cache, ms_name, project_dir, project_name
-                    )
-
                 # Copy wwwroot if it exists in target_structure or source directory
                 if "wwwroot" in folders or os.path.exists(join_paths(self.source_dir, "wwwroot")):
-                    logger.info(f"Copying wwwroot static files for project: {project_name}")
+                    logger.info(f"Copying wwwroot static files for project: {migration_results['project_name']}")
                     copy_static_files_to_wwwroot(self.source_dir, project_dir)
                     migration_results["successful_files"].append("wwwroot")
                     migration_results["total_files"] += 1  # Count wwwroot as one processed item
@@ -1174,6 +1564,6 @@ class Migrator:
 
             self.create_solution(ms_dir, ms_name)
         finally:
-            composable_memory.reset()
+            agent.reset()
 
         return ms_results
\ No newline at end of file
@@ -0,0 +1,398 @@
+import asyncio
+import base64
+import json
+import os
+import tempfile
+import zipfile
+from typing import Callable, Dict, List, Optional, Tuple
+from config.db_config import SessionLocal
+from models.db import Analysis
+from services.analysis_service import ProjectAnalyzer
+from services.job_queue import job_queue
+from services.job_store import job_store
+from services.migration_service import Migrator
+from utils import logger
+from utils.context_builder import GenerationContextBuilder
+from utils.file_utils import ensure_directory_exists, join_paths, safe_remove_directory
+from utils.git_helpers import clone_repository
+from utils.migration_progress import MigrationProgress
+from utils.source_index import get_source_index
+from utils.token_counter import token_counter
+
+# Receives progress snapshots such as {"stage": "analyzing"}; used by background workers
+ProgressCallback = Callable[[Dict], None]
+
+
+def _report(progress: Optional[ProgressCallback], **fields) -> None:
+    if progress:
+        progress(fields)
+
+
+async def restore_zip_content(zip_content_b64: str, temp_dir: str) -> str:
+    """Restore ZIP file from base64 content and extract it."""
+    try:
+        # Decode base64 content
+        zip_content = base64.b64decode(zip_content_b64)
+
+        # Ensure the temporary directory exists
+        ensure_directory_exists(temp_dir)
+        zip_path = os.path.join(temp_dir, "restored.zip")
+
+        # Write ZIP content to file
+        with open(zip_path, 'wb') as f:
+            f.write(zip_content)
+
+        # Extract the ZIP file
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            zip_ref.extractall(temp_dir)
+
+        # Remove the ZIP file after extraction
+        os.remove(zip_path)
+
+        # Find the root directory of the extracted content
+        extracted_dirs = [os.path.join(temp_dir, d) for d in os.listdir(temp_dir) if os.path.isdir(os.path.join(temp_dir, d))]
+        if len(extracted_dirs) == 1:
+            return extracted_dirs[0]  # Use the single root directory if present
+        return temp_dir  # Otherwise, use the temp_dir directly
+    except Exception as e:
+        logger.error(f"Failed to restore ZIP content: {str(e)}")
+        await safe_remove_directory(temp_dir)
+        raise RuntimeError(f"Failed to restore ZIP content: {str(e)}")
+
+
+async def run_analysis(repo_url: Optional[str], target_version: str, api_type: str, instruction: Optional[str] = None,
+                       zip_content_b64: Optional[str] = None, progress: Optional[ProgressCallback] = None) -> Dict:
+    """
+    Analyze a git repository or an uploaded ZIP (base64), generate the target structure and
+    save the analysis. Returns the /analyze response data.
+    """
+    temp_dir = None
+    try:
+        # Handle source based on whether a repository URL or ZIP content was given
+        _report(progress, stage="fetching_source")
+        if zip_content_b64 is None:
+            temp_dir = source_dir = await clone_repository(repo_url)
+            logger.info(f"Repository cloned to: {temp_dir}")
+        else:
+            temp_dir = tempfile.mkdtemp(prefix="migration_")
+            source_dir = await restore_zip_content(zip_content_b64, temp_dir)
+            logger.info(f"ZIP file extracted to: {source_dir}")
+
+        # Create analyzer with local path
+        analyzer = ProjectAnalyzer(source_dir)
+        _report(progress, stage="analyzing")
+        basic_tree = await analyzer.create_basic_tree()
+        analysis_tree = await analyzer.create_analyzed_tree()
+
+        logger.info("Created analysis")
+
+        default_instruction = f"Use the best of your knowledge to split into microservices considering the API type is {api_type}"
+        instruction = instruction or default_instruction
+
+        logger.info("Generating target structure")
+        _report(progress, stage="generating_target_structure")
+
+        # Select the appropriate method based on api_type
+        if api_type == "rest":
+            target_structure = await analyzer.create_target_structure(
+                analyzed_structure=analysis_tree,
+                target_version=target_version,
+                instruction=instruction
+            )
+        elif api_type == "grpc":
+            target_structure = await analyzer.create_grpc_target_structure(
+                analyzed_structure=analysis_tree,
+                target_version=target_version,
+                instruction=instruction
+            )
+        else:
+            raise ValueError("Invalid api_type specified")
+
+        logger.info("Target structure generated and validated")
+        with open('target.json', 'w') as f:
+            f.write(json.dumps(target_structure, indent=4))
+
+        # Create DB record
+        _report(progress, stage="saving")
+        db = SessionLocal()
+        try:
+            new_analysis = Analysis(
+                repo_url=repo_url or "Uploaded ZIP",
+                target_version=target_version,
+                api_type=api_type,
+                structure=basic_tree,
+                analysis=analysis_tree,
+                instruction=instruction,
+                zip_content=zip_content_b64
+            )
+            db.add(new_analysis)
+            db.commit()
+            db.refresh(new_analysis)
+            analysis_id = new_analysis.id
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        logger.info("Analysis data saved to database")
+
+        return {
+            "analysis_id": analysis_id,
+            "repo_url": repo_url or "Uploaded ZIP",
+            "target_version": target_version,
+            "api_type": api_type,
+            "structure": basic_tree,
+            "target_structure": target_structure
+        }
+    finally:
+        if temp_dir and os.path.exists(temp_dir):
+            logger.info(f"Cleaning up temporary directory: {temp_dir}")
+            await safe_remove_directory(temp_dir)
+            logger.info("Cleanup completed")
+
+
+async def fetch_sources(analysis: Analysis) -> Tuple[str, str]:
+    """Clone the analysis repository or restore its uploaded ZIP; returns (temp_dir to clean up, source_dir)."""
+    # Determine source type from analysis
+    repo_url = analysis.repo_url
+    is_zip = repo_url == "Uploaded ZIP"
+
+    # Handle source based on whether it was originally a ZIP or git
+    if not is_zip:
+        temp_dir = await clone_repository(repo_url)
+        logger.info(f"Repository cloned to: {temp_dir}")
+        return temp_dir, temp_dir
+
+    # For ZIP-based projects, restore from stored content
+    if not getattr(analysis, 'zip_content', None):
+        raise ValueError("ZIP content not found in analysis. Please re-upload the ZIP file.")
+    temp_dir = tempfile.mkdtemp(prefix="migration_")
+    source_dir = await restore_zip_content(analysis.zip_content, temp_dir)
+    logger.info(f"ZIP content restored to: {source_dir}")
+    return temp_dir, source_dir
+
+
+async def prepare_migrator(job: Dict, analysis: Analysis, source_dir: str, events: MigrationProgress,
+                           rebuild_target_index: bool = True, rebuild_analysis_index: bool = True) -> Migrator:
+    """
+    Build a Migrator for a job: output directory, checkpoints, progress events and both RAG
+    indexes. The indexes are persisted under the job's output directory, so later selective
+    runs can load them instead of embedding everything again.
+    """
+    migration_service = Migrator()
+    await migration_service.initialize(output_dir=job["output_dir"], source_dir=source_dir)
+    migration_service.instruction = job["instruction"]
+    migration_service.source_index = get_source_index(analysis.id, analysis.analysis)
+    migration_service.context_builder = GenerationContextBuilder(analysis.analysis, token_counter.count)
+    migration_service.job_id = job["id"]
+    migration_service.checkpoints = await asyncio.to_thread(job_store.load_checkpoints, job["id"])
+    migration_service.progress = events
+
+    # Initialize the shared RAG services using the provided JSON data
+    rag_dir = join_paths(job["output_dir"], ".rag")
+    rag_initialized = migration_service.rag_service.initialize(
+        json_data=job["target_structure"],
+        temp_dir=join_paths(rag_dir, "target_structure"),
+        force_rebuild=rebuild_target_index
+    )
+    if not rag_initialized:
+        raise RuntimeError("Failed to initialize target structure RAG service")
+    logger.info("Target structure RAG service initialized successfully")
+
+    analysis_initialized = migration_service.analysis_rag_service.initialize(
+        json_data=analysis.analysis,
+        temp_dir=join_paths(rag_dir, "analysis"),
+        force_rebuild=rebuild_analysis_index
+    )
+    if not analysis_initialized:
+        raise RuntimeError("Failed to initialize analysis RAG service")
+    logger.info("Analysis RAG service initialized successfully")
+    return migration_service
+
+
+class JobEventWriter:
+    """
+    Persists a job's progress events so any API process can stream them (see
+    /migrate/{job_id}/events). Events are buffered and written in batches by a background task
+    through asyncio.to_thread, so SQLite writes never stall generations on the event loop.
+    """
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self._buffer: List[Dict] = []
+        self._wake = asyncio.Event()
+        self._closed = False
+        self._task: Optional[asyncio.Task] = None
+
+    def append(self, event: Dict) -> None:
+        self._buffer.append(event)
+        self._wake.set()
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            while self._buffer:
+                batch, self._buffer = self._buffer, []
+                try:
+                    await asyncio.to_thread(job_queue.append_events, self.job_id, batch)
+                except Exception as e:
+                    logger.warning(f"Failed to persist {len(batch)} events of job {self.job_id}: {str(e)}")
+            if self._closed:
+                return
+
+    async def close(self) -> None:
+        """Write every buffered event (including the final one) and stop the writer."""
+        self._closed = True
+        self._wake.set()
+        if self._task is not None:
+            await self._task
+
+
+def _event_publisher(job_id: str, progress: Optional[ProgressCallback]) -> Tuple[MigrationProgress, JobEventWriter]:
+    writer = JobEventWriter(job_id)
+
+    def publish(event: Dict) -> None:
+        writer.append(event)
+        if progress:
+            progress(event)
+
+    return MigrationProgress(sink=publish), writer
+
+
+async def run_migration(job: Dict, analysis: Analysis, progress: Optional[ProgressCallback] = None) -> Dict:
+    """
+    Run a migration job end to end: restore the sources, generate every target file and zip
+    the result. Files checkpointed by an earlier run of the same job are reused, so calling
+    this again for a failed job resumes it.
+    """
+    temp_dir = None
+    events, event_writer = _event_publisher(job["id"], progress)
+    try:
+        await asyncio.to_thread(job_store.update_job, job["id"], status="running", error=None)
+        _report(progress, stage="fetching_source")
+        temp_dir, source_dir = await fetch_sources(analysis)
+
+        _report(progress, stage="indexing")
+        migration_service = await prepare_migrator(job, analysis, source_dir, events)
+        if migration_service.checkpoints:
+            logger.info(f"Resuming job {job['id']} with {len(migration_service.checkpoints)} checkpointed files")
+
+        target_structure = job["target_structure"]
+
+        # Select processing method based on api_type
+        _report(progress, stage="generating")
+        if job["api_type"] == "rest":
+            migration_result = await migration_service.process_and_zip_projects(
+                target_structure=target_structure,
+                target_version=job["target_version"],
+                repo_name=job["repo_name"]
+            )
+        elif job["api_type"] == "grpc":
+            migration_result = await migration_service.process_and_zip_projects_grpc(
+                target_structure=target_structure,
+                target_version=job["target_version"],
+                repo_name=job["repo_name"]
+            )
+        else:
+            raise ValueError("Invalid api_type specified")
+
+        zip_file_path = migration_result.get("zip_file")
+        if not zip_file_path or not os.path.exists(zip_file_path):
+            raise RuntimeError("Zip file not found")
+
+        await asyncio.to_thread(
+            job_store.update_job, job["id"], status="completed",
+            result={"zip_file": zip_file_path, "token_usage": migration_result.get("token_usage")}
+        )
+        events.finish("completed", token_usage=migration_result.get("token_usage"))
+        return migration_result
+    except asyncio.CancelledError:
+        job_store.update_job(job["id"], status="cancelled")
+        events.finish("cancelled")
+        raise
+    except Exception as e:
+        await asyncio.to_thread(job_store.update_job, job["id"], status="failed", error=str(e))
+        events.finish("failed", error=str(e))
+        raise
+    finally:
+        await event_writer.close()
+        if temp_dir and os.path.exists(temp_dir):
+            logger.info(f"Cleaning up temporary directory: {temp_dir}")
+            await safe_remove_directory(temp_dir)
+            logger.info("Cleanup completed")
+
+
+async def run_regeneration(job: Dict, analysis: Analysis, paths: List[str], microservices: List[str],
+                           target_structure: Optional[Dict] = None, instruction: Optional[str] = None,
+                           progress: Optional[ProgressCallback] = None) -> Dict:
+    """
+    Regenerate selected files (or whole microservices) of a migration job in place and re-zip
+    its output. The caller must have claimed the job (status "regenerating", see
+    job_store.claim_job). An updated target structure or instruction replaces the stored one
+    once the regeneration succeeds, so later resumes and regenerations use it too.
+
+    Files are rewritten in place, so a regeneration that fails or is cancelled leaves the job
+    "regeneration_failed": its output, zip and checkpoints may mix old and new files until a
+    regeneration succeeds.
+    """
+    temp_dir = None
+    events, event_writer = _event_publisher(job["id"], progress)
+    structure_changed = target_structure is not None and target_structure != job["target_structure"]
+    updates = {}
+    if structure_changed:
+        updates["target_structure"] = target_structure
+    if instruction:
+        updates["instruction"] = instruction
+    # The stored job keeps its structure and instruction until this run succeeds
+    job = {**job, **updates}
+    try:
+        temp_dir, source_dir = await fetch_sources(analysis)
+        rag_dir = join_paths(job["output_dir"], ".rag")
+        migration_service = await prepare_migrator(
+            job, analysis, source_dir, events,
+            rebuild_target_index=structure_changed or not os.path.exists(join_paths(rag_dir, "target_structure", "context", "index")),
+            rebuild_analysis_index=not os.path.exists(join_paths(rag_dir, "analysis", "context", "index"))
+        )
+        result = await migration_service.regenerate_files(
+            target_structure=job["target_structure"],
+            target_version=job["target_version"],
+            repo_name=job["repo_name"],
+            api_type=job["api_type"],
+            paths=paths,
+            microservices=microservices
+        )
+        previous_usage = (job.get("result") or {}).get("token_usage")
+        await asyncio.to_thread(
+            job_store.update_job, job["id"], status="completed", error=None,
+            result={"zip_file": result["zip_file"], "token_usage": previous_usage, "last_regeneration": result["token_usage"]},
+            **updates
+        )
+        events.finish("completed", token_usage=result["token_usage"], changed_files=result["changed_files"])
+        return result
+    except (Exception, asyncio.CancelledError) as e:
+        # Some files may already be rewritten, so the output is no longer the completed one
+        await asyncio.to_thread(job_store.update_job, job["id"], status="regeneration_failed",
+                                error=f"Regeneration failed: {str(e)}")
+        events.finish("cancelled" if isinstance(e, asyncio.CancelledError) else "failed", error=str(e))
+        raise
+    finally:
+        await event_writer.close()
+        if temp_dir and os.path.exists(temp_dir):
+            logger.info(f"Cleaning up temporary directory: {temp_dir}")
+            await safe_remove_directory(temp_dir)
+            logger.info("Cleanup completed")
+
+
+def load_analysis(analysis_id: str) -> Optional[Analysis]:
+    """Load an analysis detached from its session, for use outside a request."""
+    db = SessionLocal()
+    try:
+        analysis = db.query(Analysis).filter(Analysis.id == analysis_id).first()
+        if analysis:
+            db.expunge(analysis)
+        return analysis
+    finally:
+        db.close()
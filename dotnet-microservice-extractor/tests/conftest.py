@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+# The service imports its packages (utils, services, ...) from the project directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Importing services.job_queue opens the default queue; keep it out of the project directory
+os.environ.setdefault("JOB_QUEUE_PATH", os.path.join(tempfile.mkdtemp(prefix="tests_"), "jobs.sqlite3"))
@@ -0,0 +1,55 @@
+import json
+
+from utils.code_stream import GeneratedCodeDecoder, StreamingSanitizer
+from utils.file_utils import sanitize_content
+
+CODE = 'namespace Shop\n{\n\tclass A { string s = "café \\\\ \U0001F600"; }\n}\n'
+
+
+def decode(response, step):
+    decoder = GeneratedCodeDecoder()
+    out = "".join(decoder.feed(response[:end]) for end in range(step, len(response) + step, step))
+    return decoder, out
+
+
+def test_decoder_matches_json_for_any_split():
+    response = json.dumps({"dependencies": ["Shop.Domain"], "generated_code": CODE})
+    escaped = json.dumps({"generated_code": CODE}, ensure_ascii=True)
+    for text in (response, escaped):
+        for step in (1, 2, 5, 13, len(text)):
+            decoder, out = decode(text, step)
+            assert out == CODE, step
+            assert decoder.complete
+            assert decoder.dependencies() == (["Shop.Domain"] if text is response else [])
+
+
+def test_decoder_reports_a_truncated_response():
+    response = json.dumps({"generated_code": CODE, "dependencies": ["A"]}, ensure_ascii=True)
+    # Cut off in the middle of the surrogate pair's escape
+    decoder, out = decode(response[:response.index("\\ud83d") + 3], 1)
+
+    assert not decoder.complete
+    assert CODE.startswith(out)
+    assert decoder.dependencies() == []
+
+
+def test_decoder_dependencies_after_the_code_and_cut_off():
+    decoder, _ = decode('{"generated_code": "x", "dependencies": ["A.B", "C', 3)
+    assert decoder.dependencies() == ["A.B"]
+    decoder, _ = decode('{"generated_code": "x", "dependencies": ["A.B", "C"]}', 4)
+    assert decoder.dependencies() == ["A.B", "C"]
+
+
+def test_streaming_sanitizer_matches_sanitize_content():
+    samples = [
+        "```csharp\nclass A { }\n```\n",
+        "  \n'''cs\nvar s = \"`\";\n'''  \n\n",
+        "no markers at all   ",
+        "``'``'```\nx\n``",
+        "",
+    ]
+    for text in samples:
+        for step in (1, 2, 3, 7, max(len(text), 1)):
+            sanitizer = StreamingSanitizer()
+            out = "".join(sanitizer.feed(text[i:i + step]) for i in range(0, len(text), step))
+            assert out + sanitizer.finish() == sanitize_content(text), (text, step)
@@ -0,0 +1,57 @@
+import re
+
+from utils.csharp_chunker import SPLIT_MEMBER_CONTINUED, SPLIT_MEMBER_CONTINUES, chunk_source
+
+HEADER = "using System;\nusing System.Linq;\n\nnamespace Shop.Orders\n{\n    public class OrderService\n    {\n"
+FOOTER = "    }\n\n    public enum Status { Open, Closed }\n}\n"
+
+
+def count_tokens(text):
+    return len(text) // 4
+
+
+def method(i, lines=2):
+    body = "".join(f"            var value{j} = input * {j};\n" for j in range(lines))
+    return f"        public int Method{i}(int input)\n        {{\n{body}            return input;\n        }}\n\n"
+
+
+def balance(text):
+    return text.count("{") - text.count("}")
+
+
+def test_source_within_budget_is_one_chunk():
+    source = HEADER + method(0) + FOOTER
+    assert chunk_source(source, 10000, count_tokens) == [source]
+
+
+def test_chunks_split_at_member_boundaries():
+    source = HEADER + "".join(method(i) for i in range(12)) + FOOTER
+    chunks = chunk_source(source, 150, count_tokens)
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert count_tokens(chunk) <= 150
+        assert balance(chunk) == 0
+        assert chunk.startswith("using System;\nusing System.Linq;\n")
+        assert "namespace Shop.Orders\n{\n" in chunk
+    methods = re.findall(r"Method\d+", "".join(chunks))
+    assert sorted(methods) == sorted(f"Method{i}" for i in range(12))
+    assert sum("enum Status" in chunk for chunk in chunks) == 1
+    assert all("public class OrderService" in chunk for chunk in chunks if "Method" in chunk)
+
+
+def test_member_larger_than_a_chunk_is_split_into_marked_parts():
+    source = HEADER + method(0, lines=200) + method(1) + FOOTER
+    chunks = chunk_source(source, 300, count_tokens)
+    parts = [chunk for chunk in chunks if "var value" in chunk and "Method1" not in chunk]
+
+    assert len(parts) > 2
+    assert SPLIT_MEMBER_CONTINUED not in parts[0] and parts[0].endswith(SPLIT_MEMBER_CONTINUES)
+    for part in parts[1:-1]:
+        assert SPLIT_MEMBER_CONTINUED in part and part.endswith(SPLIT_MEMBER_CONTINUES)
+    assert SPLIT_MEMBER_CONTINUED in parts[-1] and SPLIT_MEMBER_CONTINUES not in parts[-1]
+    # Every part reopens the namespace and class; only the last one closes them (and the method)
+    assert parts[-1].endswith("        }\n}\n}\n")
+    assert balance("".join(parts)) == 2 * (len(parts) - 1)
+    values = re.findall(r"var value(\d+)", "".join(parts))
+    assert values == [str(j) for j in range(200)]
@@ -0,0 +1,126 @@
+import asyncio
+
+from utils.generation_scheduler import GenerationScheduler, GenerationTask, build_generation_dag
+
+
+def task(key, project="Orders.Domain", layer="Domain", description="", source_files=None):
+    return GenerationTask(key, project, project, f"{project}/{key}", {"description": description,
+                                                                      "source_files": source_files or []}, layer)
+
+
+def layered_tasks():
+    return [
+        task("Order.cs"),
+        task("Orders.Domain.csproj"),
+        task("OrderService.cs", "Orders.Application", "Application", "Uses Order to place orders"),
+        task("Legacy.cs", "Orders.Application", "Application", source_files=["Old/Order.cs"]),
+        task("Mapped.cs", source_files=["Old/Order.cs"]),
+        task("Unrelated.cs", "Orders.Application", "Application", "Formats dates"),
+    ]
+
+
+def test_build_generation_dag():
+    dag = build_generation_dag(layered_tasks())
+
+    assert dag["Orders.Domain.csproj"] == {"Order.cs", "Mapped.cs"}
+    assert dag["OrderService.cs"] == {"Order.cs"}
+    assert dag["Legacy.cs"] == {"Mapped.cs"}
+    assert dag["Unrelated.cs"] == set()
+    assert dag["Order.cs"] == set()
+
+
+def test_run_respects_dependencies_and_concurrency():
+    started, finished = [], []
+    running = 0
+    peak = 0
+
+    async def worker(t):
+        nonlocal running, peak
+        started.append(t.key)
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        finished.append(t.key)
+        if t.key == "Mapped.cs":
+            raise ValueError("model failed")
+        return {"file": t.key}
+
+    results = asyncio.run(GenerationScheduler(max_concurrency=2).run(layered_tasks(), worker))
+
+    assert peak <= 2
+    assert results["Order.cs"] == {"file": "Order.cs"}
+    assert isinstance(results["Mapped.cs"], ValueError)
+    # A failed dependency still releases the tasks waiting for it
+    assert "Legacy.cs" in results
+    for dependent, dependency in (("OrderService.cs", "Order.cs"), ("Legacy.cs", "Mapped.cs"),
+                                  ("Orders.Domain.csproj", "Order.cs"), ("Orders.Domain.csproj", "Mapped.cs")):
+        assert finished.index(dependency) < started.index(dependent)
+
+
+def test_dependency_cycle_still_runs_every_task():
+    a, b, c = task("A.cs"), task("B.cs"), task("C.cs")
+    a.dependencies.add("B.cs")
+    b.dependencies.add("A.cs")
+    c.dependencies.add("A.cs")
+
+    async def worker(t):
+        return t.key
+
+    results = asyncio.run(asyncio.wait_for(GenerationScheduler().run([a, b, c], worker), timeout=5))
+    assert results == {"A.cs": "A.cs", "B.cs": "B.cs", "C.cs": "C.cs"}
+
+
+def test_cancelled_child_is_reported_as_a_failure():
+    async def worker(t):
+        if t.key == "A.cs":
+            raise asyncio.CancelledError()
+        return t.key
+
+    results = asyncio.run(GenerationScheduler().run([task("A.cs"), task("B.cs")], worker))
+
+    assert isinstance(results["A.cs"], RuntimeError)
+    assert results["B.cs"] == "B.cs"
+
+
+def test_cancelling_run_cancels_running_generations():
+    completed = []
+
+    async def worker(t):
+        await asyncio.sleep(0.2)
+        completed.append(t.key)
+
+    async def main():
+        run = asyncio.ensure_future(GenerationScheduler().run([task(f"T{i}.cs") for i in range(4)], worker))
+        await asyncio.sleep(0.05)
+        run.cancel()
+        try:
+            await run
+        except asyncio.CancelledError:
+            pass
+        await asyncio.sleep(0.3)
+        return run.cancelled()
+
+    assert asyncio.run(main())
+    assert completed == []
+
+
+def test_schedulers_sharing_a_semaphore_share_the_limit():
+    running = 0
+    peak = 0
+
+    async def worker(t):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    async def main():
+        shared = asyncio.Semaphore(3)
+        schedulers = [GenerationScheduler(8, lambda: shared) for _ in range(3)]
+        await asyncio.gather(*(scheduler.run([task(f"{i}-{j}.cs") for j in range(6)], worker)
+                               for i, scheduler in enumerate(schedulers)))
+
+    asyncio.run(main())
+    assert peak == 3
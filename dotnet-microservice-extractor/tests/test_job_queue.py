@@ -0,0 +1,41 @@
+import time
+
+from services.job_queue import CANCELLED, COMPLETED, FAILED, QUEUED, RUNNING, JobQueue
+
+
+def test_claim_heartbeat_and_complete(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    job_id = queue.submit("analyze", {"repo_url": "x"}, owner="alice")
+
+    job = queue.claim("worker-a")
+    assert job["id"] == job_id and job["status"] == RUNNING and job["payload"] == {"repo_url": "x"}
+    assert queue.claim("worker-b") is None
+    assert queue.heartbeat(job_id, "worker-a", {"stage": "analyzing"}) is False
+    assert queue.cancel(job_id) == RUNNING
+    assert queue.heartbeat(job_id, "worker-a") is True
+    assert queue.mark_cancelled(job_id, "worker-a")
+    assert queue.get(job_id)["status"] == CANCELLED
+
+
+def test_requeued_job_cannot_be_finished_by_its_old_worker(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    job_id = queue.submit("migrate", {})
+    queue.claim("worker-a")
+
+    time.sleep(0.01)
+    assert queue.requeue_stale(stale_after=0) == 1
+    assert queue.get(job_id)["status"] == QUEUED
+    assert queue.heartbeat(job_id, "worker-a") is None
+    assert not queue.fail(job_id, "worker-a", "lost")
+
+    assert queue.claim("worker-b")["id"] == job_id
+    assert queue.heartbeat(job_id, "worker-a") is None
+    assert not queue.complete(job_id, "worker-a", {"stale": True})
+    assert not queue.mark_cancelled(job_id, "worker-a")
+    assert queue.get(job_id)["status"] == RUNNING
+
+    assert queue.complete(job_id, "worker-b", {"ok": True})
+    assert queue.get(job_id)["status"] == COMPLETED
+    assert queue.result(job_id) == {"ok": True}
+    assert not queue.fail(job_id, "worker-b", "too late")
+    assert queue.get(job_id)["status"] != FAILED
@@ -0,0 +1,24 @@
+from utils.prompt_registry import GENERATION_GUIDELINES, prompt_registry
+
+
+def test_shared_prefix_is_identical_for_files_of_the_same_type_and_project():
+    prompts = prompt_registry.current()
+    args = ("service", "OrderService", "OrderService.Application", "Application", "net8.0")
+
+    first = prompts.shared_prefix(*args, instruction="split by bounded context")
+    second = prompts.shared_prefix(*args, instruction="split by bounded context")
+    assert first == second
+    assert first.startswith(GENERATION_GUIDELINES.format(target_version="net8.0"))
+    assert first.endswith(prompts.prefix(*args))
+    assert "Migration instructions: split by bounded context" in first
+
+
+def test_shared_prefix_differs_only_by_type_and_project():
+    prompts = prompt_registry.current()
+
+    service = prompts.shared_prefix("service", "OrderService", "OrderService.Application", "Application", "net8.0")
+    other_project = prompts.shared_prefix("service", "OrderService", "OrderService.Domain", "Domain", "net8.0")
+    assert service != other_project
+    assert "Migration instructions" not in service
+    guidelines = prompts.guidelines("net8.0")
+    assert service.startswith(guidelines) and other_project.startswith(guidelines)
@@ -0,0 +1,58 @@
+from utils.source_index import SourcePathIndex, get_source_index, path_tokens, tree_file_paths
+
+PATHS = [
+    "Web/Controllers/OrderController.cs",
+    "Web/Controllers/ProductController.cs",
+    "Web/Views/Order/Index.cshtml",
+    "Data/OrderRepository.cs",
+    "Data/Models/Product.cs",
+    "Web.config",
+]
+
+
+def test_lookups_are_case_insensitive_and_in_path_order():
+    index = SourcePathIndex(PATHS)
+
+    assert len(index) == len(PATHS)
+    assert "Data/OrderRepository.cs" in index
+    assert "data/orderrepository.cs" not in index
+    assert index.contains("ORDER") == ["Data/OrderRepository.cs", "Web/Controllers/OrderController.cs",
+                                       "Web/Views/Order/Index.cshtml"]
+    # Shorter than a trigram, so checked against every path
+    assert index.contains("CS") == sorted(path for path in PATHS if path != "Web.config")
+    assert index.ends_with("controller.cs") == ["Web/Controllers/OrderController.cs",
+                                                "Web/Controllers/ProductController.cs"]
+    assert index.with_extension("cshtml", ".config") == ["Web.config", "Web/Views/Order/Index.cshtml"]
+    assert index.with_basename("product.cs") == ["Data/Models/Product.cs"]
+    assert index.with_token("repository") == ["Data/OrderRepository.cs"]
+    assert index.under("/web/controllers/") == ["Web/Controllers/OrderController.cs",
+                                                "Web/Controllers/ProductController.cs"]
+
+
+def test_find_combines_criteria():
+    index = SourcePathIndex(PATHS)
+
+    assert index.find(contains=("order",), extensions=(".cs",)) == ["Data/OrderRepository.cs",
+                                                                    "Web/Controllers/OrderController.cs"]
+    assert index.find(any_of=("product", "repository"), under="Data") == ["Data/Models/Product.cs",
+                                                                          "Data/OrderRepository.cs"]
+    assert index.find(under="Web", exclude_extensions=(".cs",)) == ["Web/Views/Order/Index.cshtml"]
+    assert index.find() == sorted(PATHS)
+
+
+def test_search_ranks_exact_basenames_first_and_applies_the_limit():
+    index = SourcePathIndex(PATHS + ["Legacy/Product.cs.bak", "Tools/product.cs"])
+
+    assert index.search("product.cs")[:2] == ["Data/Models/Product.cs", "Tools/product.cs"]
+    assert index.search("web order", limit=10) == ["Web/Controllers/OrderController.cs",
+                                                   "Web/Views/Order/Index.cshtml"]
+    assert index.search("", limit=2) == sorted(index.paths)[:2]
+    assert len(index.search("c", limit=3)) == 3
+
+
+def test_tree_paths_and_tokens():
+    tree = {"Web": {"Controllers": {"OrderController.cs": {"file_type": "controller"}}}, "Web.config": "xml"}
+
+    assert tree_file_paths(tree) == ["Web.config", "Web/Controllers/OrderController.cs"]
+    assert path_tokens("Data/OrderRepository.cs") == {"data", "order", "repository", "cs"}
+    assert get_source_index("analysis-1", tree) is get_source_index("analysis-1", {})
@@ -0,0 +1,71 @@
+import copy
+
+from utils.structure_validator import TargetStructureValidator, is_unsafe_path
+
+
+def project(name, folders=None, root=None):
+    return {"project_name": name, "target_structure": {"root": root or {}, "folders": folders or {}}}
+
+
+def structure(gateway_folders):
+    return {
+        "microservices": [
+            {"name": "Gateway", "projects": [project("Gateway", gateway_folders, {"Gateway.csproj": {}})]},
+            {"name": "OrderService", "projects": [project("OrderService.Api", root={"OrderService.Api.csproj": {}})]},
+        ]
+    }
+
+
+def test_fix_mode_adds_gateway_auth_files_and_prunes_empty_folders():
+    target = structure({"Controllers": {"target_files": {}, "subfolders": {}},
+                        "Models": {"target_files": {}, "subfolders": {"Dtos": {"target_files": {}}}}})
+    report = TargetStructureValidator(auth_case="gateway").validate(target, fix=True)
+
+    folders = target["microservices"][0]["projects"][0]["target_structure"]["folders"]
+    assert report.is_valid
+    assert "AuthController.cs" in folders["Controllers"]["target_files"]
+    assert "AuthDbContext.cs" in folders["Data"]["target_files"]
+    assert "User.cs" in folders["Entities"]["target_files"]
+    assert "Models" not in folders
+    assert len(report.violations) == 3
+    assert any("added Controllers/AuthController.cs" in fix for fix in report.fixes)
+
+
+def test_no_fix_mode_reports_without_changing_the_structure():
+    target = structure({"Controllers": {"target_files": {}, "subfolders": {}}})
+    original = copy.deepcopy(target)
+    report = TargetStructureValidator(auth_case="gateway").validate(target, fix=False)
+
+    assert target == original
+    assert len(report.violations) == 3
+    assert report.fixes == []
+
+
+def test_unsafe_names_are_errors():
+    target = {
+        "microservices": [
+            {"name": "../outside", "projects": []},
+            {"name": "Orders", "projects": [
+                project("C:\\Orders", root={"Orders.csproj": {}}),
+                project("Orders.Api", folders={"..": {"target_files": {"Evil.cs": {}}}},
+                        root={"Orders.Api.csproj": {}}),
+            ]},
+        ]
+    }
+    report = TargetStructureValidator(architecture_rules=False).validate(target)
+
+    assert not report.is_valid
+    assert len(report.errors) == 3
+    assert "Unsafe microservice name '../outside'" in report.errors
+
+
+def test_is_unsafe_path():
+    for path in ("/etc/passwd", "a/../../b", "..", "C:/Windows", "d:file", "\\\\server\\share"):
+        assert is_unsafe_path(path), path
+    for path in ("OrderService", "Orders.Api/Controllers/OrdersController.cs", "a..b/c"):
+        assert not is_unsafe_path(path), path
+
+
+def test_missing_microservices_list():
+    report = TargetStructureValidator().validate({"services": []})
+    assert report.errors == ["Target structure must contain a 'microservices' list"]
@@ -0,0 +1,71 @@
+from utils.tree_utils import (TreePathView, clear_empty_folders, flatten_tree, iter_analyzed_files,
+                              prune_empty_folders)
+
+
+def test_flatten_and_path_view():
+    tree = {"a": {"b": {"c": 1}, "empty": {}}, "d": 2}
+
+    assert flatten_tree(tree) == {"a/b/c": 1, "d": 2}
+    view = TreePathView(tree)
+    assert view["a/b/c"] == 1
+    assert list(view) == ["a/b/c", "d"]
+    assert len(view) == 2
+    assert "a/b" not in view
+    tree["a"]["e"] = 3
+    assert view["a/e"] == 3
+
+
+def test_deep_trees_do_not_recurse():
+    tree = node = {}
+    for _ in range(5000):
+        node["d"] = {}
+        node = node["d"]
+    node["file.cs"] = "x"
+
+    assert list(flatten_tree(tree).values()) == ["x"]
+
+
+def test_analyzed_files_stop_at_file_type():
+    tree = {"Web": {"Home.aspx": {"file_type": "page", "controls": {"grid": {}}}, "site.css": "css"}}
+
+    assert [path for path, _ in iter_analyzed_files(tree)] == ["Web/Home.aspx", "Web/site.css"]
+    assert list(iter_analyzed_files(None)) == []
+
+
+def folders():
+    return {
+        "Controllers": {"target_files": {"HomeController.cs": {}}, "subfolders": {}},
+        "Models": {"target_files": {}, "subfolders": {"Dtos": {"target_files": []}}},
+        "Services": {"target_files": {}, "subfolders": {"Impl": {"target_files": {"OrderService.cs": {}}}}},
+    }
+
+
+def test_prune_empty_folders_in_place():
+    tree = folders()
+    removed = []
+
+    assert prune_empty_folders(tree, on_remove=removed.append) == 2
+    # Post-order: a subfolder goes before the folder that only it kept
+    assert removed == ["Models/Dtos", "Models"]
+    assert sorted(tree) == ["Controllers", "Services"]
+
+
+def test_clear_empty_folders_shares_untouched_subtrees():
+    structure = {"folders": folders()}
+    result = clear_empty_folders(structure)
+
+    assert "Models" in structure["folders"]
+    assert sorted(result["folders"]) == ["Controllers", "Services"]
+    assert result["folders"]["Services"] is structure["folders"]["Services"]
+    unchanged = {"folders": {"Controllers": structure["folders"]["Controllers"]}}
+    assert clear_empty_folders(unchanged) is unchanged
+
+
+def test_clear_empty_folders_on_a_full_target_structure():
+    target = {"microservices": [{"name": "Orders", "projects": [{"target_structure": {"folders": folders()}}]}]}
+
+    pruned = clear_empty_folders(target)
+    assert sorted(pruned["microservices"][0]["projects"][0]["target_structure"]["folders"]) == ["Controllers", "Services"]
+    assert "Models" in target["microservices"][0]["projects"][0]["target_structure"]["folders"]
+    assert clear_empty_folders(target, in_place=True) is target
+    assert "Models" not in target["microservices"][0]["projects"][0]["target_structure"]["folders"]
@@ -0,0 +1,101 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional
+from llama_index.core.agent import ReActAgent
+from llama_index.core.llms import ChatMessage, MessageRole
+from llama_index.core.memory import ChatMemoryBuffer
+from config.settings import settings
+from utils.token_counter import token_counter
+
+NAMESPACE_PATTERN = re.compile(r"^\s*namespace\s+([\w.]+)", re.MULTILINE)
+TYPE_PATTERN = re.compile(
+    r"^\s*(?:\[[^\]]*\]\s*)*(?:(?:public|internal|static|sealed|abstract|partial|readonly)\s+)*"
+    r"(class|interface|record|struct|enum)\s+(\w+)",
+    re.MULTILINE
+)
+# Public members: the signature up to the body, expression body or initializer
+MEMBER_PATTERN = re.compile(r"^[ \t]*public[ \t]+(?![\w \t]*\b(?:class|interface|record|struct|enum)[ \t])([^{;=\n]+?)[ \t]*(?:\{|=>|;|=|$)", re.MULTILINE)
+# Proto services, messages and rpcs
+PROTO_PATTERN = re.compile(r"^\s*(service|message|rpc)\s+(\w+[^{;]*)", re.MULTILINE)
+MAX_MEMBERS_PER_FILE = 20
+
+
+def summarize_generated_file(label: str, code: str) -> Optional[str]:
+    """One compact entry (namespace, types, public members) for a generated C# or proto file; None for other files."""
+    if label.endswith(".proto"):
+        declarations = [f"{kind} {signature.strip()}" for kind, signature in PROTO_PATTERN.findall(code)]
+        if not declarations:
+            return None
+        return f"- {label}: " + "; ".join(declarations[:MAX_MEMBERS_PER_FILE])
+    if not label.endswith(".cs"):
+        return None
+    types = [f"{kind} {name}" for kind, name in TYPE_PATTERN.findall(code)]
+    if not types:
+        return None
+    namespace = NAMESPACE_PATTERN.search(code)
+    members = [" ".join(member.split()) for member in MEMBER_PATTERN.findall(code)]
+    entry = f"- {label}: {', '.join(types)}"
+    if namespace:
+        entry += f" in {namespace.group(1)}"
+    if members:
+        entry += "\n  public: " + "; ".join(members[:MAX_MEMBERS_PER_FILE])
+    return entry
+
+
+class MicroserviceAgent:
+    """
+    ReAct agent of one microservice with bounded memory. Instead of one chat history shared by
+    every file (which grows with each generation until the buffer cuts it at an arbitrary
+    point), each chat() starts from a fresh memory holding only compact summaries of the files
+    generated so far, newest first, within `token_budget` tokens. The prompt already carries the
+    file's own context, so no raw transcript of earlier files is needed.
+    """
+
+    def __init__(self, tools: List, llm, token_budget: Optional[int] = None,
+                 count_tokens: Callable[[str], int] = token_counter.count):
+        self.tools = tools
+        self.llm = llm
+        self.token_budget = settings.AGENT_MEMORY_TOKEN_LIMIT if token_budget is None else token_budget
+        self.count_tokens = count_tokens
+        self._summaries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, label: str, code: str) -> None:
+        """Remember a generated file; a regenerated file replaces its earlier summary."""
+        summary = summarize_generated_file(label, code)
+        if summary is None:
+            return
+        with self._lock:
+            self._summaries.pop(label, None)
+            self._summaries[label] = summary
+
+    def summary(self) -> str:
+        with self._lock:
+            entries = list(reversed(self._summaries.values()))
+        header = "Files already generated in this microservice (type names, namespaces, public members):"
+        kept: List[str] = []
+        remaining = self.token_budget - self.count_tokens(header)
+        for entry in entries:
+            tokens = self.count_tokens(entry)
+            if tokens > remaining:
+                break
+            kept.append(entry)
+            remaining -= tokens
+        return header + "\n" + "\n".join(kept) if kept else ""
+
+    def memory(self) -> ChatMemoryBuffer:
+        """Fresh memory for one file, seeded with the generated-file summaries."""
+        summary = self.summary()
+        history = [ChatMessage(role=MessageRole.SYSTEM, content=summary)] if summary else []
+        # Counted with the same encoding as the summary, with room for message overhead
+        return ChatMemoryBuffer.from_defaults(chat_history=history, token_limit=self.token_budget + 100,
+                                              tokenizer_fn=token_counter.encoder.encode)
+
+    def chat(self, prompt: str):
+        agent = ReActAgent.from_tools(tools=self.tools, llm=self.llm, verbose=True, memory=self.memory())
+        return agent.chat(prompt)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._summaries.clear()
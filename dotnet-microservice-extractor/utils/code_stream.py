@@ -0,0 +1,156 @@
+"""
+Incremental handling of a streamed {"generated_code": ..., "dependencies": [...]} response, so
+generated code can be written to disk while the model is still producing it.
+"""
+import json
+import re
+from typing import List, Optional
+from utils.file_utils import CODE_BLOCK_MARKERS
+
+CODE_KEY_PATTERN = re.compile(r'"generated_code"\s*:\s*"')
+DEPENDENCIES_PATTERN = re.compile(r'"dependencies"\s*:\s*(\[[^\]]*\]?)')
+STRING_SPECIALS = re.compile(r'["\\]')
+ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+# Longest run of a possible code block marker that must be held back between chunks
+MARKER_HOLDBACK = max(len(marker) for marker in CODE_BLOCK_MARKERS) - 1
+
+
+class GeneratedCodeDecoder:
+    """
+    Decodes the "generated_code" string of a JSON object as its text arrives. feed() takes the
+    accumulated JSON text and returns the code decoded since the last call; `complete` tells
+    whether the string was closed, i.e. whether the response was cut off inside the code.
+    """
+
+    def __init__(self):
+        self.consumed = 0
+        self.started = False
+        self.complete = False
+        self._pending = ""
+        self._before: List[str] = []
+        self._after: List[str] = []
+
+    def feed(self, accumulated: str) -> str:
+        delta = accumulated[self.consumed:]
+        self.consumed = len(accumulated)
+        if self.complete:
+            self._after.append(delta)
+            return ""
+        text = self._pending + delta
+        self._pending = ""
+        if not self.started:
+            match = CODE_KEY_PATTERN.search(text)
+            if match is None:
+                # Keep the text so far for the key search and for dependencies listed first
+                self._pending = text
+                return ""
+            self.started = True
+            self._before.append(text[:match.start()])
+            text = text[match.end():]
+        return self._decode(text)
+
+    def _decode(self, text: str) -> str:
+        out: List[str] = []
+        i = 0
+        n = len(text)
+        while i < n:
+            match = STRING_SPECIALS.search(text, i)
+            if match is None:
+                out.append(text[i:])
+                break
+            j = match.start()
+            out.append(text[i:j])
+            if text[j] == '"':
+                self.complete = True
+                self._after.append(text[j + 1:])
+                break
+            # Escape sequence; hold it back until it has fully arrived
+            if j + 1 >= n:
+                self._pending = text[j:]
+                break
+            kind = text[j + 1]
+            if kind != "u":
+                out.append(ESCAPES.get(kind, kind))
+                i = j + 2
+                continue
+            end = j + 6
+            if end <= n and 0xD800 <= int(text[j + 2:end], 16) <= 0xDBFF:
+                # High surrogate: decode together with the low surrogate that follows
+                end = j + 12
+            if end > n:
+                self._pending = text[j:]
+                break
+            out.append(json.loads(f'"{text[j:end]}"'))
+            i = end
+        return "".join(out)
+
+    def dependencies(self) -> List[str]:
+        """Dependencies listed before or after the code; lenient about an array cut off mid-way."""
+        rest = "".join(self._before) + "".join(self._after) + (self._pending if not self.started else "")
+        match = DEPENDENCIES_PATTERN.search(rest)
+        if match is None:
+            return []
+        try:
+            return [str(dependency) for dependency in json.loads(match.group(1))]
+        except ValueError:
+            return re.findall(r'"([^"\\]+)"', match.group(1))
+
+
+class StreamingSanitizer:
+    """
+    sanitize_content() for text that arrives in pieces: code block markers are removed, leading
+    whitespace is dropped and trailing whitespace is only emitted once more code follows it.
+    """
+
+    def __init__(self):
+        self._held = ""
+        self._whitespace = ""
+        self._started = False
+
+    @staticmethod
+    def _strip_markers(text: str) -> str:
+        for marker in CODE_BLOCK_MARKERS:
+            text = text.replace(marker, "")
+        return text
+
+    def _emit(self, text: str) -> str:
+        if not self._started:
+            text = text.lstrip()
+            if not text:
+                return ""
+            self._started = True
+        body = text.rstrip()
+        if not body:
+            self._whitespace += text
+            return ""
+        out = self._whitespace + body
+        self._whitespace = text[len(body):]
+        return out
+
+    def feed(self, text: str) -> str:
+        text = self._held + text
+        # The end may be the start of a marker whose remaining characters have not arrived yet,
+        # and a marker must not be cut in two by the split
+        split = max(len(text) - MARKER_HOLDBACK, 0)
+        for start in range(max(split - MARKER_HOLDBACK, 0), split):
+            if any(text.startswith(marker, start) and start + len(marker) > split for marker in CODE_BLOCK_MARKERS):
+                split = start
+                break
+        # Removing a marker can join the quotes around it into a new one, so never split after a quote
+        while split > 0 and text[split - 1] in "`'":
+            split -= 1
+        self._held = text[split:]
+        return self._emit(self._strip_markers(text[:split]))
+
+    def finish(self) -> str:
+        text = self._strip_markers(self._held)
+        self._held = ""
+        return self._emit(text)
+
+
+def final_result_args(message) -> Optional[str]:
+    """JSON arguments streamed so far for the structured result of a pydantic-ai model response."""
+    for part in getattr(message, "parts", []):
+        if getattr(part, "part_kind", None) == "tool-call":
+            return part.args_as_json_str()
+    return None
@@ -0,0 +1,132 @@
+import os
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from config.settings import settings
+from utils import logger
+from utils.file_cache import FileCache
+from utils.generation_scheduler import IDENTIFIER_PATTERN, GenerationTask
+from utils.source_index import SourcePathIndex
+from utils.tree_utils import iter_analyzed_files
+
+# Analysis fields quoted for each source file, in this order
+ANALYSIS_FIELDS = ("description", "classnames", "methods", "dependencies", "external_references", "patterns_used")
+# A generated file is cut rather than dropped when at least this many tokens of budget are left
+MIN_TRUNCATED_TOKENS = 200
+
+
+class GenerationContextBuilder:
+    """
+    Collects the context a target file needs before it is generated, instead of letting the
+    agent discover it one tool call at a time:
+
+    1. the analysis entries of its source_files,
+    2. the types of the same microservice it references (name, file type, namespace, description),
+    3. the code of referenced files that are already generated, in task (dependency) order.
+
+    Sections are added in that priority until the token budget is spent. Only files that are
+    guaranteed to exist when the task starts are quoted (its DAG dependencies and files not
+    scheduled in this run), so the same inputs always produce the same bundle.
+    """
+
+    def __init__(self, analysis_tree: Dict, count_tokens: Callable[[str], int], token_budget: Optional[int] = None):
+        self.analysis_files: Dict[str, Dict] = {
+            path: entry for path, entry in iter_analyzed_files(analysis_tree) if isinstance(entry, dict)
+        }
+        self.index = SourcePathIndex(self.analysis_files)
+        self.count_tokens = count_tokens
+        self.token_budget = settings.CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+
+    def analysis_entry(self, source_file: str) -> Optional[Tuple[str, Dict]]:
+        """Analysis of a source file; target structures may omit or add a leading directory."""
+        path = source_file.replace("\\", "/").strip("/")
+        if path in self.analysis_files:
+            return path, self.analysis_files[path]
+        candidates = self.index.ends_with(f"/{path}")
+        if not candidates and "/" in path:
+            candidates = self.index.ends_with(f"/{path.split('/', 1)[1]}")
+        if not candidates:
+            return None
+        return candidates[0], self.analysis_files[candidates[0]]
+
+    @staticmethod
+    def index_types(tasks: List[GenerationTask]) -> Dict[str, List[GenerationTask]]:
+        """{type name: tasks defining it} for one microservice's tasks, kept in task order."""
+        types: Dict[str, List[GenerationTask]] = {}
+        for task in tasks:
+            if task.type_name:
+                types.setdefault(task.type_name, []).append(task)
+        return types
+
+    def referenced_names(self, task: GenerationTask, entries: List[Tuple[str, Dict]]) -> Set[str]:
+        names = task.mentions()
+        for _, entry in entries:
+            for field in ("classnames", "dependencies", "external_references"):
+                for value in entry.get(field) or []:
+                    names.update(IDENTIFIER_PATTERN.findall(str(value)))
+        if task.type_name:
+            # A class usually implements the interface named after it
+            names.add(f"I{task.type_name}")
+            names.discard(task.type_name)
+        return names
+
+    async def build(self, task: GenerationTask, types: Dict[str, List[GenerationTask]], order: Dict[str, int],
+                    scheduled: Set[str], file_cache: FileCache) -> str:
+        """
+        Context bundle for `task`. `types` comes from index_types, `order` maps task keys to
+        their position in the microservice's task list, `scheduled` holds the keys generated
+        in this run.
+        """
+        entries = [entry for entry in map(self.analysis_entry, task.file_info.get("source_files") or []) if entry]
+        names = self.referenced_names(task, entries)
+        referenced = sorted(
+            {other.key: other for name in names for other in types.get(name, []) if other.key != task.key}.values(),
+            key=lambda other: order.get(other.key, len(order))
+        )
+
+        blocks: List[str] = []
+        for path, entry in entries:
+            lines = [f"### Source analysis: {path} ({entry.get('file_type', 'unknown')})"]
+            for field in ANALYSIS_FIELDS:
+                value = entry.get(field)
+                if value:
+                    lines.append(f"{field}: {', '.join(map(str, value)) if isinstance(value, list) else value}")
+            blocks.append("\n".join(lines))
+        if referenced:
+            blocks.append("### Referenced types\n" + "\n".join(
+                f"- {other.type_name} ({other.file_info.get('file_type', 'unknown')}) in namespace "
+                f"{other.file_info.get('namespace') or other.project_name}: {other.file_info.get('description', '')}"
+                for other in referenced
+            ))
+
+        for other in referenced:
+            if other.key in scheduled and other.key not in task.dependencies:
+                # Generated concurrently with this task, so it may or may not exist yet
+                continue
+            try:
+                code = await file_cache.get_file_content(other.output_path)
+            except (FileNotFoundError, OSError):
+                continue
+            # Project-relative, so the prompt (and its cache key) does not depend on the output directory
+            path = os.path.relpath(other.output_path, other.project_dir).replace(os.sep, "/")
+            blocks.append(f"### Generated file: {other.project_name}/{path}\n{code}")
+
+        return self.fit(blocks, task.label)
+
+    def fit(self, blocks: List[str], label: str) -> str:
+        """Keep blocks in priority order within the token budget, cutting the first one that overflows."""
+        kept: List[str] = []
+        remaining = self.token_budget
+        for block in blocks:
+            tokens = self.count_tokens(block)
+            if tokens <= remaining:
+                kept.append(block)
+                remaining -= tokens
+                continue
+            if remaining >= MIN_TRUNCATED_TOKENS:
+                lines = block.splitlines()
+                while lines and self.count_tokens("\n".join(lines)) > remaining - 10:
+                    lines = lines[:len(lines) * 3 // 4]
+                if lines:
+                    kept.append("\n".join(lines) + "\n... (truncated)")
+            logger.debug(f"Context for {label} trimmed to {self.token_budget} tokens ({len(kept)} of {len(blocks)} blocks)")
+            break
+        return "\n\n".join(kept)
@@ -0,0 +1,329 @@
+"""
+Splits C# (and .proto) source into LLM-sized chunks at type and member boundaries.
+
+A small scanner walks the text once, skipping comments, preprocessor lines, char literals and
+every string form (regular, verbatim, interpolated with nested holes, raw), and tracks braces
+and parentheses. A line end is a split point when the code before it ends a statement or block
+and every enclosing block is a namespace or type body, i.e. never inside a method, property,
+initializer or enum. Each chunk repeats the file's using/namespace directives and the
+declarations of the types it sits in, and closes the braces it leaves open, so every chunk reads
+as well-formed code on its own.
+
+The exception is a single member larger than a chunk. It is split at line boundaries, so its
+parts are not well-formed; they carry SPLIT_MEMBER_CONTINUES / SPLIT_MEMBER_CONTINUED marker
+comments so the prompt can tell the model to continue the member rather than close it.
+"""
+import math
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Statements kept as shared header lines: C# usings and file-scoped namespaces, proto file options
+DIRECTIVE_PATTERN = re.compile(r"\s*(?:global\s+using|using|extern\s+alias|namespace|syntax|package|import|option)\b")
+# Blocks whose members may be split apart; everything else (methods, properties, enums, proto messages) stays whole
+CONTAINER_PATTERN = re.compile(
+    r"\s*(?:\[[^\]]*\]\s*)*"
+    r"(?:(?:public|private|protected|internal|static|sealed|abstract|partial|unsafe|new|readonly|ref|file)\s+)*"
+    r"(?:namespace|class|struct|interface|record)\b"
+)
+# Rough cost of one closing brace line appended to a chunk
+CLOSER_TOKENS = 2
+# A chunk may exceed the even share of the content by this much before rebalancing gives up
+BALANCE_SLACK = 1.15
+# Marker comments on the parts of a member split at line boundaries
+SPLIT_MEMBER_CONTINUES = "// [split member: continues in the next part]\n"
+SPLIT_MEMBER_CONTINUED = "// [split member: continued from the previous part]\n"
+
+
+def skip_string(text: str, i: int) -> Optional[int]:
+    """If a string literal (with any $/@ prefix) starts at `i`, return the index just past it."""
+    n = len(text)
+    j = i
+    interpolated = verbatim = False
+    while j < n and text[j] in "$@":
+        if text[j] == "$":
+            interpolated = True
+        else:
+            verbatim = True
+        j += 1
+    if j >= n or text[j] != '"':
+        return None
+    if text.startswith('"""', j):
+        quotes = 3
+        while text.startswith('"', j + quotes):
+            quotes += 1
+        end = text.find('"' * quotes, j + quotes)
+        return n if end < 0 else end + quotes
+
+    j += 1
+    depth = 0
+    while j < n:
+        c = text[j]
+        if depth == 0:
+            if c == "\\" and not verbatim:
+                j += 2
+                continue
+            if c == '"':
+                if verbatim and text.startswith('""', j):
+                    j += 2
+                    continue
+                return j + 1
+            if c == "\n" and not verbatim:
+                # Unterminated regular string: stop at the line end rather than swallow the file
+                return j
+            if interpolated and c == "{":
+                if text.startswith("{{", j):
+                    j += 2
+                    continue
+                depth = 1
+            j += 1
+            continue
+        # Inside an interpolation hole: nested strings, chars and braces
+        if c in '"$@':
+            end = skip_string(text, j)
+            if end is not None:
+                j = end
+                continue
+        elif c == "'":
+            end = skip_char(text, j)
+            if end is not None:
+                j = end
+                continue
+        elif c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+        j += 1
+    return n
+
+
+def skip_char(text: str, i: int) -> Optional[int]:
+    """If a char literal starts at `i`, return the index just past it."""
+    j = i + 1
+    if j < len(text) and text[j] == "\\":
+        end = text.find("'", j + 2)
+        return end + 1 if 0 <= end - i <= 10 else None
+    return j + 2 if text.startswith("'", j + 1) else None
+
+
+class Unit:
+    """Source text between two split points, with the container blocks open at either end."""
+
+    __slots__ = ("start", "end", "opened", "closed", "has_code", "tokens")
+
+    def __init__(self, start: int, end: int, opened: Tuple[int, ...], closed: Tuple[int, ...], has_code: bool):
+        self.start = start
+        self.end = end
+        self.opened = opened
+        self.closed = closed
+        self.has_code = has_code
+        self.tokens = 0
+
+
+class CSharpSegmenter:
+    """One scan of `content` into split points, container declarations and header directives."""
+
+    def __init__(self, content: str):
+        self.content = content
+        self.containers: List[str] = []
+        self.directives: List[Tuple[int, str]] = []
+        self.units: List[Unit] = []
+        self._scan()
+
+    def _scan(self) -> None:
+        text = self.content
+        n = len(text)
+        stack: List[Optional[int]] = []
+        code: List[str] = []
+        statement_start = 0
+        paren = 0
+        last = ";"
+        line_blank = True
+        has_code = False
+        previous, previous_stack = 0, ()
+
+        def split(position: int) -> None:
+            nonlocal previous, previous_stack, has_code
+            if paren or last not in ";{}" or None in stack or position <= previous:
+                return
+            self.units.append(Unit(previous, position, previous_stack, tuple(stack), has_code))
+            previous, previous_stack, has_code = position, tuple(stack), False
+
+        i = 0
+        while i < n:
+            c = text[i]
+            if c in " \t\r\n\f\v":
+                # Whitespace only separates words in the statement text used for classification
+                if code and code[-1] != " ":
+                    code.append(" ")
+                if c == "\n":
+                    split(i + 1)
+                    line_blank = True
+                i += 1
+                continue
+            if c == "#" and line_blank:
+                end = text.find("\n", i)
+                i = n if end < 0 else end
+                continue
+            line_blank = False
+            if text.startswith("//", i):
+                end = text.find("\n", i)
+                i = n if end < 0 else end
+                continue
+            if text.startswith("/*", i):
+                end = text.find("*/", i + 2)
+                i = n if end < 0 else end + 2
+                continue
+            if c in '"$@':
+                end = skip_string(text, i)
+                if end is not None:
+                    code.append('""')
+                    last = '"'
+                    has_code = True
+                    i = end
+                    continue
+            elif c == "'":
+                end = skip_char(text, i)
+                if end is not None:
+                    code.append("''")
+                    last = "'"
+                    has_code = True
+                    i = end
+                    continue
+
+            has_code = True
+            if c == "(":
+                paren += 1
+            elif c == ")":
+                paren = max(0, paren - 1)
+            if c == "{":
+                header = "".join(code)
+                if not paren and None not in stack and CONTAINER_PATTERN.match(header):
+                    stack.append(len(self.containers))
+                    self.containers.append(self._declaration(statement_start, i + 1))
+                else:
+                    stack.append(None)
+                code, statement_start = [], i + 1
+            elif c == "}":
+                if stack:
+                    stack.pop()
+                code, statement_start = [], i + 1
+            elif c == ";" and not paren:
+                if None not in stack and DIRECTIVE_PATTERN.match("".join(code)):
+                    self.directives.append((i, text[statement_start:i + 1].strip()))
+                code, statement_start = [], i + 1
+            else:
+                code.append(c)
+            last = c
+            i += 1
+
+        if previous < n:
+            self.units.append(Unit(previous, n, previous_stack, tuple(stack), has_code))
+
+    def _declaration(self, start: int, end: int) -> str:
+        """Declaration text of a container up to its `{`, without comment lines."""
+        lines = [line.rstrip() for line in self.content[start:end].splitlines()]
+        return "\n".join(line for line in lines if line.strip() and not line.strip().startswith("//"))
+
+    def merged_units(self) -> List[Unit]:
+        """Units with comment/attribute-only runs attached to the member that follows them."""
+        merged: List[Unit] = []
+        pending: Optional[Unit] = None
+        for unit in self.units:
+            if pending is not None:
+                unit = Unit(pending.start, unit.end, pending.opened, unit.closed, unit.has_code)
+                pending = None
+            if not unit.has_code:
+                pending = unit
+                continue
+            merged.append(unit)
+        if pending is not None:
+            if merged:
+                last = merged[-1]
+                merged[-1] = Unit(last.start, pending.end, last.opened, pending.closed, True)
+            else:
+                merged.append(pending)
+        return merged
+
+    def header(self, position: int, opened: Tuple[int, ...]) -> str:
+        """Directives before `position` plus the declarations of the containers open there."""
+        lines: List[str] = []
+        seen = set()
+        for directive_position, directive in self.directives:
+            if directive_position >= position:
+                break
+            if directive not in seen:
+                seen.add(directive)
+                lines.append(directive)
+        lines.extend(self.containers[container] for container in opened)
+        return "\n".join(lines) + "\n" if lines else ""
+
+
+def chunk_source(content: str, max_tokens: int, count_tokens: Callable[[str], int]) -> List[str]:
+    """
+    Split `content` into chunks of at most `max_tokens` tokens (as measured by `count_tokens`)
+    at member boundaries. Each unit is measured once; a member larger than a whole chunk is
+    split by lines into marked parts that are not well-formed on their own. Chunk sizes are then
+    evened out when that does not add chunks.
+    """
+    segmenter = CSharpSegmenter(content)
+    units = segmenter.merged_units()
+    for unit in units:
+        unit.tokens = count_tokens(content[unit.start:unit.end])
+    header_tokens: Dict[str, int] = {}
+
+    def pack(budget: int) -> Tuple[List[str], int]:
+        chunks: List[str] = []
+        largest_header = 0
+        i = 0
+        while i < len(units):
+            first = units[i]
+            header = segmenter.header(first.start, first.opened)
+            if header not in header_tokens:
+                header_tokens[header] = count_tokens(header) if header else 0
+            largest_header = max(largest_header, header_tokens[header])
+            room = max(budget - header_tokens[header], budget // 2)
+
+            if first.tokens > room:
+                # A single member larger than a chunk: fall back to line boundaries
+                pieces: List[str] = []
+                piece: List[str] = []
+                used = 0
+                for line in content[first.start:first.end].splitlines(keepends=True):
+                    line_tokens = count_tokens(line)
+                    if piece and used + line_tokens > room:
+                        pieces.append("".join(piece))
+                        piece, used = [], 0
+                    piece.append(line)
+                    used += line_tokens
+                if piece:
+                    pieces.append("".join(piece))
+                for k, text in enumerate(pieces):
+                    if not text.endswith("\n"):
+                        text += "\n"
+                    continued = SPLIT_MEMBER_CONTINUED if k > 0 else ""
+                    if k < len(pieces) - 1:
+                        chunks.append(header + continued + text + SPLIT_MEMBER_CONTINUES)
+                    else:
+                        chunks.append(header + continued + text + "}\n" * len(first.closed))
+                i += 1
+                continue
+
+            used = 0
+            j = i
+            while j < len(units) and used + units[j].tokens + CLOSER_TOKENS * len(units[j].closed) <= room:
+                used += units[j].tokens
+                j += 1
+            body = content[first.start:units[j - 1].end]
+            closers = "}\n" * len(units[j - 1].closed)
+            chunks.append(header + body + ("\n" if closers and not body.endswith("\n") else "") + closers)
+            i = j
+        return chunks, largest_header
+
+    chunks, largest_header = pack(max_tokens)
+    if len(chunks) > 1:
+        share = math.ceil(sum(unit.tokens for unit in units) / len(chunks) * BALANCE_SLACK) + largest_header
+        if share < max_tokens:
+            balanced, _ = pack(share)
+            if len(balanced) <= len(chunks):
+                chunks = balanced
+    return chunks
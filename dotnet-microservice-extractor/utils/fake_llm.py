@@ -0,0 +1,581 @@
+"""
+Offline stand-in for Azure OpenAI (LLM_BACKEND=fake). It serves deterministic, schema-valid
+responses to pydantic-ai agents, LlamaIndex complete/chat (including ReAct agents) and
+embeddings, with simulated latency, 429/5xx injection and token accounting, so the pipeline's
+own overhead can be measured and load tested without a live deployment.
+"""
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import httpx
+import openai
+import yaml
+from pydantic import PrivateAttr
+from pydantic_ai.messages import ModelMessage, ModelRequest, ModelResponse, TextPart, ToolCallPart
+from pydantic_ai.models import AgentModel, Model, StreamedResponse
+from pydantic_ai.settings import ModelSettings
+from pydantic_ai.tools import ToolDefinition
+from pydantic_ai.usage import Usage
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.base.llms.types import (
+    ChatMessage,
+    ChatResponse,
+    ChatResponseGen,
+    CompletionResponse,
+    CompletionResponseGen,
+    LLMMetadata,
+    MessageRole
+)
+from llama_index.core.llms.callbacks import llm_chat_callback, llm_completion_callback
+from llama_index.core.llms.custom import CustomLLM
+from utils import logger
+from utils.token_counter import token_counter
+
+FAKE_ENDPOINT = "https://fake-llm.invalid/openai/deployments"
+# Streamed responses arrive in pieces of about this many characters
+STREAM_CHUNK_CHARS = 48
+# Nesting below which optional fields and maps are still filled in; recursive schemas stop here
+MAX_SCHEMA_DEPTH = 6
+# Retry backoff of the openai client, which the fake replays for injected failures
+INITIAL_RETRY_DELAY = 0.5
+MAX_RETRY_DELAY = 8.0
+# A 429 comes back almost immediately
+RATE_LIMIT_RESPONSE_SECONDS = 0.05
+# ReAct agents ask for "Thought: ... Answer: ..." in their system header
+REACT_MARKER = "Answer: [your answer here"
+
+WORDS = ("service", "customer", "order", "request", "response", "repository", "handler", "model", "value",
+         "config", "entity", "context", "result", "event", "client", "item", "account", "product", "status")
+PACKAGES = ("Microsoft.EntityFrameworkCore", "Microsoft.Extensions.Logging", "Grpc.AspNetCore",
+            "Swashbuckle.AspNetCore", "AutoMapper", "FluentValidation", "Serilog.AspNetCore")
+FILE_NAME_PATTERN = re.compile(r"File to generate: (\S+)")
+NAMESPACE_PATTERN = re.compile(r"namespace for this file should be: ([\w.]+)")
+
+
+def _words(rng: random.Random, count: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def _pascal(rng: random.Random, count: int = 2) -> str:
+    return "".join(rng.choice(WORDS).capitalize() for _ in range(count))
+
+
+def fake_prose(rng: random.Random, tokens: int) -> str:
+    sentences = []
+    # About 1.3 tokens per word with the gpt-4o encoding
+    for _ in range(max(1, int(tokens / 1.3) // 10)):
+        sentences.append(_words(rng, 10).capitalize() + ".")
+    return " ".join(sentences)
+
+
+def fake_code(file_name: str, namespace: Optional[str], tokens: int, rng: random.Random) -> str:
+    """Plausible content of `file_name` of roughly `tokens` tokens."""
+    stem, _, extension = file_name.rpartition(".")
+    stem = re.sub(r"\W", "", stem.split("/")[-1]) or _pascal(rng)
+    budget = int(tokens * 3.5)
+    lines: List[str] = []
+    if extension == "csproj":
+        lines += ['<Project Sdk="Microsoft.NET.Sdk.Web">', "  <PropertyGroup>",
+                  "    <TargetFramework>net8.0</TargetFramework>", "  </PropertyGroup>", "  <ItemGroup>"]
+        for package in rng.sample(PACKAGES, 3):
+            lines.append(f'    <PackageReference Include="{package}" Version="8.0.0" />')
+        lines += ["  </ItemGroup>", "</Project>"]
+    elif extension == "proto":
+        lines += ['syntax = "proto3";', f"package {stem.lower()};", "", f"service {stem} {{"]
+        body = []
+        while sum(len(line) for line in lines + body) < budget:
+            name = _pascal(rng)
+            lines.append(f"  rpc Get{name} (Get{name}Request) returns (Get{name}Reply);")
+            body += ["", f"message Get{name}Request {{", "  int32 id = 1;", "}",
+                     f"message Get{name}Reply {{", "  string value = 1;", "}"]
+        lines += ["}"] + body
+    elif extension == "json":
+        settings = {_pascal(rng): {"Enabled": True, "Value": _words(rng, 2)}
+                    for _ in range(max(1, budget // 60))}
+        return json.dumps(settings, indent=2)
+    elif extension in ("cs", "cshtml", "razor"):
+        lines += ["using System;", "using System.Threading.Tasks;", "",
+                  f"namespace {namespace or 'Contoso.' + _pascal(rng, 1)};", "",
+                  "/// <summary>", f"/// {_words(rng, 8).capitalize()}.", "/// </summary>", f"public class {stem}", "{"]
+        while sum(len(line) for line in lines) < budget:
+            name = _pascal(rng)
+            lines += ["    /// <summary>", f"    /// {_words(rng, 6).capitalize()}.", "    /// </summary>",
+                      f"    public async Task<string> {name}Async(int id)", "    {",
+                      "        await Task.Yield();", f'        return $"{_words(rng, 3)} {{id}}";', "    }", ""]
+        lines.append("}")
+    else:
+        while sum(len(line) for line in lines) < budget:
+            lines.append(f"# {_words(rng, 10)}")
+    return "\n".join(lines)
+
+
+def fake_from_schema(schema: Dict, rng: random.Random, hints: Dict[str, Any], root: Optional[Dict] = None,
+                     name: str = "", depth: int = 0) -> Any:
+    """Deterministic value valid for a JSON schema (the subset pydantic emits); `hints` shape known fields."""
+    root = root or schema
+    if "$ref" in schema:
+        schema = root["$defs"][schema["$ref"].rsplit("/", 1)[-1]]
+    if "const" in schema:
+        return schema["const"]
+    if "enum" in schema:
+        return rng.choice(schema["enum"])
+    options = schema.get("anyOf") or schema.get("oneOf")
+    if options:
+        concrete = [option for option in options if option.get("type") != "null"]
+        if not concrete or (len(concrete) < len(options) and depth >= MAX_SCHEMA_DEPTH - 2):
+            return None
+        return fake_from_schema(concrete[0], rng, hints, root, name, depth)
+    kind = schema.get("type", "object")
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != "null"), "null")
+    if kind == "object":
+        properties = schema.get("properties")
+        if properties:
+            required = set(schema.get("required", []))
+            return {key: fake_from_schema(value, rng, hints, root, key, depth + 1)
+                    for key, value in properties.items() if key in required or depth < MAX_SCHEMA_DEPTH}
+        values = schema.get("additionalProperties")
+        if not isinstance(values, dict) or depth >= MAX_SCHEMA_DEPTH:
+            return {}
+        # Maps of files (target_files, root) get file names as keys
+        keys = [f"{_pascal(rng)}.cs" if "file" in name or name == "root" else _pascal(rng, 1) for _ in range(rng.randint(1, 2))]
+        return {key: fake_from_schema(values, rng, hints, root, name, depth + 1) for key in keys}
+    if kind == "array":
+        if depth >= MAX_SCHEMA_DEPTH:
+            return []
+        count = max(schema.get("minItems", 0), rng.randint(1, 3))
+        return [fake_from_schema(schema.get("items", {}), rng, hints, root, name, depth + 1) for _ in range(count)]
+    if kind == "string":
+        if name == "generated_code":
+            return fake_code(hints["file_name"], hints.get("namespace"), hints["tokens"], rng)
+        if name == "namespace":
+            return hints.get("namespace") or f"Contoso.{_pascal(rng, 1)}"
+        if name == "dependencies":
+            return rng.choice(PACKAGES)
+        if name == "project_name":
+            return f"Contoso.{_pascal(rng, 1)}"
+        if name in ("description", "extra_notes"):
+            return fake_prose(rng, 40)
+        if name == "routes":
+            return f"/api/{rng.choice(WORDS)}s"
+        return _words(rng, 3)
+    if kind == "integer":
+        return rng.randint(0, 100)
+    if kind == "number":
+        return round(rng.uniform(0, 100), 2)
+    if kind == "boolean":
+        return rng.random() < 0.5
+    return None
+
+
+def _request_text(messages: List[ModelMessage]) -> str:
+    """Prompt text of a pydantic-ai conversation: system/user prompts, tool returns and retries."""
+    texts = []
+    for message in messages:
+        if not isinstance(message, ModelRequest):
+            continue
+        for part in message.parts:
+            if part.part_kind in ("system-prompt", "user-prompt"):
+                texts.append(part.content)
+            elif part.part_kind == "tool-return":
+                texts.append(part.model_response_str())
+            elif part.part_kind == "retry-prompt":
+                texts.append(part.model_response())
+    return "\n".join(texts)
+
+
+class FakeLLMBackend:
+    """
+    Deterministic responses plus simulated model time. Content depends only on the seed, the
+    deployment and the prompt, so a run is reproducible; latency and faults come from one seeded
+    sequence. Latency is the time to the first token (median `latency_ms`, shaped by
+    `latency_distribution` and `latency_spread`) plus output tokens at `tokens_per_second`.
+    Injected 429s and 5xx errors are retried with the openai client's backoff up to `max_retries`
+    times before the error is raised, so failures cost the time they would against Azure.
+    """
+
+    def __init__(self, latency_ms: float = 500.0, latency_distribution: str = "lognormal", latency_spread: float = 0.5,
+                 tokens_per_second: float = 80.0, completion_tokens: int = 600, error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, max_retries: int = 3, seed: int = 0, embed_latency_ms: float = 30.0,
+                 embed_dimensions: int = 3072, fixtures_path: Optional[str] = None,
+                 count_tokens: Callable[[str], int] = token_counter.count):
+        self.latency_ms = latency_ms
+        self.latency_distribution = latency_distribution
+        self.latency_spread = latency_spread
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.max_retries = max_retries
+        self.seed = seed
+        self.embed_latency_ms = embed_latency_ms
+        self.embed_dimensions = embed_dimensions
+        self.count_tokens = count_tokens
+        self.fixtures = self._load_fixtures(fixtures_path) if fixtures_path else []
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._models: Dict[str, "FakeModel"] = {}
+        self._llms: Dict[str, "FakeLLM"] = {}
+        self.reset_stats()
+
+    @staticmethod
+    def _load_fixtures(path: str) -> List[Tuple["re.Pattern", str]]:
+        """Canned responses: a YAML list of {match: <regex searched in the prompt>, response: <text or JSON value>}."""
+        with open(path, "r", encoding="utf-8") as f:
+            entries = yaml.safe_load(f) or []
+        fixtures = []
+        for entry in entries:
+            response = entry["response"]
+            fixtures.append((re.compile(entry["match"], re.DOTALL),
+                             response if isinstance(response, str) else json.dumps(response)))
+        logger.info(f"Loaded {len(fixtures)} fake LLM fixtures from {path}")
+        return fixtures
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.stats = {"requests": 0, "attempts": 0, "rate_limited": 0, "server_errors": 0, "failed": 0,
+                          "prompt_tokens": 0, "completion_tokens": 0, "embedding_requests": 0, "embedding_tokens": 0,
+                          "simulated_seconds": 0.0, "deployments": {}}
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return json.loads(json.dumps(self.stats))
+
+    # Simulated model time
+
+    def _latency(self, median_ms: float) -> float:
+        if self.latency_distribution == "fixed":
+            factor = 1.0
+        elif self.latency_distribution == "uniform":
+            factor = self._rng.uniform(1 - self.latency_spread, 1 + self.latency_spread)
+        else:
+            factor = math.exp(self._rng.gauss(0, self.latency_spread))
+        return max(0.0, median_ms * factor / 1000)
+
+    def _fault_response(self, status: int) -> httpx.Response:
+        return httpx.Response(status, request=httpx.Request("POST", FAKE_ENDPOINT), headers={"retry-after": "1"})
+
+    def schedule(self, deployment: str, prompt_tokens: int, completion_tokens: int) -> Tuple[float, float, Optional[Exception]]:
+        """
+        Account for one request and plan its timing: (seconds until the first token, seconds per
+        output token, error to raise after waiting or None).
+        """
+        waited = 0.0
+        error: Optional[Exception] = None
+        with self._lock:
+            self.stats["requests"] += 1
+            for attempt in range(self.max_retries + 1):
+                self.stats["attempts"] += 1
+                roll = self._rng.random()
+                if roll < self.rate_limit_rate:
+                    self.stats["rate_limited"] += 1
+                    waited += RATE_LIMIT_RESPONSE_SECONDS
+                    error = openai.RateLimitError("Fake LLM: rate limit exceeded", response=self._fault_response(429), body=None)
+                elif roll < self.rate_limit_rate + self.error_rate:
+                    self.stats["server_errors"] += 1
+                    waited += self._latency(self.latency_ms)
+                    error = openai.InternalServerError("Fake LLM: injected server error", response=self._fault_response(500), body=None)
+                else:
+                    waited += self._latency(self.latency_ms)
+                    error = None
+                    break
+                if attempt < self.max_retries:
+                    waited += min(INITIAL_RETRY_DELAY * 2 ** attempt, MAX_RETRY_DELAY) * (1 - 0.25 * self._rng.random())
+            per_token = 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+            if error is None:
+                usage = self.stats["deployments"].setdefault(deployment, {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0})
+                usage["requests"] += 1
+                usage["prompt_tokens"] += prompt_tokens
+                usage["completion_tokens"] += completion_tokens
+                self.stats["prompt_tokens"] += prompt_tokens
+                self.stats["completion_tokens"] += completion_tokens
+                self.stats["simulated_seconds"] += waited + completion_tokens * per_token
+            else:
+                self.stats["failed"] += 1
+                self.stats["simulated_seconds"] += waited
+        return waited, per_token, error
+
+    def embedding_wait(self, texts: Sequence[str]) -> float:
+        tokens = sum(self.count_tokens(text) for text in texts)
+        with self._lock:
+            self.stats["embedding_requests"] += 1
+            self.stats["embedding_tokens"] += tokens
+            wait = self._latency(self.embed_latency_ms)
+            self.stats["simulated_seconds"] += wait
+        return wait
+
+    # Deterministic content
+
+    def _content_rng(self, deployment: str, prompt: str) -> random.Random:
+        digest = hashlib.sha256(f"{self.seed}:{deployment}:{prompt}".encode("utf-8", "surrogatepass")).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def _hints(self, prompt: str, rng: random.Random) -> Dict[str, Any]:
+        file_name = FILE_NAME_PATTERN.search(prompt)
+        namespace = NAMESPACE_PATTERN.search(prompt)
+        return {
+            "file_name": file_name.group(1) if file_name else f"{_pascal(rng)}.cs",
+            "namespace": namespace.group(1) if namespace else None,
+            "tokens": max(50, int(self.completion_tokens * rng.uniform(0.5, 1.5)))
+        }
+
+    def respond(self, deployment: str, prompt: str, schema: Optional[Dict] = None) -> str:
+        """Response text for `prompt`: a matching fixture, else JSON valid for `schema`, else code or prose."""
+        for pattern, response in self.fixtures:
+            if pattern.search(prompt):
+                return response
+        rng = self._content_rng(deployment, prompt)
+        hints = self._hints(prompt, rng)
+        if schema is not None:
+            return json.dumps(fake_from_schema(schema, rng, hints))
+        if '"generated_code"' in prompt:
+            return json.dumps({"generated_code": fake_code(hints["file_name"], hints["namespace"], hints["tokens"], rng),
+                               "dependencies": rng.sample(PACKAGES, 2)})
+        return fake_prose(rng, hints["tokens"])
+
+    def embed(self, text: str) -> List[float]:
+        """Hashed bag of words, normalized: deterministic, and texts sharing words land close together."""
+        vector = [0.0] * self.embed_dimensions
+        for word in re.findall(r"\w+", text.lower()):
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            index = int.from_bytes(digest[:4], "big") % self.embed_dimensions
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    # Clients
+
+    def pydantic_model(self, deployment: str) -> "FakeModel":
+        with self._lock:
+            model = self._models.get(deployment)
+            if model is None:
+                model = self._models[deployment] = FakeModel(self, deployment)
+            return model
+
+    def llm(self, deployment: str) -> "FakeLLM":
+        with self._lock:
+            llm = self._llms.get(deployment)
+            if llm is None:
+                llm = self._llms[deployment] = FakeLLM(self, deployment_name=deployment)
+            return llm
+
+    def embed_model(self) -> "FakeEmbedding":
+        return FakeEmbedding(self)
+
+    def log_summary(self) -> None:
+        stats = self.snapshot()
+        logger.info(f"Fake LLM: {stats['requests']} requests ({stats['attempts']} attempts, {stats['rate_limited']} rate limited, "
+                    f"{stats['server_errors']} server errors, {stats['failed']} failed), {stats['prompt_tokens']:,} prompt / "
+                    f"{stats['completion_tokens']:,} completion tokens, {stats['simulated_seconds']:.1f}s simulated model time")
+
+
+class FakeModel(Model):
+    """pydantic-ai model of one fake deployment; the result tool is always called with schema-valid arguments."""
+
+    def __init__(self, backend: FakeLLMBackend, deployment: str):
+        self.backend = backend
+        self.deployment = deployment
+
+    async def agent_model(self, *, function_tools: List[ToolDefinition], allow_text_result: bool,
+                          result_tools: List[ToolDefinition]) -> AgentModel:
+        return FakeAgentModel(self, result_tools[0] if result_tools else None)
+
+    def name(self) -> str:
+        return f"fake:{self.deployment}"
+
+
+class FakeAgentModel(AgentModel):
+
+    def __init__(self, model: FakeModel, result_tool: Optional[ToolDefinition]):
+        self.model = model
+        self.result_tool = result_tool
+
+    def _respond(self, messages: List[ModelMessage]) -> Tuple[str, int, int, Tuple[float, float, Optional[Exception]]]:
+        backend = self.model.backend
+        prompt = _request_text(messages)
+        schema = self.result_tool.parameters_json_schema if self.result_tool else None
+        text = backend.respond(self.model.deployment, prompt, schema)
+        prompt_tokens = backend.count_tokens(prompt)
+        completion_tokens = backend.count_tokens(text)
+        return text, prompt_tokens, completion_tokens, backend.schedule(self.model.deployment, prompt_tokens, completion_tokens)
+
+    def _usage(self, prompt_tokens: int, completion_tokens: int) -> Usage:
+        return Usage(request_tokens=prompt_tokens, response_tokens=completion_tokens,
+                     total_tokens=prompt_tokens + completion_tokens, details={"cached_tokens": 0})
+
+    async def request(self, messages: List[ModelMessage], model_settings: Optional[ModelSettings]) -> Tuple[ModelResponse, Usage]:
+        text, prompt_tokens, completion_tokens, (first_token, per_token, error) = self._respond(messages)
+        await asyncio.sleep(first_token + completion_tokens * per_token)
+        if error is not None:
+            raise error
+        part = ToolCallPart(tool_name=self.result_tool.name, args=text) if self.result_tool else TextPart(content=text)
+        return ModelResponse(parts=[part], model_name=self.model.name()), self._usage(prompt_tokens, completion_tokens)
+
+    @asynccontextmanager
+    async def request_stream(self, messages: List[ModelMessage], model_settings: Optional[ModelSettings]) -> AsyncIterator[StreamedResponse]:
+        text, prompt_tokens, completion_tokens, (first_token, per_token, error) = self._respond(messages)
+        await asyncio.sleep(first_token)
+        if error is not None:
+            raise error
+        yield FakeStreamedResponse(self.model.name(), text=text, tool_name=self.result_tool.name if self.result_tool else None,
+                                   seconds_per_chunk=per_token * completion_tokens * STREAM_CHUNK_CHARS / max(len(text), 1),
+                                   final_usage=self._usage(prompt_tokens, completion_tokens))
+
+
+class FakeStreamedResponse(StreamedResponse):
+
+    def __init__(self, model_name: str, text: str, tool_name: Optional[str], seconds_per_chunk: float, final_usage: Usage):
+        super().__init__(_model_name=model_name)
+        self._text = text
+        self._tool_name = tool_name
+        self._seconds_per_chunk = seconds_per_chunk
+        self._final_usage = final_usage
+        self._timestamp = datetime.now(tz=timezone.utc)
+
+    async def _get_event_iterator(self):
+        for start in range(0, len(self._text), STREAM_CHUNK_CHARS):
+            if start:
+                await asyncio.sleep(self._seconds_per_chunk)
+            chunk = self._text[start:start + STREAM_CHUNK_CHARS]
+            if self._tool_name is None:
+                yield self._parts_manager.handle_text_delta(vendor_part_id="content", content=chunk)
+                continue
+            event = self._parts_manager.handle_tool_call_delta(
+                vendor_part_id=0, tool_name=self._tool_name if start == 0 else None, args=chunk, tool_call_id=None
+            )
+            if event is not None:
+                yield event
+        self._usage = self._final_usage
+
+    def timestamp(self) -> datetime:
+        return self._timestamp
+
+
+class FakeLLM(CustomLLM):
+    """
+    LlamaIndex LLM of one fake deployment. chat() answers directly instead of going through
+    complete(), so each call fires one start event (and one rate limiter reservation); prompts
+    of a ReAct agent get their answer in the Thought/Answer format.
+    """
+    deployment_name: str = "fake"
+    _backend: FakeLLMBackend = PrivateAttr()
+
+    def __init__(self, backend: FakeLLMBackend, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._backend = backend
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "fake_llm"
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(context_window=128000, num_output=4096, is_chat_model=True, model_name=f"fake:{self.deployment_name}")
+
+    def _prepare(self, prompt: str) -> Tuple[str, Tuple[float, float, Optional[Exception]]]:
+        text = self._backend.respond(self.deployment_name, prompt)
+        if REACT_MARKER in prompt:
+            text = f"Thought: I can answer without using any more tools.\nAnswer: {text}"
+        timing = self._backend.schedule(self.deployment_name, self._backend.count_tokens(prompt), self._backend.count_tokens(text))
+        return text, timing
+
+    def _respond(self, prompt: str) -> str:
+        text, (first_token, per_token, error) = self._prepare(prompt)
+        time.sleep(first_token + self._backend.count_tokens(text) * per_token)
+        if error is not None:
+            raise error
+        return text
+
+    async def _arespond(self, prompt: str) -> str:
+        text, (first_token, per_token, error) = self._prepare(prompt)
+        await asyncio.sleep(first_token + self._backend.count_tokens(text) * per_token)
+        if error is not None:
+            raise error
+        return text
+
+    def _stream(self, prompt: str) -> Iterator[Tuple[str, str]]:
+        text, (first_token, per_token, error) = self._prepare(prompt)
+        time.sleep(first_token)
+        if error is not None:
+            raise error
+        seconds_per_chunk = per_token * self._backend.count_tokens(text) * STREAM_CHUNK_CHARS / max(len(text), 1)
+        for start in range(0, len(text), STREAM_CHUNK_CHARS):
+            if start:
+                time.sleep(seconds_per_chunk)
+            yield text[:start + STREAM_CHUNK_CHARS], text[start:start + STREAM_CHUNK_CHARS]
+
+    def _chat_prompt(self, messages: Sequence[ChatMessage]) -> str:
+        return "\n".join(str(message.content or "") for message in messages)
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        return CompletionResponse(text=self._respond(prompt))
+
+    @llm_completion_callback()
+    async def acomplete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        return CompletionResponse(text=await self._arespond(prompt))
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseGen:
+        def gen() -> CompletionResponseGen:
+            for text, delta in self._stream(prompt):
+                yield CompletionResponse(text=text, delta=delta)
+        return gen()
+
+    @llm_chat_callback()
+    def chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        text = self._respond(self._chat_prompt(messages))
+        return ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content=text))
+
+    @llm_chat_callback()
+    async def achat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        text = await self._arespond(self._chat_prompt(messages))
+        return ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content=text))
+
+    @llm_chat_callback()
+    def stream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponseGen:
+        def gen() -> ChatResponseGen:
+            for text, delta in self._stream(self._chat_prompt(messages)):
+                yield ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content=text), delta=delta)
+        return gen()
+
+
+class FakeEmbedding(BaseEmbedding):
+    """LlamaIndex embeddings from FakeLLMBackend.embed; one simulated round trip per batch."""
+    _backend: FakeLLMBackend = PrivateAttr()
+
+    def __init__(self, backend: FakeLLMBackend, **kwargs: Any):
+        super().__init__(model_name="fake-embedding", **kwargs)
+        self._backend = backend
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "fake_embedding"
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._get_text_embeddings([query])[0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return (await self._aget_text_embeddings([query]))[0]
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return (await self._aget_text_embeddings([text]))[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self._backend.embedding_wait(texts))
+        return [self._backend.embed(text) for text in texts]
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self._backend.embedding_wait(texts))
+        return [self._backend.embed(text) for text in texts]
@@ -15,6 +15,10 @@ class FileCache:
             return content
         raise FileNotFoundError(f"File not found: {file_path}")
 
+    def remember(self, file_path: str, content: str):
+        """Cache content that was already written to file_path."""
+        self._cache[file_path] = content
+
     async def update_file(self, file_path: str, new_content: str):
         async with aiofiles.open(file_path, 'w', encoding='utf-8') as f:
             await f.write(new_content)
@@ -4,6 +4,7 @@ import yaml
 from typing import Dict, Optional
 import shutil 
 from utils import logger
+from utils.tree_utils import clear_empty_folders
 import stat
 from pathlib import Path
 
@@ -85,6 +86,13 @@ def ensure_directory_exists(path: str) -> None:
     os.makedirs(path, exist_ok=True)
 
 
+# Markdown code block indicators (with language specifiers) removed from generated content, in this order
+CODE_BLOCK_MARKERS = [
+    "```csharp", "```json", "```xml", "```cs", "```",
+    "'''csharp", "'''json", "'''xml", "'''cs", "'''"
+]
+
+
 def sanitize_content(content: str) -> str:
     """
     Remove markdown code block indicators and language specifiers from generated content.
@@ -96,13 +104,8 @@ def sanitize_content(content: str) -> str:
         Sanitized content string
     """
     # Remove markdown code block indicators and language specifiers
-    code_block_markers = [
-        "```csharp", "```json", "```xml", "```cs", "```",
-        "'''csharp", "'''json", "'''xml", "'''cs", "'''"
-    ]
-    
     result = content
-    for marker in code_block_markers:
+    for marker in CODE_BLOCK_MARKERS:
         result = result.replace(marker, "")
     
     return result.strip()
@@ -180,48 +183,3 @@ def copy_static_files_to_wwwroot(source_dir: str, project_dir: str) -> None:
                 target_file = join_paths(js_dir, file)
                 if not os.path.exists(target_file):
                     shutil.copy2(source_file, target_file)
-
-
-def clear_empty_folders(target_structure: dict) -> dict:
-    """
-    Recursively remove folders that do not contain any files.
-    A folder is considered empty if both its "target_files" (list or dict)
-    is empty and it has no non‑empty subfolders.
-    """
-    import copy
-    cleaned_structure = copy.deepcopy(target_structure)
-
-    def clean_folder(folder: dict) -> dict | None:
-        # Get and clean subfolders
-        subfolders = folder.get("subfolders", {})
-        new_subfolders = {}
-        for name, sub in subfolders.items():
-            cleaned_sub = clean_folder(sub)
-            if cleaned_sub is not None:
-                new_subfolders[name] = cleaned_sub
-
-        # Determine if current folder has files:
-        target_files = folder.get("target_files")
-        has_files = False
-        if target_files is not None:
-            if isinstance(target_files, dict):
-                has_files = len(target_files) > 0
-            elif isinstance(target_files, list):
-                has_files = len(target_files) > 0
-
-        # Folder is empty if there are no files and no subfolders with files.
-        if not has_files and len(new_subfolders) == 0:
-            return None
-
-        folder["subfolders"] = new_subfolders
-        return folder
-
-    folders = cleaned_structure.get("folders", {})
-    new_folders = {}
-    for folder_name, folder in folders.items():
-        cleaned = clean_folder(folder)
-        if cleaned is not None:
-            new_folders[folder_name] = cleaned
-    cleaned_structure["folders"] = new_folders
-
-    return cleaned_structure
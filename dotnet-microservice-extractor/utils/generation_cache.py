@@ -0,0 +1,107 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+from config.settings import settings
+from utils import logger
+
+# Bump when the way a response becomes a file changes (parsing, chunk merging), to drop old entries
+GENERATION_CACHE_VERSION = "2"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS generations (
+    key TEXT PRIMARY KEY,
+    file_name TEXT,
+    file_type TEXT,
+    model TEXT,
+    generated_code TEXT NOT NULL,
+    dependencies TEXT NOT NULL,
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    response_tokens INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    last_hit_at REAL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def generation_key(prompt: str, file_type: str, model: str) -> str:
+    """
+    Cache key of one generation. The rendered prompt already contains every input that shapes
+    the output: file_type prompt text from prompts.yml, description, instructions, namespace,
+    microservice/project/layer, target version and the source content.
+    """
+    digest = hashlib.sha256()
+    for part in (GENERATION_CACHE_VERSION, model, file_type, prompt):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class GenerationCache:
+    """
+    Persistent {prompt fingerprint: generated file} store in a local SQLite file, so re-running a
+    migration after editing part of the target structure only sends changed files to the LLM.
+    Safe to share between threads and processes; callers on the event loop use asyncio.to_thread.
+    """
+
+    def __init__(self, path: Optional[str] = None, enabled: Optional[bool] = None):
+        self.path = path or settings.GENERATION_CACHE_PATH
+        self.enabled = settings.GENERATION_CACHE_ENABLED if enabled is None else enabled
+        self._local = threading.local()
+        if self.enabled:
+            self._connect().executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str) -> Optional[Dict]:
+        if not self.enabled:
+            return None
+        connection = self._connect()
+        row = connection.execute("SELECT * FROM generations WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        connection.execute("UPDATE generations SET hits = hits + 1, last_hit_at = ? WHERE key = ?", (time.time(), key))
+        return {
+            "generated_code": row["generated_code"],
+            "dependencies": json.loads(row["dependencies"]),
+            "prompt_tokens": row["prompt_tokens"],
+            "response_tokens": row["response_tokens"]
+        }
+
+    def put(self, key: str, generated_code: str, dependencies: List[str], file_name: Optional[str] = None,
+            file_type: Optional[str] = None, model: Optional[str] = None, prompt_tokens: int = 0,
+            response_tokens: int = 0) -> None:
+        if not self.enabled:
+            return
+        self._connect().execute(
+            "INSERT OR REPLACE INTO generations (key, file_name, file_type, model, generated_code, dependencies, "
+            "prompt_tokens, response_tokens, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, file_name, file_type, model, generated_code, json.dumps(list(dependencies or [])),
+             prompt_tokens, response_tokens, time.time())
+        )
+        logger.debug(f"Cached generation for {file_name} ({key[:12]})")
+
+    def prune(self, max_age_days: float) -> int:
+        """Drop entries neither created nor hit within `max_age_days`; returns how many were removed."""
+        if not self.enabled:
+            return 0
+        cutoff = time.time() - max_age_days * 86400
+        cursor = self._connect().execute(
+            "DELETE FROM generations WHERE COALESCE(last_hit_at, created_at) < ?", (cutoff,)
+        )
+        return cursor.rowcount
+
+
+# Create singleton instance
+generation_cache = GenerationCache()
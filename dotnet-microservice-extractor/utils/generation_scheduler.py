@@ -0,0 +1,167 @@
+import asyncio
+import os
+import re
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+from utils import logger
+from utils.template_engine import LAYER_PROFILES
+
+IDENTIFIER_PATTERN = re.compile(r"[A-Za-z_]\w*")
+# Target files whose name is a type other files can reference
+TYPE_FILE_EXTENSIONS = (".cs", ".proto")
+# Files that never feed the project file's dependency list
+NON_AGGREGATED_EXTENSIONS = (".csproj", ".sln")
+
+
+class GenerationTask:
+    """One target file to generate, plus the keys of the tasks it has to wait for."""
+
+    def __init__(self, key: str, project_name: str, project_dir: str, output_path: str,
+                 file_info: Dict, layer: Optional[str] = None, label: Optional[str] = None):
+        self.key = key
+        self.label = label or output_path
+        self.project_name = project_name
+        self.project_dir = project_dir
+        self.output_path = output_path
+        self.file_info = file_info
+        self.layer = layer
+        self.file_name = os.path.basename(output_path)
+        self.dependencies: Set[str] = set()
+
+    @property
+    def is_csproj(self) -> bool:
+        return self.file_name.lower().endswith(".csproj")
+
+    @property
+    def type_name(self) -> Optional[str]:
+        """Type the file defines, e.g. "ProductService" for Services/ProductService.cs."""
+        if not self.file_name.lower().endswith(TYPE_FILE_EXTENSIONS) or self.file_name.lower() == "program.cs":
+            return None
+        return self.file_name.split(".")[0]
+
+    def mentions(self) -> Set[str]:
+        """Identifiers this file's description and instructions refer to."""
+        text = " ".join(str(self.file_info.get(field) or "") for field in ("description", "instructions"))
+        return set(IDENTIFIER_PATTERN.findall(text))
+
+
+def build_generation_dag(tasks: List[GenerationTask]) -> Dict[str, Set[str]]:
+    """
+    Fill in each task's dependencies and return {key: dependencies}.
+
+    - A project's .csproj waits for every other file of that project, because it aggregates
+      the dependencies they report.
+    - A file waits for files of the projects its layer references (Presentation -> Application,
+      Application -> Domain/Infrastructure, Infrastructure -> Domain) when it mentions the type
+      they define or is mapped from the same legacy source, so the generated type exists first.
+    Everything else is independent and may run concurrently.
+    """
+    by_project: Dict[str, List[GenerationTask]] = {}
+    for task in tasks:
+        by_project.setdefault(task.project_name, []).append(task)
+    project_layers = {name: project_tasks[0].layer for name, project_tasks in by_project.items()}
+
+    for project_name, project_tasks in by_project.items():
+        layer = project_layers[project_name]
+        referenced_layers = set(LAYER_PROFILES["csproj"].get(layer, {}).get("references", [])) if layer else set()
+        referenced_tasks = [
+            task for name, other_tasks in by_project.items()
+            if name != project_name and project_layers[name] in referenced_layers
+            for task in other_tasks if task.type_name
+        ]
+
+        for task in project_tasks:
+            if task.is_csproj:
+                task.dependencies.update(
+                    other.key for other in project_tasks
+                    if other is not task and not other.file_name.lower().endswith(NON_AGGREGATED_EXTENSIONS)
+                )
+                continue
+            if not referenced_tasks:
+                continue
+            mentions = task.mentions()
+            sources = set(task.file_info.get("source_files") or [])
+            for other in referenced_tasks:
+                if other.type_name in mentions or sources.intersection(other.file_info.get("source_files") or []):
+                    task.dependencies.add(other.key)
+
+    return {task.key: set(task.dependencies) for task in tasks}
+
+
+class GenerationScheduler:
+    """
+    Runs generation tasks in dependency order. A task starts as soon as everything it
+    depends on has finished (successfully or not); at most `max_concurrency` tasks run at once
+    across every microservice sharing the scheduler. With `shared_semaphore`, a callable
+    returning a semaphore shared beyond this scheduler (e.g. llm_config.generation_semaphore),
+    the limit is that semaphore's instead, so it holds across concurrent migrations.
+    """
+
+    def __init__(self, max_concurrency: int = 8,
+                 shared_semaphore: Optional[Callable[[], asyncio.Semaphore]] = None):
+        self.max_concurrency = max(1, max_concurrency)
+        self._shared_semaphore = shared_semaphore
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._shared_semaphore is not None:
+            return self._shared_semaphore()
+        # Created lazily so it binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _run_one(self, task: GenerationTask, worker: Callable[[GenerationTask], Awaitable[Dict]]) -> Dict:
+        async with self.semaphore:
+            return await worker(task)
+
+    async def run(self, tasks: List[GenerationTask],
+                  worker: Callable[[GenerationTask], Awaitable[Dict]]) -> Dict[str, object]:
+        """Return {task key: worker result or the exception it raised}."""
+        build_generation_dag(tasks)
+        by_key = {task.key: task for task in tasks}
+        waiting_on = {task.key: {dep for dep in task.dependencies if dep in by_key} for task in tasks}
+        dependents: Dict[str, List[str]] = {key: [] for key in by_key}
+        for key, deps in waiting_on.items():
+            for dep in deps:
+                dependents[dep].append(key)
+
+        results: Dict[str, object] = {}
+        running: Dict[asyncio.Task, str] = {}
+        pending = dict.fromkeys(by_key)
+
+        def start_ready() -> None:
+            for key in [key for key in pending if not waiting_on[key]]:
+                del pending[key]
+                running[asyncio.ensure_future(self._run_one(by_key[key], worker))] = key
+
+        try:
+            start_ready()
+            while running or pending:
+                if not running:
+                    # Only possible with a dependency cycle: release the remaining tasks rather than hang
+                    logger.warning(f"Dependency cycle among {sorted(pending)}; scheduling them without ordering")
+                    for key in pending:
+                        waiting_on[key].clear()
+                    start_ready()
+                    continue
+
+                done, _ = await asyncio.wait(list(running), return_when=asyncio.FIRST_COMPLETED)
+                for finished in done:
+                    key = running.pop(finished)
+                    if finished.cancelled():
+                        # Reported as a failure; CancelledError is not an Exception callers check for
+                        results[key] = RuntimeError(f"Generation of {by_key[key].label} was cancelled")
+                    else:
+                        exception = finished.exception()
+                        results[key] = exception if exception else finished.result()
+                    for dependent in dependents[key]:
+                        waiting_on[dependent].discard(key)
+                start_ready()
+        finally:
+            # Cancelling run() (e.g. a cancelled job) must not leave generations writing behind it
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+
+        return results
@@ -0,0 +1,128 @@
+import time
+from typing import Callable, Dict, List, Optional
+from utils import logger
+
+# Files generated outside the per-file pipeline (ocelot.json is built from the collected routes)
+NON_GENERATED_FILES = ("ocelot.json",)
+STALLED_FILES_REPORTED = 5
+
+
+def count_target_files(microservice: Dict) -> int:
+    """Number of target files a microservice's projects declare (root files plus every folder)."""
+    total = 0
+    for project in microservice.get("projects") or []:
+        structure = project.get("target_structure") or {}
+        total += sum(1 for name in (structure.get("root") or {}) if not name.endswith(NON_GENERATED_FILES))
+        stack = list((structure.get("folders") or {}).values())
+        while stack:
+            folder = stack.pop()
+            if not isinstance(folder, dict):
+                continue
+            total += len(folder.get("target_files") or {})
+            stack.extend((folder.get("subfolders") or {}).values())
+    return total
+
+
+class MigrationProgress:
+    """
+    Live progress of one migration. Turns per-file start/finish calls into events
+    ({"type": ..., "ts": ..., ...}) for `sink`, each finish carrying running totals per
+    microservice, the overall ETA and the longest-running files in flight. The ETA uses the
+    observed throughput of generated files only, since files restored from a checkpoint finish
+    instantly and would make it look too optimistic.
+    """
+
+    def __init__(self, sink: Optional[Callable[[Dict], None]] = None):
+        self.sink = sink
+        self.reset()
+
+    def reset(self) -> None:
+        self.microservices: Dict[str, Dict] = {}
+        self.in_flight: Dict[str, Dict] = {}
+        self.started_at: Optional[float] = None
+        self.generated_files = 0
+
+    def emit(self, event_type: str, **data) -> None:
+        if not self.sink:
+            return
+        try:
+            self.sink({"type": event_type, "ts": time.time(), **data})
+        except Exception as e:
+            # Progress reporting must never break generation
+            logger.warning(f"Failed to publish {event_type} event: {str(e)}")
+
+    def _microservice(self, ms_name: str) -> Dict:
+        return self.microservices.setdefault(ms_name, {
+            "total": 0, "done": 0, "failed": 0, "resumed": 0, "prompt_tokens": 0, "response_tokens": 0
+        })
+
+    def start(self, microservices: List[Dict], api_type: Optional[str] = None) -> None:
+        self.reset()
+        self.started_at = time.monotonic()
+        for microservice in microservices:
+            self._microservice(microservice.get("name", "Miscellaneous"))["total"] = count_target_files(microservice)
+        self.emit("migration_started", api_type=api_type, totals=self.totals())
+
+    def set_total(self, ms_name: str, total: int) -> None:
+        """Replace the estimate from the target structure with the scheduled file count."""
+        self._microservice(ms_name)["total"] = total
+
+    def file_started(self, ms_name: str, file_path: str, project_name: Optional[str] = None) -> None:
+        self.in_flight[file_path] = {"microservice": ms_name, "started": time.monotonic()}
+        self.emit("file_started", microservice=ms_name, project=project_name, file=file_path)
+
+    def file_finished(self, ms_name: str, file_path: str, result: Dict, latency: float, retries: int = 0) -> None:
+        self.in_flight.pop(file_path, None)
+        stats = self._microservice(ms_name)
+        token_usage = result.get("token_usage") or {}
+        stats["done"] += 1
+        stats["prompt_tokens"] += token_usage.get("prompt_tokens", 0)
+        stats["response_tokens"] += token_usage.get("response_tokens", 0)
+        if result.get("resumed"):
+            stats["resumed"] += 1
+        else:
+            self.generated_files += 1
+
+        failed = result.get("status") != "success"
+        if failed:
+            stats["failed"] += 1
+        self.emit(
+            "file_failed" if failed else "file_finished",
+            microservice=ms_name,
+            file=file_path,
+            generated_by=result.get("generated_by") or ("checkpoint" if result.get("resumed") else None),
+            prompt_tokens=token_usage.get("prompt_tokens", 0),
+            response_tokens=token_usage.get("response_tokens", 0),
+            latency_s=round(latency, 3),
+            retries=retries,
+            error=result.get("error"),
+            totals=self.totals()
+        )
+
+    def finish(self, status: str, **data) -> None:
+        self.emit(f"migration_{status}", totals=self.totals(), **data)
+
+    def eta_seconds(self) -> Optional[float]:
+        if self.started_at is None or not self.generated_files:
+            return None
+        total = sum(stats["total"] for stats in self.microservices.values())
+        done = sum(stats["done"] for stats in self.microservices.values())
+        elapsed = time.monotonic() - self.started_at
+        return round(max(total - done, 0) * elapsed / self.generated_files, 1)
+
+    def totals(self) -> Dict:
+        now = time.monotonic()
+        stalled = sorted(self.in_flight.items(), key=lambda item: item[1]["started"])[:STALLED_FILES_REPORTED]
+        return {
+            "files_total": sum(stats["total"] for stats in self.microservices.values()),
+            "files_done": sum(stats["done"] for stats in self.microservices.values()),
+            "files_failed": sum(stats["failed"] for stats in self.microservices.values()),
+            "files_resumed": sum(stats["resumed"] for stats in self.microservices.values()),
+            "elapsed_s": round(now - self.started_at, 1) if self.started_at is not None else 0.0,
+            "eta_s": self.eta_seconds(),
+            "microservices": {name: dict(stats) for name, stats in self.microservices.items()},
+            "in_flight": [
+                {"file": path, "microservice": info["microservice"], "running_s": round(now - info["started"], 1)}
+                for path, info in stalled
+            ]
+        }
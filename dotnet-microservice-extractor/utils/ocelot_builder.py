@@ -0,0 +1,192 @@
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from pydantic import BaseModel, Field
+from utils import logger
+
+AUTH_PORT = 5000
+FIRST_SERVICE_PORT = 5001
+GATEWAY_PORT = 5004
+GATEWAY_BASE_URL = f"http://localhost:{GATEWAY_PORT}"
+DEFAULT_HTTP_METHODS = ["GET", "POST", "PUT", "DELETE"]
+
+# Instruction keywords that ask for gateway behaviour the local builder cannot express.
+LLM_GATEWAY_KEYWORDS = [
+    "ocelot", "rate limit", "ratelimit", "qos", "quality of service", "load balanc",
+    "aggregat", "caching", "circuit breaker", "service discovery", "consul", "header transform"
+]
+
+
+class OcelotHostAndPort(BaseModel):
+    Host: str
+    Port: int = Field(..., ge=1, le=65535)
+
+
+class OcelotAuthenticationOptions(BaseModel):
+    AuthenticationProviderKey: str
+    AllowedScopes: List[str] = []
+
+
+class OcelotRoute(BaseModel):
+    DownstreamPathTemplate: str = Field(..., pattern=r"^/")
+    DownstreamScheme: str
+    DownstreamHostAndPorts: List[OcelotHostAndPort] = Field(..., min_length=1)
+    UpstreamPathTemplate: str = Field(..., pattern=r"^/")
+    UpstreamHttpMethod: List[str] = Field(..., min_length=1)
+    AuthenticationOptions: Optional[OcelotAuthenticationOptions] = None
+    Priority: Optional[int] = None
+
+
+class OcelotGlobalConfiguration(BaseModel):
+    BaseUrl: str
+
+
+class OcelotConfiguration(BaseModel):
+    Routes: List[OcelotRoute]
+    GlobalConfiguration: OcelotGlobalConfiguration
+
+
+def gateway_microservice_names(target_structure: Dict) -> List[str]:
+    """Return the route names of all non-gateway microservices, in target structure order."""
+    return [
+        ms["name"].replace("Api", "").lower()
+        for ms in target_structure.get("microservices", [])
+        if ms["name"].lower() != "gateway"
+    ]
+
+
+def assign_service_ports(microservices: List[str]) -> Dict[str, int]:
+    """Auth always listens on 5000, every other service on 5001 + its position."""
+    return {
+        ms_name: AUTH_PORT if ms_name == "auth" else FIRST_SERVICE_PORT + i
+        for i, ms_name in enumerate(microservices)
+    }
+
+
+def detect_auth_case(microservices: List[str]) -> str:
+    """Return 'none', 'separate' (dedicated auth service) or 'gateway' (auth handled in Gateway)."""
+    if not any("auth" in ms.lower() for ms in microservices):
+        return "none"
+    if "auth" in microservices:
+        return "separate"
+    return "gateway"
+
+
+def needs_llm_gateway(instruction: Optional[str]) -> bool:
+    """True when the instruction asks for gateway features beyond plain routing."""
+    if not instruction:
+        return False
+    instruction_lower = instruction.lower()
+    return any(keyword in instruction_lower for keyword in LLM_GATEWAY_KEYWORDS)
+
+
+def _normalize_route(route: str, controller_name: str) -> Optional[str]:
+    """
+    Turn an extracted controller route into an absolute Ocelot path template.
+    Relative action routes (e.g. "{id}") cannot be resolved without the class-level
+    route and are already covered by the catch-all route, so they are skipped.
+    """
+    route = route.strip()
+    if route.startswith("~/"):
+        route = route[1:]
+    if not (route.startswith("/") or route.lower().startswith("api/")):
+        return None
+    if "[action]" in route.lower():
+        return None
+    route = re.sub(r"\[controller\]", controller_name, route, flags=re.IGNORECASE)
+    # Ocelot does not understand route constraints such as {id:int}
+    route = re.sub(r"\{(\w+):[^}]+\}", r"{\1}", route)
+    return "/" + route.lstrip("/")
+
+
+def _route(path: str, port: int, authenticated: bool, priority: Optional[int] = None) -> Dict:
+    route = {
+        "DownstreamPathTemplate": path,
+        "DownstreamScheme": "http",
+        "DownstreamHostAndPorts": [{"Host": "localhost", "Port": port}],
+        "UpstreamPathTemplate": path,
+        "UpstreamHttpMethod": list(DEFAULT_HTTP_METHODS)
+    }
+    if authenticated:
+        route["AuthenticationOptions"] = {"AuthenticationProviderKey": "Bearer", "AllowedScopes": []}
+    if priority is not None:
+        route["Priority"] = priority
+    return route
+
+
+def collect_controller_routes(migration_results: List[Dict]) -> Dict[str, List[Tuple[str, str]]]:
+    """
+    Group the routes extracted from generated controllers by microservice route name.
+    Returns {ms_name: [(controller_name, route), ...]}.
+    """
+    routes_by_ms: Dict[str, List[Tuple[str, str]]] = {}
+    for result in migration_results or []:
+        ms_name = str(result.get("microservice", "")).replace("Api", "").lower()
+        for file_path, routes in (result.get("file_routes") or {}).items():
+            controller_name = os.path.basename(file_path)
+            if controller_name.endswith(".cs"):
+                controller_name = controller_name[:-3]
+            if controller_name.endswith("Controller"):
+                controller_name = controller_name[:-len("Controller")]
+            for route in routes:
+                routes_by_ms.setdefault(ms_name, []).append((controller_name.lower(), route))
+    return routes_by_ms
+
+
+def build_ocelot_config(microservices: List[str], auth_case: str,
+                        controller_routes: Optional[Dict[str, List[Tuple[str, str]]]] = None,
+                        base_url: str = GATEWAY_BASE_URL) -> Dict:
+    """
+    Build ocelot.json from the microservice list without calling the LLM.
+
+    Every service gets a /api/<ms>/{everything} catch-all route. Absolute routes
+    extracted from its generated controllers that fall outside that prefix get an
+    explicit route with a higher priority so Ocelot prefers them.
+    """
+    ports = assign_service_ports(microservices)
+    authenticated = auth_case in ("gateway", "separate")
+    routes = []
+    seen_templates = set()
+
+    if auth_case == "separate":
+        routes.append(_route("/auth/{everything}", AUTH_PORT, authenticated=False))
+        seen_templates.add("/auth/{everything}")
+
+    for ms_name in microservices:
+        port = ports[ms_name]
+        is_auth_route = ms_name == "auth"
+        catch_all = f"/api/{ms_name}/{{everything}}"
+        if catch_all.lower() not in seen_templates:
+            routes.append(_route(catch_all, port, authenticated=authenticated and not is_auth_route))
+            seen_templates.add(catch_all.lower())
+
+        for controller_name, raw_route in (controller_routes or {}).get(ms_name, []):
+            path = _normalize_route(raw_route, controller_name)
+            if not path or path.lower() in seen_templates:
+                continue
+            if path.lower().startswith(f"/api/{ms_name}/") or path.lower() == f"/api/{ms_name}":
+                continue
+            routes.append(_route(path, port, authenticated=authenticated and not is_auth_route, priority=1))
+            seen_templates.add(path.lower())
+
+    return {"Routes": routes, "GlobalConfiguration": {"BaseUrl": base_url}}
+
+
+def validate_ocelot_config(config: Dict) -> Dict:
+    """
+    Validate an ocelot configuration against the schema and reject duplicate upstream routes.
+    Returns the normalized configuration; raises ValueError if it is invalid.
+    """
+    try:
+        validated = OcelotConfiguration.model_validate(config)
+    except Exception as e:
+        raise ValueError(f"Invalid ocelot configuration: {str(e)}")
+
+    upstream = Counter(route.UpstreamPathTemplate.lower() for route in validated.Routes)
+    duplicates = sorted(path for path, count in upstream.items() if count > 1)
+    if duplicates:
+        raise ValueError(f"Invalid ocelot configuration: duplicate upstream routes {duplicates}")
+
+    logger.debug(f"Validated ocelot configuration with {len(validated.Routes)} routes")
+    return validated.model_dump(exclude_none=True)
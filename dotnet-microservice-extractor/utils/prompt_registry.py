@@ -0,0 +1,193 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+import yaml
+from utils import logger
+
+DEFAULT_PROMPTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts.yml")
+# Prompts that must exist for a migration to run
+REQUIRED_FILE_TYPES = ("ocelot",)
+# How often (seconds) current() checks prompts.yml for changes
+RELOAD_CHECK_INTERVAL = 2.0
+# Example microservice names in prompts.yml, replaced by the microservice being generated
+MICROSERVICE_PLACEHOLDER = re.compile(r"(customerGrpc|CustomerGrpc)")
+# Rules shared by every generated file; they open the prompt so it starts with the same bytes every time
+GENERATION_GUIDELINES = """Generate code for one file of a .NET project, following these strict guidelines:
+
+VALIDATION RULES:
+1. The file must contain exactly one primary type (class, interface, or record) for C# files.
+2. The namespace must reflect the project and folder structure.
+3. No regions or commented-out code are allowed.
+4. Follow standard .NET naming conventions.
+5. Include all necessary using directives at the top.
+
+Target Framework: {target_version}
+
+For csproj files: Use the computed list of dependencies to create corresponding PackageReference entries, including only packages that are not part of the default set for {target_version} (exclude system and default packages).
+
+Generate clean, modern .NET code using the following principles:
+- Leverage the latest C# features appropriate for the target framework.
+- Follow SOLID principles and adopt clean architecture.
+- Implement proper dependency injection.
+- Use async/await where applicable.
+- Handle errors appropriately.
+- Include XML documentation for public APIs.
+
+Output Requirements:
+The response MUST be a valid JSON object with exactly two keys:
+1. "generated_code": containing the generated code as a string.
+2. "dependencies": an array of dependency names.
+Do not include any extra text or commentary in the response.
+
+"""
+
+
+class PromptSet:
+    """
+    One validated version of prompts.yml. File-type prompts are compiled into segments around
+    the example microservice names, and rendered prompt prefixes are cached per
+    (file_type, microservice, project, layer, target version), so generating a file costs a dict
+    lookup instead of several replace passes and concatenations.
+    """
+
+    def __init__(self, raw: Dict, version: str):
+        self.raw = raw
+        self.version = version
+        self._compiled: Dict[str, List[str]] = {}
+        for file_type, entry in raw["file_type_prompts"].items():
+            if isinstance(entry, dict):
+                self._compiled[file_type] = MICROSERVICE_PLACEHOLDER.split(entry["prompt"])
+        self._prefixes: Dict[Tuple, str] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def validate(raw: Dict) -> None:
+        if not isinstance(raw, dict) or not isinstance(raw.get("file_type_prompts"), dict):
+            raise ValueError("prompts.yml must define a 'file_type_prompts' mapping")
+        for file_type, entry in raw["file_type_prompts"].items():
+            # Plain strings are shared guideline text; file types are {"prompt": ...}
+            if isinstance(entry, dict) and not isinstance(entry.get("prompt"), str):
+                raise ValueError(f"'file_type_prompts.{file_type}' has no 'prompt' text")
+        for file_type in REQUIRED_FILE_TYPES:
+            if not isinstance(raw["file_type_prompts"].get(file_type), dict):
+                raise ValueError(f"Missing 'file_type_prompts.{file_type}.prompt' in prompts.yml")
+
+    def guidelines(self, target_version: Optional[str]) -> str:
+        """GENERATION_GUIDELINES for a target framework; identical for every file of a migration."""
+        key = ("guidelines", target_version)
+        with self._lock:
+            cached = self._prefixes.get(key)
+            if cached is None:
+                cached = self._prefixes[key] = GENERATION_GUIDELINES.format(target_version=target_version)
+        return cached
+
+    def has_prompt(self, file_type: str) -> bool:
+        return file_type in self._compiled
+
+    def file_type_prompt(self, file_type: str, microservice_name: Optional[str] = None) -> Optional[str]:
+        """The file type's prompt with the example microservice names replaced; None if there is none."""
+        segments = self._compiled.get(file_type)
+        if segments is None:
+            return None
+        if not microservice_name or microservice_name == "Unknown":
+            return "".join(segments)
+        ms_name = microservice_name.replace("Grpc", "").lower()
+        names = {"customerGrpc": f"{ms_name}Grpc", "CustomerGrpc": f"{ms_name.capitalize()}Grpc"}
+        # split() with a capture group puts the matched names at odd indexes
+        return "".join(names[segment] if i % 2 else segment for i, segment in enumerate(segments))
+
+    def prefix(self, file_type: str, microservice_name: Optional[str], project_name: Optional[str],
+               layer: Optional[str], target_version: Optional[str]) -> str:
+        """File type instructions plus the microservice/project/layer block; shared by files of the same type and project."""
+        key = (file_type, microservice_name, project_name, layer, target_version)
+        with self._lock:
+            cached = self._prefixes.get(key)
+        if cached is not None:
+            return cached
+        file_type_prompt = self.file_type_prompt(file_type, microservice_name)
+        if file_type_prompt is None:
+            file_type_prompt = f"Generate a {file_type} file for a .NET project targeting {target_version} with appropriate SDK and build properties."
+        prefix = ""
+        if file_type_prompt:
+            prefix = f"{file_type_prompt}\n\nAdditional Context:\n- Microservice Name: {microservice_name or 'Unknown'}\n- Project Name: {project_name or 'Unknown'}\n- Project Layer: {layer or 'Unknown'}\n\n"
+        with self._lock:
+            self._prefixes[key] = prefix
+        return prefix
+
+    def shared_prefix(self, file_type: str, microservice_name: Optional[str], project_name: Optional[str],
+                      layer: Optional[str], target_version: Optional[str], instruction: Optional[str] = None) -> str:
+        """
+        Opening of a generation prompt that is byte-identical for every file of the same type and
+        project in a migration: the guidelines, the migration-wide instruction and prefix().
+        Anything specific to one file belongs after it.
+        """
+        shared = self.guidelines(target_version)
+        if instruction:
+            shared += f"Migration instructions: {instruction}\n\n"
+        return shared + self.prefix(file_type, microservice_name, project_name, layer, target_version)
+
+
+class PromptRegistry:
+    """
+    Process-wide access to prompts.yml. The file is parsed and validated once; current() picks
+    up edits (checked at most every RELOAD_CHECK_INTERVAL seconds) and keeps serving the last
+    good version if an edit does not validate. Each version carries a content hash that caches
+    can key on. A Migrator holds on to the PromptSet it started with, so one migration never
+    mixes prompt versions.
+    """
+
+    def __init__(self, path: str = DEFAULT_PROMPTS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stamp: Optional[Tuple[float, int]] = None
+        self._checked_at = 0.0
+        self._current: Optional[PromptSet] = None
+        self._load()
+
+    @property
+    def version(self) -> str:
+        return self.current().version
+
+    def _load(self) -> None:
+        stat = os.stat(self.path)
+        with open(self.path, "rb") as f:
+            content = f.read()
+        raw = yaml.safe_load(content)
+        PromptSet.validate(raw)
+        version = hashlib.sha256(content).hexdigest()[:12]
+        self._current = PromptSet(raw, version)
+        self._stamp = (stat.st_mtime, stat.st_size)
+        logger.info(f"Loaded prompts from {self.path} (version {version}, {len(raw['file_type_prompts'])} file types)")
+
+    def reload_if_changed(self) -> bool:
+        """Reload prompts.yml if it changed on disk; returns whether a new version was loaded."""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                stat = os.stat(self.path)
+            except OSError as e:
+                logger.error(f"Cannot stat {self.path}, keeping prompts version {self._current.version}: {str(e)}")
+                return False
+            if (stat.st_mtime, stat.st_size) == self._stamp:
+                return False
+            previous = self._current.version
+            try:
+                self._load()
+            except Exception as e:
+                # Remember the broken stamp so it is not re-parsed on every check
+                self._stamp = (stat.st_mtime, stat.st_size)
+                logger.error(f"Ignoring invalid prompts.yml, keeping version {previous}: {str(e)}")
+                return False
+            return self._current.version != previous
+
+    def current(self) -> PromptSet:
+        if time.monotonic() - self._checked_at >= RELOAD_CHECK_INTERVAL:
+            self.reload_if_changed()
+        return self._current
+
+
+# Create singleton instance
+prompt_registry = PromptRegistry()
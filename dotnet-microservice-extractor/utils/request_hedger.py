@@ -0,0 +1,110 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, TypeVar
+from utils import logger
+
+T = TypeVar("T")
+
+# Latencies remembered per key; old samples age out as the deployment's behaviour changes
+LATENCY_WINDOW = 200
+
+
+class RequestHedger:
+    """
+    Hedged requests for slow LLM calls. Latencies are tracked per key (a file type). When a call
+    runs longer than the `percentile` of its key's recent latencies, an identical request is
+    sent and whichever finishes first wins; the other is cancelled. Hedges are only sent while
+    their estimated tokens stay within `budget_ratio` of the tokens sent by first attempts, and
+    only once `min_samples` latencies of the key (or of all keys together) are known.
+    """
+
+    def __init__(self, percentile: float = 95.0, budget_ratio: float = 0.05, min_samples: int = 20):
+        self.percentile = percentile
+        self.budget_ratio = budget_ratio
+        self.min_samples = min_samples
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._primary_tokens = 0
+        self._hedge_tokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, key: str, latency: float) -> None:
+        with self._lock:
+            for bucket in (key, "*"):
+                self._latencies.setdefault(bucket, deque(maxlen=LATENCY_WINDOW)).append(latency)
+
+    def threshold(self, key: str) -> Optional[float]:
+        """Latency after which a call of `key` is hedged; None while too few samples are known."""
+        with self._lock:
+            samples = self._latencies.get(key)
+            if samples is None or len(samples) < self.min_samples:
+                samples = self._latencies.get("*")
+            if samples is None or len(samples) < self.min_samples:
+                return None
+            ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))]
+
+    def _reserve_hedge(self, estimated_tokens: int) -> bool:
+        with self._lock:
+            if self._hedge_tokens + estimated_tokens > self._primary_tokens * self.budget_ratio:
+                return False
+            self._hedge_tokens += estimated_tokens
+            return True
+
+    async def run(self, key: str, call: Callable[[], Awaitable[T]], estimated_tokens: int,
+                  acquire_hedge: Optional[Callable[[], Awaitable[None]]] = None, stats: Optional[Dict] = None) -> T:
+        """
+        Await `call()`, hedging it with a second `call()` if it is slow. `acquire_hedge` runs
+        before the hedge is sent (rate limiting); `stats` counts hedges, wins and hedge tokens.
+        """
+        with self._lock:
+            self._primary_tokens += estimated_tokens
+        started = time.monotonic()
+        primary = asyncio.ensure_future(call())
+        try:
+            delay = self.threshold(key)
+            if delay is not None:
+                done, _ = await asyncio.wait({primary}, timeout=delay)
+                if not done and self._reserve_hedge(estimated_tokens):
+                    return await self._hedge(key, call, primary, started, delay, estimated_tokens, acquire_hedge, stats)
+            result = await primary
+        except BaseException:
+            # A cancelled caller must not leave its request running
+            if not primary.done():
+                primary.cancel()
+            raise
+        self.record(key, time.monotonic() - started)
+        return result
+
+    async def _hedge(self, key: str, call: Callable[[], Awaitable[T]], primary: "asyncio.Future[T]", started: float,
+                     delay: float, estimated_tokens: int, acquire_hedge: Optional[Callable[[], Awaitable[None]]],
+                     stats: Optional[Dict]) -> T:
+        logger.info(f"Hedging {key} request after {delay:.1f}s")
+        if stats is not None:
+            stats["hedged"] = stats.get("hedged", 0) + 1
+            stats["hedge_tokens"] = stats.get("hedge_tokens", 0) + estimated_tokens
+
+        async def hedged_call() -> T:
+            if acquire_hedge is not None:
+                await acquire_hedge()
+            return await call()
+
+        hedge = asyncio.ensure_future(hedged_call())
+        pending = {primary, hedge}
+        try:
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in done if task.exception() is None), None)
+                if winner is None and pending:
+                    # The other request may still succeed
+                    continue
+                winner = winner or next(iter(done))
+                if winner is hedge and winner.exception() is None and stats is not None:
+                    stats["hedge_wins"] = stats.get("hedge_wins", 0) + 1
+                self.record(key, time.monotonic() - started)
+                return winner.result()
+        finally:
+            for task in (primary, hedge):
+                if not task.done():
+                    task.cancel()
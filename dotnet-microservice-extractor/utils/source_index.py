@@ -0,0 +1,189 @@
+import bisect
+import os
+import re
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set
+from utils import logger
+from utils.tree_utils import iter_analyzed_files
+
+TRIGRAM = 3
+TOKEN_PATTERN = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+MAX_CACHED_INDEXES = 16
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + TRIGRAM] for i in range(len(text) - TRIGRAM + 1)}
+
+
+def path_tokens(path: str) -> Set[str]:
+    """Lowercase path tokens, split on separators and camelCase boundaries ("OrderRepository.cs" -> order, repository, cs)."""
+    return {token.lower() for token in TOKEN_PATTERN.findall(path)}
+
+
+def tree_file_paths(tree: Dict, sep: str = '/') -> List[str]:
+    """Return the sorted source file paths of an analyzed (or basic) tree."""
+    return sorted(path for path, _ in iter_analyzed_files(tree, sep))
+
+
+class SourcePathIndex:
+    """
+    Read-only index over the source file paths of one analysis.
+
+    Every path is lowercased and tokenized once at build time. Lookups by basename, extension,
+    token and directory are dictionary hits; "ends with" uses binary search over the reversed
+    paths; "contains" intersects trigram postings and only verifies the surviving candidates.
+    Results are always returned in path order.
+    """
+
+    def __init__(self, paths: Iterable[str]):
+        self.paths: List[str] = sorted(set(paths))
+        self._lower: List[str] = [path.lower() for path in self.paths]
+        self._by_basename: Dict[str, List[int]] = {}
+        self._by_extension: Dict[str, List[int]] = {}
+        self._by_token: Dict[str, List[int]] = {}
+        self._by_directory: Dict[str, List[int]] = {}
+        self._trigrams: Dict[str, Set[int]] = {}
+
+        for i, (path, lower) in enumerate(zip(self.paths, self._lower)):
+            basename = lower.rsplit('/', 1)[-1]
+            self._by_basename.setdefault(basename, []).append(i)
+            extension = os.path.splitext(basename)[1]
+            if extension:
+                self._by_extension.setdefault(extension, []).append(i)
+            for token in path_tokens(path):
+                self._by_token.setdefault(token, []).append(i)
+            parts = lower.split('/')[:-1]
+            for depth in range(1, len(parts) + 1):
+                self._by_directory.setdefault('/'.join(parts[:depth]), []).append(i)
+            for trigram in _trigrams(lower):
+                self._trigrams.setdefault(trigram, set()).add(i)
+
+        # Suffix lookups: sorted reversed paths, so "ends with X" is a prefix range of reversed X
+        self._reversed = sorted((lower[::-1], i) for i, lower in enumerate(self._lower))
+        self._reversed_keys = [key for key, _ in self._reversed]
+        logger.debug(f"Indexed {len(self.paths)} source paths ({len(self._by_token)} tokens)")
+
+    @classmethod
+    def from_tree(cls, tree: Dict) -> "SourcePathIndex":
+        return cls(tree_file_paths(tree))
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def __contains__(self, path: str) -> bool:
+        i = bisect.bisect_left(self.paths, path)
+        return i < len(self.paths) and self.paths[i] == path
+
+    def _resolve(self, ids: Iterable[int]) -> List[str]:
+        return [self.paths[i] for i in sorted(ids)]
+
+    # --- id-level lookups ---
+
+    def _contains_ids(self, text: str) -> Set[int]:
+        text = text.lower()
+        if len(text) < TRIGRAM:
+            return {i for i, lower in enumerate(self._lower) if text in lower}
+        postings = sorted((self._trigrams.get(trigram, set()) for trigram in _trigrams(text)), key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+        return {i for i in candidates if text in self._lower[i]}
+
+    def _ends_with_ids(self, suffix: str) -> Set[int]:
+        key = suffix.lower()[::-1]
+        start = bisect.bisect_left(self._reversed_keys, key)
+        end = bisect.bisect_left(self._reversed_keys, key + '\uffff', start)
+        return {i for _, i in self._reversed[start:end]}
+
+    def _extension_ids(self, extensions: Iterable[str]) -> Set[int]:
+        ids = set()
+        for extension in extensions:
+            extension = extension.lower()
+            ids.update(self._by_extension.get(extension if extension.startswith('.') else f'.{extension}', []))
+        return ids
+
+    def _under_ids(self, directory: str) -> Set[int]:
+        return set(self._by_directory.get(directory.lower().strip('/'), []))
+
+    # --- public queries ---
+
+    def contains(self, *texts: str) -> List[str]:
+        """Paths containing any of the given substrings (case-insensitive)."""
+        ids = set()
+        for text in texts:
+            ids |= self._contains_ids(text)
+        return self._resolve(ids)
+
+    def ends_with(self, *suffixes: str) -> List[str]:
+        """Paths ending with any of the given suffixes (case-insensitive)."""
+        ids = set()
+        for suffix in suffixes:
+            ids |= self._ends_with_ids(suffix)
+        return self._resolve(ids)
+
+    def with_extension(self, *extensions: str) -> List[str]:
+        return self._resolve(self._extension_ids(extensions))
+
+    def with_basename(self, name: str) -> List[str]:
+        return self._resolve(self._by_basename.get(name.lower(), []))
+
+    def with_token(self, token: str) -> List[str]:
+        return self._resolve(self._by_token.get(token.lower(), []))
+
+    def under(self, directory: str) -> List[str]:
+        """Paths anywhere below the given directory."""
+        return self._resolve(self._under_ids(directory))
+
+    def find(self, contains: Iterable[str] = (), any_of: Iterable[str] = (), extensions: Iterable[str] = (),
+             under: Optional[str] = None, exclude_extensions: Iterable[str] = ()) -> List[str]:
+        """
+        Combined query: every `contains` substring, at least one `any_of` substring, one of
+        `extensions`, below `under`, and none of `exclude_extensions`. Empty criteria are ignored.
+        """
+        filters: List[Set[int]] = [self._contains_ids(text) for text in contains]
+        any_of = list(any_of)
+        if any_of:
+            filters.append(set().union(*(self._contains_ids(text) for text in any_of)))
+        extensions = list(extensions)
+        if extensions:
+            filters.append(self._extension_ids(extensions))
+        if under is not None:
+            filters.append(self._under_ids(under))
+
+        if filters:
+            filters.sort(key=len)
+            ids = filters[0].intersection(*filters[1:])
+        else:
+            ids = set(range(len(self.paths)))
+        exclude_extensions = list(exclude_extensions)
+        if exclude_extensions:
+            ids -= self._extension_ids(exclude_extensions)
+        return self._resolve(ids)
+
+    def search(self, query: str, limit: int = 50) -> List[str]:
+        """
+        Free-text lookup for file pickers and tools: exact basename matches first, then
+        paths containing every whitespace-separated term.
+        """
+        terms = [term for term in query.lower().split() if term]
+        if not terms:
+            return self.paths[:limit]
+        exact = self._by_basename.get(terms[0], []) if len(terms) == 1 else []
+        ranked = self._resolve(exact)
+        seen = set(ranked)
+        ranked.extend(path for path in self.find(contains=terms) if path not in seen)
+        return ranked[:limit]
+
+
+_index_cache: "OrderedDict[str, SourcePathIndex]" = OrderedDict()
+
+
+def get_source_index(key: str, tree: Dict) -> SourcePathIndex:
+    """Return the index for an analysis, building it at most once per key (small LRU)."""
+    index = _index_cache.get(key)
+    if index is None:
+        index = SourcePathIndex.from_tree(tree)
+        _index_cache[key] = index
+        if len(_index_cache) > MAX_CACHED_INDEXES:
+            _index_cache.popitem(last=False)
+    else:
+        _index_cache.move_to_end(key)
+    return index
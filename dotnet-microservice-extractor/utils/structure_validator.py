@@ -0,0 +1,460 @@
+import os
+import re
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+from pydantic import BaseModel
+from utils import logger
+from utils.source_index import SourcePathIndex
+from utils.tree_utils import prune_empty_folders
+
+REST_GATEWAY_AUTH_FILES = ['Controllers/AuthController.cs', 'Data/AuthDbContext.cs', 'Entities/User.cs']
+GRPC_GATEWAY_BASE_FILES = [
+    'appsettings.json',
+    'Gateway.csproj',
+    'gateway.sln',
+    'Program.cs',
+    'Properties/launchSettings.json',
+]
+NON_GRPC_SERVICES = ['gateway', 'webui']
+
+
+def default_gateway_project() -> Dict:
+    """Routing-only Gateway project used when the LLM omits or mangles it."""
+    return {
+        'project_name': 'Gateway',
+        'target_structure': {
+            'root': {
+                'appsettings.json': {
+                    'file_type': 'config',
+                    'description': 'Gateway configuration',
+                    'namespace': '',
+                    'source_files': []
+                },
+                'Gateway.csproj': {
+                    'file_type': 'csproj',
+                    'description': 'API Gateway project with Ocelot dependencies',
+                    'namespace': '',
+                    'source_files': []
+                },
+                'ocelot.json': {
+                    'file_type': 'ocelot',
+                    'description': 'Ocelot routing configuration',
+                    'namespace': '',
+                    'source_files': []
+                },
+                'Program.cs': {
+                    'file_type': 'program',
+                    'description': 'Gateway entry point with Ocelot middleware',
+                    'namespace': 'Gateway',
+                    'source_files': []
+                }
+            },
+            'folders': {}
+        }
+    }
+
+
+class ValidationReport(BaseModel):
+    violations: List[str] = []
+    fixes: List[str] = []
+    errors: List[str] = []
+
+    @property
+    def is_valid(self) -> bool:
+        return not self.errors
+
+
+class ProjectIndex:
+    """
+    Index of a project's target files, built once and kept in sync as rules add or remove files.
+
+    A required file such as 'Properties/launchSettings.json' is present when it is a root entry
+    or a suffix of '<top-level folder>/<file>', matching how the analyzer has always checked it.
+    """
+
+    def __init__(self, target_structure: Dict):
+        self.structure = target_structure
+        self._suffixes = Counter()
+        for folder_name, folder in (target_structure.get('folders') or {}).items():
+            for file_name in (folder or {}).get('target_files') or {}:
+                self._add(folder_name, file_name)
+
+    @staticmethod
+    def _path_suffixes(folder_name: str, file_name: str) -> List[str]:
+        parts = f"{folder_name}/{file_name}".lower().split('/')
+        return ['/'.join(parts[i:]) for i in range(len(parts))]
+
+    def _add(self, folder_name: str, file_name: str) -> None:
+        self._suffixes.update(self._path_suffixes(folder_name, file_name))
+
+    def has(self, required_path: str) -> bool:
+        return required_path in (self.structure.get('root') or {}) or self._suffixes[required_path.lower()] > 0
+
+    def folder(self, folder_name: str) -> Dict:
+        folders = self.structure.setdefault('folders', {})
+        folder = folders.setdefault(folder_name, {'target_files': {}, 'subfolders': {}})
+        if folder.get('target_files') is None:
+            folder['target_files'] = {}
+        return folder
+
+    def add_file(self, folder_name: Optional[str], file_name: str, file_info: Dict) -> None:
+        if not folder_name:
+            self.structure.setdefault('root', {})[file_name] = file_info
+            return
+        self.folder(folder_name)['target_files'][file_name] = file_info
+        self._add(folder_name, file_name)
+
+    def remove_file(self, folder_name: str, file_name: str) -> None:
+        del self.structure['folders'][folder_name]['target_files'][file_name]
+        self._suffixes.subtract(self._path_suffixes(folder_name, file_name))
+
+    def remove_folder(self, folder_name: str) -> None:
+        folder = self.structure['folders'].pop(folder_name)
+        for file_name in (folder or {}).get('target_files') or {}:
+            self._suffixes.subtract(self._path_suffixes(folder_name, file_name))
+
+
+def is_unsafe_path(path: str) -> bool:
+    """True for absolute paths or paths that climb out of the directory they are joined to."""
+    normalized = path.replace('\\', '/')
+    return normalized.startswith('/') or '..' in normalized.split('/') or os.path.isabs(path) \
+        or bool(re.match(r'^[A-Za-z]:', normalized))
+
+
+class TargetStructureValidator:
+    """
+    Rule-based validator/normalizer for target structures.
+
+    The source tree is indexed once, each project's target files are indexed once, and every
+    rule runs in a single pass over the microservices. Structural rules always run; the
+    architecture rules (Gateway shape, authentication files, gRPC protos/controllers) only run
+    when `architecture_rules` is set, which is what the analyzer does right after the LLM call.
+    """
+
+    def __init__(self, api_type: str = "rest", auth_case: str = "none", gateway_routing_only: bool = False,
+                 source_index: Optional[SourcePathIndex] = None, architecture_rules: bool = True):
+        self.api_type = api_type
+        self.auth_case = auth_case
+        self.gateway_routing_only = gateway_routing_only
+        self.architecture_rules = architecture_rules
+        self.source_index = source_index or SourcePathIndex([])
+        self.fix = True
+        self.report = ValidationReport()
+
+    # --- helpers ---
+
+
+    def _apply(self, violation: str, fix: Optional[Callable[[], None]] = None, fix_message: Optional[str] = None) -> None:
+        self.report.violations.append(violation)
+        if self.fix and fix is not None:
+            fix()
+            self.report.fixes.append(fix_message or violation)
+
+    def _error(self, message: str) -> None:
+        self.report.errors.append(message)
+
+    # --- entry point ---
+
+    def validate(self, target_structure: Dict, fix: bool = True) -> ValidationReport:
+        """Validate (and with fix=True, normalize in place) a target structure."""
+        self.fix = fix
+        self.report = ValidationReport()
+
+        microservices = target_structure.get('microservices') if isinstance(target_structure, dict) else None
+        if not isinstance(microservices, list):
+            self._error("Target structure must contain a 'microservices' list")
+            return self.report
+
+        grpc_services = [
+            ms.get('name', '') for ms in microservices
+            if isinstance(ms, dict) and str(ms.get('name', '')).lower() not in NON_GRPC_SERVICES
+        ]
+        gateway_found = False
+
+        for ms in microservices:
+            if not isinstance(ms, dict) or not ms.get('name'):
+                self._error("Every microservice must be an object with a 'name'")
+                continue
+            if is_unsafe_path(str(ms['name'])):
+                # The name becomes the microservice's output directory
+                self._error(f"Unsafe microservice name '{ms['name']}'")
+                continue
+            is_gateway = ms['name'].lower() == 'gateway'
+            gateway_found = gateway_found or is_gateway
+
+            if self.architecture_rules and is_gateway:
+                self._gateway_projects(ms)
+
+            seen_projects = set()
+            for position, project in enumerate(ms.get('projects') or []):
+                index = self._check_project(ms['name'], project, seen_projects)
+                if index is None or not self.architecture_rules:
+                    continue
+                if is_gateway and position == 0:
+                    self._gateway_rules(index, grpc_services)
+                elif not is_gateway and self.api_type == "grpc" and ms['name'].lower() not in NON_GRPC_SERVICES \
+                        and 'Presentation' in project.get('project_name', ''):
+                    self._downstream_proto_rule(ms['name'], index)
+                if self.fix:
+                    self._prune_empty_folders(ms['name'], project)
+
+        if self.architecture_rules and not gateway_found and (self.api_type == "grpc" or self.auth_case != "none"):
+            self._error("Gateway microservice not found in the microservices list.")
+
+        logger.info(
+            f"Target structure validation: {len(self.report.violations)} violations, "
+            f"{len(self.report.fixes)} fixes, {len(self.report.errors)} errors"
+        )
+        return self.report
+
+    # --- structural rules ---
+
+    def _check_project(self, ms_name: str, project: Dict, seen_projects: set) -> Optional[ProjectIndex]:
+        if not isinstance(project, dict) or not isinstance(project.get('target_structure'), dict):
+            self._error(f"{ms_name}: project is missing 'target_structure'")
+            return None
+        project_name = project.get('project_name')
+        if not project_name:
+            self._error(f"{ms_name}: project is missing 'project_name'")
+            return None
+        if is_unsafe_path(str(project_name)):
+            self._error(f"{ms_name}: unsafe project name '{project_name}'")
+            return None
+        if project_name in seen_projects:
+            self.report.violations.append(f"{ms_name}: duplicate project '{project_name}'")
+        seen_projects.add(project_name)
+
+        structure = project['target_structure']
+        for key in ('root', 'folders'):
+            if structure.get(key) is not None and not isinstance(structure[key], dict):
+                self._error(f"{ms_name}/{project_name}: '{key}' must be an object")
+                return None
+
+        stack = [(name, folder) for name, folder in (structure.get('folders') or {}).items()]
+        file_names = list((structure.get('root') or {}).keys())
+        while stack:
+            path, folder = stack.pop()
+            if not isinstance(folder, dict):
+                self._error(f"{ms_name}/{project_name}: folder '{path}' must be an object")
+                continue
+            file_names.extend(f"{path}/{name}" for name in (folder.get('target_files') or {}))
+            stack.extend((f"{path}/{name}", sub) for name, sub in (folder.get('subfolders') or {}).items())
+
+        for file_name in file_names:
+            if is_unsafe_path(file_name):
+                self._error(f"{ms_name}/{project_name}: unsafe target path '{file_name}'")
+        if not any(name.endswith('.csproj') for name in file_names):
+            self.report.violations.append(f"{ms_name}/{project_name}: no .csproj file")
+
+        return ProjectIndex(structure)
+
+    def _prune_empty_folders(self, ms_name: str, project: Dict) -> None:
+        """Drop folders that hold no files directly or in any subfolder (in place)."""
+        prune_empty_folders(
+            project['target_structure'].get('folders') or {},
+            on_remove=lambda path: self.report.fixes.append(
+                f"{ms_name}/{project.get('project_name')}: removed empty folder '{path}'"
+            )
+        )
+
+    # --- architecture rules ---
+
+    def _gateway_projects(self, gateway: Dict) -> None:
+        """Gateway must have a usable project list; routing-only gateways get their folders cleared."""
+        projects = gateway.get('projects')
+        if not projects or not isinstance(projects, list):
+            if self.api_type == "grpc":
+                self._error("Gateway microservice has no projects")
+            elif self.gateway_routing_only or self.auth_case != "none":
+                self._apply(
+                    "Gateway microservice has invalid or missing projects",
+                    lambda: gateway.__setitem__('projects', [default_gateway_project()]),
+                    "Gateway: added default routing-only project"
+                )
+            return
+
+        if self.api_type == "rest" and (self.gateway_routing_only or self.auth_case == "separate"):
+            for project in projects:
+                structure = project.get('target_structure') if isinstance(project, dict) else None
+                if isinstance(structure, dict) and structure.get('folders'):
+                    self._apply(
+                        f"Gateway project '{project.get('project_name')}' contains folders but must be routing-only",
+                        lambda s=structure: s.__setitem__('folders', {}),
+                        f"Gateway: cleared folders {sorted(structure['folders'])} for routing-only gateway"
+                    )
+
+    def _gateway_rules(self, index: ProjectIndex, grpc_services: List[str]) -> None:
+        if self.api_type == "grpc":
+            self._grpc_gateway_rules(index, grpc_services)
+        elif self.auth_case == "gateway":
+            self._rest_gateway_auth_rule(index)
+
+    def _rest_gateway_auth_rule(self, index: ProjectIndex) -> None:
+        """Case 3: authentication lives in the Gateway, so its auth files must exist."""
+        templates = {
+            'Controllers/AuthController.cs': {
+                'file_type': 'controller',
+                'description': 'Authentication endpoints (e.g., /login, /token)',
+                'namespace': 'Gateway.Controllers',
+                'routes': ['/api/auth/login', '/api/auth/token'],
+                'source_files': ['WebApi/Controllers/AuthenticationController.cs']
+            },
+            'Data/AuthDbContext.cs': {
+                'file_type': 'dbcontext',
+                'description': 'EF Core context for auth data',
+                'namespace': 'Gateway.Data',
+                'source_files': ['Infrastructure/Persistence/ApplicationDbContext.cs']
+            },
+            'Entities/User.cs': {
+                'file_type': 'entity',
+                'description': 'User entity for authentication',
+                'namespace': 'Gateway.Entities',
+                'source_files': ['Infrastructure/Identity/ApplicationUser.cs']
+            },
+        }
+        for required in REST_GATEWAY_AUTH_FILES:
+            if index.has(required):
+                continue
+            folder_name, file_name = required.split('/', 1)
+            self._apply(
+                f"Gateway missing required authentication file {required}",
+                lambda f=folder_name, n=file_name, r=required: index.add_file(f, n, templates[r]),
+                f"Gateway: added {required}"
+            )
+
+    def _service_sources(self, service_base: str, kinds: tuple) -> List[str]:
+        return self.source_index.find(contains=(service_base,), any_of=kinds, extensions=('.cs',))
+
+    def _grpc_gateway_rules(self, index: ProjectIndex, grpc_services: List[str]) -> None:
+        structure = index.structure
+        folders = structure.get('folders') or {}
+        service_bases = {service.lower().replace('grpc', '') for service in grpc_services}
+
+        # Case 1: no authentication, so the Gateway carries no auth data access or controllers
+        if self.auth_case == "none":
+            for folder_name in ('Data', 'Entities'):
+                if folder_name in folders:
+                    self._apply(f"Gateway contains {folder_name}/ without authentication",
+                                lambda f=folder_name: index.remove_folder(f),
+                                f"Gateway: removed {folder_name}/ folder")
+            for file_name in list((folders.get('Controllers') or {}).get('target_files') or {}):
+                if 'auth' in file_name.lower():
+                    self._apply(f"Gateway contains auth controller {file_name} without authentication",
+                                lambda n=file_name: index.remove_file('Controllers', n),
+                                f"Gateway: removed Controllers/{file_name}")
+
+        # Drop protos/controllers named after the bare service; the canonical ones use the Grpc suffix
+        for folder_name, suffix in (('Protos', '.proto'), ('Controllers', 'Controller.cs')):
+            for file_name in list((folders.get(folder_name) or {}).get('target_files') or {}):
+                if file_name.replace(suffix, '').lower() in service_bases:
+                    self._apply(f"Gateway has redundant {folder_name}/{file_name}",
+                                lambda f=folder_name, n=file_name: index.remove_file(f, n),
+                                f"Gateway: removed redundant {folder_name}/{file_name}")
+
+        required_files = list(GRPC_GATEWAY_BASE_FILES)
+        for service in grpc_services:
+            service_base = service.lower().replace('grpc', '')
+            required_files.extend([f'Controllers/{service}Controller.cs', f'Protos/{service_base}grpc.proto'])
+
+        for required in required_files:
+            if index.has(required):
+                continue
+            folder_name, file_name = required.rsplit('/', 1) if '/' in required else (None, required)
+            self._apply(
+                f"Gateway missing required gRPC file {required}",
+                lambda f=folder_name, n=file_name: index.add_file(f, n, self._grpc_gateway_file(f, n)),
+                f"Gateway: added {required}"
+            )
+
+    def _grpc_gateway_file(self, folder_name: Optional[str], file_name: str) -> Dict:
+        entity_kinds = ('entity', 'model', 'repository', 'aspx.cs')
+        if file_name == 'appsettings.json':
+            return {
+                'source_files': self.source_index.contains('web.config', 'appsettings'),
+                'file_type': 'config',
+                'description': 'Configuration settings for Gateway with gRPC client endpoints and MySQL connection string if auth_enabled',
+                'instructions': 'Include logging (Information level), gRPC service endpoints for productGrpc (port 5001), cartGrpc (port 5002), orderGrpc (port 5003), webappGrpc (port 5004), and MySQL connection string if auth_enabled',
+                'namespace': ''
+            }
+        if file_name == 'Gateway.csproj':
+            return {
+                'source_files': self.source_index.with_extension('.csproj'),
+                'file_type': 'csproj_grpc',
+                'description': 'Gateway project file with gRPC client dependencies and MySQLConnector if auth_enabled',
+                'instructions': 'Target net8.0; include Grpc.Net.Client, Grpc.Net.ClientFactory, Microsoft.AspNetCore.Mvc, Microsoft.Extensions.Logging, and MySQLConnector if auth_enabled; reference .proto files in Protos folder',
+                'namespace': ''
+            }
+        if file_name == 'gateway.sln':
+            return {
+                'source_files': self.source_index.with_extension('.sln'),
+                'file_type': 'sln',
+                'description': 'Solution file for Gateway microservice',
+                'instructions': 'Include Gateway project and ensure compatibility with .NET 8.0',
+                'namespace': ''
+            }
+        if file_name == 'Program.cs':
+            return {
+                'source_files': self.source_index.contains('startup.cs', 'program.cs'),
+                'file_type': 'program_cs_grpc',
+                'description': 'Entry point for Gateway with gRPC client setup, no EF middleware',
+                'instructions': 'Configure ASP.NET Core with gRPC clients for productGrpc, cartGrpc, orderGrpc, and webappGrpc; set up MVC for HTTP-to-gRPC routing; use minimal API or controllers; configure logging; no EF middleware',
+                'namespace': 'Gateway'
+            }
+        if file_name == 'launchSettings.json':
+            return {
+                'source_files': self.source_index.contains('launchsettings'),
+                'file_type': 'config',
+                'description': 'Launch settings for Gateway development',
+                'instructions': 'Include HTTP profile with port 5000, HTTPS profile with port 5005, and Development environment settings',
+                'namespace': ''
+            }
+        if folder_name == 'Controllers':
+            service_name = file_name.replace('Controller.cs', '')
+            service_base = service_name.lower().replace('grpc', '')
+            return {
+                'source_files': self._service_sources(service_base, entity_kinds),
+                'file_type': 'controller',
+                'description': f'Controller for routing HTTP requests to {service_name} gRPC service',
+                'instructions': f'Create an ASP.NET Core controller with async actions (Get{service_base.capitalize()}, List{service_base.capitalize()}s) to call {service_name} gRPC service using Grpc.Net.Client; inject gRPC client via constructor; use routes /api/{service_base}/get and /api/{service_base}/list',
+                'namespace': 'Gateway.Controllers',
+                'routes': [f'/api/{service_base}/get', f'/api/{service_base}/list']
+            }
+        service_name = file_name.replace('.proto', '')
+        service_base = service_name.lower().replace('grpc', '')
+        return {
+            'source_files': self._service_sources(service_base, entity_kinds),
+            'file_type': 'proto',
+            'description': f'gRPC service definition for {service_name} microservice client',
+            'instructions': f'Define {service_base.capitalize()}Service with Get{service_base.capitalize()} (takes {service_base.capitalize()}Request with id, returns {service_base.capitalize()}Response) and List{service_base.capitalize()}s (returns {service_base.capitalize()}ListResponse); derive messages from entity/model classes',
+            'namespace': service_base
+        }
+
+    def _downstream_proto_rule(self, ms_name: str, index: ProjectIndex) -> None:
+        """Every gRPC Presentation project owns exactly one <service>grpc.proto."""
+        service_base = ms_name.lower().replace('grpc', '')
+        proto_file = f"{service_base}grpc.proto"
+        protos = (index.structure.get('folders') or {}).get('Protos') or {}
+
+        for proto in list(protos.get('target_files') or {}):
+            if proto != proto_file and proto.replace('.proto', '').lower() == service_base:
+                self._apply(f"{ms_name}: redundant proto {proto}",
+                            lambda p=proto: index.remove_file('Protos', p),
+                            f"{ms_name}: removed redundant Protos/{proto}")
+
+        relevant_files = self._service_sources(service_base, ('entity', 'model', 'repository'))
+        if not relevant_files:
+            relevant_files = self._service_sources(service_base, ('aspx.cs',))
+        proto_info = {
+            'source_files': relevant_files,
+            'file_type': 'proto',
+            'description': f"gRPC service definition for {ms_name} microservice",
+            'instructions': f"Define {service_base.capitalize()}Service with Get{service_base.capitalize()} (takes {service_base.capitalize()}Request with id, returns {service_base.capitalize()}Response) and List{service_base.capitalize()}s (returns {service_base.capitalize()}ListResponse)",
+            'namespace': service_base
+        }
+        # The analyzer always rewrites this mapping so the proto carries the canonical instructions
+        if self.fix:
+            index.add_file('Protos', proto_file, proto_info)
+            self.report.fixes.append(f"{ms_name}: set Protos/{proto_file}")
+        elif not index.has(f"Protos/{proto_file}"):
+            self.report.violations.append(f"{ms_name}: missing Protos/{proto_file}")
+        logger.debug(f"Source files for {proto_file}: {relevant_files}")
@@ -0,0 +1,307 @@
+import os
+import re
+import hashlib
+import uuid
+from typing import Dict, List, Optional, Tuple
+from jinja2 import Environment, FileSystemLoader, StrictUndefined
+from utils import logger
+
+# Bump whenever a template or layer profile changes in a way that alters generated output.
+TEMPLATE_LIBRARY_VERSION = "2"
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+
+LAYERS = ["Domain", "Application", "Infrastructure", "Presentation"]
+
+# (template kind, layer) -> template file. A layer of None matches every layer.
+TEMPLATES: Dict[Tuple[str, Optional[str]], str] = {
+    ("launch_settings", None): "launchSettings.json.j2",
+    ("appsettings", None): "appsettings.json.j2",
+    ("view_start", None): "_ViewStart.cshtml.j2",
+    ("view_imports", None): "_ViewImports.cshtml.j2",
+    ("sln", None): "solution.sln.j2",
+    ("program", "Gateway"): "Program.gateway.cs.j2",
+    ("csproj", "Gateway"): "project.csproj.j2",
+    **{("csproj", layer): "project.csproj.j2" for layer in LAYERS},
+    **{("csproj_grpc", layer): "project.csproj.j2" for layer in LAYERS},
+}
+
+# Kinds whose content does not depend on the legacy source, so mapped source_files are ignored.
+SOURCE_INDEPENDENT_KINDS = {"launch_settings", "view_start", "view_imports", "sln", "csproj", "csproj_grpc"}
+
+# How a kind treats file instructions: "ignore" when the file is fully derived from the target
+# structure, "packages" when instructions may name the framework, project references and packages.
+# Any other kind goes to the LLM when it carries instructions.
+INSTRUCTION_HANDLING = {"sln": "ignore", "csproj": "packages", "csproj_grpc": "packages"}
+
+# Project file settings per layer, mirroring the csproj/csproj_grpc guidance in prompts.yml.
+LAYER_PROFILES: Dict[str, Dict[str, Dict]] = {
+    "csproj": {
+        "Domain": {"sdk": "Microsoft.NET.Sdk", "output_type": "Library", "packages": [], "references": []},
+        "Application": {
+            "sdk": "Microsoft.NET.Sdk", "output_type": "Library",
+            "packages": [("AutoMapper", "12.0.1")],
+            "references": ["Domain", "Infrastructure"]
+        },
+        "Infrastructure": {
+            "sdk": "Microsoft.NET.Sdk", "output_type": "Library",
+            "packages": [("MySqlConnector", "2.4.0")],
+            "references": ["Domain"]
+        },
+        "Presentation": {
+            "sdk": "Microsoft.NET.Sdk.Web", "output_type": "Exe",
+            "packages": [
+                ("Swashbuckle.AspNetCore", "6.2.0"),
+                ("AutoMapper.Extensions.Microsoft.DependencyInjection", "12.0.1")
+            ],
+            "references": ["Application"]
+        },
+        "Gateway": {
+            "sdk": "Microsoft.NET.Sdk.Web", "output_type": "Exe",
+            "packages": [("Ocelot", "23.2.2")],
+            "references": []
+        },
+    },
+    "csproj_grpc": {
+        "Domain": {"sdk": "Microsoft.NET.Sdk", "output_type": "Library", "packages": [], "references": []},
+        "Application": {
+            "sdk": "Microsoft.NET.Sdk", "output_type": "Library",
+            "packages": [("AutoMapper", "12.0.1"), ("MediatR", "12.2.0")],
+            "references": ["Domain", "Infrastructure"]
+        },
+        "Infrastructure": {
+            "sdk": "Microsoft.NET.Sdk", "output_type": "Library",
+            "packages": [("MySqlConnector", "2.4.0")],
+            "references": ["Domain"]
+        },
+        "Presentation": {
+            "sdk": "Microsoft.NET.Sdk.Web", "output_type": "Exe",
+            "packages": [
+                ("Grpc.AspNetCore", "2.60.0"),
+                ("AutoMapper.Extensions.Microsoft.DependencyInjection", "12.0.1")
+            ],
+            "references": ["Application"]
+        },
+    },
+}
+
+# Versions for packages that generated files commonly report as dependencies.
+KNOWN_PACKAGE_VERSIONS = {
+    "automapper": ("AutoMapper", "12.0.1"),
+    "automapper.extensions.microsoft.dependencyinjection": ("AutoMapper.Extensions.Microsoft.DependencyInjection", "12.0.1"),
+    "mediatr": ("MediatR", "12.2.0"),
+    "mysqlconnector": ("MySqlConnector", "2.4.0"),
+    "ocelot": ("Ocelot", "23.2.2"),
+    "grpc.aspnetcore": ("Grpc.AspNetCore", "2.60.0"),
+    "grpc.net.client": ("Grpc.Net.Client", "2.60.0"),
+    "grpc.net.clientfactory": ("Grpc.Net.ClientFactory", "2.60.0"),
+    "google.protobuf": ("Google.Protobuf", "3.25.1"),
+    "swashbuckle.aspnetcore": ("Swashbuckle.AspNetCore", "6.2.0"),
+    "newtonsoft.json": ("Newtonsoft.Json", "13.0.3"),
+    "fluentvalidation": ("FluentValidation", "11.9.0"),
+    "dapper": ("Dapper", "2.1.35"),
+    "microsoft.data.sqlclient": ("Microsoft.Data.SqlClient", "5.2.2"),
+}
+
+JWT_BEARER_VERSIONS = {"net6.0": "6.0.36", "net7.0": "7.0.20", "net8.0": "8.0.11"}
+
+# Packages released alongside each framework version, so their version follows the target framework.
+FRAMEWORK_PACKAGE_VERSIONS = {
+    "microsoft.aspnetcore.authentication.jwtbearer": ("Microsoft.AspNetCore.Authentication.JwtBearer", JWT_BEARER_VERSIONS),
+    "microsoft.aspnetcore.identity.entityframeworkcore": ("Microsoft.AspNetCore.Identity.EntityFrameworkCore", JWT_BEARER_VERSIONS),
+    "microsoft.entityframeworkcore": ("Microsoft.EntityFrameworkCore", JWT_BEARER_VERSIONS),
+    "microsoft.entityframeworkcore.design": ("Microsoft.EntityFrameworkCore.Design", JWT_BEARER_VERSIONS),
+    "microsoft.entityframeworkcore.relational": ("Microsoft.EntityFrameworkCore.Relational", JWT_BEARER_VERSIONS),
+    "microsoft.entityframeworkcore.sqlserver": ("Microsoft.EntityFrameworkCore.SqlServer", JWT_BEARER_VERSIONS),
+    "microsoft.entityframeworkcore.tools": ("Microsoft.EntityFrameworkCore.Tools", JWT_BEARER_VERSIONS),
+    "pomelo.entityframeworkcore.mysql": ("Pomelo.EntityFrameworkCore.MySql", {"net6.0": "6.0.3", "net7.0": "7.0.0", "net8.0": "8.0.2"}),
+}
+
+# Names that never need a package: base class library namespaces, plus the ASP.NET Core shared
+# framework on projects using the Web SDK.
+BCL_PREFIXES = ("system",)
+SHARED_FRAMEWORK_PREFIXES = ("microsoft.aspnetcore", "microsoft.extensions")
+
+# Instruction clauses a project file template can honour (see INSTRUCTION_HANDLING)
+TARGET_CLAUSE = re.compile(r"^(target|ensure compatibility with)\s+(\.net\s*)?(net)?\d+(\.\d+)?$", re.IGNORECASE)
+REFERENCE_CLAUSE = re.compile(r"^reference\b.*\b(projects?|files?)\b.*$", re.IGNORECASE)
+PACKAGE_CLAUSE = re.compile(r"^(include|add|use)\s+(?P<packages>.+?)(\s+for\s+[\w. -]+)?$", re.IGNORECASE)
+PACKAGE_NAME = re.compile(r"^[A-Za-z][\w.]*$")
+
+
+def resolve_template_kind(file_name: str, file_type: str) -> Optional[str]:
+    """Map a target file to a template kind, or None if it is not boilerplate."""
+    name = os.path.basename(file_name).lower()
+    if name == "launchsettings.json":
+        return "launch_settings"
+    if name == "appsettings.json":
+        return "appsettings"
+    if name == "_viewstart.cshtml":
+        return "view_start"
+    if name == "_viewimports.cshtml":
+        return "view_imports"
+    if name.endswith(".sln"):
+        return "sln"
+    if name.endswith(".csproj"):
+        return "csproj_grpc" if file_type == "csproj_grpc" else "csproj"
+    if name == "program.cs" and file_type == "program":
+        return "program"
+    return None
+
+
+def instruction_packages(instructions: Optional[str]) -> Optional[List[str]]:
+    """
+    Packages named by project file instructions such as "Target net8.0; include MySQLConnector
+    for ADO.NET; reference Domain and Application projects". None when a clause asks for
+    something the template cannot express (e.g. a conditional package).
+    """
+    packages: List[str] = []
+    for clause in re.split(r"[;\n]+|\.\s+", instructions or ""):
+        clause = clause.strip().rstrip(".")
+        if not clause or TARGET_CLAUSE.match(clause) or REFERENCE_CLAUSE.match(clause):
+            continue
+        match = PACKAGE_CLAUSE.match(clause)
+        if not match:
+            return None
+        names = [name.strip() for name in re.split(r",\s*(?:and\s+)?|\s+and\s+", match.group("packages"))]
+        if not all(PACKAGE_NAME.match(name) for name in names):
+            return None
+        packages.extend(names)
+    return packages
+
+
+def package_version(dependency: str, target_framework: Optional[str] = None) -> Optional[Tuple[str, str]]:
+    """(package name, version) for a dependency with a known version, else None."""
+    key = str(dependency).strip().lower()
+    if key in KNOWN_PACKAGE_VERSIONS:
+        return KNOWN_PACKAGE_VERSIONS[key]
+    if key in FRAMEWORK_PACKAGE_VERSIONS:
+        name, versions = FRAMEWORK_PACKAGE_VERSIONS[key]
+        return name, versions.get(target_framework, versions["net8.0"])
+    return None
+
+
+def needs_package(dependency: str, kind: str, layer: str, local_prefixes: Tuple[str, ...] = ()) -> bool:
+    """False for names a project gets without a package: BCL, shared framework, its own projects."""
+    key = str(dependency).strip().lower()
+    if key.startswith(BCL_PREFIXES) or any(key.startswith(prefix.lower()) for prefix in local_prefixes if prefix):
+        return False
+    web_sdk = LAYER_PROFILES[kind][layer]["sdk"].endswith(".Web")
+    return not (web_sdk and key.startswith(SHARED_FRAMEWORK_PREFIXES))
+
+
+def unresolved_packages(kind: str, layer: str, dependencies: Optional[List[str]],
+                        local_prefixes: Tuple[str, ...] = ()) -> List[str]:
+    """Dependencies that need a package whose version the template library does not know."""
+    return [
+        dependency for dependency in dependencies or []
+        if package_version(dependency) is None and needs_package(dependency, kind, layer, local_prefixes)
+    ]
+
+
+def resolve_packages(kind: str, layer: str, dependencies: Optional[List[str]] = None,
+                     target_framework: Optional[str] = None, authenticated: bool = False,
+                     local_prefixes: Tuple[str, ...] = ()) -> List[Dict[str, str]]:
+    """
+    Layer packages plus the reported dependencies, deduplicated by name. Raises ValueError for a
+    dependency that needs a package of unknown version, so the caller can fall back to the LLM.
+    """
+    unresolved = unresolved_packages(kind, layer, dependencies, local_prefixes)
+    if unresolved:
+        raise ValueError(f"No known package version for: {', '.join(unresolved)}")
+    packages = list(LAYER_PROFILES[kind][layer]["packages"])
+    if layer == "Gateway" and authenticated:
+        packages.append(package_version("Microsoft.AspNetCore.Authentication.JwtBearer", target_framework))
+    for dependency in dependencies or []:
+        known = package_version(dependency, target_framework)
+        if known:
+            packages.append(known)
+
+    seen = set()
+    resolved = []
+    for name, version in packages:
+        if name.lower() not in seen:
+            seen.add(name.lower())
+            resolved.append({"name": name, "version": version})
+    return resolved
+
+
+def template_dependencies(file_info: Dict) -> Optional[List[str]]:
+    """Dependencies a project file has to cover: reported by its files plus named in its instructions."""
+    named = instruction_packages(file_info.get("instructions"))
+    if named is None:
+        return None
+    return list(file_info.get("dependencies") or []) + named
+
+
+def solution_project_guid(project_name: str) -> str:
+    """Deterministic project GUID so re-rendering a solution produces identical output."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"dotnet-project:{project_name}")).upper()
+
+
+class TemplateLibrary:
+    """Versioned Jinja template library for boilerplate project files."""
+
+    def __init__(self, template_dir: str = TEMPLATE_DIR):
+        self.template_dir = template_dir
+        self.env = Environment(
+            loader=FileSystemLoader(template_dir),
+            undefined=StrictUndefined,
+            keep_trailing_newline=True,
+            trim_blocks=True,
+            lstrip_blocks=True,
+            autoescape=False
+        )
+        self._version_hash = None
+
+    @property
+    def version_hash(self) -> str:
+        """Hash of the library version and every template source, for cache keys."""
+        if self._version_hash is None:
+            digest = hashlib.sha256(TEMPLATE_LIBRARY_VERSION.encode("utf-8"))
+            for template_name in sorted(set(TEMPLATES.values())):
+                with open(os.path.join(self.template_dir, template_name), "rb") as f:
+                    digest.update(template_name.encode("utf-8"))
+                    digest.update(f.read())
+            self._version_hash = digest.hexdigest()[:16]
+        return self._version_hash
+
+    def find_template(self, kind: Optional[str], layer: Optional[str]) -> Optional[str]:
+        if kind is None:
+            return None
+        return TEMPLATES.get((kind, layer)) or TEMPLATES.get((kind, None))
+
+    def can_render(self, file_name: str, file_info: Dict, layer: Optional[str]) -> bool:
+        """
+        A file is rendered locally when a template exists for its kind and layer, its
+        instructions ask nothing the template cannot do (see INSTRUCTION_HANDLING), every
+        package it needs has a known version, and its content does not depend on mapped
+        legacy sources.
+        """
+        kind = resolve_template_kind(file_name, file_info.get("file_type", ""))
+        if not self.find_template(kind, layer):
+            return False
+        if file_info.get("source_files") and kind not in SOURCE_INDEPENDENT_KINDS:
+            return False
+        handling = INSTRUCTION_HANDLING.get(kind)
+        if handling != "packages":
+            return handling == "ignore" or not (file_info.get("instructions") or "").strip()
+        dependencies = template_dependencies(file_info)
+        if dependencies is None:
+            return False
+        return not unresolved_packages(kind, layer, dependencies, (file_info.get("microservice_name") or "",))
+
+    def render(self, file_name: str, file_type: str, layer: Optional[str], context: Dict) -> Dict:
+        """Render a boilerplate file; returns the same shape as Migrator.generate_code."""
+        kind = resolve_template_kind(file_name, file_type)
+        template_name = self.find_template(kind, layer)
+        if not template_name:
+            raise ValueError(f"No template for {file_name} (kind: {kind}, layer: {layer})")
+
+        generated_code = self.env.get_template(template_name).render(**context)
+        dependencies = [package["name"] for package in context.get("packages", [])]
+        logger.debug(f"Rendered {file_name} from template {template_name} (library {self.version_hash})")
+        return {"generated_code": generated_code, "dependencies": dependencies}
+
+
+# Create singleton instance
+template_library = TemplateLibrary()
@@ -0,0 +1,101 @@
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Sequence
+import tiktoken
+
+# Texts shorter than this are encoded directly; hashing and caching them costs about as much
+MEMO_MIN_CHARS = 1024
+MEMO_MAX_ENTRIES = 4096
+# Exact counts of texts longer than this run in a worker thread when called from the event loop
+OFFLOAD_MIN_CHARS = 100_000
+# Average characters per token for code and prose with the gpt-4o encoding
+CHARS_PER_TOKEN = 3.5
+# approximate() is trusted for threshold checks when it is this far from the limit
+APPROXIMATION_MARGIN = 0.25
+
+
+class TokenCounter:
+    """
+    Shared token counting for the analysis and migration services.
+
+    Exact counts of large texts are memoized by content hash, so a source file, prompt or
+    generated file counted in several places (logging, limits, rate limiting) is encoded once.
+    Use count_parts for texts assembled from parts counted before, approximate/exceeds for
+    thresholds, and the async variants on the event loop so large texts are encoded in a thread.
+    """
+
+    def __init__(self, model: str = "gpt-4o", max_entries: int = MEMO_MAX_ENTRIES):
+        self.encoder = tiktoken.encoding_for_model(model)
+        self.max_entries = max_entries
+        self._memo: "OrderedDict[bytes, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+    def _cached(self, key: bytes) -> Optional[int]:
+        with self._lock:
+            count = self._memo.get(key)
+            if count is not None:
+                self._memo.move_to_end(key)
+            return count
+
+    def count(self, text: str) -> int:
+        """Exact number of tokens in `text`."""
+        if not text:
+            return 0
+        if len(text) < MEMO_MIN_CHARS:
+            return len(self.encoder.encode(text, disallowed_special=()))
+        key = self._key(text)
+        count = self._cached(key)
+        if count is None:
+            count = len(self.encoder.encode(text, disallowed_special=()))
+            with self._lock:
+                self._memo[key] = count
+                if len(self._memo) > self.max_entries:
+                    self._memo.popitem(last=False)
+        return count
+
+    async def count_async(self, text: str) -> int:
+        """count() for use on the event loop; uncached large texts are encoded in a worker thread."""
+        if len(text) < OFFLOAD_MIN_CHARS:
+            return self.count(text)
+        count = self._cached(self._key(text))
+        if count is not None:
+            return count
+        return await asyncio.to_thread(self.count, text)
+
+    def count_parts(self, parts: Sequence[str]) -> int:
+        """
+        Tokens of "".join(parts) from the counts of its parts. Shared parts (a prompt's fixed
+        instructions, a source file) hit the memo; merges across part boundaries make this off
+        by at most a token per boundary.
+        """
+        return sum(self.count(part) for part in parts)
+
+    async def count_parts_async(self, parts: Sequence[str]) -> int:
+        total = 0
+        for part in parts:
+            total += await self.count_async(part)
+        return total
+
+    @staticmethod
+    def approximate(text: str) -> int:
+        """Token estimate from the character count; no encoding."""
+        return int(len(text) / CHARS_PER_TOKEN) + 1 if text else 0
+
+    def exceeds(self, text: str, limit: int) -> bool:
+        """Whether `text` has more than `limit` tokens; only encodes when the estimate is close to the limit."""
+        estimate = self.approximate(text)
+        if estimate < limit * (1 - APPROXIMATION_MARGIN):
+            return False
+        if estimate > limit * (1 + APPROXIMATION_MARGIN):
+            return True
+        return self.count(text) > limit
+
+
+# Create singleton instance
+token_counter = TokenCounter()
@@ -3,6 +3,7 @@ from services.target_structure_rag_service import TargetStructureRagService
 from utils.file_cache import FileCache
 import asyncio
 from services.analysis_rag_service import AnalysisRagService
+from utils.source_index import SourcePathIndex
 
 def create_query_target_structure_tool(rag_service: TargetStructureRagService) -> FunctionTool:
     """
@@ -99,4 +100,30 @@ Guidelines:
         - "What dependencies are used in the original project?"
         - "Find information about the file UserController.cs"
         """
-    )
\ No newline at end of file
+    )
+
+def create_find_source_files_tool(source_index: SourcePathIndex) -> FunctionTool:
+    """
+    Factory for a source file lookup tool backed by the analysis' path index.
+    """
+    def find_source_files(query: str) -> str:
+        try:
+            matches = source_index.search(query, limit=20)
+            if not matches:
+                return f"No source files match '{query}'."
+            return "\n".join(matches)
+        except Exception as e:
+            return f"Error searching source files: {str(e)}"
+
+    return FunctionTool.from_defaults(
+        fn=find_source_files,
+        name="find_source_files",
+        description="""
+        Lists source file paths whose path contains every word of the query (case-insensitive).
+        Use it to locate files before fetching their content.
+        Example queries:
+        - "CustomerRepository"
+        - "controllers order"
+        - "web.config"
+        """
+    )
@@ -0,0 +1,191 @@
+"""
+Iterative helpers for the nested dicts passed around the service: analysis trees
+({folder: {file: analysis}}) and target structures ({folders: {name: {target_files, subfolders}}}).
+Nothing here recurses or deep-copies, so deep or very large trees cost one walk and no copies.
+"""
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+# Shared stand-in for a missing "subfolders" key, so it has a stable identity while pruning
+_NO_SUBFOLDERS: Dict = {}
+
+
+def iter_leaves(tree: Dict, sep: str = '/') -> Iterator[Tuple[str, Any]]:
+    """
+    Lazily yield (path, value) for every non-dict value, in insertion order.
+    Equivalent to flattening the tree, but without building intermediate dicts.
+    """
+    stack = [('', iter(tree.items()))]
+    while stack:
+        prefix, items = stack[-1]
+        for key, value in items:
+            path = f"{prefix}{sep}{key}" if prefix else key
+            if isinstance(value, dict):
+                stack.append((path, iter(value.items())))
+                break
+            yield path, value
+        else:
+            stack.pop()
+
+
+def flatten_tree(tree: Dict, sep: str = '/') -> Dict[str, Any]:
+    """Flatten a nested dict into {'a/b/c': value}; empty dicts produce no keys."""
+    return dict(iter_leaves(tree, sep))
+
+
+def iter_analyzed_files(tree: Dict, sep: str = '/') -> Iterator[Tuple[str, Any]]:
+    """
+    Lazily yield (file path, analysis) for an analyzed (or basic) tree.
+    A dict node counts as a file when it carries a 'file_type' string; plain values are files too.
+    """
+    stack = [('', iter((tree or {}).items()))]
+    while stack:
+        prefix, items = stack[-1]
+        for key, value in items:
+            path = f"{prefix}{sep}{key}" if prefix else key
+            if isinstance(value, dict) and not isinstance(value.get('file_type'), str):
+                stack.append((path, iter(value.items())))
+                break
+            yield path, value
+        else:
+            stack.pop()
+
+
+class TreePathView(Mapping):
+    """
+    Read-only, lazy {path: value} view over a nested dict. Lookups walk the path segments
+    instead of flattening the tree; iteration streams the leaves. Changes to the underlying
+    tree are visible immediately.
+    """
+
+    def __init__(self, tree: Dict, sep: str = '/'):
+        self._tree = tree
+        self._sep = sep
+
+    def __getitem__(self, path: str) -> Any:
+        node = self._tree
+        for part in path.split(self._sep):
+            if not isinstance(node, dict) or part not in node:
+                raise KeyError(path)
+            node = node[part]
+        if isinstance(node, dict):
+            raise KeyError(path)
+        return node
+
+    def __iter__(self) -> Iterator[str]:
+        return (path for path, _ in iter_leaves(self._tree, self._sep))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in iter_leaves(self._tree, self._sep))
+
+
+def _has_files(folder: Dict) -> bool:
+    target_files = folder.get('target_files')
+    return isinstance(target_files, (dict, list)) and len(target_files) > 0
+
+
+def prune_empty_folders(folders: Dict, on_remove: Optional[Callable[[str], None]] = None) -> int:
+    """
+    Remove, in place, every folder without files directly or in any subfolder.
+    Post-order and iterative; `on_remove` receives the path of each removed folder.
+    Returns the number of folders removed.
+    """
+    removed = 0
+    stack = [(folders, name, name, False) for name in list(folders or {})]
+    while stack:
+        parent, name, path, visited = stack.pop()
+        folder = parent.get(name)
+        if not isinstance(folder, dict):
+            continue
+        subfolders = folder.get('subfolders') or {}
+        if not visited:
+            stack.append((parent, name, path, True))
+            stack.extend((subfolders, sub_name, f"{path}/{sub_name}", False) for sub_name in list(subfolders))
+            continue
+        if not _has_files(folder) and not subfolders:
+            del parent[name]
+            removed += 1
+            if on_remove:
+                on_remove(path)
+    return removed
+
+
+def _pruned_folders(folders: Dict) -> Dict:
+    """
+    Return `folders` without empty folders, sharing every untouched subtree with the input.
+    Only folders on the way to a removed folder are shallow-copied.
+    """
+    result: Dict[int, Optional[Dict]] = {}
+    stack = [(folders, False)]
+    while stack:
+        mapping, visited = stack.pop()
+        if not visited:
+            stack.append((mapping, True))
+            stack.extend(((folder.get('subfolders') or _NO_SUBFOLDERS), False)
+                         for folder in mapping.values() if isinstance(folder, dict))
+            continue
+
+        changed = False
+        kept = {}
+        for name, folder in mapping.items():
+            if not isinstance(folder, dict):
+                kept[name] = folder
+                continue
+            subfolders = folder.get('subfolders') or _NO_SUBFOLDERS
+            new_subfolders = result[id(subfolders)]
+            if not _has_files(folder) and not new_subfolders:
+                changed = True
+                continue
+            if new_subfolders is not subfolders:
+                folder = {**folder, 'subfolders': new_subfolders}
+                changed = True
+            kept[name] = folder
+        result[id(mapping)] = kept if changed else mapping
+    return result[id(folders)]
+
+
+def clear_empty_folders(target_structure: Dict, in_place: bool = False) -> Dict:
+    """
+    Remove folders that do not contain any files, at any depth.
+
+    Accepts a single project structure ({"folders": ...}) or a full target structure
+    ({"microservices": [{"projects": [{"target_structure": ...}]}]}). By default the input
+    is left untouched and the result shares every unchanged subtree with it; with
+    `in_place=True` the input itself is pruned and returned.
+    """
+    if in_place:
+        for structure in _project_structures(target_structure):
+            prune_empty_folders(structure.get('folders') or {})
+        return target_structure
+
+    if 'microservices' in target_structure:
+        microservices = []
+        for ms in target_structure.get('microservices') or []:
+            if not isinstance(ms, dict):
+                microservices.append(ms)
+                continue
+            projects = []
+            for project in ms.get('projects') or []:
+                structure = project.get('target_structure') if isinstance(project, dict) else None
+                if isinstance(structure, dict):
+                    project = {**project, 'target_structure': clear_empty_folders(structure)}
+                projects.append(project)
+            microservices.append({**ms, 'projects': projects})
+        return {**target_structure, 'microservices': microservices}
+
+    folders = target_structure.get('folders')
+    if not isinstance(folders, dict):
+        return target_structure
+    pruned = _pruned_folders(folders)
+    return target_structure if pruned is folders else {**target_structure, 'folders': pruned}
+
+
+def _project_structures(target_structure: Dict) -> Iterator[Dict]:
+    if 'microservices' not in target_structure:
+        yield target_structure
+        return
+    for ms in target_structure.get('microservices') or []:
+        for project in (ms.get('projects') or []) if isinstance(ms, dict) else []:
+            structure = project.get('target_structure') if isinstance(project, dict) else None
+            if isinstance(structure, dict):
+                yield structure
@@ -0,0 +1,39 @@
+import os
+import certifi
+os.environ['REQUESTS_CA_BUNDLE'] = certifi.where()
+os.environ['SSL_CERT_FILE'] = certifi.where()
+import argparse
+import asyncio
+import multiprocessing
+from dotenv import load_dotenv
+load_dotenv()
+
+
+def run_worker() -> None:
+    # Imported here so every worker process builds its own LLM clients and DB engine
+    import nest_asyncio
+    from services.job_worker import JobWorker
+
+    nest_asyncio.apply()
+    try:
+        asyncio.run(JobWorker().run_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    from config.settings import settings
+
+    parser = argparse.ArgumentParser(description="Run background workers for queued analyze/migrate jobs")
+    parser.add_argument("--workers", type=int, default=settings.JOB_WORKERS, help="number of worker processes")
+    args = parser.parse_args()
+
+    processes = [multiprocessing.Process(target=run_worker, name=f"job-worker-{i}") for i in range(max(1, args.workers))]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()